@@ -4,8 +4,11 @@
 # LICENSE file in the root directory of this source tree.
 """Import file for Nocturne objects."""
 from nocturne_cpp import (Action, CollisionType, ObjectType, Object, RoadLine,
-                          RoadType, Scenario, Simulation, Vector2D, Vehicle,
-                          Pedestrian, Cyclist)
+                          RoadType, Scenario, ScenarioPack, ScenarioSnapshot,
+                          Simulation, Vector2D, Vehicle, Pedestrian, Cyclist,
+                          clear_scenario_cache, convert_scenario,
+                          scenario_cache_info, set_scenario_cache_capacity,
+                          write_scenario_pack)
 
 __all__ = [
     "Action",
@@ -15,10 +18,17 @@ __all__ = [
     "RoadLine",
     "RoadType",
     "Scenario",
+    "ScenarioPack",
+    "ScenarioSnapshot",
     "Simulation",
     "Vector2D",
     "Vehicle",
     "Pedestrian",
     "Cyclist",
+    "clear_scenario_cache",
+    "convert_scenario",
+    "scenario_cache_info",
+    "set_scenario_cache_capacity",
+    "write_scenario_pack",
     "envs",
 ]
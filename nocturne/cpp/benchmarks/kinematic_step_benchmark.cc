@@ -0,0 +1,122 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+// Time of the kinematic bicycle step of an ObjectStateStore versus the number
+// of objects, compared with a scalar loop calling std::cos, std::sin and
+// geometry::utils::AngleAdd per object. Also reports the largest differences
+// between the states computed by both.
+//
+// Usage: kinematic_step_benchmark [num_steps]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+#include <iomanip>
+#include <iostream>
+#include <random>
+
+#include "geometry/geometry_utils.h"
+#include "geometry/vector_2d.h"
+#include "object_state_store.h"
+
+namespace nocturne {
+namespace {
+
+constexpr float kDt = 0.1f;
+
+using Clock = std::chrono::steady_clock;
+
+double ElapsedUs(const Clock::time_point& start) {
+  return std::chrono::duration<double, std::micro>(Clock::now() - start)
+      .count();
+}
+
+// Objects with random states and controls, one in ten expert controlled.
+ObjectStateStore MakeStore(int64_t num_objects, std::mt19937& rng) {
+  std::uniform_real_distribution<float> position_dist(-1000.0f, 1000.0f);
+  std::uniform_real_distribution<float> heading_dist(-geometry::utils::kPi,
+                                                     geometry::utils::kPi);
+  std::uniform_real_distribution<float> speed_dist(0.0f, 20.0f);
+  std::uniform_real_distribution<float> acceleration_dist(-3.0f, 3.0f);
+  std::uniform_real_distribution<float> steering_dist(-0.3f, 0.3f);
+  ObjectStateStore store;
+  store.Reserve(num_objects);
+  for (int64_t i = 0; i < num_objects; ++i) {
+    store.Add(i, geometry::Vector2D(position_dist(rng), position_dist(rng)),
+              heading_dist(rng), speed_dist(rng), /*object_max_speed=*/30.0f);
+    store.acceleration[i] = acceleration_dist(rng);
+    store.steering[i] = steering_dist(rng);
+    store.flags[i] = i % 10 == 0 ? ObjectStateStore::kExpertControl : 0;
+  }
+  return store;
+}
+
+// Kinematic bicycle step of one object at a time with scalar library calls.
+void ScalarStep(ObjectStateStore& store, float dt) {
+  const float dt2 = dt * dt;
+  for (int64_t i = 0; i < store.size(); ++i) {
+    if ((store.flags[i] & (ObjectStateStore::kExpertControl |
+                           ObjectStateStore::kRemoved)) != 0) {
+      continue;
+    }
+    const float cos_heading = std::cos(store.heading[i]);
+    const float sin_heading = std::sin(store.heading[i]);
+    const float distance =
+        store.speed[i] * dt + 0.5f * store.acceleration[i] * dt2;
+    store.x[i] += distance * cos_heading;
+    store.y[i] += distance * sin_heading;
+    store.heading[i] = geometry::utils::AngleAdd(store.heading[i],
+                                                 store.steering[i] * distance);
+    store.speed[i] =
+        store.ClipSpeed(i, store.speed[i] + store.acceleration[i] * dt);
+  }
+}
+
+}  // namespace
+}  // namespace nocturne
+
+int main(int argc, char** argv) {
+  const int64_t num_steps = argc > 1 ? std::atoll(argv[1]) : 1000;
+  std::mt19937 rng(0);
+  std::cout << std::setw(12) << "num_objects" << std::setw(12) << "scalar_us"
+            << std::setw(12) << "store_us" << std::setw(12) << "speedup"
+            << std::setw(12) << "max_dpos" << std::setw(12) << "max_dyaw"
+            << std::endl;
+  for (const int64_t num_objects : {16, 64, 256, 1024, 4096}) {
+    const nocturne::ObjectStateStore initial =
+        nocturne::MakeStore(num_objects, rng);
+    nocturne::ObjectStateStore scalar = initial;
+    nocturne::ObjectStateStore store = initial;
+
+    nocturne::Clock::time_point start = nocturne::Clock::now();
+    for (int64_t t = 0; t < num_steps; ++t) {
+      nocturne::ScalarStep(scalar, nocturne::kDt);
+    }
+    const double scalar_us = nocturne::ElapsedUs(start) / num_steps;
+
+    start = nocturne::Clock::now();
+    for (int64_t t = 0; t < num_steps; ++t) {
+      store.KinematicBicycleStep(nocturne::kDt);
+    }
+    const double store_us = nocturne::ElapsedUs(start) / num_steps;
+
+    float max_dpos = 0.0f;
+    float max_dyaw = 0.0f;
+    for (int64_t i = 0; i < num_objects; ++i) {
+      max_dpos = std::max({max_dpos, std::fabs(store.x[i] - scalar.x[i]),
+                           std::fabs(store.y[i] - scalar.y[i])});
+      max_dyaw =
+          std::max(max_dyaw, std::fabs(nocturne::geometry::utils::AngleSub(
+                                 store.heading[i], scalar.heading[i])));
+    }
+    std::cout << std::fixed << std::setprecision(2) << std::setw(12)
+              << num_objects << std::setw(12) << scalar_us << std::setw(12)
+              << store_us << std::setw(12) << scalar_us / store_us
+              << std::scientific << std::setprecision(1) << std::setw(12)
+              << max_dpos << std::setw(12) << max_dyaw << std::endl;
+  }
+  return 0;
+}
@@ -0,0 +1,138 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+// Step time of a scenario, and rebuild and refit times of the object BVH,
+// versus the number of objects.
+//
+// Usage: object_bvh_benchmark [num_episodes]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+#include <iomanip>
+#include <iostream>
+#include <memory>
+#include <random>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <variant>
+#include <vector>
+
+#include "geometry/bvh.h"
+#include "object.h"
+#include "scenario.h"
+#include "scenario_format.h"
+
+namespace nocturne {
+namespace {
+
+constexpr int64_t kNumSteps = 90;
+constexpr float kDt = 0.1f;
+
+using Clock = std::chrono::steady_clock;
+
+double ElapsedUs(const Clock::time_point& start) {
+  return std::chrono::duration<double, std::micro>(Clock::now() - start)
+      .count();
+}
+
+// Vehicles on a grid of lanes 5m apart, driving along the lanes at random
+// speeds between 0 and 10m/s.
+ScenarioData MakeScenarioData(int64_t num_objects, std::mt19937& rng) {
+  std::uniform_real_distribution<float> speed_dist(0.0f, 10.0f);
+  const int64_t num_lanes = std::max<int64_t>(std::sqrt(num_objects), 1);
+  ScenarioData data;
+  data.name = "benchmark_" + std::to_string(num_objects);
+  for (int64_t i = 0; i < num_objects; ++i) {
+    const float x0 = 10.0f * static_cast<float>(i / num_lanes);
+    const float y = 5.0f * static_cast<float>(i % num_lanes);
+    const float speed = speed_dist(rng);
+    data.object_types.push_back(ObjectType::kVehicle);
+    data.object_lengths.push_back(4.5f);
+    data.object_widths.push_back(2.0f);
+    data.goal_x.push_back(x0 + speed * kDt * kNumSteps);
+    data.goal_y.push_back(y);
+    data.is_av.push_back(0);
+    for (int64_t t = 0; t <= kNumSteps; ++t) {
+      data.x.push_back(x0 + speed * kDt * t);
+      data.y.push_back(y);
+      data.heading.push_back(0.0f);
+      data.velocity_x.push_back(speed);
+      data.velocity_y.push_back(0.0f);
+      data.valid.push_back(1);
+    }
+    data.trajectory_offsets.push_back(data.x.size());
+  }
+  data.road_types.push_back(RoadType::kRoadEdge);
+  data.road_x = {-10.0f, -10.0f};
+  data.road_y = {-10.0f, 5.0f * num_lanes};
+  data.road_offsets.push_back(data.road_x.size());
+  return data;
+}
+
+// Average time of Scenario::Step over full episodes.
+double StepTimeUs(const ScenarioData& data, int64_t num_episodes) {
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}};
+  double total = 0.0;
+  for (int64_t episode = 0; episode < num_episodes; ++episode) {
+    Scenario scenario(data, config);
+    const Clock::time_point start = Clock::now();
+    for (int64_t t = 0; t < kNumSteps; ++t) {
+      scenario.Step(kDt);
+    }
+    total += ElapsedUs(start);
+  }
+  return total / (num_episodes * kNumSteps);
+}
+
+// Average times of rebuilding and of refitting the BVH of the objects of a
+// scenario after each step.
+std::pair<double, double> BVHTimeUs(const ScenarioData& data,
+                                    int64_t num_episodes) {
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}};
+  double rebuild = 0.0;
+  double refit = 0.0;
+  for (int64_t episode = 0; episode < num_episodes; ++episode) {
+    Scenario scenario(data, config);
+    const std::vector<std::shared_ptr<Object>>& objects = scenario.objects();
+    geometry::BVH bvh(objects);
+    for (int64_t t = 0; t < kNumSteps; ++t) {
+      scenario.Step(kDt);
+      Clock::time_point start = Clock::now();
+      bvh.Refit();
+      refit += ElapsedUs(start);
+      start = Clock::now();
+      geometry::BVH rebuilt(objects);
+      rebuild += ElapsedUs(start);
+    }
+  }
+  return std::make_pair(rebuild / (num_episodes * kNumSteps),
+                        refit / (num_episodes * kNumSteps));
+}
+
+}  // namespace
+}  // namespace nocturne
+
+int main(int argc, char** argv) {
+  const int64_t num_episodes = argc > 1 ? std::atoll(argv[1]) : 10;
+  std::mt19937 rng(0);
+  std::cout << std::setw(12) << "num_objects" << std::setw(12) << "step_us"
+            << std::setw(12) << "rebuild_us" << std::setw(12) << "refit_us"
+            << std::endl;
+  for (const int64_t num_objects : {16, 64, 256, 1024}) {
+    const nocturne::ScenarioData data =
+        nocturne::MakeScenarioData(num_objects, rng);
+    const double step = nocturne::StepTimeUs(data, num_episodes);
+    const auto [rebuild, refit] = nocturne::BVHTimeUs(data, num_episodes);
+    std::cout << std::fixed << std::setprecision(1) << std::setw(12)
+              << num_objects << std::setw(12) << step << std::setw(12)
+              << rebuild << std::setw(12) << refit << std::endl;
+  }
+  return 0;
+}
@@ -0,0 +1,187 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+// Build and query times of the BVH and of the uniform grid over the road edge
+// segments of real scenes. The queries are the bounding boxes of the recorded
+// vehicle poses, which is what the collision checks of a step look up. The
+// grid is timed for several cell sizes, as multiples of the median segment
+// length, and for the default one.
+//
+// Usage: road_edge_index_benchmark scenario_path [scenario_path...]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <iomanip>
+#include <iostream>
+#include <limits>
+#include <memory>
+#include <string>
+#include <tuple>
+#include <utility>
+#include <vector>
+
+#include "geometry/bvh.h"
+#include "geometry/geometry_utils.h"
+#include "geometry/line_segment.h"
+#include "geometry/polygon.h"
+#include "geometry/uniform_grid.h"
+#include "geometry/vector_2d.h"
+#include "scenario_format.h"
+
+namespace nocturne {
+namespace {
+
+constexpr int64_t kNumRepeats = 50;
+
+using Clock = std::chrono::steady_clock;
+
+double ElapsedUs(const Clock::time_point& start) {
+  return std::chrono::duration<double, std::micro>(Clock::now() - start)
+      .count();
+}
+
+std::vector<std::shared_ptr<geometry::LineSegment>> RoadEdgeSegments(
+    const ScenarioData& data) {
+  std::vector<std::shared_ptr<geometry::LineSegment>> segments;
+  for (int64_t road_idx = 0; road_idx < data.num_roads(); ++road_idx) {
+    if (data.road_types[road_idx] != RoadType::kRoadEdge) {
+      continue;
+    }
+    const int64_t beg = data.road_offsets[road_idx];
+    const int64_t end = data.road_offsets[road_idx + 1];
+    for (int64_t i = beg; i + 1 < end; ++i) {
+      segments.push_back(std::make_shared<geometry::LineSegment>(
+          geometry::Vector2D(data.road_x[i], data.road_y[i]),
+          geometry::Vector2D(data.road_x[i + 1], data.road_y[i + 1])));
+    }
+  }
+  return segments;
+}
+
+// Bounding boxes of all the valid recorded poses of the objects.
+std::vector<geometry::ConvexPolygon> QueryBoxes(const ScenarioData& data) {
+  std::vector<geometry::ConvexPolygon> boxes;
+  for (int64_t obj_idx = 0; obj_idx < data.num_objects(); ++obj_idx) {
+    const float half_length = data.object_lengths[obj_idx] * 0.5f;
+    const float half_width = data.object_widths[obj_idx] * 0.5f;
+    const int64_t beg = data.trajectory_offsets[obj_idx];
+    const int64_t end = data.trajectory_offsets[obj_idx + 1];
+    for (int64_t i = beg; i < end; ++i) {
+      if (!data.valid[i]) {
+        continue;
+      }
+      const geometry::Vector2D center(data.x[i], data.y[i]);
+      const geometry::Vector2D dx =
+          geometry::PolarToVector2D(half_length, data.heading[i]);
+      const geometry::Vector2D dy = geometry::PolarToVector2D(
+          half_width, data.heading[i] + geometry::utils::kHalfPi);
+      boxes.emplace_back(
+          std::vector<geometry::Vector2D>{center + dx + dy, center - dx + dy,
+                                          center - dx - dy, center + dx - dy});
+    }
+  }
+  return boxes;
+}
+
+float MedianLength(
+    const std::vector<std::shared_ptr<geometry::LineSegment>>& segments) {
+  std::vector<float> lengths;
+  lengths.reserve(segments.size());
+  for (const auto& seg : segments) {
+    lengths.push_back(seg->Length());
+  }
+  const auto median = lengths.begin() + lengths.size() / 2;
+  std::nth_element(lengths.begin(), median, lengths.end());
+  return *median;
+}
+
+// Returns the query time in microseconds, the best of kNumRepeats passes over
+// `boxes`, and the average number of candidates per query.
+template <class Index>
+std::pair<double, double> QueryTime(
+    const Index& index, const std::vector<geometry::ConvexPolygon>& boxes) {
+  const double n = static_cast<double>(boxes.size());
+  double best_us = std::numeric_limits<double>::max();
+  int64_t num_candidates = 0;
+  for (int64_t r = 0; r < kNumRepeats; ++r) {
+    num_candidates = 0;
+    const Clock::time_point start = Clock::now();
+    for (const geometry::ConvexPolygon& box : boxes) {
+      num_candidates +=
+          index.template IntersectionCandidates<geometry::LineSegment>(box)
+              .size();
+    }
+    best_us = std::min(best_us, ElapsedUs(start) / n);
+  }
+  return std::make_pair(best_us, num_candidates / n);
+}
+
+void PrintRow(const std::string& index, float cell_size, double build_us,
+              double query_us, double num_candidates, int64_t memory) {
+  std::cout << std::fixed << std::setprecision(3) << std::setw(12) << index
+            << std::setw(12) << cell_size << std::setw(12) << build_us
+            << std::setw(12) << query_us << std::setw(12) << num_candidates
+            << std::setw(12) << memory << std::endl;
+}
+
+void Run(const std::string& scenario_path) {
+  const ScenarioData data = ReadScenarioFile(scenario_path);
+  const std::vector<std::shared_ptr<geometry::LineSegment>> segments =
+      RoadEdgeSegments(data);
+  const std::vector<geometry::ConvexPolygon> boxes = QueryBoxes(data);
+  if (segments.empty() || boxes.empty()) {
+    std::cout << scenario_path << ": no road edges or objects" << std::endl;
+    return;
+  }
+  const float median_length = MedianLength(segments);
+  std::cout << scenario_path << ": " << segments.size() << " segments, "
+            << "median length " << median_length << "m, " << boxes.size()
+            << " queries" << std::endl;
+  std::cout << std::setw(12) << "index" << std::setw(12) << "cell_size"
+            << std::setw(12) << "build_us" << std::setw(12) << "query_us"
+            << std::setw(12) << "candidates" << std::setw(12) << "bytes"
+            << std::endl;
+
+  Clock::time_point start = Clock::now();
+  geometry::BVH bvh;
+  for (int64_t r = 0; r < kNumRepeats; ++r) {
+    bvh.Reset(segments);
+  }
+  double build_us = ElapsedUs(start) / kNumRepeats;
+  auto [query_us, num_candidates] = QueryTime(bvh, boxes);
+  PrintRow("bvh", /*cell_size=*/0.0f, build_us, query_us, num_candidates,
+           (2 * segments.size() - 1) * sizeof(geometry::BVH::Node));
+
+  for (const float scale : {0.0f, 1.0f, 2.0f, 4.0f, 8.0f, 16.0f, 32.0f}) {
+    start = Clock::now();
+    geometry::UniformGrid grid;
+    for (int64_t r = 0; r < kNumRepeats; ++r) {
+      grid.Reset(segments, scale * median_length);
+    }
+    build_us = ElapsedUs(start) / kNumRepeats;
+    std::tie(query_us, num_candidates) = QueryTime(grid, boxes);
+    const std::string name =
+        scale > 0.0f ? "grid_x" + std::to_string(static_cast<int>(scale))
+                     : "grid";
+    PrintRow(name, grid.cell_size(), build_us, query_us, num_candidates,
+             grid.MemoryUsage());
+  }
+}
+
+}  // namespace
+}  // namespace nocturne
+
+int main(int argc, char** argv) {
+  if (argc < 2) {
+    std::cerr << "Usage: " << argv[0] << " scenario_path [scenario_path...]"
+              << std::endl;
+    return 1;
+  }
+  for (int i = 1; i < argc; ++i) {
+    nocturne::Run(argv[i]);
+  }
+  return 0;
+}
@@ -0,0 +1,202 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+// Time of the occlusion tests of one observer: visible objects among the
+// candidate objects, then visible road points behind the visible objects.
+// The brute-force tests of every sight line against every object are compared
+// with the angular buckets and the angular sweep, for 16 to 64 objects and 500
+// road points scattered around the observer.
+//
+// Usage: visibility_benchmark [num_scenes]
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+#include <iomanip>
+#include <iostream>
+#include <limits>
+#include <memory>
+#include <random>
+#include <vector>
+
+#include "geometry/geometry_utils.h"
+#include "geometry/intersection.h"
+#include "geometry/point_like.h"
+#include "geometry/vector_2d.h"
+#include "object_base.h"
+#include "occlusion.h"
+#include "road.h"
+#include "utils/data_utils.h"
+#include "vehicle.h"
+#include "view_field.h"
+
+namespace nocturne {
+namespace {
+
+constexpr int64_t kNumRoadPoints = 500;
+constexpr int64_t kNumRepeats = 20;
+constexpr float kViewDist = 80.0f;
+constexpr float kSceneRadius = 50.0f;
+
+using Clock = std::chrono::steady_clock;
+
+double ElapsedUs(const Clock::time_point& start) {
+  return std::chrono::duration<double, std::micro>(Clock::now() - start)
+      .count();
+}
+
+struct Scene {
+  std::vector<std::unique_ptr<Vehicle>> vehicles;
+  std::vector<RoadPoint> road_points;
+  std::vector<Occluder> occluders;
+};
+
+geometry::Vector2D RandomPosition(std::mt19937& gen) {
+  std::uniform_real_distribution<float> radius_dis(0.0f, 1.0f);
+  std::uniform_real_distribution<float> angle_dis(-geometry::utils::kPi,
+                                                  geometry::utils::kPi);
+  // Uniform over the disk, at least 3m away from the observer.
+  const float r = 3.0f + (kSceneRadius - 3.0f) * std::sqrt(radius_dis(gen));
+  return geometry::PolarToVector2D(r, angle_dis(gen));
+}
+
+Scene MakeScene(int64_t num_objects, std::mt19937& gen) {
+  std::uniform_real_distribution<float> heading_dis(-geometry::utils::kPi,
+                                                    geometry::utils::kPi);
+  Scene scene;
+  for (int64_t i = 0; i < num_objects; ++i) {
+    const geometry::Vector2D position = RandomPosition(gen);
+    scene.vehicles.push_back(std::make_unique<Vehicle>(
+        i, /*length=*/4.5f, /*width=*/2.0f, position, heading_dis(gen),
+        /*speed=*/0.0f, position, /*target_heading=*/0.0f,
+        /*target_speed=*/0.0f, /*is_av=*/false));
+  }
+  scene.road_points.reserve(kNumRoadPoints);
+  for (int64_t i = 0; i < kNumRoadPoints; ++i) {
+    const geometry::Vector2D position = RandomPosition(gen);
+    scene.road_points.emplace_back(position, position, RoadType::kLane);
+  }
+  for (const auto& vehicle : scene.vehicles) {
+    scene.occluders.emplace_back(*vehicle);
+  }
+  return scene;
+}
+
+// The road points are tested against all the visible objects.
+void BruteForceOccludedPoints(const ViewField& vf, const geometry::Vector2D& o,
+                              const std::vector<const ObjectBase*>& objects,
+                              std::vector<const geometry::PointLike*>& points) {
+  const auto [x, y] = geometry::utils::PackCoordinates(points);
+  std::vector<geometry::utils::MaskType> mask(points.size(), 1);
+  std::vector<geometry::utils::MaskType> block_mask;
+  for (const ObjectBase* obj : objects) {
+    if (!obj->can_block_sight()) {
+      continue;
+    }
+    geometry::BatchIntersects(obj->BoundingPolygon(), o, x, y, block_mask);
+    for (size_t i = 0; i < mask.size(); ++i) {
+      mask[i] &= (block_mask[i] ^ 1);
+    }
+  }
+  points.resize(utils::MaskedPartition(mask, points));
+  vf.FilterVisiblePoints(points);
+}
+
+// Returns the time in microseconds of the occlusion tests of the scene, the
+// best of kNumRepeats passes, and the numbers of visible objects and points.
+template <class Func>
+double Time(const Scene& scene, Func&& func, int64_t& num_objects,
+            int64_t& num_points) {
+  double best_us = std::numeric_limits<double>::max();
+  for (int64_t r = 0; r < kNumRepeats; ++r) {
+    std::vector<const ObjectBase*> objects;
+    std::vector<const Occluder*> occluders;
+    std::vector<const geometry::PointLike*> points;
+    for (size_t i = 0; i < scene.vehicles.size(); ++i) {
+      objects.push_back(scene.vehicles[i].get());
+      occluders.push_back(&scene.occluders[i]);
+    }
+    for (const RoadPoint& point : scene.road_points) {
+      points.push_back(&point);
+    }
+    const Clock::time_point start = Clock::now();
+    func(objects, occluders, points);
+    best_us = std::min(best_us, ElapsedUs(start));
+    num_objects = objects.size();
+    num_points = points.size();
+  }
+  return best_us;
+}
+
+void Run(int64_t num_scenes) {
+  const geometry::Vector2D o(0.0f, 0.0f);
+  const ViewField vf(o, kViewDist, /*heading=*/0.0f, geometry::utils::kTwoPi);
+  std::mt19937 gen(0);
+  std::cout << std::setw(12) << "objects" << std::setw(12) << "brute_us"
+            << std::setw(12) << "buckets_us" << std::setw(12) << "sweep_us"
+            << std::setw(12) << "visible" << std::setw(12) << "points"
+            << std::endl;
+  for (const int64_t num_objects : {16, 32, 48, 64}) {
+    double brute_us = 0.0;
+    double buckets_us = 0.0;
+    double sweep_us = 0.0;
+    int64_t num_visible = 0;
+    int64_t num_points = 0;
+    for (int64_t i = 0; i < num_scenes; ++i) {
+      const Scene scene = MakeScene(num_objects, gen);
+      int64_t cur_visible = 0;
+      int64_t cur_points = 0;
+      brute_us += Time(
+          scene,
+          [&](std::vector<const ObjectBase*>& objects,
+              std::vector<const Occluder*>& /*occluders*/,
+              std::vector<const geometry::PointLike*>& points) {
+            vf.FilterVisibleObjects(objects);
+            BruteForceOccludedPoints(vf, o, objects, points);
+          },
+          cur_visible, cur_points);
+      num_visible += cur_visible;
+      num_points += cur_points;
+      for (const OcclusionAlgorithm algorithm :
+           {OcclusionAlgorithm::kAngularBuckets,
+            OcclusionAlgorithm::kAngularSweep}) {
+        int64_t visible = 0;
+        int64_t points = 0;
+        const double us = Time(
+            scene,
+            [&](std::vector<const ObjectBase*>& objects,
+                std::vector<const Occluder*>& occluders,
+                std::vector<const geometry::PointLike*>& points) {
+              vf.FilterVisibleObjects(objects, occluders, algorithm);
+              vf.FilterOccludedPoints(objects, occluders, points, algorithm);
+              vf.FilterVisiblePoints(points);
+            },
+            visible, points);
+        if (visible != cur_visible || points != cur_points) {
+          std::cerr << "Results differ from the brute force." << std::endl;
+          std::exit(1);
+        }
+        (algorithm == OcclusionAlgorithm::kAngularSweep ? sweep_us
+                                                        : buckets_us) += us;
+      }
+    }
+    std::cout << std::fixed << std::setprecision(2) << std::setw(12)
+              << num_objects << std::setw(12) << brute_us / num_scenes
+              << std::setw(12) << buckets_us / num_scenes << std::setw(12)
+              << sweep_us / num_scenes << std::setw(12)
+              << static_cast<double>(num_visible) / num_scenes << std::setw(12)
+              << static_cast<double>(num_points) / num_scenes << std::endl;
+  }
+}
+
+}  // namespace
+}  // namespace nocturne
+
+int main(int argc, char** argv) {
+  const int64_t num_scenes = argc > 1 ? std::atoll(argv[1]) : 20;
+  nocturne::Run(num_scenes);
+  return 0;
+}
@@ -48,10 +48,15 @@ class BVH {
     const Node* RChild() const { return children_[1]; }
     Node* RChild() { return children_[1]; }
 
+    const Node* Parent() const { return parent_; }
+
    protected:
+    friend class BVH;
+
     AABB aabb_;
     const AABBInterface* object_ = nullptr;
     std::array<Node*, 2> children_ = {nullptr, nullptr};
+    Node* parent_ = nullptr;
   };
 
   BVH() = default;
@@ -78,14 +83,41 @@ class BVH {
     Reset(objects);
   }
 
-  bool Empty() const { return nodes_.empty(); }
+  bool Empty() const { return root_ == nullptr; }
   int64_t Size() const { return nodes_.size(); }
 
   void Clear() {
     root_ = nullptr;
     nodes_.clear();
+    leaves_.clear();
+    build_cost_ = 0.0f;
+  }
+
+  // Surface area heuristic cost of the tree: the sum of the areas of its
+  // internal nodes. The looser the nodes, the more nodes a query visits.
+  float Cost() const;
+
+  // Recomputes the bounding boxes of the nodes bottom-up from the current
+  // bounding boxes of the objects, keeping the structure of the tree. This is
+  // much cheaper than Reset when the objects moved a little. Returns the ratio
+  // between the cost of the refitted tree and its cost when it was built,
+  // which grows as the tree gets looser.
+  float Refit();
+
+  // Removes `object` from the tree in place. Returns false if the object is not
+  // in the tree.
+  bool Remove(const AABBInterface* object) {
+    return Remove(std::vector<const AABBInterface*>{object}) > 0;
   }
 
+  // Removes `objects` from the tree in place, in one pass over the nodes.
+  // Returns the number of objects that were removed.
+  int64_t Remove(std::vector<const AABBInterface*> objects);
+
+  // Removes the object at `index` in the objects the tree was built from, in
+  // O(depth) time. Returns false if the object is not in the tree anymore.
+  bool RemoveAt(int64_t index);
+
   template <class ObjectType>
   void Reset(const std::vector<ObjectType>& objects) {
     ResetImpl(
@@ -112,11 +144,21 @@ class BVH {
   std::vector<const ObjectType*> IntersectionCandidates(
       const AABBInterface& object) const {
     std::vector<const ObjectType*> candidates;
+    IntersectionCandidates(object, candidates);
+    return candidates;
+  }
+
+  // Same as above, into `candidates` which is cleared first so that its
+  // capacity can be reused across queries.
+  template <class ObjectType>
+  void IntersectionCandidates(
+      const AABBInterface& object,
+      std::vector<const ObjectType*>& candidates) const {
+    candidates.clear();
     if (root_ != nullptr) {
       IntersectionCandidatesImpl<AABB, ObjectType>(object.GetAABB(), root_,
                                                    candidates);
     }
-    return candidates;
   }
 
   template <class ObjectType>
@@ -139,9 +181,14 @@ class BVH {
   Node* MakeNode(Node* l_child, Node* r_child) {
     nodes_.emplace_back((l_child->aabb() || r_child->aabb()),
                         /*object=*/nullptr, l_child, r_child);
+    l_child->parent_ = &nodes_.back();
+    r_child->parent_ = &nodes_.back();
     return &nodes_.back();
   }
 
+  // Replaces the parent of `leaf` by the sibling of `leaf`.
+  void RemoveLeaf(Node* leaf);
+
   std::vector<BVH::Node*> CombineNodes(const std::vector<BVH::Node*>& nodes,
                                        int64_t num);
 
@@ -157,24 +204,31 @@ class BVH {
 
     const int64_t n = objects.size();
     nodes_.reserve(2 * n - 1);
-    std::vector<std::pair<uint64_t, const AABBInterface*>> encoded_objects;
+    leaves_.assign(n, nullptr);
+    std::vector<const AABBInterface*> object_ptrs;
+    object_ptrs.reserve(n);
+    std::vector<std::pair<uint64_t, int64_t>> encoded_objects;
     encoded_objects.reserve(n);
-    for (const ObjectType& obj : objects) {
-      const AABB aabb = aabb_func(obj);
+    for (int64_t i = 0; i < n; ++i) {
+      const AABB aabb = aabb_func(objects[i]);
       const uint64_t morton_code = morton::Morton2D(aabb.Center());
-      encoded_objects.emplace_back(
-          morton_code, dynamic_cast<const AABBInterface*>(ptr_func(obj)));
+      object_ptrs.push_back(
+          dynamic_cast<const AABBInterface*>(ptr_func(objects[i])));
+      encoded_objects.emplace_back(morton_code, i);
     }
     std::sort(encoded_objects.begin(), encoded_objects.end());
     const std::vector<Node*> nodes =
-        InitHierarchy(encoded_objects, /*l=*/0, /*r=*/n);
+        InitHierarchy(object_ptrs, encoded_objects, /*l=*/0, /*r=*/n);
     const std::vector<Node*> root = CombineNodes(nodes, 1);
     root_ = root[0];
+    build_cost_ = Cost();
   }
 
-  // Init hierarchy in range [l, r).
+  // Init hierarchy in range [l, r) of `encoded_objects`, the Morton codes and
+  // indices in `objects` of the objects sorted by code.
   std::vector<Node*> InitHierarchy(
-      const std::vector<std::pair<uint64_t, const AABBInterface*>>& objects,
+      const std::vector<const AABBInterface*>& objects,
+      const std::vector<std::pair<uint64_t, int64_t>>& encoded_objects,
       int64_t l, int64_t r);
 
   template <class AABBType, class ObjectType>
@@ -192,8 +246,13 @@ class BVH {
     IntersectionCandidatesImpl(obj, cur->RChild(), candidates);
   }
 
+  // Children are always stored before their parent. Nodes removed from the
+  // tree are kept, without object nor children.
   std::vector<Node> nodes_;
+  // Leaf of each object, indexed like the objects the tree was built from.
+  std::vector<Node*> leaves_;
   Node* root_ = nullptr;
+  float build_cost_ = 0.0f;
   const int64_t delta_ = 4;
 };
 
@@ -32,8 +32,16 @@ class CircleLike : public AABBInterface {
   virtual std::pair<std::optional<Vector2D>, std::optional<Vector2D>>
   Intersection(const LineSegment& segment) const;
 
-  virtual std::vector<utils::MaskType> BatchContains(
-      const std::vector<const PointLike*>& points) const = 0;
+  std::vector<utils::MaskType> BatchContains(
+      const std::vector<const PointLike*>& points) const {
+    std::vector<utils::MaskType> mask;
+    BatchContains(points, mask);
+    return mask;
+  }
+
+  // Same as above, into `mask` which is resized to the number of points.
+  virtual void BatchContains(const std::vector<const PointLike*>& points,
+                             std::vector<utils::MaskType>& mask) const = 0;
 
  protected:
   const Vector2D center_;
@@ -58,8 +66,9 @@ class Circle : public CircleLike {
     return dx * dx + dy * dy <= radius_ * radius_;
   }
 
-  std::vector<utils::MaskType> BatchContains(
-      const std::vector<const PointLike*>& points) const override;
+  using CircleLike::BatchContains;
+  void BatchContains(const std::vector<const PointLike*>& points,
+                     std::vector<utils::MaskType>& mask) const override;
 };
 
 }  // namespace geometry
@@ -54,8 +54,9 @@ class CircularSector : public CircleLike {
 
   bool Contains(const Vector2D& p) const override;
 
-  std::vector<utils::MaskType> BatchContains(
-      const std::vector<const PointLike*>& points) const override;
+  using CircleLike::BatchContains;
+  void BatchContains(const std::vector<const PointLike*>& points,
+                     std::vector<utils::MaskType>& mask) const override;
 
   std::pair<std::optional<Vector2D>, std::optional<Vector2D>> Intersection(
       const LineSegment& segment) const override;
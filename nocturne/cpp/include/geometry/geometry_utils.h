@@ -72,6 +72,11 @@ std::pair<std::vector<float>, std::vector<float>> PackCoordinates(
     const std::vector<Vector2D>& points);
 std::pair<std::vector<float>, std::vector<float>> PackCoordinates(
     const std::vector<const PointLike*>& points);
+// Same as above, into `x` and `y` which are resized to the number of points.
+void PackCoordinates(const std::vector<Vector2D>& points, std::vector<float>& x,
+                     std::vector<float>& y);
+void PackCoordinates(const std::vector<const PointLike*>& points,
+                     std::vector<float>& x, std::vector<float>& y);
 
 template <int64_t N>
 std::pair<std::array<float, N>, std::array<float, N>> PackSmallPolygon(
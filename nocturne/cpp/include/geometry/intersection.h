@@ -39,6 +39,16 @@ std::vector<utils::MaskType> BatchIntersects(const ConvexPolygon& polygon,
                                              const std::vector<float>& x,
                                              const std::vector<float>& y);
 
+// Same as above, into `mask` which is resized to the number of points.
+void BatchIntersects(const ConvexPolygon& polygon, const Vector2D& o,
+                     const std::vector<float>& x, const std::vector<float>& y,
+                     std::vector<utils::MaskType>& mask);
+
+// Same as above for the n points (x[i], y[i]), into mask[0, n).
+void BatchIntersects(const ConvexPolygon& polygon, const Vector2D& o,
+                     const float* x, const float* y, int64_t n,
+                     utils::MaskType* mask);
+
 std::vector<utils::MaskType> BatchIntersects(
     const ConvexPolygon& polygon, const Vector2D& o,
     const std::vector<Vector2D>& points);
@@ -69,6 +79,11 @@ std::vector<float> BatchParametricIntersection(const Vector2D& o,
                                                const std::vector<float>& y,
                                                const ConvexPolygon& polygon);
 
+// Same as above for the n points (x[i], y[i]), into ret[0, n).
+void BatchParametricIntersection(const Vector2D& o, const float* x,
+                                 const float* y, int64_t n,
+                                 const ConvexPolygon& polygon, float* ret);
+
 std::vector<float> BatchParametricIntersection(
     const Vector2D& o, const std::vector<Vector2D>& points,
     const ConvexPolygon& polygon);
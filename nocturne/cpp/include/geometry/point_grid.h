@@ -0,0 +1,170 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <limits>
+#include <vector>
+
+#include "geometry/point_like.h"
+#include "geometry/vector_2d.h"
+
+namespace nocturne {
+namespace geometry {
+
+// Uniform grid over static points supporting nearest-first traversal. The
+// cells around a query point are visited by rings of increasing Chebyshev
+// distance from its cell, and after each ring the points closer than a lower
+// bound of the distance to the cells of the next rings are known. A search for
+// the k nearest points satisfying a predicate can then stop as soon as k of
+// them are closer than that bound, however many points are further away.
+//
+// Time complexity for Reset operation: O(N + C), C being the number of cells.
+// Time complexity for RingPoints operation: O(R + K), R being the number of
+// cells in the ring.
+class PointGrid {
+ public:
+  PointGrid() = default;
+
+  template <class PointType>
+  PointGrid(const std::vector<const PointType*>& points, float cell_size) {
+    Reset(points, cell_size);
+  }
+
+  bool Empty() const { return points_.empty(); }
+  int64_t Size() const { return points_.size(); }
+
+  float cell_size() const { return cell_size_; }
+  int64_t num_cells() const { return num_cols_ * num_rows_; }
+
+  void Clear();
+
+  // Builds the grid with square cells of side `cell_size`, which may be
+  // enlarged to bound the number of cells of sparse sets of points.
+  template <class PointType>
+  void Reset(const std::vector<const PointType*>& points, float cell_size) {
+    std::vector<const PointLike*> ptrs;
+    ptrs.reserve(points.size());
+    for (const PointType* point : points) {
+      ptrs.push_back(dynamic_cast<const PointLike*>(point));
+    }
+    ResetImpl(std::move(ptrs), cell_size);
+  }
+
+  // Number of rings around `o` which cover all the cells.
+  int64_t NumRings(const Vector2D& o) const {
+    if (Empty()) {
+      return 0;
+    }
+    const int64_t col = Col(o.x());
+    const int64_t row = Row(o.y());
+    return std::max({col, num_cols_ - 1 - col, row, num_rows_ - 1 - row}) + 1;
+  }
+
+  // Appends the points of the cells at Chebyshev distance `ring` from the
+  // cell of `o` to `ret`, in the order of the input within each cell. Returns
+  // a lower bound of the distance from `o` to the points of the next rings,
+  // so the points closer than it are all in the rings up to `ring`. The bound
+  // is infinite after the last ring. PointType must be the type of the points
+  // the grid was built from, or one of its bases.
+  template <class PointType>
+  float RingPoints(const Vector2D& o, int64_t ring,
+                   std::vector<const PointType*>& ret) const {
+    if (Empty()) {
+      return std::numeric_limits<float>::infinity();
+    }
+    const int64_t col = Col(o.x());
+    const int64_t row = Row(o.y());
+    const int64_t min_col = col - ring;
+    const int64_t max_col = col + ring;
+    const int64_t min_row = row - ring;
+    const int64_t max_row = row + ring;
+    const auto append_cells = [this, &ret](int64_t row, int64_t col_begin,
+                                           int64_t col_end) {
+      if (row < 0 || row >= num_rows_) {
+        return;
+      }
+      col_begin = std::max(col_begin, int64_t(0));
+      col_end = std::min(col_end, num_cols_);
+      if (col_begin >= col_end) {
+        return;
+      }
+      // The cells of a row are contiguous.
+      const int64_t begin = cell_offsets_[row * num_cols_ + col_begin];
+      const int64_t end = cell_offsets_[row * num_cols_ + col_end];
+      for (int64_t k = begin; k < end; ++k) {
+        ret.push_back(static_cast<const PointType*>(points_[k]));
+      }
+    };
+    if (ring == 0) {
+      append_cells(row, col, col + 1);
+    } else {
+      append_cells(min_row, min_col, max_col + 1);
+      for (int64_t r = min_row + 1; r < max_row; ++r) {
+        append_cells(r, min_col, min_col + 1);
+        append_cells(r, max_col, max_col + 1);
+      }
+      append_cells(max_row, min_col, max_col + 1);
+    }
+
+    // The points of a cell (c, r) lie in [x0 + c * s, x0 + (c + 1) * s] x
+    // [y0 + r * s, y0 + (r + 1) * s] up to rounding errors, so the points
+    // outside of the block of rings are further than its nearest side which
+    // has cells beyond it.
+    float bound = std::numeric_limits<float>::infinity();
+    if (min_col > 0) {
+      bound = std::min(bound, o.x() - (min_x_ + min_col * cell_size_));
+    }
+    if (max_col < num_cols_ - 1) {
+      bound = std::min(bound, min_x_ + (max_col + 1) * cell_size_ - o.x());
+    }
+    if (min_row > 0) {
+      bound = std::min(bound, o.y() - (min_y_ + min_row * cell_size_));
+    }
+    if (max_row < num_rows_ - 1) {
+      bound = std::min(bound, min_y_ + (max_row + 1) * cell_size_ - o.y());
+    }
+    return bound - kBoundMargin * cell_size_;
+  }
+
+  // Approximate number of bytes used by the grid.
+  int64_t MemoryUsage() const;
+
+ protected:
+  // Margin of the distance bounds, as a fraction of the cell size, which
+  // covers the rounding errors of the cell coordinates.
+  static constexpr float kBoundMargin = 1e-3f;
+
+  void ResetImpl(std::vector<const PointLike*> points, float cell_size);
+
+  int64_t Col(float x) const {
+    const float col = std::floor((x - min_x_) / cell_size_);
+    return static_cast<int64_t>(
+        std::clamp(col, 0.0f, static_cast<float>(num_cols_ - 1)));
+  }
+
+  int64_t Row(float y) const {
+    const float row = std::floor((y - min_y_) / cell_size_);
+    return static_cast<int64_t>(
+        std::clamp(row, 0.0f, static_cast<float>(num_rows_ - 1)));
+  }
+
+  // Points sorted by cell, those of cell (col, row) being
+  // points_[cell_offsets_[c]:cell_offsets_[c + 1]], with
+  // c = row * num_cols_ + col.
+  std::vector<const PointLike*> points_;
+  std::vector<int64_t> cell_offsets_;
+
+  float min_x_ = 0.0f;
+  float min_y_ = 0.0f;
+  float cell_size_ = 0.0f;
+  int64_t num_cols_ = 0;
+  int64_t num_rows_ = 0;
+};
+
+}  // namespace geometry
+}  // namespace nocturne
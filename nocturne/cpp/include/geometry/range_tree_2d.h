@@ -79,6 +79,15 @@ class RangeTree2d {
   template <class PointType>
   std::vector<const PointType*> RangeSearch(const AABB& aabb) const {
     std::vector<const PointType*> ret;
+    RangeSearch(aabb, ret);
+    return ret;
+  }
+
+  // Same as above, into `ret` which is cleared first so that its capacity can
+  // be reused across queries.
+  template <class PointType>
+  void RangeSearch(const AABB& aabb, std::vector<const PointType*>& ret) const {
+    ret.clear();
     const auto l_ptr = std::lower_bound(
         points_.cbegin(), points_.cend(), aabb.MinX(),
         [](const PointLike* a, float b) { return a->X() < b; });
@@ -97,7 +106,6 @@ class RangeTree2d {
       l >>= 1;
       r >>= 1;
     }
-    return ret;
   }
 
   template <class PointType>
@@ -105,6 +113,12 @@ class RangeTree2d {
     return RangeSearch<PointType>(object.GetAABB());
   }
 
+  template <class PointType>
+  void RangeSearch(const AABBInterface& object,
+                   std::vector<const PointType*>& ret) const {
+    RangeSearch(object.GetAABB(), ret);
+  }
+
  protected:
   // Time complexity: O(NlogN)
   template <class PointType, class PtrFunc>
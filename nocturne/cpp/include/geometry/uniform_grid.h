@@ -0,0 +1,135 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <memory>
+#include <vector>
+
+#include "geometry/aabb.h"
+#include "geometry/aabb_interface.h"
+
+namespace nocturne {
+namespace geometry {
+
+// Uniform grid over static objects, e.g. the road edge segments. Each object
+// is stored in all the cells its bounding box overlaps, and a query only
+// visits the cells overlapped by its bounding box. For the many short segments
+// of a road network it is several times faster to build than a BVH and at
+// least as fast to query.
+//
+// Time complexity for Reset operation: O(N + C), C being the number of cells.
+// Time complexity for IntersectionCandidates operation: O(Q + K), Q being the
+// number of objects in the cells overlapped by the query.
+class UniformGrid {
+ public:
+  UniformGrid() = default;
+
+  template <class ObjectType>
+  explicit UniformGrid(const std::vector<std::shared_ptr<ObjectType>>& objects,
+                       float cell_size = 0.0f) {
+    Reset(objects, cell_size);
+  }
+
+  bool Empty() const { return objects_.empty(); }
+  int64_t Size() const { return objects_.size(); }
+
+  float cell_size() const { return cell_size_; }
+  int64_t num_cells() const { return num_cols_ * num_rows_; }
+
+  void Clear();
+
+  // Builds the grid with square cells of side `cell_size`. If `cell_size` is
+  // not positive, the side is a multiple of the median size of the objects.
+  template <class ObjectType>
+  void Reset(const std::vector<std::shared_ptr<ObjectType>>& objects,
+             float cell_size = 0.0f) {
+    std::vector<const AABBInterface*> ptrs;
+    ptrs.reserve(objects.size());
+    for (const auto& obj : objects) {
+      ptrs.push_back(dynamic_cast<const AABBInterface*>(obj.get()));
+    }
+    ResetImpl(std::move(ptrs), cell_size);
+  }
+
+  // Returns the objects whose bounding boxes intersect `aabb`, each once.
+  template <class ObjectType>
+  std::vector<const ObjectType*> IntersectionCandidates(
+      const AABB& aabb) const {
+    std::vector<const ObjectType*> candidates;
+    if (Empty()) {
+      return candidates;
+    }
+    const int64_t min_col = Col(aabb.MinX());
+    const int64_t min_row = Row(aabb.MinY());
+    const int64_t max_col = Col(aabb.MaxX());
+    const int64_t max_row = Row(aabb.MaxY());
+    for (int64_t row = min_row; row <= max_row; ++row) {
+      for (int64_t col = min_col; col <= max_col; ++col) {
+        const int64_t cell = row * num_cols_ + col;
+        for (int64_t k = cell_offsets_[cell]; k < cell_offsets_[cell + 1];
+             ++k) {
+          const int64_t i = cell_objects_[k];
+          // An object overlapping several cells of the query is only
+          // reported from the first of them.
+          if (std::max(min_col, min_cols_[i]) == col &&
+              std::max(min_row, min_rows_[i]) == row &&
+              aabb.Intersects(aabbs_[i])) {
+            candidates.push_back(dynamic_cast<const ObjectType*>(objects_[i]));
+          }
+        }
+      }
+    }
+    return candidates;
+  }
+
+  template <class ObjectType>
+  std::vector<const ObjectType*> IntersectionCandidates(
+      const AABBInterface& object) const {
+    return IntersectionCandidates<ObjectType>(object.GetAABB());
+  }
+
+  // Approximate number of bytes used by the grid.
+  int64_t MemoryUsage() const;
+
+ protected:
+  void ResetImpl(std::vector<const AABBInterface*> objects, float cell_size);
+
+  int64_t Col(float x) const {
+    const int64_t col =
+        static_cast<int64_t>(std::floor((x - min_x_) / cell_size_));
+    return std::clamp(col, int64_t(0), num_cols_ - 1);
+  }
+
+  int64_t Row(float y) const {
+    const int64_t row =
+        static_cast<int64_t>(std::floor((y - min_y_) / cell_size_));
+    return std::clamp(row, int64_t(0), num_rows_ - 1);
+  }
+
+  std::vector<const AABBInterface*> objects_;
+  std::vector<AABB> aabbs_;
+  // Cell of the lower left corner of the bounding box of each object, which
+  // is used to report the objects overlapping several cells only once.
+  std::vector<int64_t> min_cols_;
+  std::vector<int64_t> min_rows_;
+
+  // Indices of the objects of cell (col, row) are
+  // cell_objects_[cell_offsets_[c]:cell_offsets_[c + 1]], with
+  // c = row * num_cols_ + col.
+  std::vector<int64_t> cell_offsets_;
+  std::vector<int64_t> cell_objects_;
+
+  float min_x_ = 0.0f;
+  float min_y_ = 0.0f;
+  float cell_size_ = 0.0f;
+  int64_t num_cols_ = 0;
+  int64_t num_rows_ = 0;
+};
+
+}  // namespace geometry
+}  // namespace nocturne
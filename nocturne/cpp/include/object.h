@@ -17,6 +17,7 @@
 #include "geometry/polygon.h"
 #include "geometry/vector_2d.h"
 #include "object_base.h"
+#include "object_state_store.h"
 
 namespace nocturne {
 constexpr float kViewRadius = 120.0f;
@@ -29,6 +30,10 @@ enum class ObjectType {
   kOther = 4,
 };
 
+// The kinematic state of an Object lives in an ObjectStateStore. The object
+// appends its state to the `state_store` it is constructed with, the objects of
+// a scenario are views into the store of the scenario. Without a store, the
+// object owns a store of its own.
 class Object : public ObjectBase {
  public:
   Object() = default;
@@ -37,13 +42,17 @@ class Object : public ObjectBase {
          const geometry::Vector2D& position, float heading, float speed,
          const geometry::Vector2D& target_position, float target_heading,
          float target_speed, bool can_block_sight = true,
-         bool can_be_collided = true, bool check_collision = true)
-      : ObjectBase(position, can_block_sight, can_be_collided, check_collision),
+         bool can_be_collided = true, bool check_collision = true,
+         std::shared_ptr<ObjectStateStore> state_store = nullptr)
+      : ObjectBase(can_block_sight, can_be_collided, check_collision),
         id_(id),
         length_(length),
         width_(width),
-        heading_(heading),
-        speed_(ClipSpeed(speed)),
+        state_store_(state_store != nullptr
+                         ? std::move(state_store)
+                         : std::make_shared<ObjectStateStore>()),
+        state_index_(state_store_->Add(id, position, heading, ClipSpeed(speed),
+                                       max_speed_)),
         target_position_(target_position),
         target_heading_(target_heading),
         target_speed_(target_speed),
@@ -55,14 +64,18 @@ class Object : public ObjectBase {
          const geometry::Vector2D& position, float heading, float speed,
          const geometry::Vector2D& target_position, float target_heading,
          float target_speed, bool can_block_sight = true,
-         bool can_be_collided = true, bool check_collision = true)
-      : ObjectBase(position, can_block_sight, can_be_collided, check_collision),
+         bool can_be_collided = true, bool check_collision = true,
+         std::shared_ptr<ObjectStateStore> state_store = nullptr)
+      : ObjectBase(can_block_sight, can_be_collided, check_collision),
         id_(id),
         length_(length),
         width_(width),
         max_speed_(max_speed),
-        heading_(heading),
-        speed_(ClipSpeed(speed)),
+        state_store_(state_store != nullptr
+                         ? std::move(state_store)
+                         : std::make_shared<ObjectStateStore>()),
+        state_index_(state_store_->Add(id, position, heading, ClipSpeed(speed),
+                                       max_speed_)),
         target_position_(target_position),
         target_heading_(target_heading),
         target_speed_(target_speed),
@@ -78,11 +91,25 @@ class Object : public ObjectBase {
   float width() const { return width_; }
   float max_speed() const { return max_speed_; }
 
-  float heading() const { return heading_; }
-  void set_heading(float heading) { heading_ = heading; }
+  geometry::Vector2D position() const override {
+    return geometry::Vector2D(state_store_->x[state_index_],
+                              state_store_->y[state_index_]);
+  }
+  void set_position(const geometry::Vector2D& position) override {
+    state_store_->x[state_index_] = position.x();
+    state_store_->y[state_index_] = position.y();
+  }
+  using ObjectBase::set_position;
+
+  float heading() const { return state_store_->heading[state_index_]; }
+  void set_heading(float heading) {
+    state_store_->heading[state_index_] = heading;
+  }
 
-  float speed() const { return speed_; }
-  void set_speed(float speed) { speed_ = ClipSpeed(speed); }
+  float speed() const { return state_store_->speed[state_index_]; }
+  void set_speed(float speed) {
+    state_store_->speed[state_index_] = ClipSpeed(speed);
+  }
 
   const geometry::Vector2D& target_position() const { return target_position_; }
   void set_target_position(const geometry::Vector2D& target_position) {
@@ -100,24 +127,41 @@ class Object : public ObjectBase {
   float target_speed() const { return target_speed_; }
   void set_target_speed(float target_speed) { target_speed_ = target_speed; }
 
-  float acceleration() const { return acceleration_; }
-  void set_acceleration(float acceleration) { acceleration_ = acceleration; }
+  float acceleration() const {
+    return state_store_->acceleration[state_index_];
+  }
+  void set_acceleration(float acceleration) {
+    state_store_->acceleration[state_index_] = acceleration;
+  }
 
-  float steering() const { return steering_; }
-  void set_steering(float steering) { steering_ = steering; }
+  float steering() const { return state_store_->steering[state_index_]; }
+  void set_steering(float steering) {
+    state_store_->steering[state_index_] = steering;
+  }
 
   float head_angle() const { return head_angle_; }
   void set_head_angle(float head_angle) { head_angle_ = head_angle; }
 
-  bool manual_control() const { return manual_control_; }
+  // If true the object is controlled by keyboard input.
+  bool manual_control() const {
+    return HasStateFlag(ObjectStateStore::kManualControl);
+  }
   void set_manual_control(bool manual_control) {
-    manual_control_ = manual_control;
+    SetStateFlag(ObjectStateStore::kManualControl, manual_control);
   }
 
-  bool expert_control() const { return expert_control_; }
+  // If true the object is placed along positions in its recorded trajectory.
+  bool expert_control() const {
+    return HasStateFlag(ObjectStateStore::kExpertControl);
+  }
   void set_expert_control(bool expert_control) {
-    expert_control_ = expert_control;
+    SetStateFlag(ObjectStateStore::kExpertControl, expert_control);
+  }
+
+  const std::shared_ptr<ObjectStateStore>& state_store() const {
+    return state_store_;
   }
+  int64_t state_index() const { return state_index_; }
 
   bool highlight() const { return highlight_; }
   void set_highlight(bool highlight) { highlight_ = highlight; }
@@ -142,7 +186,7 @@ class Object : public ObjectBase {
   }
 
   geometry::Vector2D Velocity() const {
-    return geometry::PolarToVector2D(speed_, heading_);
+    return geometry::PolarToVector2D(speed(), heading());
   }
 
   geometry::ConvexPolygon BoundingPolygon() const override;
@@ -154,10 +198,10 @@ class Object : public ObjectBase {
 
   void ApplyAction(const Action& action) {
     if (action.acceleration().has_value()) {
-      acceleration_ = action.acceleration().value();
+      set_acceleration(action.acceleration().value());
     }
     if (action.steering().has_value()) {
-      steering_ = action.steering().value();
+      set_steering(action.steering().value());
     }
     if (action.head_angle().has_value()) {
       head_angle_ = action.head_angle().value();
@@ -166,8 +210,9 @@ class Object : public ObjectBase {
 
   void SetActionFromKeyboard();
 
-  virtual void Step(float dt) {
-    if (manual_control_) {
+  // Scenarios step all their objects at once through their state store.
+  void Step(float dt) {
+    if (manual_control()) {
       SetActionFromKeyboard();
     }
     KinematicBicycleStep(dt);
@@ -179,7 +224,17 @@ class Object : public ObjectBase {
   void InitRandomColor();
   void InitColor(const std::optional<sf::Color>& color = std::nullopt);
 
-  void KinematicBicycleStep(float dt);
+  void KinematicBicycleStep(float dt) {
+    state_store_->KinematicBicycleStep(state_index_, dt);
+  }
+
+  bool HasStateFlag(uint8_t flag) const {
+    return (state_store_->flags[state_index_] & flag) != 0;
+  }
+  void SetStateFlag(uint8_t flag, bool value) {
+    uint8_t& flags = state_store_->flags[state_index_];
+    flags = value ? (flags | flag) : (flags & ~flag);
+  }
 
   float ClipSpeed(float speed) const {
     return std::max(std::min(speed, max_speed_), -max_speed_);
@@ -191,26 +246,18 @@ class Object : public ObjectBase {
   float width_ = 0.0f;
   const float max_speed_ = std::numeric_limits<float>::max();
 
-  float heading_ = 0.0f;
-  // Postive for moving forward, negative for moving backward.
-  float speed_ = 0.0f;
+  std::shared_ptr<ObjectStateStore> state_store_;
+  int64_t state_index_ = 0;
 
   geometry::Vector2D target_position_;
   float target_heading_ = 0.0f;
   float target_speed_ = 0.0f;
 
-  float acceleration_ = 0.0f;
-  float steering_ = 0.0f;
   float head_angle_ = 0.0f;
 
   // used to color the object in videos if set to True
   bool highlight_ = false;
 
-  // If true the object is controlled by keyboard input.
-  bool manual_control_ = false;
-  // If true the object is placed along positions in its recorded trajectory.
-  bool expert_control_ = false;
-
   sf::Color color_;
   std::unique_ptr<sf::RenderTexture> cone_texture_ = nullptr;
 
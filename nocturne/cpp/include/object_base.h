@@ -35,11 +35,19 @@ class ObjectBase : public sf::Drawable, public geometry::AABBInterface {
         can_be_collided_(can_be_collided),
         check_collision_(check_collision) {}
 
-  const geometry::Vector2D& position() const { return position_; }
-  void set_position(const geometry::Vector2D& position) {
+  // For objects keeping their position elsewhere, see Object.
+  ObjectBase(bool can_block_sight, bool can_be_collided, bool check_collision)
+      : can_block_sight_(can_block_sight),
+        can_be_collided_(can_be_collided),
+        check_collision_(check_collision) {}
+
+  virtual geometry::Vector2D position() const { return position_; }
+  virtual void set_position(const geometry::Vector2D& position) {
     position_ = position;
   }
-  void set_position(float x, float y) { position_ = geometry::Vector2D(x, y); }
+  void set_position(float x, float y) {
+    set_position(geometry::Vector2D(x, y));
+  }
 
   bool can_block_sight() const { return can_block_sight_; }
   bool can_be_collided() const { return can_be_collided_; }
@@ -0,0 +1,78 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <vector>
+
+#include "geometry/vector_2d.h"
+
+namespace nocturne {
+
+// Kinematic state of a set of objects stored as a structure of arrays. All the
+// objects of a scenario share one store and are stepped together by tight
+// loops over contiguous arrays; an Object only keeps its index in the store.
+struct ObjectStateStore {
+  static constexpr uint8_t kExpertControl = 1;
+  static constexpr uint8_t kManualControl = 2;
+  // Set for objects removed from their scenario, which are no longer stepped.
+  static constexpr uint8_t kRemoved = 4;
+
+  int64_t size() const { return id.size(); }
+
+  void Reserve(int64_t capacity);
+
+  // Appends an object and returns its index.
+  int64_t Add(int64_t object_id, const geometry::Vector2D& position,
+              float object_heading, float object_speed, float object_max_speed);
+  // Appends a copy of the object at `index` in `other` and returns its index.
+  int64_t Add(const ObjectStateStore& other, int64_t index);
+
+  float ClipSpeed(int64_t index, float object_speed) const {
+    return std::max(std::min(object_speed, max_speed[index]),
+                    -max_speed[index]);
+  }
+
+  // Kinematic bicycle step of the object at `index`.
+  void KinematicBicycleStep(int64_t index, float dt);
+
+  // Kinematic bicycle step of all the objects that are neither expert
+  // controlled nor removed.
+  void KinematicBicycleStep(float dt) { KinematicBicycleStep(dt, 0, size()); }
+  // Same as above for the objects in [begin, end) only.
+  void KinematicBicycleStep(float dt, int64_t begin, int64_t end);
+
+  // Places the expert controlled objects that are not removed at their
+  // recorded state at `time`. The expert data is indexed by object id.
+  void ExpertStep(
+      int64_t time,
+      const std::vector<std::vector<geometry::Vector2D>>& expert_trajectories,
+      const std::vector<std::vector<float>>& expert_headings,
+      const std::vector<std::vector<float>>& expert_speeds) {
+    ExpertStep(time, expert_trajectories, expert_headings, expert_speeds, 0,
+               size());
+  }
+  // Same as above for the objects in [begin, end) only.
+  void ExpertStep(
+      int64_t time,
+      const std::vector<std::vector<geometry::Vector2D>>& expert_trajectories,
+      const std::vector<std::vector<float>>& expert_headings,
+      const std::vector<std::vector<float>>& expert_speeds, int64_t begin,
+      int64_t end);
+
+  std::vector<int64_t> id;
+  std::vector<float> x;
+  std::vector<float> y;
+  std::vector<float> heading;
+  // Postive for moving forward, negative for moving backward.
+  std::vector<float> speed;
+  std::vector<float> max_speed;
+  std::vector<float> acceleration;
+  std::vector<float> steering;
+  std::vector<uint8_t> flags;
+};
+
+}  // namespace nocturne
@@ -0,0 +1,175 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <array>
+#include <cstdint>
+#include <memory>
+#include <utility>
+#include <vector>
+
+#include "geometry/aabb.h"
+#include "geometry/polygon.h"
+#include "geometry/vector_2d.h"
+#include "object.h"
+
+namespace nocturne {
+
+// Algorithm of the occlusion tests of the sight lines of an observer against a
+// set of occluders. Both give the same results.
+enum class OcclusionAlgorithm {
+  // The sight lines are sorted into fixed angular buckets and each occluder is
+  // tested against the buckets overlapping its angular interval, see
+  // AngularIndex.
+  kAngularBuckets = 0,
+  // Sweep over the angular intervals of the occluders, each sight line only
+  // being tested against the occluders which are not hidden behind another
+  // one around its angle, see ShadowProfile.
+  kAngularSweep = 1,
+};
+
+// Bounding polygon of an object which may block the sight of an observer,
+// with its AABB. The edges of the polygon are the pairs of consecutive
+// vertices.
+struct Occluder {
+  Occluder() : aabb(0.0f, 0.0f, 0.0f, 0.0f) {}
+  explicit Occluder(const ObjectBase& object)
+      : polygon(object.BoundingPolygon()), aabb(polygon.GetAABB()) {}
+
+  geometry::ConvexPolygon polygon;
+  geometry::AABB aabb;
+};
+
+// Occluders of all the objects of a scenario, computed once per step and
+// shared by the visibility tests of all the observers of that step.
+class OcclusionCache {
+ public:
+  // Computes the occluders of `objects`, indexed by their state index which
+  // is smaller than `num_slots`. The occluders of the previous call are
+  // overwritten in place.
+  void Reset(const std::vector<std::shared_ptr<Object>>& objects,
+             int64_t num_slots);
+
+  const Occluder& occluder(const Object& object) const {
+    return occluders_[object.state_index()];
+  }
+
+ protected:
+  std::vector<Occluder> occluders_;
+};
+
+// Points sorted by their angle around an observer. The points whose sight
+// lines may cross an occluder are then found in at most two contiguous ranges
+// instead of testing all the points against every occluder.
+class AngularIndex {
+ public:
+  static constexpr int64_t kNumBuckets = 256;
+
+  // Sorts the n points (x[i], y[i]) by their angle around `o`.
+  void Reset(const geometry::Vector2D& o, const float* x, const float* y,
+             int64_t n);
+
+  int64_t size() const { return index_.size(); }
+
+  // Coordinates of the sorted points, which may be overwritten by points on
+  // the same sight lines.
+  float* x() { return x_.data(); }
+  float* y() { return y_.data(); }
+  const float* x() const { return x_.data(); }
+  const float* y() const { return y_.data(); }
+  // Index of the sorted points in the input.
+  const int64_t* index() const { return index_.data(); }
+
+  // Writes the ranges [begin, end) of the sorted points whose segments from
+  // the observer may intersect `occluder` to `ranges` and returns their
+  // number. The points outside of these ranges never do.
+  int64_t CandidateRanges(
+      const Occluder& occluder,
+      std::array<std::pair<int64_t, int64_t>, 2>& ranges) const;
+
+ protected:
+  geometry::Vector2D o_;
+  std::vector<float> x_;
+  std::vector<float> y_;
+  std::vector<int64_t> index_;
+  std::vector<int32_t> buckets_;
+  std::array<int64_t, kNumBuckets + 1> bucket_offsets_;
+};
+
+// Shadows cast by occluders around an observer. The angles around the observer
+// are split into sectors at the ends of the angular intervals of the
+// occluders. Each sector keeps the occluders overlapping it, except the ones
+// entirely behind an occluder which covers the whole sector: the sight lines
+// of the sector always hit that occluder first. Building the profile sorts the
+// ends of the intervals, then each point is assigned to its sector by binary
+// search on its angle.
+class ShadowProfile {
+ public:
+  // Builds the sectors of the occluders of the objects of `objects` which can
+  // block the sight, occluders[i] being the occluder of objects[i].
+  void Reset(const geometry::Vector2D& o,
+             const std::vector<const ObjectBase*>& objects,
+             const std::vector<const Occluder*>& occluders);
+
+  int64_t num_sectors() const { return bounds_.size() - 1; }
+
+  // Sector of the sight lines of angle `angle`.
+  int64_t Sector(float angle) const;
+
+  // Indices in `objects` of the occluders which may intersect the sight lines
+  // of `sector`, in increasing order.
+  const int64_t* OccludersBegin(int64_t sector) const {
+    return occluder_indices_.data() + occluder_offsets_[sector];
+  }
+  const int64_t* OccludersEnd(int64_t sector) const {
+    return occluder_indices_.data() + occluder_offsets_[sector + 1];
+  }
+
+  // Sorts the n points (x[i], y[i]) by sector.
+  void SortPoints(const float* x, const float* y, int64_t n);
+
+  // Coordinates of the sorted points, which may be overwritten by points on
+  // the same sight lines.
+  float* x() { return x_.data(); }
+  float* y() { return y_.data(); }
+  const float* x() const { return x_.data(); }
+  const float* y() const { return y_.data(); }
+  // Index of the sorted points in the input.
+  const int64_t* index() const { return index_.data(); }
+
+  // Range [begin, end) of the sorted points in `sector`.
+  std::pair<int64_t, int64_t> SectorPoints(int64_t sector) const {
+    return std::make_pair(point_offsets_[sector], point_offsets_[sector + 1]);
+  }
+
+ protected:
+  struct Event {
+    float angle;
+    int64_t type;
+    int64_t index;
+  };
+
+  // Adds the begin and end events of type `type` of the occluder `index` over
+  // the angular interval [lo, hi], split at pi.
+  void AddEvents(float lo, float hi, int64_t type, int64_t index);
+  void AddPiece(float lo, float hi, int64_t type, int64_t index);
+
+  geometry::Vector2D o_;
+  std::vector<Event> events_;
+  std::vector<float> near_;
+  std::vector<float> far_;
+  std::vector<float> bounds_;
+  std::vector<float> merged_bounds_;
+  std::vector<int64_t> occluder_offsets_;
+  std::vector<int64_t> occluder_indices_;
+
+  std::vector<float> x_;
+  std::vector<float> y_;
+  std::vector<int64_t> index_;
+  std::vector<int64_t> sectors_;
+  std::vector<int64_t> point_offsets_;
+};
+
+}  // namespace nocturne
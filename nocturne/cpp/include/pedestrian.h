@@ -17,19 +17,21 @@ class Pedestrian : public Object {
              const geometry::Vector2D& position, float heading, float speed,
              const geometry::Vector2D& target_position, float target_heading,
              float target_speed, bool can_block_sight = true,
-             bool can_be_collided = true, bool check_collision = true)
+             bool can_be_collided = true, bool check_collision = true,
+             std::shared_ptr<ObjectStateStore> state_store = nullptr)
       : Object(id, length, width, position, heading, speed, target_position,
                target_heading, target_speed, can_block_sight, can_be_collided,
-               check_collision) {}
+               check_collision, std::move(state_store)) {}
 
   Pedestrian(int64_t id, float length, float width, float max_speed,
              const geometry::Vector2D& position, float heading, float speed,
              const geometry::Vector2D& target_position, float target_heading,
              float target_speed, bool can_block_sight = true,
-             bool can_be_collided = true, bool check_collision = true)
+             bool can_be_collided = true, bool check_collision = true,
+             std::shared_ptr<ObjectStateStore> state_store = nullptr)
       : Object(id, length, width, max_speed, position, heading, speed,
                target_position, target_heading, target_speed, can_block_sight,
-               can_be_collided, check_collision) {}
+               can_be_collided, check_collision, std::move(state_store)) {}
 
   ObjectType Type() const override { return ObjectType::kPedestrian; }
 };
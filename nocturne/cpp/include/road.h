@@ -5,6 +5,7 @@
 #pragma once
 
 #include <SFML/Graphics.hpp>
+#include <cstdint>
 #include <initializer_list>
 #include <string>
 #include <vector>
@@ -35,15 +36,19 @@ class RoadPoint : public sf::Drawable, public geometry::PointLike {
  public:
   RoadPoint() = default;
   RoadPoint(const geometry::Vector2D& position,
-            const geometry::Vector2D& neighbor_position, RoadType road_type)
+            const geometry::Vector2D& neighbor_position, RoadType road_type,
+            int64_t index = -1)
       : position_(position),
         neighbor_position_(neighbor_position),
         road_type_(road_type),
-        drawable_(utils::MakeCircleShape(position, 0.5,
-                                         RoadTypeColor(road_type), true)) {}
+        index_(index) {}
 
   RoadType road_type() const { return road_type_; }
 
+  // Index of the point in the RoadPointTable of its scenario, -1 if it is not
+  // part of one.
+  int64_t index() const { return index_; }
+
   const geometry::Vector2D& position() const { return position_; }
   const geometry::Vector2D& neighbor_position() const {
     return neighbor_position_;
@@ -55,7 +60,11 @@ class RoadPoint : public sf::Drawable, public geometry::PointLike {
 
  protected:
   void draw(sf::RenderTarget& target, sf::RenderStates states) const override {
-    target.draw(*drawable_, states);
+    // The shape is only built when rendering so that loading a scenario does
+    // not pay for the graphics of every road point.
+    target.draw(*utils::MakeCircleShape(position_, 0.5,
+                                        RoadTypeColor(road_type_), true),
+                states);
   }
 
   const geometry::Vector2D position_;
@@ -63,7 +72,8 @@ class RoadPoint : public sf::Drawable, public geometry::PointLike {
   const geometry::Vector2D neighbor_position_;
 
   const RoadType road_type_ = RoadType::kNone;
-  std::unique_ptr<sf::CircleShape> drawable_ = nullptr;
+
+  const int64_t index_ = -1;
 };
 
 // RoadLine is not an Object now.
@@ -73,34 +83,37 @@ class RoadLine : public sf::Drawable {
 
   RoadLine(RoadType road_type,
            const std::initializer_list<geometry::Vector2D>& geometry_points,
-           int64_t sample_every_n = 1, bool check_collision = false)
+           int64_t sample_every_n = 1, bool check_collision = false,
+           int64_t first_point_index = -1)
       : road_type_(road_type),
         geometry_points_(geometry_points),
         sample_every_n_(sample_every_n),
         check_collision_(check_collision) {
-    InitRoadPoints();
+    InitRoadPoints(first_point_index);
     InitRoadLineGraphics();
   }
 
   RoadLine(RoadType road_type,
            const std::vector<geometry::Vector2D>& geometry_points,
-           int64_t sample_every_n = 1, bool check_collision = false)
+           int64_t sample_every_n = 1, bool check_collision = false,
+           int64_t first_point_index = -1)
       : road_type_(road_type),
         geometry_points_(geometry_points),
         sample_every_n_(sample_every_n),
         check_collision_(check_collision) {
-    InitRoadPoints();
+    InitRoadPoints(first_point_index);
     InitRoadLineGraphics();
   }
 
   RoadLine(RoadType road_type,
            std::vector<geometry::Vector2D>&& geometry_points,
-           int64_t sample_every_n = 1, bool check_collision = false)
+           int64_t sample_every_n = 1, bool check_collision = false,
+           int64_t first_point_index = -1)
       : road_type_(road_type),
         geometry_points_(std::move(geometry_points)),
         sample_every_n_(sample_every_n),
         check_collision_(check_collision) {
-    InitRoadPoints();
+    InitRoadPoints(first_point_index);
     InitRoadLineGraphics();
   }
 
@@ -121,7 +134,8 @@ class RoadLine : public sf::Drawable {
  protected:
   void draw(sf::RenderTarget& target, sf::RenderStates states) const override;
 
-  void InitRoadPoints();
+  // The road points are numbered from `first_point_index` if it is not -1.
+  void InitRoadPoints(int64_t first_point_index);
   void InitRoadLineGraphics();
 
   const RoadType road_type_ = RoadType::kNone;
@@ -136,6 +150,26 @@ class RoadLine : public sf::Drawable {
   std::vector<sf::Vertex> graphic_points_;
 };
 
+// Static attributes of the road points of a scenario in structure of arrays
+// layout, indexed by RoadPoint::index(). Observations only compute the
+// attributes which depend on the observer from it.
+struct RoadPointTable {
+  int64_t size() const { return x.size(); }
+
+  // Appends the road points of `road_line`, which are numbered from size().
+  void Append(const RoadLine& road_line);
+
+  std::vector<float> x;
+  std::vector<float> y;
+  // Vector from the point to the next point of its road line, its norm and
+  // its angle.
+  std::vector<float> neighbor_x;
+  std::vector<float> neighbor_y;
+  std::vector<float> neighbor_distance;
+  std::vector<float> neighbor_angle;
+  std::vector<RoadType> road_type;
+};
+
 inline RoadType ParseRoadType(const std::string& s) {
   if (s == "none") {
     return RoadType::kNone;
@@ -5,7 +5,10 @@
 #pragma once
 
 #include <SFML/Graphics.hpp>
+#include <array>
 #include <fstream>
+#include <functional>
+#include <limits>
 #include <memory>
 #include <nlohmann/json.hpp>
 #include <optional>
@@ -13,6 +16,7 @@
 #include <string>
 #include <tuple>
 #include <unordered_map>
+#include <utility>
 #include <variant>
 #include <vector>
 
@@ -23,18 +27,24 @@
 #include "geometry/geometry_utils.h"
 #include "geometry/line_segment.h"
 #include "geometry/point_like.h"
-#include "geometry/range_tree_2d.h"
 #include "geometry/vector_2d.h"
 #include "ndarray.h"
 #include "object.h"
 #include "object_base.h"
+#include "object_state_store.h"
+#include "occlusion.h"
 #include "pedestrian.h"
 #include "road.h"
+#include "scenario_format.h"
+#include "scenario_pack.h"
+#include "scenario_template.h"
 #include "static_object.h"
 #include "stop_sign.h"
 #include "traffic_light.h"
 #include "utils/data_utils.h"
+#include "utils/thread_pool.h"
 #include "vehicle.h"
+#include "view_field.h"
 
 namespace nocturne {
 
@@ -70,32 +80,69 @@ constexpr int64_t kStopSignsFeatureSize = 3;
 //   relative_target_heading, relative_target_speed ]
 constexpr int64_t kEgoFeatureSize = 10;
 
+// Names of the ego features. With the normalize_state config, ego feature i is
+// divided by the "ego_state_max_<kEgoFeatureNames[i]>" config entry.
+constexpr std::array<const char*, kEgoFeatureSize> kEgoFeatureNames = {
+    "veh_len",
+    "veh_width",
+    "speed",
+    "target_dist",
+    "target_azimuth",
+    "target_heading",
+    "rel_target_speed_dist",
+    "curr_accel",
+    "curr_steering",
+    "curr_head_angle"};
+
+// Mutable state of a scenario, see Scenario::Snapshot. The per-object vectors
+// are indexed like `object_states`, i.e. in the order of the objects of the
+// scenario template.
+struct ScenarioSnapshot {
+  std::shared_ptr<const ScenarioTemplate> scenario_template;
+  int64_t current_time = 0;
+  // Kinematics, control modes and removed objects.
+  ObjectStateStore object_states;
+  std::vector<float> head_angles;
+  std::vector<geometry::Vector2D> target_positions;
+  std::vector<float> target_headings;
+  std::vector<float> target_speeds;
+  std::vector<uint8_t> collided;
+  std::vector<CollisionType> collision_types;
+};
+
+// Goal tolerances of the objects. An object reaches its goal when its distance
+// to its target position, and the absolute differences between its speed and
+// heading and its target speed and heading are all below the tolerances.
+// Infinite tolerances disable the corresponding criterion.
+struct GoalTolerance {
+  float position = std::numeric_limits<float>::infinity();
+  float speed = std::numeric_limits<float>::infinity();
+  float heading = std::numeric_limits<float>::infinity();
+};
+
+// Observations of several objects without the padding of their visible
+// states, see Scenario::RaggedObservations. The visible objects of each
+// category ("objects", "road_points", "traffic_lights" and "stop_signs") of all
+// the objects are stored contiguously, in compressed sparse row format: the
+// features of the visible objects of row i are the rows [offsets[i],
+// offsets[i + 1]) of the features of the category.
+struct RaggedObservationBatch {
+  // (N, kEgoFeatureSize) ego states, NaN for the null objects. Empty if the ego
+  // states were not requested.
+  NdArray<float> ego_state;
+  // (M, feature size) features of each category, empty if the visible states
+  // were not requested.
+  std::unordered_map<std::string, NdArray<float>> features;
+  // (N + 1) offsets of the rows of each category into its features.
+  std::unordered_map<std::string, NdArray<int64_t>> offsets;
+};
+
 class Scenario : public sf::Drawable {
  public:
   Scenario(const std::string& scenario_path,
            const std::unordered_map<std::string,
                                     std::variant<bool, int64_t, float>>& config)
-      : current_time_(std::get<int64_t>(config.at("start_time"))),
-        allow_non_vehicles_(std::get<bool>(
-            utils::FindWithDefault(config, "allow_non_vehicles", true))),
-        spawn_invalid_objects_(std::get<bool>(
-            utils::FindWithDefault(config, "spawn_invalid_objects", false))),
-        max_visible_objects_(std::get<int64_t>(utils::FindWithDefault(
-            config, "max_visible_objects", kMaxVisibleObjects))),
-        max_visible_road_points_(std::get<int64_t>(utils::FindWithDefault(
-            config, "max_visible_road_points", kMaxVisibleRoadPoints))),
-        max_visible_traffic_lights_(std::get<int64_t>(utils::FindWithDefault(
-            config, "max_visible_traffic_lights", kMaxVisibleTrafficLights))),
-        max_visible_stop_signs_(std::get<int64_t>(utils::FindWithDefault(
-            config, "max_visible_stop_signs", kMaxVisibleStopSigns))),
-        sample_every_n_(std::get<int64_t>(
-            utils::FindWithDefault(config, "sample_every_n", int64_t(1)))),
-        road_edge_first_(std::get<bool>(
-            utils::FindWithDefault(config, "road_edge_first", false))),
-        moving_threshold_(std::get<float>(
-            utils::FindWithDefault(config, "moving_threshold", 0.2f))),
-        speed_threshold_(std::get<float>(
-            utils::FindWithDefault(config, "speed_threshold", 0.05f))) {
+      : Scenario(config) {
     if (!scenario_path.empty()) {
       LoadScenario(scenario_path);
     } else {
@@ -106,35 +153,130 @@ class Scenario : public sf::Drawable {
     }
   }
 
+  Scenario(const ScenarioData& scenario_data,
+           const std::unordered_map<std::string,
+                                    std::variant<bool, int64_t, float>>& config)
+      : Scenario(config) {
+    LoadScenario(scenario_data);
+  }
+
+  Scenario(const ScenarioPack& scenario_pack, const std::string& scenario_name,
+           const std::unordered_map<std::string,
+                                    std::variant<bool, int64_t, float>>& config)
+      : Scenario(config) {
+    LoadScenario(scenario_pack, scenario_name);
+  }
+
+  // Loads a scenario file, either in the JSON or in the binary format. The
+  // parsed scenario is shared through the global ScenarioTemplateCache.
   void LoadScenario(const std::string& scenario_path);
+  // Loads the scene `scenario_name` of a scenario pack, also through the
+  // global ScenarioTemplateCache.
+  void LoadScenario(const ScenarioPack& scenario_pack,
+                    const std::string& scenario_name);
+  void LoadScenario(const ScenarioData& scenario_data);
+
+  const std::string& name() const { return scenario_template_->name; }
 
-  const std::string& name() const { return name_; }
+  // Number of threads running the dynamics and collision checks of a step,
+  // set by the num_threads config.
+  int64_t num_threads() const { return thread_pool_->num_threads(); }
 
   void Step(float dt);
 
+  // Runs `num_steps` steps of `dt` seconds with the same actions. The
+  // collision flags of the objects are accumulated over the steps: an object
+  // collided if it collided during any of them, and its collision type is the
+  // one of its first collision. If `goal_tolerance` is set, returns the ids of
+  // the objects that reached their goal at the end of any of the steps.
+  std::vector<int64_t> StepN(
+      int64_t num_steps, float dt,
+      const std::optional<GoalTolerance>& goal_tolerance = std::nullopt);
+
+  int64_t current_time() const { return current_time_; }
+  // Sets the current time of the scenario and of its traffic lights, eg. to
+  // restore a saved state.
+  void set_current_time(int64_t current_time);
+
+  // Rebuilds the object BVH and recomputes the collisions of all the objects.
+  // Must be called after objects are moved outside of Step.
+  void RefreshObjects();
+
+  // Restricts the collision checks to the objects with ids `ids`, e.g. the
+  // controlled vehicles. Other objects are only flagged as collided when they
+  // collide with one of these objects, and are not checked against road
+  // edges. Takes effect at the next step.
+  void SetCollisionSubset(int64_t num_ids, const int64_t* ids);
+  // Checks the collisions of all the objects again.
+  void ClearCollisionSubset() { collision_subset_.clear(); }
+
+  // Captures the mutable state of the scenario: the object kinematics, goals
+  // and collisions, the removed objects and the current time, which also
+  // defines the traffic light states.
+  ScenarioSnapshot Snapshot() const;
+
+  // Restores a state captured on this scenario or on another scenario of the
+  // same scene template, e.g. a clone. Object handles stay valid, objects
+  // removed since the snapshot are added back.
+  void Restore(const ScenarioSnapshot& snapshot);
+
+  // Returns a scenario in the same state that shares the road map, spatial
+  // indices and expert data of this one.
+  std::unique_ptr<Scenario> Clone() const;
+
+  // Returns the object with id `id`, or nullptr if there is no such object in
+  // the scenario, e.g. because it was removed.
+  Object* FindObject(int64_t id) const;
+
   // void removeVehicle(Vehicle* object);
   bool RemoveObject(const Object& object);
 
+  // Removes the objects with ids `ids` at once. Each object is flagged as
+  // removed in the state store and its leaf is removed from the object BVH in
+  // O(depth) time. The object lists are compacted in a single pass the next
+  // time they are used. Ids of objects that are not in the scenario are
+  // ignored. Returns the number of removed objects.
+  int64_t RemoveObjects(int64_t num_ids, const int64_t* ids);
+
+  // Sets the acceleration and the steering of the objects with ids `ids`, and
+  // their head angle if `head_angle` is not null. All the arrays have
+  // `num_actions` elements. NaN values leave the corresponding control
+  // unchanged. Ids of objects that are not in the scenario (eg. removed ones)
+  // are ignored.
+  void ApplyActions(int64_t num_actions, const int64_t* ids,
+                    const float* acceleration, const float* steering,
+                    const float* head_angle = nullptr);
+
+  // Same as ApplyActions for discrete actions. The action index `actions[i]`
+  // is the acceleration `acceleration_grid[actions[i] / steering_grid.size()]`
+  // and the steering `steering_grid[actions[i] % steering_grid.size()]`.
+  // Throws std::out_of_range without applying any action if one of the action
+  // indices is not in the grid.
+  void ApplyDiscreteActions(int64_t num_actions, const int64_t* ids,
+                            const int64_t* actions,
+                            const std::vector<float>& acceleration_grid,
+                            const std::vector<float>& steering_grid);
+
   // Returns expert position for obj at timestamp.
   geometry::Vector2D ExpertPosition(const Object& obj,
                                     int64_t timestamp) const {
-    return expert_trajectories_.at(obj.id()).at(timestamp);
+    return scenario_template_->expert_trajectories.at(obj.id()).at(timestamp);
   }
 
   // Returns expert velocities for obj at timestamp.
   geometry::Vector2D ExpertVelocity(const Object& obj,
                                     int64_t timestamp) const {
-    return expert_velocities_.at(obj.id()).at(timestamp);
+    return scenario_template_->expert_velocities.at(obj.id()).at(timestamp);
   }
 
   // Returns expert heading for obj at timestamp.
   float ExpertHeading(const Object& obj, int64_t timestamp) const {
-    return expert_headings_.at(obj.id()).at(timestamp);
+    return scenario_template_->expert_headings.at(obj.id()).at(timestamp);
   }
 
   // Returns expert speed for obj at timestamp.
   float ExpertSpeed(const Object& obj, int64_t timestamp) const {
-    return expert_speeds_.at(obj.id()).at(timestamp);
+    return scenario_template_->expert_speeds.at(obj.id()).at(timestamp);
   }
 
   std::optional<Action> ExpertAction(const Object& obj,
@@ -213,30 +355,40 @@ class Scenario : public sf::Drawable {
   /*********************** State Accessors *******************/
 
   const std::vector<std::shared_ptr<Vehicle>>& vehicles() const {
+    CompactObjectLists();
     return vehicles_;
   }
 
   const std::vector<std::shared_ptr<Pedestrian>>& pedestrians() const {
+    CompactObjectLists();
     return pedestrians_;
   }
 
   const std::vector<std::shared_ptr<Cyclist>>& cyclists() const {
+    CompactObjectLists();
     return cyclists_;
   }
 
   const std::vector<std::shared_ptr<Object>>& objects() const {
+    CompactObjectLists();
     return objects_;
   }
 
   const std::vector<std::shared_ptr<Object>>& moving_objects() const {
+    CompactObjectLists();
     return moving_objects_;
   }
 
   const std::vector<std::shared_ptr<RoadLine>>& road_lines() const {
-    return road_lines_;
+    return scenario_template_->road_lines;
   }
 
+  // The ego state and the visible state are normalized with the scales of the
+  // config if normalize_state is set, see ego_state_scales_ and
+  // visible_state_scales_.
   NdArray<float> EgoState(const Object& src) const;
+  // Writes the kEgoFeatureSize features of EgoState to `state`.
+  void EgoState(const Object& src, float* state) const;
 
   std::unordered_map<std::string, NdArray<float>> VisibleState(
       const Object& src, float view_dist, float view_angle,
@@ -245,6 +397,46 @@ class Scenario : public sf::Drawable {
   NdArray<float> FlattenedVisibleState(const Object& src, float view_dist,
                                        float view_angle,
                                        float head_angle = 0.0f) const;
+  // Writes the FlattenedVisibleStateSize() features of FlattenedVisibleState,
+  // padding included, to `state`.
+  void FlattenedVisibleState(const Object& src, float view_dist,
+                             float view_angle, float head_angle,
+                             float* state) const;
+
+  int64_t FlattenedVisibleStateSize() const {
+    return max_visible_objects_ * kObjectFeatureSize +
+           max_visible_road_points_ * kRoadPointFeatureSize +
+           max_visible_traffic_lights_ * kTrafficLightFeatureSize +
+           max_visible_stop_signs_ * kStopSignsFeatureSize;
+  }
+
+  int64_t ObservationSize(bool ego_state = true,
+                          bool visible_state = true) const {
+    return (ego_state ? kEgoFeatureSize : 0) +
+           (visible_state ? FlattenedVisibleStateSize() : 0);
+  }
+
+  // Observations of several objects at once, one row of ObservationSize()
+  // features per object: its EgoState if `ego_state`, followed by its
+  // FlattenedVisibleState if `visible_state`. Rows of null objects are NaN.
+  // Rows are computed in parallel on the thread pool of the scenario.
+  NdArray<float> Observations(const std::vector<const Object*>& objects,
+                              float view_dist, float view_angle,
+                              float head_angle = 0.0f, bool ego_state = true,
+                              bool visible_state = true) const;
+  // Same as above, writing the rows to `observations`.
+  void Observations(const std::vector<const Object*>& objects, float view_dist,
+                    float view_angle, float head_angle, bool ego_state,
+                    bool visible_state, float* observations) const;
+
+  // Same as Observations without the padding of the visible states: the
+  // features of each category only have one row per visible object, which are
+  // the non-padding rows of the flattened visible state. The rows of null
+  // objects are NaN and have no visible object.
+  RaggedObservationBatch RaggedObservations(
+      const std::vector<const Object*>& objects, float view_dist,
+      float view_angle, float head_angle = 0.0f, bool ego_state = true,
+      bool visible_state = true) const;
 
   int64_t getMaxNumVisibleObjects() const { return max_visible_objects_; }
   int64_t getMaxNumVisibleRoadPoints() const {
@@ -263,18 +455,175 @@ class Scenario : public sf::Drawable {
   int64_t getEgoFeatureSize() const { return kEgoFeatureSize; }
 
  protected:
-  void LoadObjects(const json& objects_json);
-  void LoadRoads(const json& roads_json);
+  explicit Scenario(
+      const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+          config)
+      : current_time_(std::get<int64_t>(config.at("start_time"))),
+        allow_non_vehicles_(std::get<bool>(
+            utils::FindWithDefault(config, "allow_non_vehicles", true))),
+        spawn_invalid_objects_(std::get<bool>(
+            utils::FindWithDefault(config, "spawn_invalid_objects", false))),
+        max_visible_objects_(std::get<int64_t>(utils::FindWithDefault(
+            config, "max_visible_objects", kMaxVisibleObjects))),
+        max_visible_road_points_(std::get<int64_t>(utils::FindWithDefault(
+            config, "max_visible_road_points", kMaxVisibleRoadPoints))),
+        max_visible_traffic_lights_(std::get<int64_t>(utils::FindWithDefault(
+            config, "max_visible_traffic_lights", kMaxVisibleTrafficLights))),
+        max_visible_stop_signs_(std::get<int64_t>(utils::FindWithDefault(
+            config, "max_visible_stop_signs", kMaxVisibleStopSigns))),
+        sample_every_n_(std::get<int64_t>(
+            utils::FindWithDefault(config, "sample_every_n", int64_t(1)))),
+        road_edge_first_(std::get<bool>(
+            utils::FindWithDefault(config, "road_edge_first", false))),
+        moving_threshold_(std::get<float>(
+            utils::FindWithDefault(config, "moving_threshold", 0.2f))),
+        speed_threshold_(std::get<float>(
+            utils::FindWithDefault(config, "speed_threshold", 0.05f))),
+        road_edge_grid_(std::get<bool>(
+            utils::FindWithDefault(config, "road_edge_grid", true))),
+        occlusion_algorithm_(std::get<bool>(utils::FindWithDefault(
+                                 config, "angular_sweep_visibility", false))
+                                 ? OcclusionAlgorithm::kAngularSweep
+                                 : OcclusionAlgorithm::kAngularBuckets),
+        normalize_state_(std::get<bool>(
+            utils::FindWithDefault(config, "normalize_state", false))),
+        ego_state_scales_(EgoStateScales(config)),
+        visible_state_scales_(VisibleStateScales(config)),
+        thread_pool_(std::make_unique<utils::ThreadPool>(std::get<int64_t>(
+            utils::FindWithDefault(config, "num_threads", int64_t(1))))) {}
+
+  // Only copies the config of `other`, see Clone.
+  explicit Scenario(const Scenario& other)
+      : current_time_(other.current_time_),
+        allow_non_vehicles_(other.allow_non_vehicles_),
+        spawn_invalid_objects_(other.spawn_invalid_objects_),
+        max_visible_objects_(other.max_visible_objects_),
+        max_visible_road_points_(other.max_visible_road_points_),
+        max_visible_traffic_lights_(other.max_visible_traffic_lights_),
+        max_visible_stop_signs_(other.max_visible_stop_signs_),
+        sample_every_n_(other.sample_every_n_),
+        road_edge_first_(other.road_edge_first_),
+        moving_threshold_(other.moving_threshold_),
+        speed_threshold_(other.speed_threshold_),
+        road_edge_grid_(other.road_edge_grid_),
+        occlusion_algorithm_(other.occlusion_algorithm_),
+        normalize_state_(other.normalize_state_),
+        ego_state_scales_(other.ego_state_scales_),
+        visible_state_scales_(other.visible_state_scales_),
+        thread_pool_(std::make_unique<utils::ThreadPool>(other.num_threads())) {
+  }
+
+  // Scales of the ego features, read from the "ego_state_max_<name>" entries
+  // of `config`, see kEgoFeatureNames. Missing entries are 1.
+  static std::array<float, kEgoFeatureSize> EgoStateScales(
+      const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+          config);
+  // Scales of the features of each category of visible objects, in the order
+  // of VisibleFeatures, read from the "visible_state_max_<category>" entries
+  // of `config`. Missing entries are 1.
+  static std::array<float, 4> VisibleStateScales(
+      const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+          config);
+
+  // Returns the template of `source` from the global ScenarioTemplateCache,
+  // building it from the data returned by `load_fn` on a cache miss.
+  std::shared_ptr<const ScenarioTemplate> GetScenarioTemplate(
+      const std::string& source,
+      const std::function<ScenarioData()>& load_fn) const;
+
+  std::shared_ptr<const ScenarioTemplate> MakeScenarioTemplate(
+      const ScenarioData& scenario_data) const;
+
+  // Creates the objects and traffic lights of the scenario from their initial
+  // state in `scenario_template`.
+  void InitFromTemplate(
+      std::shared_ptr<const ScenarioTemplate> scenario_template);
+
+  // Rebuilds the object lists from `all_objects_`, skipping removed objects.
+  void ResetObjectLists();
+  // Erases the objects removed since the last call from the object lists.
+  void CompactObjectLists() const;
+
+  void LoadObjects(const ScenarioData& scenario_data,
+                   ScenarioTemplate* scenario_template) const;
+  void LoadRoads(const ScenarioData& scenario_data,
+                 ScenarioTemplate* scenario_template) const;
+  void LoadTrafficLights(const ScenarioData& scenario_data,
+                         ScenarioTemplate* scenario_template) const;
+
+  // Refits the object BVH to the current object positions, rebuilding it only
+  // when the refitted tree got too loose.
+  void UpdateObjectBVH();
+  // Rebuilds the object BVH from the objects that are not removed.
+  void ResetObjectBVH();
+
+  // Whether the collisions of `object` are checked, see SetCollisionSubset.
+  bool ChecksCollision(const Object& object) const {
+    return object.check_collision() &&
+           (collision_subset_.empty() ||
+            collision_subset_[object.state_index()]);
+  }
 
-  // Update the collision status of all objects
+  // Update the collision status of all objects. Each pair of objects is tested
+  // once, and the road edge collisions of the objects that did not move since
+  // the last update are not tested again.
   void UpdateCollision();
 
+  // Returns the visible objects, traffic lights and stop signs of `src`, and
+  // its nearest visible road points with their distances, sorted by distance
+  // (see NearestVisibleRoadPoints).
   std::tuple<std::vector<const ObjectBase*>,
-             std::vector<const geometry::PointLike*>,
+             std::vector<std::pair<const geometry::PointLike*, float>>,
              std::vector<const ObjectBase*>, std::vector<const ObjectBase*>>
   VisibleObjects(const Object& src, float view_dist, float view_angle,
                  float head_angle = 0.0f) const;
 
+  // Same as above, into the given vectors which are cleared first. The scratch
+  // space of the visibility tests is reused across calls of the same thread.
+  // The occluders are taken from `occlusion_cache` if not null, otherwise they
+  // are computed for the candidate objects.
+  void VisibleObjects(
+      const Object& src, float view_dist, float view_angle, float head_angle,
+      const OcclusionCache* occlusion_cache,
+      std::vector<const ObjectBase*>& objects,
+      std::vector<std::pair<const geometry::PointLike*, float>>& road_points,
+      std::vector<const ObjectBase*>& traffic_lights,
+      std::vector<const ObjectBase*>& stop_signs) const;
+
+  // Writes the max_visible_road_points_ road points nearest to `src` which
+  // are in its view field `vf` of radius `view_dist` and not hidden by
+  // `objects`, occluders[i] being the occluder of objects[i], to `ret` with
+  // their distances. They are sorted by distance, then by index in the road
+  // point table, the road edges coming first if road_edge_first_. The road
+  // points are visited nearest first and the search stops once enough visible
+  // ones are found.
+  void NearestVisibleRoadPoints(
+      const Object& src, const ViewField& vf, float view_dist,
+      const std::vector<const ObjectBase*>& objects,
+      const std::vector<const Occluder*>& occluders,
+      std::vector<std::pair<const geometry::PointLike*, float>>& ret) const;
+
+  // FlattenedVisibleState with the occluders of `occlusion_cache`, see
+  // VisibleObjects.
+  void FlattenedVisibleState(const Object& src, float view_dist,
+                             float view_angle, float head_angle,
+                             const OcclusionCache* occlusion_cache,
+                             float* state) const;
+
+  // Writes the features of the visible objects, road points, traffic lights
+  // and stop signs of `src`, nearest first, to `object_features`,
+  // `road_point_features`, `traffic_light_features` and `stop_sign_features`.
+  // These have room for the maximum numbers of visible objects of each
+  // category and must be initially 0. Returns the numbers of visible objects
+  // written, in the same order.
+  std::array<int64_t, 4> VisibleFeatures(const Object& src, float view_dist,
+                                         float view_angle, float head_angle,
+                                         const OcclusionCache* occlusion_cache,
+                                         float* object_features,
+                                         float* road_point_features,
+                                         float* traffic_light_features,
+                                         float* stop_sign_features) const;
+
   std::vector<const TrafficLight*> VisibleTrafficLights(
       const Object& src, float view_dist, float view_angle,
       float head_angle = 0.0f) const;
@@ -298,7 +647,9 @@ class Scenario : public sf::Drawable {
   // to draw classes inheriting sf::Drawable.
   void draw(sf::RenderTarget& target, sf::RenderStates states) const override;
 
-  std::string name_;
+  // Road map, spatial indices and expert data, shared with the other scenarios
+  // of the same scene.
+  std::shared_ptr<const ScenarioTemplate> scenario_template_ = nullptr;
 
   int64_t current_time_;
 
@@ -329,34 +680,70 @@ class Scenario : public sf::Drawable {
   // for a vehicle to be included in ObjectsThatMoved
   const float speed_threshold_ = 0.05;
 
-  std::vector<std::shared_ptr<Vehicle>> vehicles_;
-  std::vector<std::shared_ptr<Pedestrian>> pedestrians_;
-  std::vector<std::shared_ptr<Cyclist>> cyclists_;
-  std::vector<std::shared_ptr<Object>> objects_;
+  // Index the road edge segments with a uniform grid rather than a BVH for
+  // the collision checks.
+  const bool road_edge_grid_ = true;
+
+  // Algorithm of the occlusion tests of the observations, the angular sweep if
+  // the angular_sweep_visibility config is set. Both give the same results.
+  const OcclusionAlgorithm occlusion_algorithm_ =
+      OcclusionAlgorithm::kAngularBuckets;
+
+  // Whether the features of the ego state and of the visible state are
+  // divided by their scales while they are written, which brings them to
+  // about [-1, 1]. The features of the visible objects of a category all have
+  // the same scale.
+  const bool normalize_state_ = false;
+  const std::array<float, kEgoFeatureSize> ego_state_scales_ = {};
+  const std::array<float, 4> visible_state_scales_ = {};
+
+  // Runs the dynamics and the collision checks of a step. Results do not
+  // depend on the number of threads.
+  std::unique_ptr<utils::ThreadPool> thread_pool_;
+
+  // The object lists may hold removed objects until CompactObjectLists is
+  // called by the accessors.
+  mutable std::vector<std::shared_ptr<Vehicle>> vehicles_;
+  mutable std::vector<std::shared_ptr<Pedestrian>> pedestrians_;
+  mutable std::vector<std::shared_ptr<Cyclist>> cyclists_;
+  mutable std::vector<std::shared_ptr<Object>> objects_;
   // Rrack the object that moved, useful for figuring out which agents should
   // actually be controlled
-  std::vector<std::shared_ptr<Object>> moving_objects_;
+  mutable std::vector<std::shared_ptr<Object>> moving_objects_;
+  // Whether objects were removed since the object lists were last compacted.
+  mutable bool has_removed_objects_ = false;
+  // Kinematic state of the objects, which are views into it.
+  std::shared_ptr<ObjectStateStore> object_state_store_;
+  // All the objects including the removed ones, indexed like the state store.
+  std::vector<std::shared_ptr<Object>> all_objects_;
+  // Index of the objects in `all_objects_` by id, -1 for ids without object.
+  std::vector<int64_t> object_slots_;
+
+  // Road edge collision of an object at the pose it was last tested at.
+  struct EdgeCollision {
+    geometry::Vector2D position;
+    float heading = 0.0f;
+    // -1 if the object was never tested.
+    int8_t collided = -1;
+  };
+  // Indexed like the state store.
+  std::vector<EdgeCollision> edge_collisions_;
+  // Objects whose collisions are checked, indexed like the state store. All
+  // the objects are checked if empty.
+  std::vector<uint8_t> collision_subset_;
 
-  std::vector<std::shared_ptr<geometry::LineSegment>> line_segments_;
-  std::vector<std::shared_ptr<RoadLine>> road_lines_;
-  std::vector<std::shared_ptr<StopSign>> stop_signs_;
   std::vector<std::shared_ptr<TrafficLight>> traffic_lights_;
 
-  geometry::BVH object_bvh_;        // track objects for collisions
-  geometry::BVH line_segment_bvh_;  // track line segments for collisions
-  geometry::BVH static_bvh_;        // static objects other than road points
-  geometry::RangeTree2d road_point_tree_;  // track road points
+  geometry::BVH object_bvh_;  // track objects for collisions
+  // Index of the objects in the objects the object BVH was built from, indexed
+  // like the state store. -1 for the objects that were removed then.
+  std::vector<int64_t> object_bvh_indices_;
+  geometry::BVH static_bvh_;  // static objects other than road points
 
   // expert data
   const float expert_dt_ = 0.1f;
-  std::vector<std::vector<geometry::Vector2D>> expert_trajectories_;
-  std::vector<std::vector<geometry::Vector2D>> expert_velocities_;
-  std::vector<std::vector<float>> expert_headings_;
-  std::vector<std::vector<float>> expert_speeds_;
-  std::vector<std::vector<bool>> expert_valid_masks_;
 
   std::unique_ptr<sf::RenderTexture> image_texture_ = nullptr;
-  sf::FloatRect road_network_bounds_;
 };
 
 }  // namespace nocturne
@@ -0,0 +1,173 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <initializer_list>
+#include <memory>
+#include <nlohmann/json.hpp>
+#include <string>
+#include <vector>
+
+#include "object.h"
+#include "road.h"
+#include "traffic_light.h"
+
+namespace nocturne {
+
+// Every binary scenario file starts with these 8 bytes, followed by a uint32
+// format version. All multi-byte values are stored little-endian.
+constexpr char kBinaryScenarioMagic[8] = {'N', 'O', 'C', 'T',
+                                          'S', 'C', 'E', 'N'};
+// Version 2 aligns every array to kBinaryScenarioAlignment bytes so that the
+// arrays can be read in place. Version 1 files are still read, by copy.
+constexpr uint32_t kBinaryScenarioVersion = 2;
+constexpr int64_t kBinaryScenarioAlignment = 8;
+
+// Array of a ScenarioData. It either owns its elements, when parsing JSON or
+// building a scenario in code, or views elements decoded in place from a
+// binary scenario, which stay alive as long as the ScenarioData::storage they
+// point into.
+template <typename T>
+class ScenarioArray {
+ public:
+  using value_type = T;
+  using iterator = const T*;
+  using const_iterator = const T*;
+
+  ScenarioArray() = default;
+  ScenarioArray(std::initializer_list<T> values) : owned_(values) {}
+  ScenarioArray(std::vector<T> values) : owned_(std::move(values)) {}
+
+  // Returns an array viewing the `size` elements at `data`.
+  static ScenarioArray View(const T* data, int64_t size) {
+    ScenarioArray ret;
+    ret.view_data_ = data;
+    ret.view_size_ = size;
+    return ret;
+  }
+
+  bool is_view() const { return view_data_ != nullptr; }
+
+  const T* data() const { return is_view() ? view_data_ : owned_.data(); }
+  int64_t size() const { return is_view() ? view_size_ : owned_.size(); }
+  bool empty() const { return size() == 0; }
+
+  const T* begin() const { return data(); }
+  const T* end() const { return data() + size(); }
+  const T& front() const { return data()[0]; }
+  const T& back() const { return data()[size() - 1]; }
+  const T& operator[](int64_t i) const { return data()[i]; }
+
+  void push_back(const T& value) {
+    Own();
+    owned_.push_back(value);
+  }
+
+ private:
+  // Copies viewed elements into owned storage before a modification.
+  void Own() {
+    if (is_view()) {
+      owned_.assign(view_data_, view_data_ + view_size_);
+      view_data_ = nullptr;
+      view_size_ = 0;
+    }
+  }
+
+  std::vector<T> owned_;
+  const T* view_data_ = nullptr;
+  int64_t view_size_ = 0;
+};
+
+template <typename T>
+bool operator==(const ScenarioArray<T>& lhs, const ScenarioArray<T>& rhs) {
+  return std::equal(lhs.begin(), lhs.end(), rhs.begin(), rhs.end());
+}
+
+template <typename T>
+bool operator==(const ScenarioArray<T>& lhs, const std::vector<T>& rhs) {
+  return std::equal(lhs.begin(), lhs.end(), rhs.begin(), rhs.end());
+}
+
+template <typename T>
+bool operator==(const std::vector<T>& lhs, const ScenarioArray<T>& rhs) {
+  return rhs == lhs;
+}
+
+template <typename T>
+bool operator!=(const ScenarioArray<T>& lhs, const ScenarioArray<T>& rhs) {
+  return !(lhs == rhs);
+}
+
+// Columnar, parse-free representation of a scenario. Both the Waymo-derived
+// JSON files and the binary format decode into this structure, which is what
+// Scenario is built from.
+//
+// Variable length sequences (object trajectories, road polylines and traffic
+// light states) are packed in CSR layout: the entries of the i-th sequence are
+// in [offsets[i], offsets[i + 1]).
+struct ScenarioData {
+  std::string name;
+
+  // Keeps the memory viewed by the arrays alive, e.g. the mapping of a
+  // ScenarioPack. Null when all the arrays own their elements.
+  std::shared_ptr<const void> storage = nullptr;
+
+  // Per object attributes.
+  ScenarioArray<ObjectType> object_types;
+  ScenarioArray<float> object_lengths;
+  ScenarioArray<float> object_widths;
+  ScenarioArray<float> goal_x;
+  ScenarioArray<float> goal_y;
+  ScenarioArray<uint8_t> is_av;
+
+  // Per step trajectories. Headings are in degrees as in the JSON files.
+  ScenarioArray<int64_t> trajectory_offsets = {0};
+  ScenarioArray<float> x;
+  ScenarioArray<float> y;
+  ScenarioArray<float> heading;
+  ScenarioArray<float> velocity_x;
+  ScenarioArray<float> velocity_y;
+  ScenarioArray<uint8_t> valid;
+
+  // Road polylines. Stop signs are stored as roads with a single point.
+  ScenarioArray<RoadType> road_types;
+  ScenarioArray<int64_t> road_offsets = {0};
+  ScenarioArray<float> road_x;
+  ScenarioArray<float> road_y;
+
+  // Traffic lights.
+  ScenarioArray<float> traffic_light_x;
+  ScenarioArray<float> traffic_light_y;
+  ScenarioArray<int64_t> traffic_light_offsets = {0};
+  ScenarioArray<TrafficLightState> traffic_light_states;
+  ScenarioArray<int64_t> traffic_light_times;
+
+  int64_t num_objects() const { return object_types.size(); }
+  int64_t num_roads() const { return road_types.size(); }
+  int64_t num_traffic_lights() const { return traffic_light_x.size(); }
+};
+
+ScenarioData ParseJsonScenario(const nlohmann::json& j);
+
+// Returns true if the `size` bytes at `data` start with the binary header.
+bool IsBinaryScenario(const char* data, int64_t size);
+
+// Decodes a binary scenario. If `storage` keeps the `size` bytes at `data`
+// alive, the aligned arrays view these bytes instead of copying them.
+ScenarioData ParseBinaryScenario(const char* data, int64_t size,
+                                 std::shared_ptr<const void> storage = nullptr);
+
+std::string SerializeScenario(const ScenarioData& scenario_data);
+
+// Reads a scenario file in either format, detected from its first bytes.
+ScenarioData ReadScenarioFile(const std::string& scenario_path);
+
+// Converts a scenario file in either format to the binary format.
+void ConvertScenarioFile(const std::string& src_path,
+                         const std::string& dst_path);
+
+}  // namespace nocturne
@@ -0,0 +1,74 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <cstdint>
+#include <memory>
+#include <string>
+#include <string_view>
+#include <unordered_map>
+#include <vector>
+
+#include "scenario_format.h"
+
+namespace nocturne {
+
+// A scenario pack starts with these 8 bytes, a uint32 format version, a uint32
+// padding, the number of scenes and the offset of the index (both int64). The
+// scenes follow as 8-byte aligned binary scenarios. The index is at the end of
+// the file and stores for every scene its offset, size and name.
+constexpr char kScenarioPackMagic[8] = {'N', 'O', 'C', 'T', 'P', 'A', 'C', 'K'};
+constexpr uint32_t kScenarioPackVersion = 1;
+
+// Read-only dataset of binary scenarios stored in a single memory-mapped file.
+// All processes mapping the same pack share one page-cache copy of it. The
+// scenes are decoded in place: their arrays view the mapping, which stays
+// alive as long as the pack or any scene loaded from it.
+class ScenarioPack {
+ public:
+  explicit ScenarioPack(const std::string& pack_path);
+
+  ScenarioPack(const ScenarioPack&) = delete;
+  ScenarioPack& operator=(const ScenarioPack&) = delete;
+
+  const std::string& path() const { return path_; }
+
+  // Scene names in the order they were written.
+  const std::vector<std::string>& names() const { return names_; }
+
+  int64_t size() const { return names_.size(); }
+
+  bool Contains(const std::string& name) const {
+    return index_.find(name) != index_.end();
+  }
+
+  // Returns the mapped bytes of the scene `name`.
+  std::string_view SceneBytes(const std::string& name) const;
+
+  // Decodes the scene `name` in place from the mapped bytes.
+  ScenarioData LoadScene(const std::string& name) const {
+    const std::string_view bytes = SceneBytes(name);
+    return ParseBinaryScenario(bytes.data(), bytes.size(), mapping_);
+  }
+
+ protected:
+  const std::string path_;
+  // Unmaps the file once the pack and all the scenes viewing it are gone.
+  std::shared_ptr<const char> mapping_ = nullptr;
+  const char* data_ = nullptr;
+  int64_t size_ = 0;
+
+  std::vector<std::string> names_;
+  // Scene name -> (offset, size) in the mapped file.
+  std::unordered_map<std::string, std::pair<int64_t, int64_t>> index_;
+};
+
+// Writes the scenario files at `src_paths` (in either scenario format) into a
+// single pack at `dst_path`. Scenes are named after the base name of their
+// file.
+void WriteScenarioPack(const std::string& dst_path,
+                       const std::vector<std::string>& src_paths);
+
+}  // namespace nocturne
@@ -0,0 +1,129 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <SFML/Graphics.hpp>
+#include <cstdint>
+#include <list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#include "geometry/bvh.h"
+#include "geometry/line_segment.h"
+#include "geometry/point_grid.h"
+#include "geometry/uniform_grid.h"
+#include "geometry/vector_2d.h"
+#include "object.h"
+#include "road.h"
+#include "stop_sign.h"
+#include "traffic_light.h"
+
+namespace nocturne {
+
+// Initial state of one of the objects of a scenario.
+struct ObjectTemplate {
+  ObjectType type = ObjectType::kUnset;
+  int64_t id = -1;
+  float length = 0.0f;
+  float width = 0.0f;
+  geometry::Vector2D position;
+  float heading = 0.0f;
+  float speed = 0.0f;
+  geometry::Vector2D target_position;
+  float target_heading = 0.0f;
+  float target_speed = 0.0f;
+  bool is_av = false;
+  bool is_moving = false;
+};
+
+// Parsed, immutable part of a scenario. All the Scenario instances of the same
+// scene share one template: the road map, its spatial indices and the expert
+// trajectories are only built once, and resetting a scenario only recreates
+// the objects and traffic lights from their initial state.
+struct ScenarioTemplate {
+  std::string name;
+
+  std::vector<ObjectTemplate> objects;
+  // Traffic lights at the start time. Scenarios own copies of them since the
+  // light states depend on the current time.
+  std::vector<std::shared_ptr<const TrafficLight>> traffic_lights;
+
+  std::vector<std::shared_ptr<geometry::LineSegment>> line_segments;
+  std::vector<std::shared_ptr<RoadLine>> road_lines;
+  std::vector<std::shared_ptr<StopSign>> stop_signs;
+
+  // Track line segments for collisions, only one of them is built depending
+  // on the road_edge_grid config.
+  geometry::BVH line_segment_bvh;
+  geometry::UniformGrid line_segment_grid;
+  // Track road points for the nearest visible road point queries.
+  geometry::PointGrid road_point_grid;
+  // Static attributes of the road points of `road_lines`, from which their
+  // features are computed.
+  RoadPointTable road_point_table;
+
+  // Expert data indexed by object id.
+  std::vector<std::vector<geometry::Vector2D>> expert_trajectories;
+  std::vector<std::vector<geometry::Vector2D>> expert_velocities;
+  std::vector<std::vector<float>> expert_headings;
+  std::vector<std::vector<float>> expert_speeds;
+  std::vector<std::vector<bool>> expert_valid_masks;
+
+  sf::FloatRect road_network_bounds;
+
+  // Approximate number of bytes used by the template.
+  int64_t MemoryUsage() const;
+};
+
+// Process-wide LRU cache of scenario templates with a memory budget in bytes.
+// The cache is disabled (capacity 0) by default. It is safe to use from
+// multiple threads.
+class ScenarioTemplateCache {
+ public:
+  static ScenarioTemplateCache& Global();
+
+  int64_t capacity() const;
+  // Sets the memory budget, evicting the least recently used templates if
+  // needed.
+  void set_capacity(int64_t capacity);
+
+  int64_t size() const;
+  int64_t memory_usage() const;
+  int64_t hits() const;
+  int64_t misses() const;
+
+  // Returns nullptr if `key` is not in the cache.
+  std::shared_ptr<const ScenarioTemplate> Get(const std::string& key);
+
+  // Templates larger than the capacity are not cached.
+  void Put(const std::string& key,
+           std::shared_ptr<const ScenarioTemplate> scenario_template);
+
+  void Clear();
+
+ protected:
+  struct Entry {
+    std::string key;
+    std::shared_ptr<const ScenarioTemplate> scenario_template;
+    int64_t memory_usage;
+  };
+
+  void EvictUntil(int64_t memory_usage);
+
+  mutable std::mutex mu_;
+  int64_t capacity_ = 0;
+  int64_t memory_usage_ = 0;
+  int64_t hits_ = 0;
+  int64_t misses_ = 0;
+  // Most recently used entries first.
+  std::list<Entry> entries_;
+  std::unordered_map<std::string, std::list<Entry>::iterator> index_;
+};
+
+}  // namespace nocturne
@@ -9,6 +9,7 @@
 #include <fstream>
 #include <iostream>
 #include <memory>
+#include <optional>
 #include <stdexcept>
 #include <string>
 #include <unordered_map>
@@ -18,6 +19,7 @@
 #include "geometry/vector_2d.h"
 #include "object.h"
 #include "scenario.h"
+#include "scenario_pack.h"
 
 namespace nocturne {
 
@@ -31,10 +33,29 @@ class Simulation {
         scenario_(std::make_unique<Scenario>(scenario_path, config)),
         config_(config) {}
 
-  void Reset() { scenario_.reset(new Scenario(scenario_path_, config_)); }
+  // Simulates the scene `scenario_name` of a scenario pack.
+  Simulation(
+      std::shared_ptr<const ScenarioPack> scenario_pack,
+      const std::string& scenario_name,
+      const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+          config)
+      : scenario_path_(scenario_name),
+        scenario_pack_(std::move(scenario_pack)),
+        scenario_(std::make_unique<Scenario>(*scenario_pack_, scenario_name,
+                                             config)),
+        config_(config) {}
+
+  void Reset();
 
   void Step(float dt) { scenario_->Step(dt); }
 
+  // See Scenario::StepN.
+  std::vector<int64_t> StepN(
+      int64_t num_steps, float dt,
+      const std::optional<GoalTolerance>& goal_tolerance = std::nullopt) {
+    return scenario_->StepN(num_steps, dt, goal_tolerance);
+  }
+
   void Render();
 
   Scenario* GetScenario() const { return scenario_.get(); }
@@ -44,7 +65,9 @@ class Simulation {
  protected:
   void UpdateView(float padding = 100.0f) const;
 
+  // Path of the scenario file, or scene name if `scenario_pack_` is set.
   const std::string scenario_path_;
+  const std::shared_ptr<const ScenarioPack> scenario_pack_ = nullptr;
   std::unique_ptr<Scenario> scenario_ = nullptr;
 
   const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
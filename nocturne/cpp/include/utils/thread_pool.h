@@ -0,0 +1,75 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#pragma once
+
+#include <condition_variable>
+#include <cstdint>
+#include <exception>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace nocturne {
+namespace utils {
+
+// Persistent pool of worker threads running parallel loops. The calling
+// thread takes part in each loop, so a pool of num_threads threads only
+// starts num_threads - 1 workers, and a pool of one thread runs the loops
+// inline.
+//
+// Loops are split into contiguous chunks which only depend on the loop size,
+// the minimum chunk size and the number of threads, never on scheduling.
+// Results gathered per chunk can thus be combined in a deterministic order.
+class ThreadPool {
+ public:
+  using ChunkFunc =
+      std::function<void(int64_t chunk, int64_t begin, int64_t end)>;
+
+  explicit ThreadPool(int64_t num_threads);
+  ~ThreadPool();
+
+  ThreadPool(const ThreadPool&) = delete;
+  ThreadPool& operator=(const ThreadPool&) = delete;
+
+  int64_t num_threads() const { return num_threads_; }
+
+  // Number of chunks ParallelFor splits a loop of size `n` into.
+  int64_t NumChunks(int64_t n, int64_t min_chunk_size = 1) const;
+
+  // Calls `func` on the chunks of [0, n) of at least `min_chunk_size`
+  // iterations and waits for all of them. The first exception thrown by
+  // `func` is rethrown. Loops started from several threads run one after the
+  // other. Not reentrant: `func` must not call ParallelFor.
+  void ParallelFor(int64_t n, const ChunkFunc& func,
+                   int64_t min_chunk_size = 1);
+
+ protected:
+  void WorkerLoop(int64_t worker);
+
+  void RunChunk(int64_t chunk);
+
+  const int64_t num_threads_;
+  std::vector<std::thread> workers_;
+
+  // Held for the whole duration of a parallel loop.
+  std::mutex loop_mu_;
+  std::mutex mu_;
+  std::condition_variable work_cv_;
+  std::condition_variable done_cv_;
+  bool stop_ = false;
+  // Incremented for each loop, workers wait for it to change.
+  int64_t generation_ = 0;
+  int64_t num_pending_ = 0;
+  std::exception_ptr exception_ = nullptr;
+
+  // Current loop.
+  const ChunkFunc* func_ = nullptr;
+  int64_t n_ = 0;
+  int64_t num_chunks_ = 0;
+};
+
+}  // namespace utils
+}  // namespace nocturne
@@ -26,10 +26,11 @@ class Vehicle : public Object {
           const geometry::Vector2D& position, float heading, float speed,
           const geometry::Vector2D& target_position, float target_heading,
           float target_speed, bool is_av, bool can_block_sight = true,
-          bool can_be_collided = true, bool check_collision = true)
+          bool can_be_collided = true, bool check_collision = true,
+          std::shared_ptr<ObjectStateStore> state_store = nullptr)
       : Object(id, length, width, position, heading, speed, target_position,
                target_heading, target_speed, can_block_sight, can_be_collided,
-               check_collision),
+               check_collision, std::move(state_store)),
         is_av_(is_av) {
     Object::InitColor(std::make_optional(DEFAULT_COLOR));
   }
@@ -38,10 +39,11 @@ class Vehicle : public Object {
           const geometry::Vector2D& position, float heading, float speed,
           const geometry::Vector2D& target_position, float target_heading,
           float target_speed, bool is_av, bool can_block_sight = true,
-          bool can_be_collided = true, bool check_collision = true)
+          bool can_be_collided = true, bool check_collision = true,
+          std::shared_ptr<ObjectStateStore> state_store = nullptr)
       : Object(id, length, width, max_speed, position, heading, speed,
                target_position, target_heading, target_speed, can_block_sight,
-               can_be_collided, check_collision),
+               can_be_collided, check_collision, std::move(state_store)),
         is_av_(is_av) {
     Object::InitColor(std::make_optional(DEFAULT_COLOR));
   }
@@ -57,7 +59,7 @@ class Vehicle : public Object {
   void makeTrace(sf::RenderTarget& target) {
     std::vector<sf::Color> src_colors = SRC_COLOR;
     // std::cout << speed_ << std::endl;
-    if (speed_ <
+    if (speed() <
         SLOW_SPEED) {  // less traces if moving slow (prevents cheetoing)
       if (trace_delay_counter < trace_delay) {
         trace_delay_counter++;
@@ -71,10 +73,12 @@ class Vehicle : public Object {
         std::make_shared<sf::CircleShape>(MAX_TRACE_SIZE);
     trace->setFillColor(src_colors[0]);
     // TODO : the position of the vehicle is the corner not the middle
-    float x = cos(heading_) * (length_ / 2) - sin(heading_) * (width_ / 2) +
-              position_.x();
-    float y = sin(heading_) * (length_ / 2) + cos(heading_) * (width_ / 2) +
-              position_.y();
+    const float heading = this->heading();
+    const geometry::Vector2D position = this->position();
+    float x = cos(heading) * (length_ / 2) - sin(heading) * (width_ / 2) +
+              position.x();
+    float y = sin(heading) * (length_ / 2) + cos(heading) * (width_ / 2) +
+              position.y();
     // std::cout << "Heading: " << heading_ << std::endl;
     // std::cout << "Position: " << position_.x() << " " << position_.y()
     //           << std::endl;
@@ -14,6 +14,7 @@
 #include "geometry/point_like.h"
 #include "geometry/vector_2d.h"
 #include "object_base.h"
+#include "occlusion.h"
 
 namespace nocturne {
 
@@ -28,6 +29,21 @@ class ViewField : public geometry::AABBInterface {
   std::vector<const ObjectBase*> VisibleObjects(
       const std::vector<const ObjectBase*>& objects) const;
   void FilterVisibleObjects(std::vector<const ObjectBase*>& objects) const;
+  // Same as above, occluders[i] being the occluder of objects[i]. Both vectors
+  // are filtered. Each sight line is only tested against the occluders whose
+  // angular interval around the center contains it.
+  void FilterVisibleObjects(
+      std::vector<const ObjectBase*>& objects,
+      std::vector<const Occluder*>& occluders,
+      OcclusionAlgorithm algorithm = OcclusionAlgorithm::kAngularBuckets) const;
+
+  // Filters the points hidden by the objects of `objects` which can block the
+  // sight out of `points`, occluders[i] being the occluder of objects[i].
+  void FilterOccludedPoints(
+      const std::vector<const ObjectBase*>& objects,
+      const std::vector<const Occluder*>& occluders,
+      std::vector<const geometry::PointLike*>& points,
+      OcclusionAlgorithm algorithm = OcclusionAlgorithm::kAngularBuckets) const;
 
   std::vector<const ObjectBase*> VisibleNonblockingObjects(
       const std::vector<const ObjectBase*>& objects) const;
@@ -38,10 +54,16 @@ class ViewField : public geometry::AABBInterface {
       const std::vector<const geometry::PointLike*>& objects) const;
   void FilterVisiblePoints(
       std::vector<const geometry::PointLike*>& objects) const;
+  // Same as above, using `mask` as scratch space.
+  void FilterVisiblePoints(std::vector<const geometry::PointLike*>& objects,
+                           std::vector<geometry::utils::MaskType>& mask) const;
 
  protected:
   std::vector<geometry::Vector2D> ComputeSightEndpoints(
       const std::vector<const ObjectBase*>& objects) const;
+  // Same as above for the polygons of `occluders`, into `ret`.
+  void ComputeSightEndpoints(const std::vector<const Occluder*>& occluders,
+                             std::vector<geometry::Vector2D>& ret) const;
 
   std::unique_ptr<geometry::CircleLike> vision_ = nullptr;
   const bool panoramic_view_ = false;
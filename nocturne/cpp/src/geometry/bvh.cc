@@ -19,9 +19,8 @@ namespace {
 
 // Binary search for smallest index who shares the same highest bit with r - 1
 // in range [l, r).
-int64_t FindPivot(
-    const std::vector<std::pair<uint64_t, const AABBInterface*>>& objects,
-    int64_t l, int64_t r) {
+int64_t FindPivot(const std::vector<std::pair<uint64_t, int64_t>>& objects,
+                  int64_t l, int64_t r) {
   const uint64_t last = objects[r - 1].first;
   const int64_t pivot_prefix = __builtin_clzll(objects[l].first ^ last);
   int64_t ret = r;
@@ -68,6 +67,81 @@ void RemoveNode(int64_t num, BVH::Node* p,
 
 }  // namespace
 
+float BVH::Cost() const {
+  float cost = 0.0f;
+  for (const Node& node : nodes_) {
+    if (node.LChild() != nullptr) {
+      cost += node.aabb().Area();
+    }
+  }
+  return cost;
+}
+
+float BVH::Refit() {
+  float cost = 0.0f;
+  for (Node& node : nodes_) {
+    if (node.IsLeaf()) {
+      node.aabb_ = node.object()->GetAABB();
+    } else if (node.LChild() != nullptr) {
+      node.aabb_ = node.LChild()->aabb() || node.RChild()->aabb();
+      cost += node.aabb().Area();
+    }
+  }
+  if (build_cost_ > 0.0f) {
+    return cost / build_cost_;
+  }
+  return cost > 0.0f ? std::numeric_limits<float>::infinity() : 1.0f;
+}
+
+int64_t BVH::Remove(std::vector<const AABBInterface*> objects) {
+  std::sort(objects.begin(), objects.end());
+  int64_t num_removed = 0;
+  for (Node& node : nodes_) {
+    if (node.IsLeaf() &&
+        std::binary_search(objects.cbegin(), objects.cend(), node.object())) {
+      RemoveLeaf(&node);
+      ++num_removed;
+    }
+  }
+  return num_removed;
+}
+
+bool BVH::RemoveAt(int64_t index) {
+  Node* leaf = leaves_.at(index);
+  // Removed leaves are kept in `nodes_` without object.
+  if (!leaf->IsLeaf()) {
+    return false;
+  }
+  RemoveLeaf(leaf);
+  return true;
+}
+
+void BVH::RemoveLeaf(Node* leaf) {
+  Node* parent = leaf->parent_;
+  leaf->object_ = nullptr;
+  leaf->parent_ = nullptr;
+  if (parent == nullptr) {
+    root_ = nullptr;
+    return;
+  }
+
+  Node* sibling =
+      parent->LChild() == leaf ? parent->RChild() : parent->LChild();
+  Node* grandparent = parent->parent_;
+  sibling->parent_ = grandparent;
+  if (grandparent == nullptr) {
+    root_ = sibling;
+  } else {
+    grandparent->children_[grandparent->LChild() == parent ? 0 : 1] = sibling;
+  }
+  parent->children_ = {nullptr, nullptr};
+  parent->parent_ = nullptr;
+
+  for (Node* cur = grandparent; cur != nullptr; cur = cur->parent_) {
+    cur->aabb_ = cur->LChild()->aabb() || cur->RChild()->aabb();
+  }
+}
+
 std::vector<BVH::Node*> BVH::CombineNodes(const std::vector<BVH::Node*>& nodes,
                                           int64_t num) {
   const int64_t n = nodes.size();
@@ -122,24 +196,29 @@ std::vector<BVH::Node*> BVH::CombineNodes(const std::vector<BVH::Node*>& nodes,
 }
 
 std::vector<BVH::Node*> BVH::InitHierarchy(
-    const std::vector<std::pair<uint64_t, const AABBInterface*>>& objects,
-    int64_t l, int64_t r) {
+    const std::vector<const AABBInterface*>& objects,
+    const std::vector<std::pair<uint64_t, int64_t>>& encoded_objects, int64_t l,
+    int64_t r) {
   assert(l < r);
   if (r - l <= delta_) {
     std::vector<BVH::Node*> ret;
     ret.reserve(r - l);
     for (int64_t i = l; i < r; ++i) {
-      ret.push_back(MakeNode(std::get<1>(objects[i])));
+      const int64_t index = encoded_objects[i].second;
+      leaves_[index] = MakeNode(objects[index]);
+      ret.push_back(leaves_[index]);
     }
     return ret;
   }
-  int64_t p = FindPivot(objects, l, r);
+  int64_t p = FindPivot(encoded_objects, l, r);
   if (p == l || p == r) {
     p = l + (r - l) / 2;
   }
 
-  const std::vector<Node*> l_nodes = InitHierarchy(objects, l, p);
-  const std::vector<Node*> r_nodes = InitHierarchy(objects, p, r);
+  const std::vector<Node*> l_nodes =
+      InitHierarchy(objects, encoded_objects, l, p);
+  const std::vector<Node*> r_nodes =
+      InitHierarchy(objects, encoded_objects, p, r);
   std::vector<Node*> nodes;
   nodes.reserve(l_nodes.size() + r_nodes.size());
   for (Node* node : l_nodes) {
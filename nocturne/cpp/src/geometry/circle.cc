@@ -50,19 +50,18 @@ CircleLike::Intersection(const LineSegment& segment) const {
   }
 }
 
-std::vector<utils::MaskType> Circle::BatchContains(
-    const std::vector<const PointLike*>& points) const {
+void Circle::BatchContains(const std::vector<const PointLike*>& points,
+                           std::vector<utils::MaskType>& mask) const {
   const int64_t n = points.size();
-  std::vector<utils::MaskType> mask(n);
-  const auto [x, y] = utils::PackCoordinates(points);
+  mask.resize(n);
   const float ox = center_.x();
   const float oy = center_.y();
   for (int64_t i = 0; i < n; ++i) {
-    const float dx = x[i] - ox;
-    const float dy = y[i] - oy;
+    const Vector2D p = points[i]->Coordinate();
+    const float dx = p.x() - ox;
+    const float dy = p.y() - oy;
     mask[i] = (dx * dx + dy * dy <= radius_ * radius_);
   }
-  return mask;
 }
 
 }  // namespace geometry
@@ -59,11 +59,10 @@ bool CircularSector::Contains(const Vector2D& p) const {
   return dx * dx + dy * dy <= radius_ * radius_ && CenterAngleContains(p);
 }
 
-std::vector<utils::MaskType> CircularSector::BatchContains(
-    const std::vector<const PointLike*>& points) const {
+void CircularSector::BatchContains(const std::vector<const PointLike*>& points,
+                                   std::vector<utils::MaskType>& mask) const {
   const int64_t n = points.size();
-  std::vector<utils::MaskType> mask(n);
-  const auto [x, y] = utils::PackCoordinates(points);
+  mask.resize(n);
   const Vector2D r0 = Radius0();
   const Vector2D r1 = Radius1();
   const float ox = center_.x();
@@ -73,8 +72,9 @@ std::vector<utils::MaskType> CircularSector::BatchContains(
   const float r1x = r1.x();
   const float r1y = r1.y();
   for (int64_t i = 0; i < n; ++i) {
-    const float dx = x[i] - ox;
-    const float dy = y[i] - oy;
+    const Vector2D p = points[i]->Coordinate();
+    const float dx = p.x() - ox;
+    const float dy = p.y() - oy;
     const float r2 = dx * dx + dy * dy;
     const float c0 = dx * r0y - r0x * dy;
     const float c1 = dx * r1y - r1x * dy;
@@ -83,7 +83,6 @@ std::vector<utils::MaskType> CircularSector::BatchContains(
                                             : (utils::MaskType(c0 <= 0.0f) & utils::MaskType(c1 >= 0.0f));
     mask[i] = ((r2 <= radius_ * radius_) & m);
   }
-  return mask;
 }
 
 std::pair<std::optional<Vector2D>, std::optional<Vector2D>>
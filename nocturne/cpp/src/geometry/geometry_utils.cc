@@ -5,6 +5,7 @@
 #include "geometry/geometry_utils.h"
 
 #include <cassert>
+#include <utility>
 
 #include "geometry/point_like.h"
 #include "geometry/polygon.h"
@@ -16,27 +17,41 @@ namespace utils {
 
 std::pair<std::vector<float>, std::vector<float>> PackCoordinates(
     const std::vector<Vector2D>& points) {
+  std::vector<float> x;
+  std::vector<float> y;
+  PackCoordinates(points, x, y);
+  return std::make_pair(std::move(x), std::move(y));
+}
+
+std::pair<std::vector<float>, std::vector<float>> PackCoordinates(
+    const std::vector<const PointLike*>& points) {
+  std::vector<float> x;
+  std::vector<float> y;
+  PackCoordinates(points, x, y);
+  return std::make_pair(std::move(x), std::move(y));
+}
+
+void PackCoordinates(const std::vector<Vector2D>& points, std::vector<float>& x,
+                     std::vector<float>& y) {
   const int64_t n = points.size();
-  std::vector<float> x(n);
-  std::vector<float> y(n);
+  x.resize(n);
+  y.resize(n);
   for (int64_t i = 0; i < n; ++i) {
     x[i] = points[i].x();
     y[i] = points[i].y();
   }
-  return std::make_pair(x, y);
 }
 
-std::pair<std::vector<float>, std::vector<float>> PackCoordinates(
-    const std::vector<const PointLike*>& points) {
+void PackCoordinates(const std::vector<const PointLike*>& points,
+                     std::vector<float>& x, std::vector<float>& y) {
   const int64_t n = points.size();
-  std::vector<float> x(n);
-  std::vector<float> y(n);
+  x.resize(n);
+  y.resize(n);
   for (int64_t i = 0; i < n; ++i) {
     const Vector2D p = points[i]->Coordinate();
     x[i] = p.x();
     y[i] = p.y();
   }
-  return std::make_pair(x, y);
 }
 
 #define NOCTURNE_DEFINE_PACK_SMALL_POLYGON(N)                                \
@@ -37,12 +37,11 @@ int ComputeOutCode(const AABB& aabb, const Vector2D& p) {
 }
 
 template <int64_t N>
-std::vector<utils::MaskType> SmallPolygonBatchIntersects(
-    const ConvexPolygon& polygon, const Vector2D& o,
-    const std::vector<float>& x, const std::vector<float>& y) {
-  assert(x.size() == y.size());
-  const int64_t n = x.size();
-  std::vector<utils::MaskType> mask(n, 1);
+void SmallPolygonBatchIntersects(const ConvexPolygon& polygon,
+                                 const Vector2D& o, const float* x,
+                                 const float* y, int64_t n,
+                                 utils::MaskType* mask) {
+  std::fill(mask, mask + n, 1);
 
   const auto [pvx, pvy] = utils::PackSmallPolygon<N>(polygon);
   const float ox = o.x();
@@ -89,17 +88,14 @@ std::vector<utils::MaskType> SmallPolygonBatchIntersects(
     // Use (^1) for not operation.
     mask[i] &= (utils::MaskType(cur_v > 0.0f) ^ 1);
   }
-
-  return mask;
 }
 
 template <int64_t N>
-std::vector<float> SmallPolygonBatchParametricIntersection(
-    const Vector2D& o, const std::vector<float>& x, const std::vector<float>& y,
-    const ConvexPolygon& polygon) {
-  assert(x.size() == y.size());
-  const int64_t n = x.size();
-  std::vector<float> ret(n, std::numeric_limits<float>::infinity());
+void SmallPolygonBatchParametricIntersection(const Vector2D& o, const float* x,
+                                             const float* y, int64_t n,
+                                             const ConvexPolygon& polygon,
+                                             float* ret) {
+  std::fill(ret, ret + n, std::numeric_limits<float>::infinity());
 
   const auto [pvx, pvy] = utils::PackSmallPolygon<N>(polygon);
   const float p0x = o.x();
@@ -135,8 +131,6 @@ std::vector<float> SmallPolygonBatchParametricIntersection(
       ret[i] = cur < ret[i] ? cur : ret[i];
     }
   }
-
-  return ret;
 }
 
 }  // namespace
@@ -239,23 +233,41 @@ std::vector<utils::MaskType> BatchIntersects(const ConvexPolygon& polygon,
                                              const Vector2D& o,
                                              const std::vector<float>& x,
                                              const std::vector<float>& y) {
+  std::vector<utils::MaskType> mask;
+  BatchIntersects(polygon, o, x, y, mask);
+  return mask;
+}
+
+void BatchIntersects(const ConvexPolygon& polygon, const Vector2D& o,
+                     const std::vector<float>& x, const std::vector<float>& y,
+                     std::vector<utils::MaskType>& mask) {
+  assert(x.size() == y.size());
+  mask.resize(x.size());
+  BatchIntersects(polygon, o, x.data(), y.data(), x.size(), mask.data());
+}
+
+void BatchIntersects(const ConvexPolygon& polygon, const Vector2D& o,
+                     const float* x, const float* y, int64_t n,
+                     utils::MaskType* mask) {
   const int64_t m = polygon.NumEdges();
   if (m == 3) {
-    return SmallPolygonBatchIntersects<3>(polygon, o, x, y);
+    SmallPolygonBatchIntersects<3>(polygon, o, x, y, n, mask);
+    return;
   }
   if (m == 4) {
-    return SmallPolygonBatchIntersects<4>(polygon, o, x, y);
+    SmallPolygonBatchIntersects<4>(polygon, o, x, y, n, mask);
+    return;
   }
   if (m == 5) {
-    return SmallPolygonBatchIntersects<5>(polygon, o, x, y);
+    SmallPolygonBatchIntersects<5>(polygon, o, x, y, n, mask);
+    return;
   }
   if (m == 6) {
-    return SmallPolygonBatchIntersects<6>(polygon, o, x, y);
+    SmallPolygonBatchIntersects<6>(polygon, o, x, y, n, mask);
+    return;
   }
 
-  assert(x.size() == y.size());
-  const int64_t n = x.size();
-  std::vector<utils::MaskType> mask(n, 1);
+  std::fill(mask, mask + n, 1);
   std::vector<float> min_v(n, std::numeric_limits<float>::max());
   std::vector<float> max_v(n, std::numeric_limits<float>::lowest());
 
@@ -303,8 +315,6 @@ std::vector<utils::MaskType> BatchIntersects(const ConvexPolygon& polygon,
           ((utils::MaskType(v0 > 0.0f) & utils::MaskType(v1 > 0.0f)) ^ 1);
     }
   }
-
-  return mask;
 }
 
 std::vector<utils::MaskType> BatchIntersects(
@@ -325,23 +335,35 @@ std::vector<float> BatchParametricIntersection(const Vector2D& o,
                                                const std::vector<float>& x,
                                                const std::vector<float>& y,
                                                const ConvexPolygon& polygon) {
+  assert(x.size() == y.size());
+  std::vector<float> ret(x.size());
+  BatchParametricIntersection(o, x.data(), y.data(), x.size(), polygon,
+                              ret.data());
+  return ret;
+}
+
+void BatchParametricIntersection(const Vector2D& o, const float* x,
+                                 const float* y, int64_t n,
+                                 const ConvexPolygon& polygon, float* ret) {
   const int64_t m = polygon.NumEdges();
   if (m == 3) {
-    return SmallPolygonBatchParametricIntersection<3>(o, x, y, polygon);
+    SmallPolygonBatchParametricIntersection<3>(o, x, y, n, polygon, ret);
+    return;
   }
   if (m == 4) {
-    return SmallPolygonBatchParametricIntersection<4>(o, x, y, polygon);
+    SmallPolygonBatchParametricIntersection<4>(o, x, y, n, polygon, ret);
+    return;
   }
   if (m == 5) {
-    return SmallPolygonBatchParametricIntersection<5>(o, x, y, polygon);
+    SmallPolygonBatchParametricIntersection<5>(o, x, y, n, polygon, ret);
+    return;
   }
   if (m == 6) {
-    return SmallPolygonBatchParametricIntersection<6>(o, x, y, polygon);
+    SmallPolygonBatchParametricIntersection<6>(o, x, y, n, polygon, ret);
+    return;
   }
 
-  assert(x.size() == y.size());
-  const int64_t n = x.size();
-  std::vector<float> ret(n, std::numeric_limits<float>::infinity());
+  std::fill(ret, ret + n, std::numeric_limits<float>::infinity());
 
   const float p0x = o.x();
   const float p0y = o.y();
@@ -379,8 +401,6 @@ std::vector<float> BatchParametricIntersection(const Vector2D& o,
       ret[i] = cur < ret[i] ? cur : ret[i];
     }
   }
-
-  return ret;
 }
 
 std::vector<float> BatchParametricIntersection(
@@ -0,0 +1,92 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "geometry/point_grid.h"
+
+#include <algorithm>
+#include <cmath>
+#include <numeric>
+
+namespace nocturne {
+namespace geometry {
+
+namespace {
+
+// Lower bound on the average number of points per cell, which keeps the
+// memory usage linear in the number of points for sparse sets.
+constexpr float kMinPointsPerCell = 0.25f;
+
+}  // namespace
+
+void PointGrid::Clear() {
+  points_.clear();
+  cell_offsets_.clear();
+  min_x_ = 0.0f;
+  min_y_ = 0.0f;
+  cell_size_ = 0.0f;
+  num_cols_ = 0;
+  num_rows_ = 0;
+}
+
+int64_t PointGrid::MemoryUsage() const {
+  return points_.capacity() * sizeof(const PointLike*) +
+         cell_offsets_.capacity() * sizeof(int64_t);
+}
+
+void PointGrid::ResetImpl(std::vector<const PointLike*> points,
+                          float cell_size) {
+  Clear();
+  if (points.empty()) {
+    return;
+  }
+  const int64_t n = points.size();
+  std::vector<Vector2D> coordinates;
+  coordinates.reserve(n);
+  for (const PointLike* point : points) {
+    coordinates.push_back(point->Coordinate());
+  }
+
+  float max_x = coordinates[0].x();
+  float max_y = coordinates[0].y();
+  min_x_ = coordinates[0].x();
+  min_y_ = coordinates[0].y();
+  for (const Vector2D& p : coordinates) {
+    min_x_ = std::min(min_x_, p.x());
+    min_y_ = std::min(min_y_, p.y());
+    max_x = std::max(max_x, p.x());
+    max_y = std::max(max_y, p.y());
+  }
+  const float width = max_x - min_x_;
+  const float height = max_y - min_y_;
+  const float max_cells = static_cast<float>(n) / kMinPointsPerCell;
+  cell_size = std::max({cell_size, std::sqrt(width * height / max_cells),
+                        std::max(width, height) / max_cells});
+  if (!(cell_size > 0.0f)) {
+    // All the points are the same.
+    cell_size = 1.0f;
+  }
+  cell_size_ = cell_size;
+  num_cols_ = static_cast<int64_t>(std::floor(width / cell_size_)) + 1;
+  num_rows_ = static_cast<int64_t>(std::floor(height / cell_size_)) + 1;
+
+  // Bucket the points by cell with a stable counting sort.
+  std::vector<int64_t> cells;
+  cells.reserve(n);
+  cell_offsets_.assign(num_cols_ * num_rows_ + 1, 0);
+  for (const Vector2D& p : coordinates) {
+    const int64_t cell = Row(p.y()) * num_cols_ + Col(p.x());
+    cells.push_back(cell);
+    ++cell_offsets_[cell + 1];
+  }
+  std::partial_sum(cell_offsets_.begin(), cell_offsets_.end(),
+                   cell_offsets_.begin());
+  points_.resize(n);
+  std::vector<int64_t> cursors(cell_offsets_.begin(), cell_offsets_.end() - 1);
+  for (int64_t i = 0; i < n; ++i) {
+    points_[cursors[cells[i]]++] = points[i];
+  }
+}
+
+}  // namespace geometry
+}  // namespace nocturne
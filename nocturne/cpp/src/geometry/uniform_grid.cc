@@ -0,0 +1,133 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "geometry/uniform_grid.h"
+
+#include <algorithm>
+#include <cmath>
+#include <numeric>
+
+namespace nocturne {
+namespace geometry {
+
+namespace {
+
+// Cell side as a multiple of the median object size. Road edges are split
+// into segments of about half a meter, so with this scale a vehicle box
+// overlaps a handful of cells holding a few dozen segments.
+constexpr float kCellSizeScale = 8.0f;
+
+// Upper bound on the number of cells per object, which keeps the memory
+// usage linear in the number of objects for sparse scenes.
+constexpr int64_t kMaxCellsPerObject = 4;
+
+}  // namespace
+
+void UniformGrid::Clear() {
+  objects_.clear();
+  aabbs_.clear();
+  min_cols_.clear();
+  min_rows_.clear();
+  cell_offsets_.clear();
+  cell_objects_.clear();
+  min_x_ = 0.0f;
+  min_y_ = 0.0f;
+  cell_size_ = 0.0f;
+  num_cols_ = 0;
+  num_rows_ = 0;
+}
+
+int64_t UniformGrid::MemoryUsage() const {
+  return objects_.capacity() * sizeof(const AABBInterface*) +
+         aabbs_.capacity() * sizeof(AABB) +
+         (min_cols_.capacity() + min_rows_.capacity() +
+          cell_offsets_.capacity() + cell_objects_.capacity()) *
+             sizeof(int64_t);
+}
+
+void UniformGrid::ResetImpl(std::vector<const AABBInterface*> objects,
+                            float cell_size) {
+  Clear();
+  if (objects.empty()) {
+    return;
+  }
+  const int64_t n = objects.size();
+  objects_ = std::move(objects);
+  aabbs_.reserve(n);
+  for (const AABBInterface* obj : objects_) {
+    aabbs_.push_back(obj->GetAABB());
+  }
+
+  float max_x = aabbs_[0].MaxX();
+  float max_y = aabbs_[0].MaxY();
+  min_x_ = aabbs_[0].MinX();
+  min_y_ = aabbs_[0].MinY();
+  for (const AABB& aabb : aabbs_) {
+    min_x_ = std::min(min_x_, aabb.MinX());
+    min_y_ = std::min(min_y_, aabb.MinY());
+    max_x = std::max(max_x, aabb.MaxX());
+    max_y = std::max(max_y, aabb.MaxY());
+  }
+  const float width = max_x - min_x_;
+  const float height = max_y - min_y_;
+
+  if (cell_size <= 0.0f) {
+    std::vector<float> sizes;
+    sizes.reserve(n);
+    for (const AABB& aabb : aabbs_) {
+      sizes.push_back(
+          std::max(aabb.MaxX() - aabb.MinX(), aabb.MaxY() - aabb.MinY()));
+    }
+    const auto median = sizes.begin() + n / 2;
+    std::nth_element(sizes.begin(), median, sizes.end());
+    cell_size = kCellSizeScale * (*median);
+  }
+  cell_size = std::max(
+      {cell_size,
+       std::sqrt(width * height / static_cast<float>(kMaxCellsPerObject * n)),
+       std::max(width, height) / static_cast<float>(kMaxCellsPerObject * n)});
+  if (!(cell_size > 0.0f)) {
+    // All the objects are the same point.
+    cell_size = 1.0f;
+  }
+  cell_size_ = cell_size;
+  num_cols_ = static_cast<int64_t>(std::floor(width / cell_size_)) + 1;
+  num_rows_ = static_cast<int64_t>(std::floor(height / cell_size_)) + 1;
+
+  // Bucket the objects by cell with a counting sort.
+  min_cols_.reserve(n);
+  min_rows_.reserve(n);
+  cell_offsets_.assign(num_cols_ * num_rows_ + 1, 0);
+  std::vector<int64_t> max_cols;
+  std::vector<int64_t> max_rows;
+  max_cols.reserve(n);
+  max_rows.reserve(n);
+  for (const AABB& aabb : aabbs_) {
+    min_cols_.push_back(Col(aabb.MinX()));
+    min_rows_.push_back(Row(aabb.MinY()));
+    max_cols.push_back(Col(aabb.MaxX()));
+    max_rows.push_back(Row(aabb.MaxY()));
+  }
+  for (int64_t i = 0; i < n; ++i) {
+    for (int64_t row = min_rows_[i]; row <= max_rows[i]; ++row) {
+      for (int64_t col = min_cols_[i]; col <= max_cols[i]; ++col) {
+        ++cell_offsets_[row * num_cols_ + col + 1];
+      }
+    }
+  }
+  std::partial_sum(cell_offsets_.begin(), cell_offsets_.end(),
+                   cell_offsets_.begin());
+  cell_objects_.resize(cell_offsets_.back());
+  std::vector<int64_t> cursors(cell_offsets_.begin(), cell_offsets_.end() - 1);
+  for (int64_t i = 0; i < n; ++i) {
+    for (int64_t row = min_rows_[i]; row <= max_rows[i]; ++row) {
+      for (int64_t col = min_cols_[i]; col <= max_cols[i]; ++col) {
+        cell_objects_[cursors[row * num_cols_ + col]++] = i;
+      }
+    }
+  }
+}
+
+}  // namespace geometry
+}  // namespace nocturne
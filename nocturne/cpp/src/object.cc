@@ -12,26 +12,31 @@
 namespace nocturne {
 
 geometry::ConvexPolygon Object::BoundingPolygon() const {
+  const geometry::Vector2D position = this->position();
+  const float heading = this->heading();
   const geometry::Vector2D p0 =
-      geometry::Vector2D(length_ * 0.5f, width_ * 0.5f).Rotate(heading_) +
-      position_;
+      geometry::Vector2D(length_ * 0.5f, width_ * 0.5f).Rotate(heading) +
+      position;
   const geometry::Vector2D p1 =
-      geometry::Vector2D(-length_ * 0.5f, width_ * 0.5f).Rotate(heading_) +
-      position_;
+      geometry::Vector2D(-length_ * 0.5f, width_ * 0.5f).Rotate(heading) +
+      position;
   const geometry::Vector2D p2 =
-      geometry::Vector2D(-length_ * 0.5f, -width_ * 0.5f).Rotate(heading_) +
-      position_;
+      geometry::Vector2D(-length_ * 0.5f, -width_ * 0.5f).Rotate(heading) +
+      position;
   const geometry::Vector2D p3 =
-      geometry::Vector2D(length_ * 0.5f, -width_ * 0.5f).Rotate(heading_) +
-      position_;
+      geometry::Vector2D(length_ * 0.5f, -width_ * 0.5f).Rotate(heading) +
+      position;
   return geometry::ConvexPolygon({p0, p1, p2, p3});
 }
 
 void Object::draw(sf::RenderTarget& target, sf::RenderStates states) const {
+  const geometry::Vector2D position = this->position();
+  const float heading = this->heading();
+
   sf::RectangleShape rect(sf::Vector2f(length_, width_));
   rect.setOrigin(length_ / 2.0f, width_ / 2.0f);
-  rect.setPosition(utils::ToVector2f(position_));
-  rect.setRotation(geometry::utils::Degrees(heading_));
+  rect.setPosition(utils::ToVector2f(position));
+  rect.setRotation(geometry::utils::Degrees(heading));
 
   sf::Color col;
   if (can_block_sight_ && can_be_collided_) {
@@ -51,7 +56,7 @@ void Object::draw(sf::RenderTarget& target, sf::RenderStates states) const {
     float radius = std::max(length_, width_);
     sf::CircleShape circ(radius);
     circ.setOrigin(length_ / 2.0f, width_ / 2.0f);
-    circ.setPosition(utils::ToVector2f(position_));
+    circ.setPosition(utils::ToVector2f(position));
     circ.setFillColor(sf::Color(255, 0, 0, 100));
     target.draw(circ, states);
   }
@@ -62,8 +67,8 @@ void Object::draw(sf::RenderTarget& target, sf::RenderStates states) const {
   arrow.setPoint(1, sf::Vector2f(0.0f, width_ / 2.0f));
   arrow.setPoint(2, sf::Vector2f(length_ / 2.0f, 0.0f));
   arrow.setOrigin(0.0f, 0.0f);
-  arrow.setPosition(utils::ToVector2f(position_));
-  arrow.setRotation(geometry::utils::Degrees(heading_));
+  arrow.setPosition(utils::ToVector2f(position));
+  arrow.setRotation(geometry::utils::Degrees(heading));
   arrow.setFillColor(sf::Color::White);
   target.draw(arrow, states);
 }
@@ -92,47 +97,28 @@ void Object::InitColor(
 
 void Object::SetActionFromKeyboard() {
   // up: accelerate ; down: brake
+  const float speed = this->speed();
   if (sf::Keyboard::isKeyPressed(sf::Keyboard::Up)) {
-    acceleration_ = 1.0f;
+    set_acceleration(1.0f);
   } else if (sf::Keyboard::isKeyPressed(sf::Keyboard::Down)) {
     // larger acceleration for braking than for moving backwards
-    acceleration_ = speed_ > 0 ? -2.0f : -1.0f;
-  } else if (std::abs(speed_) < 0.05) {
+    set_acceleration(speed > 0 ? -2.0f : -1.0f);
+  } else if (std::abs(speed) < 0.05) {
     // clip to 0
-    speed_ = 0.0f;
+    set_speed(0.0f);
   } else {
     // friction
-    acceleration_ = 0.5f * (speed_ > 0 ? -1.0f : 1.0f);
+    set_acceleration(0.5f * (speed > 0 ? -1.0f : 1.0f));
   }
 
   // right: turn right; left: turn left
   if (sf::Keyboard::isKeyPressed(sf::Keyboard::Right)) {
-    steering_ = geometry::utils::Radians(-10.0f);
+    set_steering(geometry::utils::Radians(-10.0f));
   } else if (sf::Keyboard::isKeyPressed(sf::Keyboard::Left)) {
-    steering_ = geometry::utils::Radians(10.0f);
+    set_steering(geometry::utils::Radians(10.0f));
   } else {
-    steering_ = 0.0f;
+    set_steering(0.0f);
   }
 }
 
-// Kinematic Bicycle Model
-// https://www.coursera.org/lecture/intro-self-driving-cars/lesson-2-the-kinematic-bicycle-model-Bi8yE
-void Object::KinematicBicycleStep(float dt) {
-  // Forward dynamics:
-  //     new_x = x + vel_x * t + 1/2 * accel * cos(yaw) * t ** 2
-  //     new_y = y + vel_y * t + 1/2 * accel * sin(yaw) * t ** 2
-  //     new_yaw = yaw + steering * (speed * t + 1/2 * accel * t ** 2)
-  //     new_vel = vel + accel * t
-  geometry::Vector2D vel = Velocity();
-  geometry::Vector2D rot =
-      geometry::Vector2D(std::cos(heading_), std::sin(heading_));
-  position_ =
-      position_ + vel * dt + 0.5 * acceleration_ * rot * (float)pow(dt, 2);
-
-  heading_ = geometry::utils::AngleAdd(
-      heading_,
-      (float)(steering_ * (speed_ * dt + 0.5 * acceleration_ * pow(dt, 2))));
-  speed_ = ClipSpeed(speed_ + acceleration_ * dt);
-}
-
 }  // namespace nocturne
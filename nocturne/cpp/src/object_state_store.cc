@@ -0,0 +1,196 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "object_state_store.h"
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+
+#include "geometry/geometry_utils.h"
+
+namespace nocturne {
+
+namespace {
+
+// Objects are stepped in blocks of this many objects, whose intermediate
+// values fit in arrays on the stack.
+constexpr int64_t kBlockSize = 256;
+
+constexpr float kTwoOverPi = 0.636619772367581343f;
+// pi / 2 split in three floats for an exact range reduction (Cody-Waite).
+constexpr float kHalfPi1 = 1.5703125f;
+constexpr float kHalfPi2 = 4.837512969970703125e-4f;
+constexpr float kHalfPi3 = 7.54978995489188216e-8f;
+
+// Computes sin(angle) and cos(angle) for `n` angles without branches or
+// library calls, so that the loop is vectorized. The angle is reduced to
+// [-pi/4, pi/4] and the minimax polynomials of Cephes are evaluated there. The
+// error is within 2 ulp for |angle| < 8192.
+void SinCos(const float* __restrict angle, int64_t n,
+            float* __restrict sin_angle, float* __restrict cos_angle) {
+  for (int64_t i = 0; i < n; ++i) {
+    const float q = std::rint(angle[i] * kTwoOverPi);
+    const int32_t quadrant = static_cast<int32_t>(q);
+    const float r = ((angle[i] - q * kHalfPi1) - q * kHalfPi2) - q * kHalfPi3;
+    const float r2 = r * r;
+    const float s = r + r * r2 *
+                            (-1.6666654611e-1f +
+                             r2 * (8.3321608736e-3f + r2 * -1.9515295891e-4f));
+    const float c =
+        1.0f - 0.5f * r2 +
+        r2 * r2 *
+            (4.166664568298827e-2f +
+             r2 * (-1.388731625493765e-3f + r2 * 2.443315711809948e-5f));
+    // sin and cos swap in odd quadrants, sin is negated in quadrants 2 and 3
+    // and cos in quadrants 1 and 2.
+    const bool odd = (quadrant & 1) != 0;
+    const float sin_sign = (quadrant & 2) != 0 ? -1.0f : 1.0f;
+    const float cos_sign = ((quadrant + 1) & 2) != 0 ? -1.0f : 1.0f;
+    sin_angle[i] = sin_sign * (odd ? c : s);
+    cos_angle[i] = cos_sign * (odd ? s : c);
+  }
+}
+
+// Same as geometry::utils::NormalizeAngle, in single precision and with
+// selects instead of branches. The number of turns is truncated by a
+// conversion to int, which unlike std::trunc is vectorized.
+inline float NormalizeAngle(float angle) {
+  constexpr float kPi = geometry::utils::kPi;
+  constexpr float kTwoPi = geometry::utils::kTwoPi;
+  const float turns =
+      static_cast<float>(static_cast<int32_t>(angle * (1.0f / kTwoPi)));
+  const float ret = angle - kTwoPi * turns;
+  const float wrapped = ret > 0.0f ? ret - kTwoPi : ret + kTwoPi;
+  return std::fabs(ret) > kPi ? wrapped : ret;
+}
+
+// Kinematic Bicycle Model
+// https://www.coursera.org/lecture/intro-self-driving-cars/lesson-2-the-kinematic-bicycle-model-Bi8yE
+// Forward dynamics:
+//     new_x = x + vel_x * t + 1/2 * accel * cos(yaw) * t ** 2
+//     new_y = y + vel_y * t + 1/2 * accel * sin(yaw) * t ** 2
+//     new_yaw = yaw + steering * (speed * t + 1/2 * accel * t ** 2)
+//     new_vel = vel + accel * t
+//
+// Updates the state of `n` objects given the sine and cosine of their
+// headings. The new state of the objects with one of the `fixed_flags` is
+// discarded by a select. The arrays are __restrict so that the loop is
+// vectorized without runtime alias checks, and the function is not inlined so
+// that the compiler keeps these qualifiers.
+__attribute__((noinline)) void BicycleUpdate(
+    int64_t n, float dt, uint8_t fixed_flags,
+    const float* __restrict sin_heading, const float* __restrict cos_heading,
+    const float* __restrict max_speed, const float* __restrict acceleration,
+    const float* __restrict steering, const uint8_t* __restrict flags,
+    float* __restrict x, float* __restrict y, float* __restrict heading,
+    float* __restrict speed) {
+  const float dt2 = dt * dt;
+  for (int64_t i = 0; i < n; ++i) {
+    const float distance = speed[i] * dt + 0.5f * acceleration[i] * dt2;
+    const float new_x = x[i] + distance * cos_heading[i];
+    const float new_y = y[i] + distance * sin_heading[i];
+    const float new_heading =
+        NormalizeAngle(heading[i] + steering[i] * distance);
+    const float new_speed = std::max(
+        std::min(speed[i] + acceleration[i] * dt, max_speed[i]), -max_speed[i]);
+    const bool fixed = (flags[i] & fixed_flags) != 0;
+    x[i] = fixed ? x[i] : new_x;
+    y[i] = fixed ? y[i] : new_y;
+    heading[i] = fixed ? heading[i] : new_heading;
+    speed[i] = fixed ? speed[i] : new_speed;
+  }
+}
+
+// Steps the objects of [begin, end), at most kBlockSize of them, in two
+// passes over the arrays: the first one computes the sine and cosine of the
+// headings and the second one the new states.
+void BicycleStepBlock(ObjectStateStore& store, float dt, int64_t begin,
+                      int64_t end, uint8_t fixed_flags) {
+  const int64_t n = end - begin;
+  float sin_heading[kBlockSize];
+  float cos_heading[kBlockSize];
+  SinCos(store.heading.data() + begin, n, sin_heading, cos_heading);
+  BicycleUpdate(n, dt, fixed_flags, sin_heading, cos_heading,
+                store.max_speed.data() + begin,
+                store.acceleration.data() + begin,
+                store.steering.data() + begin, store.flags.data() + begin,
+                store.x.data() + begin, store.y.data() + begin,
+                store.heading.data() + begin, store.speed.data() + begin);
+}
+
+}  // namespace
+
+void ObjectStateStore::Reserve(int64_t capacity) {
+  id.reserve(capacity);
+  x.reserve(capacity);
+  y.reserve(capacity);
+  heading.reserve(capacity);
+  speed.reserve(capacity);
+  max_speed.reserve(capacity);
+  acceleration.reserve(capacity);
+  steering.reserve(capacity);
+  flags.reserve(capacity);
+}
+
+int64_t ObjectStateStore::Add(int64_t object_id,
+                              const geometry::Vector2D& position,
+                              float object_heading, float object_speed,
+                              float object_max_speed) {
+  id.push_back(object_id);
+  x.push_back(position.x());
+  y.push_back(position.y());
+  heading.push_back(object_heading);
+  speed.push_back(object_speed);
+  max_speed.push_back(object_max_speed);
+  acceleration.push_back(0.0f);
+  steering.push_back(0.0f);
+  flags.push_back(0);
+  return size() - 1;
+}
+
+int64_t ObjectStateStore::Add(const ObjectStateStore& other, int64_t index) {
+  id.push_back(other.id[index]);
+  x.push_back(other.x[index]);
+  y.push_back(other.y[index]);
+  heading.push_back(other.heading[index]);
+  speed.push_back(other.speed[index]);
+  max_speed.push_back(other.max_speed[index]);
+  acceleration.push_back(other.acceleration[index]);
+  steering.push_back(other.steering[index]);
+  flags.push_back(other.flags[index]);
+  return size() - 1;
+}
+
+void ObjectStateStore::KinematicBicycleStep(int64_t index, float dt) {
+  BicycleStepBlock(*this, dt, index, index + 1, /*fixed_flags=*/0);
+}
+
+void ObjectStateStore::KinematicBicycleStep(float dt, int64_t begin,
+                                            int64_t end) {
+  for (int64_t block = begin; block < end; block += kBlockSize) {
+    BicycleStepBlock(*this, dt, block, std::min(block + kBlockSize, end),
+                     kExpertControl | kRemoved);
+  }
+}
+
+void ObjectStateStore::ExpertStep(
+    int64_t time,
+    const std::vector<std::vector<geometry::Vector2D>>& expert_trajectories,
+    const std::vector<std::vector<float>>& expert_headings,
+    const std::vector<std::vector<float>>& expert_speeds, int64_t begin,
+    int64_t end) {
+  for (int64_t i = begin; i < end; ++i) {
+    if ((flags[i] & (kExpertControl | kRemoved)) != kExpertControl) {
+      continue;
+    }
+    const geometry::Vector2D& position = expert_trajectories.at(id[i]).at(time);
+    x[i] = position.x();
+    y[i] = position.y();
+    heading[i] = expert_headings.at(id[i]).at(time);
+    speed[i] = ClipSpeed(i, expert_speeds.at(id[i]).at(time));
+  }
+}
+
+}  // namespace nocturne
@@ -0,0 +1,332 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "occlusion.h"
+
+#include <algorithm>
+#include <cmath>
+#include <iterator>
+#include <limits>
+#include <set>
+#include <utility>
+
+#include "geometry/geometry_utils.h"
+
+namespace nocturne {
+
+namespace {
+
+using geometry::utils::kPi;
+using geometry::utils::kTwoPi;
+
+// Bounds of the angles returned by std::atan2 in float.
+constexpr float kMinusPi = -kPi;
+constexpr float kPlusPi = kPi;
+
+constexpr float kBucketsPerRadian =
+    static_cast<float>(AngularIndex::kNumBuckets / kTwoPi);
+
+// Occluders closer than this to the observer, which may contain it, are
+// tested against all the points.
+constexpr float kMinOccluderDistance = 1.0f;
+
+// Margin added on both sides of the angular interval of an occluder, large
+// enough to cover the rounding errors of the angles and of the exact tests.
+constexpr float kAngleMargin = 0.01f;
+
+// Relative and absolute tolerance on the distances when checking that an
+// occluder is entirely behind another one.
+constexpr float kDistanceTolerance = 1e-3f;
+
+// Event types of ShadowProfile::Reset. An occluder is a candidate over its
+// angular interval widened by the margin, and covers its interval shrunk by
+// the margin, where all the sight lines hit it.
+constexpr int64_t kCandidateBegin = 0;
+constexpr int64_t kCandidateEnd = 1;
+constexpr int64_t kCoverBegin = 2;
+constexpr int64_t kCoverEnd = 3;
+
+int64_t Bucket(float angle) {
+  const int64_t bucket =
+      static_cast<int64_t>(std::floor((angle + kPi) * kBucketsPerRadian));
+  return std::clamp<int64_t>(bucket, 0, AngularIndex::kNumBuckets - 1);
+}
+
+// Distance from `o` to `aabb`.
+float Distance(const geometry::Vector2D& o, const geometry::AABB& aabb) {
+  const float dx = std::max({aabb.MinX() - o.x(), 0.0f, o.x() - aabb.MaxX()});
+  const float dy = std::max({aabb.MinY() - o.y(), 0.0f, o.y() - aabb.MaxY()});
+  return std::hypot(dx, dy);
+}
+
+float AngleMargin(float distance) {
+  return kAngleMargin * (1.0f + 1.0f / distance);
+}
+
+// Angular interval [lo, hi] around `o` of `polygon`, which does not contain
+// `o`. A convex polygon then spans less than pi around `o`, so the angles of
+// the vertices relative to the first one give its interval. hi may be greater
+// than pi.
+std::pair<float, float> AngularInterval(
+    const geometry::Vector2D& o, const geometry::ConvexPolygon& polygon) {
+  const std::vector<geometry::Vector2D>& vertices = polygon.vertices();
+  const geometry::Vector2D d0 = vertices.front() - o;
+  const float a0 = std::atan2(d0.y(), d0.x());
+  float lo = 0.0f;
+  float hi = 0.0f;
+  for (auto it = std::next(vertices.cbegin()); it != vertices.cend(); ++it) {
+    const geometry::Vector2D cur = *it - o;
+    const float da =
+        geometry::utils::AngleSub(std::atan2(cur.y(), cur.x()), a0);
+    lo = std::min(lo, da);
+    hi = std::max(hi, da);
+  }
+  return std::make_pair(a0 + lo, a0 + hi);
+}
+
+}  // namespace
+
+void OcclusionCache::Reset(const std::vector<std::shared_ptr<Object>>& objects,
+                           int64_t num_slots) {
+  occluders_.resize(num_slots);
+  for (const auto& object : objects) {
+    occluders_[object->state_index()] = Occluder(*object);
+  }
+}
+
+void AngularIndex::Reset(const geometry::Vector2D& o, const float* x,
+                         const float* y, int64_t n) {
+  o_ = o;
+  x_.resize(n);
+  y_.resize(n);
+  index_.resize(n);
+  buckets_.resize(n);
+  bucket_offsets_.fill(0);
+  for (int64_t i = 0; i < n; ++i) {
+    const int64_t bucket = Bucket(std::atan2(y[i] - o.y(), x[i] - o.x()));
+    buckets_[i] = bucket;
+    ++bucket_offsets_[bucket + 1];
+  }
+  for (int64_t i = 0; i < kNumBuckets; ++i) {
+    bucket_offsets_[i + 1] += bucket_offsets_[i];
+  }
+  // Counting sort of the points by bucket.
+  std::array<int64_t, kNumBuckets> cursors;
+  std::copy(bucket_offsets_.cbegin(), bucket_offsets_.cend() - 1,
+            cursors.begin());
+  for (int64_t i = 0; i < n; ++i) {
+    const int64_t j = cursors[buckets_[i]]++;
+    x_[j] = x[i];
+    y_[j] = y[i];
+    index_[j] = i;
+  }
+}
+
+int64_t AngularIndex::CandidateRanges(
+    const Occluder& occluder,
+    std::array<std::pair<int64_t, int64_t>, 2>& ranges) const {
+  const int64_t n = size();
+  const float d = Distance(o_, occluder.aabb);
+  if (d <= kMinOccluderDistance) {
+    ranges[0] = std::make_pair(0, n);
+    return 1;
+  }
+  const auto [lo, hi] = AngularInterval(o_, occluder.polygon);
+  const float margin = AngleMargin(d);
+  int64_t b0 =
+      static_cast<int64_t>(std::floor((lo - margin + kPi) * kBucketsPerRadian));
+  int64_t b1 =
+      static_cast<int64_t>(std::floor((hi + margin + kPi) * kBucketsPerRadian));
+  if (b1 - b0 + 1 >= kNumBuckets) {
+    ranges[0] = std::make_pair(0, n);
+    return 1;
+  }
+  // Shift the interval so that it starts in [0, kNumBuckets), it then wraps
+  // around at most once.
+  const int64_t shift =
+      (b0 >= 0 ? b0 / kNumBuckets : (b0 + 1) / kNumBuckets - 1) * kNumBuckets;
+  b0 -= shift;
+  b1 -= shift;
+  if (b1 < kNumBuckets) {
+    ranges[0] = std::make_pair(bucket_offsets_[b0], bucket_offsets_[b1 + 1]);
+    return 1;
+  }
+  ranges[0] = std::make_pair(bucket_offsets_[b0], n);
+  ranges[1] = std::make_pair(int64_t(0), bucket_offsets_[b1 - kNumBuckets + 1]);
+  return 2;
+}
+
+void ShadowProfile::Reset(const geometry::Vector2D& o,
+                          const std::vector<const ObjectBase*>& objects,
+                          const std::vector<const Occluder*>& occluders) {
+  const int64_t n = objects.size();
+  o_ = o;
+  events_.clear();
+  near_.assign(n, 0.0f);
+  far_.assign(n, 0.0f);
+  for (int64_t i = 0; i < n; ++i) {
+    if (!objects[i]->can_block_sight()) {
+      continue;
+    }
+    const Occluder& occluder = *occluders[i];
+    const float d = Distance(o, occluder.aabb);
+    float far = 0.0f;
+    for (const geometry::Vector2D& v : occluder.polygon.vertices()) {
+      far = std::max(far, geometry::Distance(o, v));
+    }
+    near_[i] = d;
+    far_[i] = far;
+    if (d <= kMinOccluderDistance) {
+      AddPiece(kMinusPi, kPlusPi, kCandidateBegin, i);
+      continue;
+    }
+    const auto [lo, hi] = AngularInterval(o, occluder.polygon);
+    const float margin = AngleMargin(d);
+    if (hi - lo + 2.0f * margin >= kTwoPi) {
+      AddPiece(kMinusPi, kPlusPi, kCandidateBegin, i);
+      continue;
+    }
+    AddEvents(lo - margin, hi + margin, kCandidateBegin, i);
+    if (hi - lo > 2.0f * margin) {
+      AddEvents(lo + margin, hi - margin, kCoverBegin, i);
+    }
+  }
+  std::sort(events_.begin(), events_.end(),
+            [](const Event& lhs, const Event& rhs) {
+              return lhs.angle < rhs.angle ||
+                     (lhs.angle == rhs.angle && lhs.type < rhs.type);
+            });
+
+  bounds_.clear();
+  bounds_.push_back(kMinusPi);
+  for (const Event& event : events_) {
+    if (event.angle > bounds_.back() && event.angle < kPlusPi) {
+      bounds_.push_back(event.angle);
+    }
+  }
+  bounds_.push_back(kPlusPi);
+
+  // Sweep over the sectors, keeping the candidate occluders sorted by their
+  // distance and the covering ones by their farthest vertex.
+  const int64_t num_events = events_.size();
+  const int64_t m = num_sectors();
+  std::set<std::pair<float, int64_t>> candidates;
+  std::set<std::pair<float, int64_t>> covers;
+  occluder_offsets_.assign(1, 0);
+  occluder_indices_.clear();
+  merged_bounds_.clear();
+  int64_t e = 0;
+  for (int64_t sector = 0; sector < m; ++sector) {
+    for (; e < num_events && events_[e].angle <= bounds_[sector]; ++e) {
+      const int64_t i = events_[e].index;
+      switch (events_[e].type) {
+        case kCandidateBegin: {
+          candidates.emplace(near_[i], i);
+          break;
+        }
+        case kCandidateEnd: {
+          candidates.erase(std::make_pair(near_[i], i));
+          break;
+        }
+        case kCoverBegin: {
+          covers.emplace(far_[i], i);
+          break;
+        }
+        case kCoverEnd: {
+          covers.erase(std::make_pair(far_[i], i));
+          break;
+        }
+      }
+    }
+    const float limit =
+        covers.empty() ? std::numeric_limits<float>::infinity()
+                       : covers.cbegin()->first * (1.0f + kDistanceTolerance) +
+                             kDistanceTolerance;
+    const int64_t begin = occluder_indices_.size();
+    for (const auto& [near, i] : candidates) {
+      if (near > limit) {
+        break;
+      }
+      occluder_indices_.push_back(i);
+    }
+    std::sort(occluder_indices_.begin() + begin, occluder_indices_.end());
+    // Merge the sector with the previous one when they have the same
+    // occluders.
+    const int64_t prev_begin =
+        occluder_offsets_.size() > 1 ? occluder_offsets_.rbegin()[1] : -1;
+    if (prev_begin >= 0 && std::equal(occluder_indices_.cbegin() + prev_begin,
+                                      occluder_indices_.cbegin() + begin,
+                                      occluder_indices_.cbegin() + begin,
+                                      occluder_indices_.cend())) {
+      occluder_indices_.resize(begin);
+    } else {
+      merged_bounds_.push_back(bounds_[sector]);
+      occluder_offsets_.push_back(occluder_indices_.size());
+    }
+  }
+  merged_bounds_.push_back(bounds_.back());
+  bounds_.swap(merged_bounds_);
+}
+
+int64_t ShadowProfile::Sector(float angle) const {
+  const auto it = std::upper_bound(std::next(bounds_.cbegin()),
+                                   std::prev(bounds_.cend()), angle);
+  return std::distance(bounds_.cbegin(), it) - 1;
+}
+
+void ShadowProfile::SortPoints(const float* x, const float* y, int64_t n) {
+  const int64_t m = num_sectors();
+  x_.resize(n);
+  y_.resize(n);
+  index_.resize(n);
+  sectors_.resize(n);
+  point_offsets_.assign(m + 1, 0);
+  for (int64_t i = 0; i < n; ++i) {
+    const int64_t sector = Sector(std::atan2(y[i] - o_.y(), x[i] - o_.x()));
+    sectors_[i] = sector;
+    ++point_offsets_[sector + 1];
+  }
+  for (int64_t i = 0; i < m; ++i) {
+    point_offsets_[i + 1] += point_offsets_[i];
+  }
+  // Counting sort of the points by sector, the offsets are shifted back by
+  // one sector at the end.
+  for (int64_t i = 0; i < n; ++i) {
+    const int64_t j = point_offsets_[sectors_[i]]++;
+    x_[j] = x[i];
+    y_[j] = y[i];
+    index_[j] = i;
+  }
+  for (int64_t i = m; i > 0; --i) {
+    point_offsets_[i] = point_offsets_[i - 1];
+  }
+  point_offsets_[0] = 0;
+}
+
+void ShadowProfile::AddEvents(float lo, float hi, int64_t type, int64_t index) {
+  // Shift the interval so that it starts in [-pi, pi), and split it at pi.
+  if (lo < kMinusPi) {
+    lo += kTwoPi;
+    hi += kTwoPi;
+  } else if (lo >= kPlusPi) {
+    lo -= kTwoPi;
+    hi -= kTwoPi;
+  }
+  if (hi > kPlusPi) {
+    AddPiece(lo, kPlusPi, type, index);
+    AddPiece(kMinusPi, hi - kTwoPi, type, index);
+  } else {
+    AddPiece(lo, hi, type, index);
+  }
+}
+
+void ShadowProfile::AddPiece(float lo, float hi, int64_t type, int64_t index) {
+  // Empty pieces, which may come from rounding at the split, cover no sector.
+  if (lo < hi) {
+    events_.push_back({lo, type, index});
+    events_.push_back({hi, type + 1, index});
+  }
+}
+
+}  // namespace nocturne
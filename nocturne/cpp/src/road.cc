@@ -42,22 +42,25 @@ void RoadLine::draw(sf::RenderTarget& target, sf::RenderStates states) const {
               states);
 }
 
-void RoadLine::InitRoadPoints() {
+void RoadLine::InitRoadPoints(int64_t first_point_index) {
   const int64_t num_segments = geometry_points_.size() - 1;
   const int64_t num_sampled_points =
       (num_segments + sample_every_n_ - 1) / sample_every_n_ + 1;
+  const auto point_index = [first_point_index](int64_t i) {
+    return first_point_index < 0 ? int64_t(-1) : first_point_index + i;
+  };
   road_points_.reserve(num_sampled_points);
   for (int64_t i = 0; i < num_sampled_points - 2; ++i) {
     road_points_.emplace_back(geometry_points_[i * sample_every_n_],
                               geometry_points_[(i + 1) * sample_every_n_],
-                              road_type_);
+                              road_type_, point_index(i));
   }
   const int64_t p = (num_sampled_points - 2) * sample_every_n_;
   road_points_.emplace_back(geometry_points_[p], geometry_points_.back(),
-                            road_type_);
+                            road_type_, point_index(num_sampled_points - 2));
   // Use itself as neighbor for the last point.
   road_points_.emplace_back(geometry_points_.back(), geometry_points_.back(),
-                            road_type_);
+                            road_type_, point_index(num_sampled_points - 1));
 }
 
 void RoadLine::InitRoadLineGraphics() {
@@ -68,4 +71,18 @@ void RoadLine::InitRoadLineGraphics() {
   }
 }
 
+void RoadPointTable::Append(const RoadLine& road_line) {
+  for (const RoadPoint& point : road_line.road_points()) {
+    const geometry::Vector2D neighbor_vec =
+        point.neighbor_position() - point.position();
+    x.push_back(point.position().x());
+    y.push_back(point.position().y());
+    neighbor_x.push_back(neighbor_vec.x());
+    neighbor_y.push_back(neighbor_vec.y());
+    neighbor_distance.push_back(neighbor_vec.Norm());
+    neighbor_angle.push_back(neighbor_vec.Angle());
+    road_type.push_back(point.road_type());
+  }
+}
+
 }  // namespace nocturne
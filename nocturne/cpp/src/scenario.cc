@@ -5,16 +5,19 @@
 #include "scenario.h"
 
 #include <algorithm>
+#include <array>
 #include <cmath>
 #include <cstring>
 #include <limits>
 #include <memory>
 #include <type_traits>
+#include <utility>
 
 #include "geometry/aabb_interface.h"
 #include "geometry/geometry_utils.h"
 #include "geometry/intersection.h"
 #include "geometry/line_segment.h"
+#include "geometry/point_grid.h"
 #include "geometry/polygon.h"
 #include "geometry/vector_2d.h"
 #include "utils/sf_utils.h"
@@ -25,61 +28,98 @@ namespace nocturne {
 
 namespace {
 
-template <class T>
-bool RemoveObjectImpl(const Object& object, std::vector<T>& objects) {
-  const int64_t id = object.id();
-  const auto it = std::find_if(
-      objects.begin(), objects.end(),
-      [id](const std::shared_ptr<Object>& obj) { return obj->id() == id; });
-  if (it == objects.end()) {
-    return false;
+// Side of the cells of the road point grid. A ring of cells then holds a few
+// dozen road points, and a view field spans about ten rings.
+constexpr float kRoadPointCellSize = 10.0f;
+
+// Maximum ratio between the cost of the refitted object BVH and its cost when
+// it was built, see geometry::BVH::Refit.
+constexpr float kMaxObjectBVHCostRatio = 1.5f;
+
+// Minimum numbers of objects per thread, below which waking up more threads
+// costs more than it saves.
+constexpr int64_t kMinDynamicsChunkSize = 256;
+constexpr int64_t kMinCollisionChunkSize = 16;
+
+// Categories of the visible objects of the observations, in the order of the
+// flattened visible state, and the sizes of their features.
+constexpr int64_t kNumVisibleCategories = 4;
+constexpr std::array<const char*, kNumVisibleCategories> kVisibleCategories = {
+    "objects", "road_points", "traffic_lights", "stop_signs"};
+constexpr std::array<int64_t, kNumVisibleCategories> kVisibleFeatureSizes = {
+    kObjectFeatureSize, kRoadPointFeatureSize, kTrafficLightFeatureSize,
+    kStopSignsFeatureSize};
+
+// Divides the n features of `features` by `scale`.
+void ScaleFeatures(float scale, int64_t n, float* features) {
+  for (int64_t i = 0; i < n; ++i) {
+    features[i] /= scale;
   }
-  objects.erase(it);
-  return true;
 }
 
-std::vector<const ObjectBase*> VisibleCandidates(const geometry::BVH& bvh,
-                                                 const Object& src,
-                                                 const ViewField& vf) {
-  std::vector<const ObjectBase*> objects =
-      bvh.IntersectionCandidates<ObjectBase>(vf);
+// Erases the objects flagged as removed in `store` from `objects`.
+template <class T>
+void EraseRemovedObjects(const ObjectStateStore& store,
+                         std::vector<std::shared_ptr<T>>& objects) {
+  objects.erase(std::remove_if(objects.begin(), objects.end(),
+                               [&store](const std::shared_ptr<T>& obj) {
+                                 return store.flags[obj->state_index()] &
+                                        ObjectStateStore::kRemoved;
+                               }),
+                objects.end());
+}
+
+// Scratch space of the visibility tests and of the observations. One instance
+// is kept per thread so that the capacity of the vectors is reused from one
+// observation to the next instead of being allocated again.
+struct ObservationScratch {
+  std::vector<const ObjectBase*> objects;
+  std::vector<const geometry::PointLike*> road_points;
+  std::vector<const ObjectBase*> traffic_lights;
+  std::vector<const ObjectBase*> stop_signs;
+  std::vector<const ObjectBase*> static_candidates;
+  std::vector<geometry::utils::MaskType> mask;
+  std::vector<std::pair<const ObjectBase*, float>> object_targets;
+  std::vector<std::pair<const geometry::PointLike*, float>> road_point_targets;
+  std::vector<std::pair<const ObjectBase*, float>> traffic_light_targets;
+  std::vector<std::pair<const ObjectBase*, float>> stop_sign_targets;
+  std::vector<const Occluder*> occluders;
+  std::vector<Occluder> local_occluders;
+};
+
+ObservationScratch& ThreadObservationScratch() {
+  thread_local ObservationScratch scratch;
+  return scratch;
+}
+
+// Occluders of the objects shared by the rows of a batch of observations. One
+// instance is kept per calling thread and reset in place by every batch, so
+// that the occluders are not allocated again for each batch.
+OcclusionCache& ThreadOcclusionCache() {
+  thread_local OcclusionCache occlusion_cache;
+  return occlusion_cache;
+}
+
+void VisibleCandidates(const geometry::BVH& bvh, const Object& src,
+                       const ViewField& vf,
+                       std::vector<const ObjectBase*>& objects) {
+  bvh.IntersectionCandidates<ObjectBase>(vf, objects);
   auto it = std::find(objects.begin(), objects.end(),
                       dynamic_cast<const ObjectBase*>(&src));
   if (it != objects.end()) {
     std::swap(*it, objects.back());
     objects.pop_back();
   }
-  return objects;
-}
-
-void VisibleRoadPoints(const Object& src,
-                       const std::vector<const ObjectBase*>& objects,
-                       std::vector<const geometry::PointLike*>& road_points) {
-  const int64_t n = road_points.size();
-  const auto [x, y] = geometry::utils::PackCoordinates(road_points);
-  std::vector<geometry::utils::MaskType> mask(n, 1);
-  for (const ObjectBase* obj : objects) {
-    if (!obj->can_block_sight()) {
-      continue;
-    }
-    const std::vector<geometry::utils::MaskType> block_mask =
-        geometry::BatchIntersects(obj->BoundingPolygon(), src.position(), x, y);
-    for (int64_t i = 0; i < n; ++i) {
-      // Use bitwise operation to get better performance.
-      // Use (^1) for not operation.
-      mask[i] &= (block_mask[i] ^ 1);
-    }
-  }
-  const int64_t pivot = utils::MaskedPartition(mask, road_points);
-  road_points.resize(pivot);
 }
 
+// Writes the k objects nearest to `src` with their distances to `ret`, sorted
+// by distance.
 template <class ObjType>
-std::vector<std::pair<const ObjType*, float>> NearestK(
-    const Object& src, const std::vector<const ObjType*>& objects, int64_t k) {
+void NearestK(const Object& src, const std::vector<const ObjType*>& objects,
+              int64_t k, std::vector<std::pair<const ObjType*, float>>& ret) {
   const geometry::Vector2D& src_pos = src.position();
   const int64_t n = objects.size();
-  std::vector<std::pair<const ObjType*, float>> ret;
+  ret.clear();
   ret.reserve(n);
   for (const ObjType* obj : objects) {
     if constexpr (std::is_same<ObjType, geometry::PointLike>::value) {
@@ -98,46 +138,95 @@ std::vector<std::pair<const ObjType*, float>> NearestK(
     utils::PartialSort(ret.begin(), ret.begin() + k, ret.end(), cmp);
     ret.resize(k);
   }
+}
+
+template <class ObjType>
+std::vector<std::pair<const ObjType*, float>> NearestK(
+    const Object& src, const std::vector<const ObjType*>& objects, int64_t k) {
+  std::vector<std::pair<const ObjType*, float>> ret;
+  NearestK(src, objects, k, ret);
   return ret;
 }
 
-template <class PointType>
-std::vector<std::pair<const PointType*, float>> NearestKRoadPoints(
-    const Object& src, const std::vector<const PointType*>& points, int64_t k,
-    bool road_edge_first) {
-  if (!road_edge_first) {
-    return NearestK(src, points, k);
+// Whether the road point target `lhs` comes before `rhs`, by distance then by
+// index in the road point table so that the order of equidistant points does
+// not depend on the search.
+bool RoadPointTargetLess(
+    const std::pair<const geometry::PointLike*, float>& lhs,
+    const std::pair<const geometry::PointLike*, float>& rhs) {
+  // The points of the road point grid are all RoadPoints.
+  return lhs.second < rhs.second ||
+         (lhs.second == rhs.second &&
+          static_cast<const RoadPoint*>(lhs.first)->index() <
+              static_cast<const RoadPoint*>(rhs.first)->index());
+}
+
+// Appends the k road points of `grid` nearest to `src` for which `pred` holds
+// and which are in `vf`, of radius `view_dist`, and not hidden by `objects` to
+// `ret`, sorted by RoadPointTargetLess. The rings of cells around `src` are
+// tested nearest first, until k visible points are closer than the points of
+// the next rings. Consecutive rings are tested together until they hold as
+// many points as are still missing, which bounds the number of visibility
+// tests of few points. `points` and `mask` are scratch space.
+template <class Pred>
+void AppendNearestVisibleRoadPoints(
+    const Object& src, const geometry::PointGrid& grid, const ViewField& vf,
+    float view_dist, const std::vector<const ObjectBase*>& objects,
+    const std::vector<const Occluder*>& occluders,
+    OcclusionAlgorithm occlusion_algorithm, int64_t k, Pred pred,
+    std::vector<const geometry::PointLike*>& points,
+    std::vector<geometry::utils::MaskType>& mask,
+    std::vector<std::pair<const geometry::PointLike*, float>>& ret) {
+  if (k <= 0) {
+    return;
   }
   const geometry::Vector2D& src_pos = src.position();
-  const int64_t n = points.size();
-  std::vector<std::pair<const PointType*, float>> ret;
-  std::vector<geometry::utils::MaskType> mask(n);
-  ret.reserve(n);
-  for (int64_t i = 0; i < n; ++i) {
-    const PointType* p = points[i];
-    mask[i] =
-        (dynamic_cast<const RoadPoint*>(p))->road_type() == RoadType::kRoadEdge;
-    ret.emplace_back(p, geometry::Distance(src_pos, p->Coordinate()));
-  }
-  const auto cmp = [](const std::pair<const PointType*, float>& lhs,
-                      const std::pair<const PointType*, float>& rhs) {
-    return lhs.second < rhs.second;
-  };
-  const int64_t pivot = utils::MaskedPartition(mask, ret);
-  if (pivot >= k) {
-    utils::PartialSort(ret.begin(), ret.begin() + k, ret.begin() + pivot, cmp);
-  } else {
-    std::sort(ret.begin(), ret.begin() + pivot, cmp);
-    if (n <= k) {
-      std::sort(ret.begin() + pivot, ret.end(), cmp);
-    } else {
-      utils::PartialSort(ret.begin() + pivot, ret.begin() + k, ret.end(), cmp);
+  const auto begin = static_cast<int64_t>(ret.size());
+  const int64_t num_rings = grid.NumRings(src_pos);
+  int64_t num_missing = k;
+  points.clear();
+  for (int64_t ring = 0; ring < num_rings; ++ring) {
+    const int64_t num_points = points.size();
+    const float bound = grid.RingPoints(src_pos, ring, points);
+    points.erase(
+        std::remove_if(points.begin() + num_points, points.end(),
+                       [&pred](const geometry::PointLike* p) {
+                         return !pred(*static_cast<const RoadPoint*>(p));
+                       }),
+        points.end());
+    // The points of the next rings are out of sight beyond `view_dist`.
+    const bool last = bound > view_dist || ring == num_rings - 1;
+    if (!last && static_cast<int64_t>(points.size()) < num_missing) {
+      continue;
+    }
+    if (!points.empty()) {
+      vf.FilterVisiblePoints(points, mask);
+      vf.FilterOccludedPoints(objects, occluders, points, occlusion_algorithm);
+      for (const geometry::PointLike* p : points) {
+        ret.emplace_back(p, geometry::Distance(src_pos, p->Coordinate()));
+      }
+      points.clear();
+    }
+    if (last) {
+      break;
+    }
+    const int64_t num_found = std::count_if(
+        ret.cbegin() + begin, ret.cend(),
+        [bound](const std::pair<const geometry::PointLike*, float>& target) {
+          return target.second < bound;
+        });
+    if (num_found >= k) {
+      break;
     }
+    num_missing = k - num_found;
   }
-  if (n > k) {
-    ret.resize(k);
+  const auto first = ret.begin() + begin;
+  if (static_cast<int64_t>(ret.size()) - begin <= k) {
+    std::sort(first, ret.end(), RoadPointTargetLess);
+  } else {
+    utils::PartialSort(first, first + k, ret.end(), RoadPointTargetLess);
+    ret.resize(begin + k);
   }
-  return ret;
 }
 
 void ExtractObjectFeature(const Object& src, const Object& obj, float dis,
@@ -161,23 +250,35 @@ void ExtractObjectFeature(const Object& src, const Object& obj, float dis,
   feature[8 + obj_type] = 1.0f;
 }
 
-void ExtractRoadPointFeature(const Object& src, const RoadPoint& obj, float dis,
-                             float* feature) {
-  const float azimuth = geometry::utils::AngleSub(
-      (obj.position() - src.position()).Angle(), src.heading());
-  const int64_t road_type = static_cast<int64_t>(obj.road_type());
-  feature[0] = 1.0f;  // Valid
-  feature[1] = dis;
-  feature[2] = azimuth;
-  const geometry::Vector2D neighbor_vec =
-      obj.neighbor_position() - obj.position();
-  const float neighbor_dis = neighbor_vec.Norm();
-  const float neighbor_azimuth =
-      geometry::utils::AngleSub(neighbor_vec.Angle(), src.heading());
-  feature[3] = neighbor_dis;
-  feature[4] = neighbor_azimuth;
-  // One-hot vector for road_type, assume feature is initially 0.
-  feature[5 + road_type] = 1.0f;
+// Writes the features of the road points of `targets` to `features`, one row
+// of kRoadPointFeatureSize features per point, which must be initially 0. The
+// static attributes of the points are read from `table`, only their azimuths
+// depend on `src`.
+void ExtractRoadPointFeatures(
+    const Object& src, const RoadPointTable& table,
+    const std::vector<std::pair<const geometry::PointLike*, float>>& targets,
+    float* features) {
+  const geometry::Vector2D& src_pos = src.position();
+  const float src_heading = src.heading();
+  const float* x = table.x.data();
+  const float* y = table.y.data();
+  const float* neighbor_distance = table.neighbor_distance.data();
+  const float* neighbor_angle = table.neighbor_angle.data();
+  const RoadType* road_type = table.road_type.data();
+  for (const auto& [point, dis] : targets) {
+    // The points of the road point grid are all RoadPoints.
+    const int64_t index = static_cast<const RoadPoint*>(point)->index();
+    const geometry::Vector2D d =
+        geometry::Vector2D(x[index], y[index]) - src_pos;
+    features[0] = 1.0f;  // Valid
+    features[1] = dis;
+    features[2] = geometry::utils::AngleSub(d.Angle(), src_heading);
+    features[3] = neighbor_distance[index];
+    features[4] = geometry::utils::AngleSub(neighbor_angle[index], src_heading);
+    // One-hot vector for road_type, assume feature is initially 0.
+    features[5 + static_cast<int64_t>(road_type[index])] = 1.0f;
+    features += kRoadPointFeatureSize;
+  }
 }
 
 void ExtractTrafficLightFeature(const Object& src, const TrafficLight& obj,
@@ -203,52 +304,137 @@ void ExtractStopSignFeature(const Object& src, const StopSign& obj, float dis,
 
 }  // namespace
 
+std::array<float, kEgoFeatureSize> Scenario::EgoStateScales(
+    const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+        config) {
+  std::array<float, kEgoFeatureSize> scales;
+  for (int64_t i = 0; i < kEgoFeatureSize; ++i) {
+    scales[i] = std::get<float>(utils::FindWithDefault(
+        config, std::string("ego_state_max_") + kEgoFeatureNames[i], 1.0f));
+  }
+  return scales;
+}
+
+std::array<float, 4> Scenario::VisibleStateScales(
+    const std::unordered_map<std::string, std::variant<bool, int64_t, float>>&
+        config) {
+  std::array<float, kNumVisibleCategories> scales;
+  for (int64_t i = 0; i < kNumVisibleCategories; ++i) {
+    scales[i] = std::get<float>(utils::FindWithDefault(
+        config, std::string("visible_state_max_") + kVisibleCategories[i],
+        1.0f));
+  }
+  return scales;
+}
+
 void Scenario::LoadScenario(const std::string& scenario_path) {
-  std::ifstream data(scenario_path);
-  if (!data.is_open()) {
-    throw std::invalid_argument("Scenario file couldn't be opened: " +
-                                scenario_path);
-  }
-
-  json j;
-  data >> j;
-  name_ = j["name"];
-
-  LoadObjects(j["objects"]);
-  LoadRoads(j["roads"]);
-
-  // Now handle the traffic light states
-  for (const auto& tl : j["tl_states"]) {
-    // Lane positions don't move so we can just use the first
-    // element
-    float x_pos = float(tl["x"][0]);
-    float y_pos = float(tl["y"][0]);
-    std::vector<int64_t> validTimes;
-    std::vector<TrafficLightState> lightStates;
-
-    for (size_t i = 0; i < tl["state"].size(); i++) {
-      // TODO(ev) do this more compactly
-      const TrafficLightState light_state =
-          ParseTrafficLightState(tl["state"][i]);
-      lightStates.push_back(light_state);
-      validTimes.push_back(int(tl["time_index"][i]));
-    }
-    std::shared_ptr<TrafficLight> traffic_light =
-        std::make_shared<TrafficLight>(geometry::Vector2D(x_pos, y_pos),
-                                       validTimes, lightStates, current_time_);
-    traffic_lights_.push_back(traffic_light);
+  InitFromTemplate(GetScenarioTemplate(scenario_path, [&scenario_path]() {
+    return ReadScenarioFile(scenario_path);
+  }));
+}
+
+void Scenario::LoadScenario(const ScenarioPack& scenario_pack,
+                            const std::string& scenario_name) {
+  InitFromTemplate(
+      GetScenarioTemplate(scenario_pack.path() + ":" + scenario_name,
+                          [&scenario_pack, &scenario_name]() {
+                            return scenario_pack.LoadScene(scenario_name);
+                          }));
+}
+
+void Scenario::LoadScenario(const ScenarioData& scenario_data) {
+  InitFromTemplate(MakeScenarioTemplate(scenario_data));
+}
+
+std::shared_ptr<const ScenarioTemplate> Scenario::GetScenarioTemplate(
+    const std::string& source,
+    const std::function<ScenarioData()>& load_fn) const {
+  // The template depends on the config entries used by the loaders.
+  const std::string key = source + "|" + std::to_string(current_time_) + "|" +
+                          std::to_string(allow_non_vehicles_) + "|" +
+                          std::to_string(spawn_invalid_objects_) + "|" +
+                          std::to_string(sample_every_n_) + "|" +
+                          std::to_string(moving_threshold_) + "|" +
+                          std::to_string(speed_threshold_) + "|" +
+                          std::to_string(road_edge_grid_);
+  ScenarioTemplateCache& cache = ScenarioTemplateCache::Global();
+  std::shared_ptr<const ScenarioTemplate> scenario_template = cache.Get(key);
+  if (scenario_template == nullptr) {
+    scenario_template = MakeScenarioTemplate(load_fn());
+    cache.Put(key, scenario_template);
   }
+  return scenario_template;
+}
+
+std::shared_ptr<const ScenarioTemplate> Scenario::MakeScenarioTemplate(
+    const ScenarioData& scenario_data) const {
+  std::shared_ptr<ScenarioTemplate> scenario_template =
+      std::make_shared<ScenarioTemplate>();
+  scenario_template->name = scenario_data.name;
+
+  LoadObjects(scenario_data, scenario_template.get());
+  LoadRoads(scenario_data, scenario_template.get());
+  LoadTrafficLights(scenario_data, scenario_template.get());
 
   std::vector<const RoadPoint*> road_points;
-  for (const auto& road_line : road_lines_) {
+  for (const auto& road_line : scenario_template->road_lines) {
     for (const auto& road_point : road_line->road_points()) {
       road_points.push_back(&road_point);
     }
   }
-  road_point_tree_.Reset(road_points);
+  scenario_template->road_point_grid.Reset(road_points, kRoadPointCellSize);
+
+  return scenario_template;
+}
+
+void Scenario::InitFromTemplate(
+    std::shared_ptr<const ScenarioTemplate> scenario_template) {
+  scenario_template_ = std::move(scenario_template);
+
+  // Objects handed out by a previous initialization keep the previous store.
+  object_state_store_ = std::make_shared<ObjectStateStore>();
+  object_state_store_->Reserve(scenario_template_->objects.size());
+  all_objects_.clear();
+  all_objects_.reserve(scenario_template_->objects.size());
+  object_slots_.assign(scenario_template_->expert_trajectories.size(), -1);
+  edge_collisions_.assign(scenario_template_->objects.size(), EdgeCollision());
+  collision_subset_.clear();
+  for (const ObjectTemplate& obj : scenario_template_->objects) {
+    object_slots_[obj.id] = all_objects_.size();
+    std::shared_ptr<Object> object;
+    if (obj.type == ObjectType::kVehicle) {
+      object = std::make_shared<Vehicle>(
+          obj.id, obj.length, obj.width, obj.position, obj.heading, obj.speed,
+          obj.target_position, obj.target_heading, obj.target_speed, obj.is_av,
+          /*can_block_sight=*/true, /*can_be_collided=*/true,
+          /*check_collision=*/true, object_state_store_);
+    } else if (obj.type == ObjectType::kPedestrian) {
+      object = std::make_shared<Pedestrian>(
+          obj.id, obj.length, obj.width, obj.position, obj.heading, obj.speed,
+          obj.target_position, obj.target_heading, obj.target_speed,
+          /*can_block_sight=*/true, /*can_be_collided=*/true,
+          /*check_collision=*/true, object_state_store_);
+    } else {
+      object = std::make_shared<Cyclist>(
+          obj.id, obj.length, obj.width, obj.position, obj.heading, obj.speed,
+          obj.target_position, obj.target_heading, obj.target_speed,
+          /*can_block_sight=*/true, /*can_be_collided=*/true,
+          /*check_collision=*/true, object_state_store_);
+    }
+    all_objects_.push_back(std::move(object));
+  }
+  ResetObjectLists();
+
+  // Traffic light states depend on the current time, so every scenario owns
+  // its traffic lights.
+  traffic_lights_.clear();
+  traffic_lights_.reserve(scenario_template_->traffic_lights.size());
+  for (const auto& traffic_light : scenario_template_->traffic_lights) {
+    traffic_lights_.push_back(std::make_shared<TrafficLight>(*traffic_light));
+  }
 
   std::vector<const geometry::AABBInterface*> static_objects;
-  for (const auto& obj : stop_signs_) {
+  for (const auto& obj : scenario_template_->stop_signs) {
     static_objects.push_back(
         dynamic_cast<const geometry::AABBInterface*>(obj.get()));
   }
@@ -262,21 +448,67 @@ void Scenario::LoadScenario(const std::string& scenario_path) {
   UpdateCollision();
 }
 
+void Scenario::ResetObjectLists() {
+  vehicles_.clear();
+  pedestrians_.clear();
+  cyclists_.clear();
+  objects_.clear();
+  moving_objects_.clear();
+  const int64_t num_objects = all_objects_.size();
+  for (int64_t i = 0; i < num_objects; ++i) {
+    if (object_state_store_->flags[i] & ObjectStateStore::kRemoved) {
+      continue;
+    }
+    const std::shared_ptr<Object>& object = all_objects_[i];
+    if (object->Type() == ObjectType::kVehicle) {
+      vehicles_.push_back(std::static_pointer_cast<Vehicle>(object));
+    } else if (object->Type() == ObjectType::kPedestrian) {
+      pedestrians_.push_back(std::static_pointer_cast<Pedestrian>(object));
+    } else {
+      cyclists_.push_back(std::static_pointer_cast<Cyclist>(object));
+    }
+    objects_.push_back(object);
+    if (scenario_template_->objects[i].is_moving) {
+      moving_objects_.push_back(object);
+    }
+  }
+  has_removed_objects_ = false;
+  ResetObjectBVH();
+}
+
+void Scenario::CompactObjectLists() const {
+  if (!has_removed_objects_) {
+    return;
+  }
+  EraseRemovedObjects(*object_state_store_, objects_);
+  EraseRemovedObjects(*object_state_store_, vehicles_);
+  EraseRemovedObjects(*object_state_store_, pedestrians_);
+  EraseRemovedObjects(*object_state_store_, cyclists_);
+  EraseRemovedObjects(*object_state_store_, moving_objects_);
+  has_removed_objects_ = false;
+}
+
 void Scenario::Step(float dt) {
   current_time_ += static_cast<int>(dt / 0.1);  // TODO(ev) hardcoding
-  for (auto& object : objects_) {
+  for (auto& object : objects()) {
     // reset the collision flags for the objects before stepping
     // we do not want to label a vehicle as persistently having collided
     object->ResetCollision();
-    if (!object->expert_control()) {
-      object->Step(dt);
-    } else {
-      const int64_t obj_id = object->id();
-      object->set_position(expert_trajectories_.at(obj_id).at(current_time_));
-      object->set_heading(expert_headings_.at(obj_id).at(current_time_));
-      object->set_speed(expert_speeds_.at(obj_id).at(current_time_));
+    if (object->manual_control() && !object->expert_control()) {
+      object->SetActionFromKeyboard();
     }
   }
+  // All the objects are stepped at once on the arrays of the state store.
+  thread_pool_->ParallelFor(
+      object_state_store_->size(),
+      [this, dt](int64_t /*chunk*/, int64_t begin, int64_t end) {
+        object_state_store_->KinematicBicycleStep(dt, begin, end);
+        object_state_store_->ExpertStep(
+            current_time_, scenario_template_->expert_trajectories,
+            scenario_template_->expert_headings,
+            scenario_template_->expert_speeds, begin, end);
+      },
+      kMinDynamicsChunkSize);
   for (auto& object : traffic_lights_) {
     object->set_current_time(current_time_);
   }
@@ -285,65 +517,322 @@ void Scenario::Step(float dt) {
   // expert_headings_.at(22).at(current_time_) << std::endl;
 
   // update the vehicle bvh
-  object_bvh_.Reset(objects_);
+  UpdateObjectBVH();
   UpdateCollision();
 }
 
-void Scenario::UpdateCollision() {
-  // check vehicle-vehicle collisions
-  for (auto& obj1 : objects_) {
-    std::vector<const Object*> candidates =
-        object_bvh_.IntersectionCandidates<Object>(*obj1);
-    for (const auto* obj2 : candidates) {
-      if (obj1->id() == obj2->id()) {
-        continue;
-      }
-      if (!obj1->can_be_collided() || !obj2->can_be_collided()) {
+std::vector<int64_t> Scenario::StepN(
+    int64_t num_steps, float dt,
+    const std::optional<GoalTolerance>& goal_tolerance) {
+  if (num_steps < 1) {
+    throw std::invalid_argument("The number of steps must be positive, got " +
+                                std::to_string(num_steps) + ".");
+  }
+  const int64_t num_objects = all_objects_.size();
+  std::vector<uint8_t> collided(num_objects, 0);
+  std::vector<CollisionType> collision_types(num_objects,
+                                             CollisionType::kNotCollided);
+  std::vector<uint8_t> goal_reached(num_objects, 0);
+  for (int64_t step = 0; step < num_steps; ++step) {
+    Step(dt);
+    for (int64_t i = 0; i < num_objects; ++i) {
+      if (object_state_store_->flags[i] & ObjectStateStore::kRemoved) {
         continue;
       }
-      if (!obj1->check_collision() && !obj2->check_collision()) {
-        continue;
+      const Object& object = *all_objects_[i];
+      if (object.collided() && !collided[i]) {
+        collided[i] = 1;
+        collision_types[i] = object.collision_type();
       }
-      if (geometry::Intersects(obj1->BoundingPolygon(),
-                               obj2->BoundingPolygon())) {
-        obj1->set_collided(true);
-        obj1->set_collision_type(CollisionType::kVehicleVehicleCollision);
-        const_cast<Object*>(obj2)->set_collided(true);
+      if (goal_tolerance.has_value() && !goal_reached[i]) {
+        goal_reached[i] =
+            (object.target_position() - object.position()).Norm() <
+                goal_tolerance->position &&
+            std::fabs(object.speed() - object.target_speed()) <
+                goal_tolerance->speed &&
+            std::fabs(geometry::utils::AngleSub(object.heading(),
+                                                object.target_heading())) <
+                goal_tolerance->heading;
       }
     }
   }
-  // check vehicle-lane segment collisions
-  for (auto& obj : objects_) {
-    std::vector<const geometry::LineSegment*> candidates =
-        line_segment_bvh_.IntersectionCandidates<geometry::LineSegment>(*obj);
-    for (const auto* seg : candidates) {
-      if (geometry::Intersects(obj->BoundingPolygon(), *seg)) {
-        obj->set_collision_type(CollisionType::kVehicleRoadEdgeCollision);
-        obj->set_collided(true);
-      }
+
+  std::vector<int64_t> goal_ids;
+  for (int64_t i = 0; i < num_objects; ++i) {
+    if (collided[i]) {
+      all_objects_[i]->set_collided(true);
+      all_objects_[i]->set_collision_type(collision_types[i]);
+    }
+    if (goal_reached[i]) {
+      goal_ids.push_back(all_objects_[i]->id());
+    }
+  }
+  return goal_ids;
+}
+
+void Scenario::set_current_time(int64_t current_time) {
+  current_time_ = current_time;
+  for (auto& object : traffic_lights_) {
+    object->set_current_time(current_time_);
+  }
+}
+
+void Scenario::RefreshObjects() {
+  for (auto& object : objects()) {
+    object->ResetCollision();
+  }
+  UpdateObjectBVH();
+  UpdateCollision();
+}
+
+ScenarioSnapshot Scenario::Snapshot() const {
+  ScenarioSnapshot snapshot;
+  snapshot.scenario_template = scenario_template_;
+  snapshot.current_time = current_time_;
+  snapshot.object_states = *object_state_store_;
+  const int64_t num_objects = all_objects_.size();
+  snapshot.head_angles.reserve(num_objects);
+  snapshot.target_positions.reserve(num_objects);
+  snapshot.target_headings.reserve(num_objects);
+  snapshot.target_speeds.reserve(num_objects);
+  snapshot.collided.reserve(num_objects);
+  snapshot.collision_types.reserve(num_objects);
+  for (const auto& object : all_objects_) {
+    snapshot.head_angles.push_back(object->head_angle());
+    snapshot.target_positions.push_back(object->target_position());
+    snapshot.target_headings.push_back(object->target_heading());
+    snapshot.target_speeds.push_back(object->target_speed());
+    snapshot.collided.push_back(object->collided());
+    snapshot.collision_types.push_back(object->collision_type());
+  }
+  return snapshot;
+}
+
+void Scenario::Restore(const ScenarioSnapshot& snapshot) {
+  if (snapshot.scenario_template != scenario_template_ ||
+      snapshot.object_states.size() != object_state_store_->size()) {
+    throw std::invalid_argument(
+        "The snapshot was not taken on a scenario of the same scene.");
+  }
+  // Objects are views into the store, copying the arrays moves them all.
+  *object_state_store_ = snapshot.object_states;
+  const int64_t num_objects = all_objects_.size();
+  for (int64_t i = 0; i < num_objects; ++i) {
+    Object& object = *all_objects_[i];
+    object.set_head_angle(snapshot.head_angles[i]);
+    object.set_target_position(snapshot.target_positions[i]);
+    object.set_target_heading(snapshot.target_headings[i]);
+    object.set_target_speed(snapshot.target_speeds[i]);
+    object.set_collided(snapshot.collided[i]);
+    object.set_collision_type(snapshot.collision_types[i]);
+  }
+  ResetObjectLists();
+  set_current_time(snapshot.current_time);
+}
+
+std::unique_ptr<Scenario> Scenario::Clone() const {
+  std::unique_ptr<Scenario> scenario(new Scenario(*this));
+  scenario->InitFromTemplate(scenario_template_);
+  scenario->collision_subset_ = collision_subset_;
+  scenario->Restore(Snapshot());
+  return scenario;
+}
+
+Object* Scenario::FindObject(int64_t id) const {
+  if (id < 0 || id >= static_cast<int64_t>(object_slots_.size()) ||
+      object_slots_[id] < 0) {
+    return nullptr;
+  }
+  const int64_t slot = object_slots_[id];
+  if (object_state_store_->flags[slot] & ObjectStateStore::kRemoved) {
+    return nullptr;
+  }
+  return all_objects_[slot].get();
+}
+
+void Scenario::UpdateObjectBVH() {
+  if (object_bvh_.Refit() > kMaxObjectBVHCostRatio) {
+    ResetObjectBVH();
+  }
+}
+
+void Scenario::ResetObjectBVH() {
+  const std::vector<std::shared_ptr<Object>>& cur_objects = objects();
+  object_bvh_.Reset(cur_objects);
+  object_bvh_indices_.assign(all_objects_.size(), -1);
+  const int64_t num_objects = cur_objects.size();
+  for (int64_t i = 0; i < num_objects; ++i) {
+    object_bvh_indices_[cur_objects[i]->state_index()] = i;
+  }
+}
+
+void Scenario::SetCollisionSubset(int64_t num_ids, const int64_t* ids) {
+  collision_subset_.assign(all_objects_.size(), 0);
+  for (int64_t i = 0; i < num_ids; ++i) {
+    if (ids[i] >= 0 && ids[i] < static_cast<int64_t>(object_slots_.size()) &&
+        object_slots_[ids[i]] >= 0) {
+      collision_subset_[object_slots_[ids[i]]] = 1;
     }
   }
 }
 
+void Scenario::UpdateCollision() {
+  const int64_t num_objects = objects().size();
+  // Bounding polygons are computed at most once per object. Each phase below
+  // only computes the polygons of the objects it is iterating over, so that
+  // the threads never write to the same slot.
+  std::vector<geometry::ConvexPolygon> polygons(all_objects_.size());
+  std::vector<uint8_t> has_polygon(all_objects_.size(), 0);
+  const auto bounding_polygon =
+      [&polygons,
+       &has_polygon](const Object& obj) -> const geometry::ConvexPolygon& {
+    const int64_t index = obj.state_index();
+    if (!has_polygon[index]) {
+      polygons[index] = obj.BoundingPolygon();
+      has_polygon[index] = 1;
+    }
+    return polygons[index];
+  };
+
+  // check vehicle-vehicle collisions
+  // Candidate pairs are gathered per chunk and concatenated in chunk order,
+  // which does not depend on the scheduling of the threads.
+  std::vector<std::vector<std::pair<const Object*, const Object*>>> chunk_pairs(
+      thread_pool_->NumChunks(num_objects, kMinCollisionChunkSize));
+  thread_pool_->ParallelFor(
+      num_objects,
+      [this, &bounding_polygon, &chunk_pairs](int64_t chunk, int64_t begin,
+                                              int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          const Object* obj1 = objects_[i].get();
+          if (!obj1->can_be_collided() || !ChecksCollision(*obj1)) {
+            continue;
+          }
+          const std::vector<const Object*> candidates =
+              object_bvh_.IntersectionCandidates<Object>(
+                  bounding_polygon(*obj1));
+          for (const Object* obj2 : candidates) {
+            if (obj2 == obj1 || !obj2->can_be_collided()) {
+              continue;
+            }
+            // Pairs of objects that both check collisions are tested from the
+            // object with the lowest index.
+            if (ChecksCollision(*obj2) &&
+                obj2->state_index() < obj1->state_index()) {
+              continue;
+            }
+            chunk_pairs[chunk].emplace_back(obj1, obj2);
+          }
+        }
+      },
+      kMinCollisionChunkSize);
+  std::vector<std::pair<const Object*, const Object*>> pairs;
+  for (const auto& cur : chunk_pairs) {
+    pairs.insert(pairs.end(), cur.cbegin(), cur.cend());
+  }
+  // Candidates that do not check collisions were not visited above.
+  for (const auto& [obj1, obj2] : pairs) {
+    bounding_polygon(*obj2);
+  }
+  std::vector<uint8_t> pair_collided(pairs.size(), 0);
+  thread_pool_->ParallelFor(
+      pairs.size(),
+      [&polygons, &pairs, &pair_collided](int64_t /*chunk*/, int64_t begin,
+                                          int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          const auto& [obj1, obj2] = pairs[i];
+          pair_collided[i] = geometry::Intersects(
+              polygons[obj1->state_index()], polygons[obj2->state_index()]);
+        }
+      },
+      kMinCollisionChunkSize);
+  for (int64_t i = 0; i < static_cast<int64_t>(pairs.size()); ++i) {
+    if (!pair_collided[i]) {
+      continue;
+    }
+    for (const Object* obj : {pairs[i].first, pairs[i].second}) {
+      Object* obj_ptr = const_cast<Object*>(obj);
+      obj_ptr->set_collided(true);
+      obj_ptr->set_collision_type(CollisionType::kVehicleVehicleCollision);
+    }
+  }
+
+  // check vehicle-lane segment collisions
+  thread_pool_->ParallelFor(
+      num_objects,
+      [this, &bounding_polygon](int64_t /*chunk*/, int64_t begin, int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          Object* obj = objects_[i].get();
+          const int64_t index = obj->state_index();
+          if (!collision_subset_.empty() && !collision_subset_[index]) {
+            continue;
+          }
+          EdgeCollision& edge_collision = edge_collisions_[index];
+          const geometry::Vector2D position = obj->position();
+          const float heading = obj->heading();
+          if (edge_collision.collided < 0 ||
+              !(edge_collision.position == position) ||
+              edge_collision.heading != heading) {
+            const geometry::ConvexPolygon& polygon = bounding_polygon(*obj);
+            const std::vector<const geometry::LineSegment*> candidates =
+                road_edge_grid_
+                    ? scenario_template_->line_segment_grid
+                          .IntersectionCandidates<geometry::LineSegment>(
+                              polygon)
+                    : scenario_template_->line_segment_bvh
+                          .IntersectionCandidates<geometry::LineSegment>(
+                              polygon);
+            edge_collision.position = position;
+            edge_collision.heading = heading;
+            edge_collision.collided =
+                std::any_of(candidates.cbegin(), candidates.cend(),
+                            [&polygon](const geometry::LineSegment* seg) {
+                              return geometry::Intersects(polygon, *seg);
+                            });
+          }
+          if (edge_collision.collided) {
+            obj->set_collision_type(CollisionType::kVehicleRoadEdgeCollision);
+            obj->set_collided(true);
+          }
+        }
+      },
+      kMinCollisionChunkSize);
+}
+
 std::tuple<std::vector<const ObjectBase*>,
-           std::vector<const geometry::PointLike*>,
+           std::vector<std::pair<const geometry::PointLike*, float>>,
            std::vector<const ObjectBase*>, std::vector<const ObjectBase*>>
 Scenario::VisibleObjects(const Object& src, float view_dist, float view_angle,
                          float head_angle) const {
+  std::vector<const ObjectBase*> objects;
+  std::vector<std::pair<const geometry::PointLike*, float>> road_points;
+  std::vector<const ObjectBase*> traffic_lights;
+  std::vector<const ObjectBase*> stop_signs;
+  VisibleObjects(src, view_dist, view_angle, head_angle,
+                 /*occlusion_cache=*/nullptr, objects, road_points,
+                 traffic_lights, stop_signs);
+  return std::make_tuple(std::move(objects), std::move(road_points),
+                         std::move(traffic_lights), std::move(stop_signs));
+}
+
+void Scenario::VisibleObjects(
+    const Object& src, float view_dist, float view_angle, float head_angle,
+    const OcclusionCache* occlusion_cache,
+    std::vector<const ObjectBase*>& objects,
+    std::vector<std::pair<const geometry::PointLike*, float>>& road_points,
+    std::vector<const ObjectBase*>& traffic_lights,
+    std::vector<const ObjectBase*>& stop_signs) const {
+  ObservationScratch& scratch = ThreadObservationScratch();
   const float heading = geometry::utils::AngleAdd(src.heading(), head_angle);
   const geometry::Vector2D& position = src.position();
   const ViewField vf(position, view_dist, heading, view_angle);
 
-  std::vector<const ObjectBase*> objects =
-      VisibleCandidates(object_bvh_, src, vf);
-  std::vector<const geometry::PointLike*> road_points =
-      road_point_tree_.RangeSearch<geometry::PointLike>(vf);
-  const std::vector<const ObjectBase*> static_candidates =
-      VisibleCandidates(static_bvh_, src, vf);
+  VisibleCandidates(object_bvh_, src, vf, objects);
+  VisibleCandidates(static_bvh_, src, vf, scratch.static_candidates);
 
-  std::vector<const ObjectBase*> traffic_lights;
-  std::vector<const ObjectBase*> stop_signs;
-  for (const ObjectBase* obj : static_candidates) {
+  traffic_lights.clear();
+  stop_signs.clear();
+  for (const ObjectBase* obj : scratch.static_candidates) {
     const StaticObject* obj_ptr = dynamic_cast<const StaticObject*>(obj);
     if (obj_ptr->Type() == StaticObjectType::kTrafficLight) {
       traffic_lights.push_back(dynamic_cast<const ObjectBase*>(obj));
@@ -352,13 +841,53 @@ Scenario::VisibleObjects(const Object& src, float view_dist, float view_angle,
     }
   }
 
-  vf.FilterVisibleObjects(objects);
-  vf.FilterVisiblePoints(road_points);
-  VisibleRoadPoints(src, objects, road_points);
+  std::vector<const Occluder*>& occluders = scratch.occluders;
+  occluders.clear();
+  if (occlusion_cache != nullptr) {
+    for (const ObjectBase* obj : objects) {
+      occluders.push_back(
+          &occlusion_cache->occluder(*dynamic_cast<const Object*>(obj)));
+    }
+  } else {
+    std::vector<Occluder>& local_occluders = scratch.local_occluders;
+    local_occluders.resize(objects.size());
+    for (size_t i = 0; i < objects.size(); ++i) {
+      local_occluders[i] = Occluder(*objects[i]);
+      occluders.push_back(&local_occluders[i]);
+    }
+  }
+
+  vf.FilterVisibleObjects(objects, occluders, occlusion_algorithm_);
+  NearestVisibleRoadPoints(src, vf, view_dist, objects, occluders, road_points);
   vf.FilterVisibleNonblockingObjects(traffic_lights);
   vf.FilterVisibleNonblockingObjects(stop_signs);
+}
 
-  return std::make_tuple(objects, road_points, traffic_lights, stop_signs);
+void Scenario::NearestVisibleRoadPoints(
+    const Object& src, const ViewField& vf, float view_dist,
+    const std::vector<const ObjectBase*>& objects,
+    const std::vector<const Occluder*>& occluders,
+    std::vector<std::pair<const geometry::PointLike*, float>>& ret) const {
+  ObservationScratch& scratch = ThreadObservationScratch();
+  const geometry::PointGrid& grid = scenario_template_->road_point_grid;
+  ret.clear();
+  if (!road_edge_first_) {
+    AppendNearestVisibleRoadPoints(
+        src, grid, vf, view_dist, objects, occluders, occlusion_algorithm_,
+        max_visible_road_points_, [](const RoadPoint&) { return true; },
+        scratch.road_points, scratch.mask, ret);
+    return;
+  }
+  AppendNearestVisibleRoadPoints(
+      src, grid, vf, view_dist, objects, occluders, occlusion_algorithm_,
+      max_visible_road_points_,
+      [](const RoadPoint& p) { return p.road_type() == RoadType::kRoadEdge; },
+      scratch.road_points, scratch.mask, ret);
+  AppendNearestVisibleRoadPoints(
+      src, grid, vf, view_dist, objects, occluders, occlusion_algorithm_,
+      max_visible_road_points_ - static_cast<int64_t>(ret.size()),
+      [](const RoadPoint& p) { return p.road_type() != RoadType::kRoadEdge; },
+      scratch.road_points, scratch.mask, ret);
 }
 
 std::vector<const TrafficLight*> Scenario::VisibleTrafficLights(
@@ -388,7 +917,11 @@ std::vector<const TrafficLight*> Scenario::VisibleTrafficLights(
 
 NdArray<float> Scenario::EgoState(const Object& src) const {
   NdArray<float> state({kEgoFeatureSize}, 0.0f);
+  EgoState(src, state.DataPtr());
+  return state;
+}
 
+void Scenario::EgoState(const Object& src, float* state) const {
   const float src_heading = src.heading();
   const geometry::Vector2D d = src.target_position() - src.position();
   const float target_dist = d.Norm();
@@ -398,29 +931,29 @@ NdArray<float> Scenario::EgoState(const Object& src) const {
       geometry::utils::AngleSub(src.target_heading(), src_heading);
   const float target_speed = src.target_speed() - src.speed();
 
-  float* state_data = state.DataPtr();
-  state_data[0] = src.length();
-  state_data[1] = src.width();
-  state_data[2] = src.speed();
-  state_data[3] = target_dist;
-  state_data[4] = target_azimuth;
-  state_data[5] = target_heading;
-  state_data[6] = target_speed;
-  state_data[7] = src.acceleration();
-  state_data[8] = src.steering();
-  state_data[9] = src.head_angle();
-
-  return state;
+  state[0] = src.length();
+  state[1] = src.width();
+  state[2] = src.speed();
+  state[3] = target_dist;
+  state[4] = target_azimuth;
+  state[5] = target_heading;
+  state[6] = target_speed;
+  state[7] = src.acceleration();
+  state[8] = src.steering();
+  state[9] = src.head_angle();
+  if (normalize_state_) {
+    for (int64_t i = 0; i < kEgoFeatureSize; ++i) {
+      state[i] /= ego_state_scales_[i];
+    }
+  }
 }
 
 std::unordered_map<std::string, NdArray<float>> Scenario::VisibleState(
     const Object& src, float view_dist, float view_angle, float head_angle,
     bool padding) const {
-  const auto [objects, road_points, traffic_lights, stop_signs] =
+  const auto [objects, r_targets, traffic_lights, stop_signs] =
       VisibleObjects(src, view_dist, view_angle, head_angle);
   const auto o_targets = NearestK(src, objects, max_visible_objects_);
-  const auto r_targets = NearestKRoadPoints(
-      src, road_points, max_visible_road_points_, road_edge_first_);
   const auto t_targets =
       NearestK(src, traffic_lights, max_visible_traffic_lights_);
   const auto s_targets = NearestK(src, stop_signs, max_visible_stop_signs_);
@@ -452,12 +985,8 @@ std::unordered_map<std::string, NdArray<float>> Scenario::VisibleState(
   }
 
   // RoadPoint feature.
-  float* r_feature_ptr = r_feature.DataPtr();
-  for (const auto [obj, dis] : r_targets) {
-    ExtractRoadPointFeature(src, *(dynamic_cast<const RoadPoint*>(obj)), dis,
-                            r_feature_ptr);
-    r_feature_ptr += kRoadPointFeatureSize;
-  }
+  ExtractRoadPointFeatures(src, scenario_template_->road_point_table, r_targets,
+                           r_feature.DataPtr());
 
   // TrafficLight feature.
   float* t_feature_ptr = t_feature.DataPtr();
@@ -475,6 +1004,17 @@ std::unordered_map<std::string, NdArray<float>> Scenario::VisibleState(
     s_feature_ptr += kStopSignsFeatureSize;
   }
 
+  if (normalize_state_) {
+    ScaleFeatures(visible_state_scales_[0], o_feature.size(),
+                  o_feature.DataPtr());
+    ScaleFeatures(visible_state_scales_[1], r_feature.size(),
+                  r_feature.DataPtr());
+    ScaleFeatures(visible_state_scales_[2], t_feature.size(),
+                  t_feature.DataPtr());
+    ScaleFeatures(visible_state_scales_[3], s_feature.size(),
+                  s_feature.DataPtr());
+  }
+
   return {{"objects", o_feature},
           {"road_points", r_feature},
           {"traffic_lights", t_feature},
@@ -485,6 +1025,23 @@ NdArray<float> Scenario::FlattenedVisibleState(const Object& src,
                                                float view_dist,
                                                float view_angle,
                                                float head_angle) const {
+  NdArray<float> state({FlattenedVisibleStateSize()}, 0.0f);
+  FlattenedVisibleState(src, view_dist, view_angle, head_angle,
+                        state.DataPtr());
+  return state;
+}
+
+void Scenario::FlattenedVisibleState(const Object& src, float view_dist,
+                                     float view_angle, float head_angle,
+                                     float* state) const {
+  FlattenedVisibleState(src, view_dist, view_angle, head_angle,
+                        /*occlusion_cache=*/nullptr, state);
+}
+
+void Scenario::FlattenedVisibleState(const Object& src, float view_dist,
+                                     float view_angle, float head_angle,
+                                     const OcclusionCache* occlusion_cache,
+                                     float* state) const {
   const int64_t kObjectFeatureStride = 0;
   const int64_t kRoadPointFeatureStride =
       kObjectFeatureStride + max_visible_objects_ * kObjectFeatureSize;
@@ -494,63 +1051,214 @@ NdArray<float> Scenario::FlattenedVisibleState(const Object& src,
   const int64_t kStopSignFeatureStride =
       kTrafficLightFeatureStride +
       max_visible_traffic_lights_ * kTrafficLightFeatureSize;
-  const int64_t kFeatureSize =
-      kStopSignFeatureStride + max_visible_stop_signs_ * kStopSignsFeatureSize;
-
-  const auto [objects, road_points, traffic_lights, stop_signs] =
-      VisibleObjects(src, view_dist, view_angle, head_angle);
 
-  const auto o_targets = NearestK(src, objects, max_visible_objects_);
-  const auto r_targets = NearestKRoadPoints(
-      src, road_points, max_visible_road_points_, road_edge_first_);
-  const auto t_targets =
-      NearestK(src, traffic_lights, max_visible_traffic_lights_);
-  const auto s_targets = NearestK(src, stop_signs, max_visible_stop_signs_);
+  // The feature extractors assume that the features are initially 0.
+  std::fill(state, state + FlattenedVisibleStateSize(), 0.0f);
+  VisibleFeatures(src, view_dist, view_angle, head_angle, occlusion_cache,
+                  state + kObjectFeatureStride, state + kRoadPointFeatureStride,
+                  state + kTrafficLightFeatureStride,
+                  state + kStopSignFeatureStride);
+}
 
-  NdArray<float> state({kFeatureSize}, 0.0f);
+std::array<int64_t, 4> Scenario::VisibleFeatures(
+    const Object& src, float view_dist, float view_angle, float head_angle,
+    const OcclusionCache* occlusion_cache, float* object_features,
+    float* road_point_features, float* traffic_light_features,
+    float* stop_sign_features) const {
+  ObservationScratch& scratch = ThreadObservationScratch();
+  VisibleObjects(src, view_dist, view_angle, head_angle, occlusion_cache,
+                 scratch.objects, scratch.road_point_targets,
+                 scratch.traffic_lights, scratch.stop_signs);
+
+  NearestK(src, scratch.objects, max_visible_objects_, scratch.object_targets);
+  NearestK(src, scratch.traffic_lights, max_visible_traffic_lights_,
+           scratch.traffic_light_targets);
+  NearestK(src, scratch.stop_signs, max_visible_stop_signs_,
+           scratch.stop_sign_targets);
 
   // Object feature.
-  float* o_feature_ptr = state.DataPtr() + kObjectFeatureStride;
-  for (const auto [obj, dis] : o_targets) {
+  float* o_feature_ptr = object_features;
+  for (const auto& [obj, dis] : scratch.object_targets) {
     ExtractObjectFeature(src, *(dynamic_cast<const Object*>(obj)), dis,
                          o_feature_ptr);
     o_feature_ptr += kObjectFeatureSize;
   }
 
   // RoadPoint feature.
-  float* r_feature_ptr = state.DataPtr() + kRoadPointFeatureStride;
-  for (const auto [obj, dis] : r_targets) {
-    ExtractRoadPointFeature(src, *(dynamic_cast<const RoadPoint*>(obj)), dis,
-                            r_feature_ptr);
-    r_feature_ptr += kRoadPointFeatureSize;
-  }
+  ExtractRoadPointFeatures(src, scenario_template_->road_point_table,
+                           scratch.road_point_targets, road_point_features);
 
   // TrafficLight feature.
-  float* t_feature_ptr = state.DataPtr() + kTrafficLightFeatureStride;
-  for (const auto [obj, dis] : t_targets) {
+  float* t_feature_ptr = traffic_light_features;
+  for (const auto& [obj, dis] : scratch.traffic_light_targets) {
     ExtractTrafficLightFeature(src, *(dynamic_cast<const TrafficLight*>(obj)),
                                dis, t_feature_ptr);
     t_feature_ptr += kTrafficLightFeatureSize;
   }
 
   // StopSign feature.
-  float* s_feature_ptr = state.DataPtr() + kStopSignFeatureStride;
-  for (const auto [obj, dis] : s_targets) {
+  float* s_feature_ptr = stop_sign_features;
+  for (const auto& [obj, dis] : scratch.stop_sign_targets) {
     ExtractStopSignFeature(src, *(dynamic_cast<const StopSign*>(obj)), dis,
                            s_feature_ptr);
     s_feature_ptr += kStopSignsFeatureSize;
   }
 
-  return state;
+  const std::array<int64_t, kNumVisibleCategories> counts = {
+      static_cast<int64_t>(scratch.object_targets.size()),
+      static_cast<int64_t>(scratch.road_point_targets.size()),
+      static_cast<int64_t>(scratch.traffic_light_targets.size()),
+      static_cast<int64_t>(scratch.stop_sign_targets.size())};
+  // The padding stays 0.
+  if (normalize_state_) {
+    const std::array<float*, kNumVisibleCategories> features = {
+        object_features, road_point_features, traffic_light_features,
+        stop_sign_features};
+    for (int64_t i = 0; i < kNumVisibleCategories; ++i) {
+      ScaleFeatures(visible_state_scales_[i],
+                    counts[i] * kVisibleFeatureSizes[i], features[i]);
+    }
+  }
+  return counts;
+}
+
+NdArray<float> Scenario::Observations(const std::vector<const Object*>& objects,
+                                      float view_dist, float view_angle,
+                                      float head_angle, bool ego_state,
+                                      bool visible_state) const {
+  const int64_t num_objects = objects.size();
+  NdArray<float> observations(
+      {num_objects, ObservationSize(ego_state, visible_state)}, 0.0f);
+  Observations(objects, view_dist, view_angle, head_angle, ego_state,
+               visible_state, observations.DataPtr());
+  return observations;
+}
+
+void Scenario::Observations(const std::vector<const Object*>& objects,
+                            float view_dist, float view_angle, float head_angle,
+                            bool ego_state, bool visible_state,
+                            float* observations) const {
+  const int64_t observation_size = ObservationSize(ego_state, visible_state);
+  // The occluders are shared by all the rows.
+  OcclusionCache& occlusion_cache = ThreadOcclusionCache();
+  if (visible_state) {
+    occlusion_cache.Reset(this->objects(), all_objects_.size());
+  }
+  thread_pool_->ParallelFor(
+      objects.size(), [&](int64_t /*chunk*/, int64_t begin, int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          float* row = observations + i * observation_size;
+          if (objects[i] == nullptr) {
+            std::fill(row, row + observation_size,
+                      std::numeric_limits<float>::quiet_NaN());
+            continue;
+          }
+          if (ego_state) {
+            EgoState(*objects[i], row);
+            row += kEgoFeatureSize;
+          }
+          if (visible_state) {
+            FlattenedVisibleState(*objects[i], view_dist, view_angle,
+                                  head_angle, &occlusion_cache, row);
+          }
+        }
+      });
+}
+
+RaggedObservationBatch Scenario::RaggedObservations(
+    const std::vector<const Object*>& objects, float view_dist,
+    float view_angle, float head_angle, bool ego_state,
+    bool visible_state) const {
+  const int64_t n = objects.size();
+  const std::array<int64_t, kNumVisibleCategories> max_visible = {
+      max_visible_objects_, max_visible_road_points_,
+      max_visible_traffic_lights_, max_visible_stop_signs_};
+
+  RaggedObservationBatch batch;
+  if (ego_state) {
+    batch.ego_state = NdArray<float>({n, kEgoFeatureSize}, 0.0f);
+  }
+  // The occluders are shared by all the rows.
+  OcclusionCache& occlusion_cache = ThreadOcclusionCache();
+  if (visible_state) {
+    occlusion_cache.Reset(this->objects(), all_objects_.size());
+  }
+  // The features of the rows of each chunk are gathered per chunk, then
+  // concatenated in the order of the chunks.
+  using ChunkFeatures = std::array<std::vector<float>, kNumVisibleCategories>;
+  std::vector<ChunkFeatures> chunk_features(thread_pool_->NumChunks(n));
+  std::vector<std::array<int64_t, kNumVisibleCategories>> counts(n);
+  thread_pool_->ParallelFor(n, [&](int64_t chunk, int64_t begin, int64_t end) {
+    ChunkFeatures& features = chunk_features[chunk];
+    for (int64_t i = begin; i < end; ++i) {
+      counts[i].fill(0);
+      if (objects[i] == nullptr) {
+        if (ego_state) {
+          float* row = batch.ego_state.DataPtr() + i * kEgoFeatureSize;
+          std::fill(row, row + kEgoFeatureSize,
+                    std::numeric_limits<float>::quiet_NaN());
+        }
+        continue;
+      }
+      if (ego_state) {
+        EgoState(*objects[i], batch.ego_state.DataPtr() + i * kEgoFeatureSize);
+      }
+      if (!visible_state) {
+        continue;
+      }
+      // Room for the maximum numbers of visible objects, filled with 0
+      // as the feature extractors expect, then trimmed to the visible
+      // ones.
+      std::array<int64_t, kNumVisibleCategories> sizes;
+      for (int64_t c = 0; c < kNumVisibleCategories; ++c) {
+        sizes[c] = features[c].size();
+        features[c].resize(sizes[c] + max_visible[c] * kVisibleFeatureSizes[c],
+                           0.0f);
+      }
+      counts[i] = VisibleFeatures(
+          *objects[i], view_dist, view_angle, head_angle, &occlusion_cache,
+          features[0].data() + sizes[0], features[1].data() + sizes[1],
+          features[2].data() + sizes[2], features[3].data() + sizes[3]);
+      for (int64_t c = 0; c < kNumVisibleCategories; ++c) {
+        features[c].resize(sizes[c] + counts[i][c] * kVisibleFeatureSizes[c]);
+      }
+    }
+  });
+
+  if (!visible_state) {
+    return batch;
+  }
+  for (int64_t c = 0; c < kNumVisibleCategories; ++c) {
+    NdArray<int64_t> offsets({n + 1}, int64_t(0));
+    int64_t* offsets_data = offsets.DataPtr();
+    for (int64_t i = 0; i < n; ++i) {
+      offsets_data[i + 1] = offsets_data[i] + counts[i][c];
+    }
+    NdArray<float> features({offsets_data[n], kVisibleFeatureSizes[c]}, 0.0f);
+    float* features_data = features.DataPtr();
+    for (const ChunkFeatures& cur : chunk_features) {
+      // features_data is null when no vehicle sees an object of the category
+      if (!cur[c].empty()) {
+        features_data =
+            std::copy(cur[c].cbegin(), cur[c].cend(), features_data);
+      }
+    }
+    batch.features.emplace(kVisibleCategories[c], std::move(features));
+    batch.offsets.emplace(kVisibleCategories[c], std::move(offsets));
+  }
+  return batch;
 }
 
 std::optional<Action> Scenario::ExpertAction(const Object& obj,
                                              int64_t timestamp) const {
-  const std::vector<float>& cur_headings = expert_headings_.at(obj.id());
-  const std::vector<float>& cur_speeds = expert_speeds_.at(obj.id());
-  const std::vector<bool>& valid_mask = expert_valid_masks_.at(obj.id());
+  const std::vector<float>& cur_headings =
+      scenario_template_->expert_headings.at(obj.id());
+  const std::vector<float>& cur_speeds =
+      scenario_template_->expert_speeds.at(obj.id());
+  const std::vector<bool>& valid_mask =
+      scenario_template_->expert_valid_masks.at(obj.id());
   const std::vector<geometry::Vector2D>& cur_velocities =
-      expert_velocities_.at(obj.id());
+      scenario_template_->expert_velocities.at(obj.id());
   const int64_t trajectory_length = valid_mask.size();
 
   if (timestamp < 0 || timestamp > trajectory_length - 1) {
@@ -586,8 +1294,9 @@ std::optional<Action> Scenario::ExpertAction(const Object& obj,
 std::optional<geometry::Vector2D> Scenario::ExpertPosShift(
     const Object& obj, int64_t timestamp) const {
   const std::vector<geometry::Vector2D>& cur_positions =
-      expert_trajectories_.at(obj.id());
-  const std::vector<bool>& valid_mask = expert_valid_masks_.at(obj.id());
+      scenario_template_->expert_trajectories.at(obj.id());
+  const std::vector<bool>& valid_mask =
+      scenario_template_->expert_valid_masks.at(obj.id());
   const int64_t trajectory_length = valid_mask.size();
 
   if (timestamp < 0 || timestamp > trajectory_length - 1) {
@@ -608,8 +1317,10 @@ std::optional<geometry::Vector2D> Scenario::ExpertPosShift(
 
 std::optional<float> Scenario::ExpertHeadingShift(const Object& obj,
                                                   int64_t timestamp) const {
-  const std::vector<float>& cur_heading = expert_headings_.at(obj.id());
-  const std::vector<bool>& valid_mask = expert_valid_masks_.at(obj.id());
+  const std::vector<float>& cur_heading =
+      scenario_template_->expert_headings.at(obj.id());
+  const std::vector<bool>& valid_mask =
+      scenario_template_->expert_valid_masks.at(obj.id());
   const int64_t trajectory_length = valid_mask.size();
 
   if (timestamp < 0 || timestamp > trajectory_length - 1) {
@@ -627,31 +1338,71 @@ std::optional<float> Scenario::ExpertHeadingShift(const Object& obj,
   return heading_shift;
 }
 
-// O(N) time remove.
 bool Scenario::RemoveObject(const Object& object) {
-  if (!RemoveObjectImpl(object, objects_)) {
-    return false;
+  const int64_t id = object.id();
+  return RemoveObjects(1, &id) > 0;
+}
+
+int64_t Scenario::RemoveObjects(int64_t num_ids, const int64_t* ids) {
+  int64_t num_removed = 0;
+  for (int64_t i = 0; i < num_ids; ++i) {
+    const Object* object = FindObject(ids[i]);
+    if (object == nullptr) {
+      continue;
+    }
+    const int64_t slot = object->state_index();
+    object_state_store_->flags[slot] |= ObjectStateStore::kRemoved;
+    object_bvh_.RemoveAt(object_bvh_indices_[slot]);
+    ++num_removed;
   }
-  switch (object.Type()) {
-    case ObjectType::kVehicle: {
-      RemoveObjectImpl(object, vehicles_);
-      break;
+  if (num_removed > 0) {
+    has_removed_objects_ = true;
+  }
+  return num_removed;
+}
+
+void Scenario::ApplyActions(int64_t num_actions, const int64_t* ids,
+                            const float* acceleration, const float* steering,
+                            const float* head_angle) {
+  for (int64_t i = 0; i < num_actions; ++i) {
+    Object* obj = FindObject(ids[i]);
+    if (obj == nullptr) {
+      continue;
     }
-    case ObjectType::kPedestrian: {
-      RemoveObjectImpl(object, pedestrians_);
-      break;
+    if (!std::isnan(acceleration[i])) {
+      obj->set_acceleration(acceleration[i]);
     }
-    case ObjectType::kCyclist: {
-      RemoveObjectImpl(object, cyclists_);
-      break;
+    if (!std::isnan(steering[i])) {
+      obj->set_steering(steering[i]);
     }
-    default: {
-      break;
+    if (head_angle != nullptr && !std::isnan(head_angle[i])) {
+      obj->set_head_angle(head_angle[i]);
+    }
+  }
+}
+
+void Scenario::ApplyDiscreteActions(int64_t num_actions, const int64_t* ids,
+                                    const int64_t* actions,
+                                    const std::vector<float>& acceleration_grid,
+                                    const std::vector<float>& steering_grid) {
+  const int64_t num_steerings = steering_grid.size();
+  const int64_t num_grid_actions = acceleration_grid.size() * num_steerings;
+  // Check all the actions first so that an invalid one leaves the scenario as
+  // is.
+  for (int64_t i = 0; i < num_actions; ++i) {
+    if (actions[i] < 0 || actions[i] >= num_grid_actions) {
+      throw std::out_of_range("Invalid discrete action: " +
+                              std::to_string(actions[i]));
+    }
+  }
+  for (int64_t i = 0; i < num_actions; ++i) {
+    Object* obj = FindObject(ids[i]);
+    if (obj == nullptr) {
+      continue;
     }
+    obj->set_acceleration(acceleration_grid[actions[i] / num_steerings]);
+    obj->set_steering(steering_grid[actions[i] % num_steerings]);
   }
-  RemoveObjectImpl(object, moving_objects_);
-  object_bvh_.Reset(objects_);
-  return true;
 }
 
 /*********************** Drawing Functions *****************/
@@ -687,11 +1438,13 @@ sf::View Scenario::View(geometry::Vector2D view_center, float rotation,
 sf::View Scenario::View(float target_height, float target_width,
                         float padding) const {
   // compute center and size of view based on known scenario bounds
+  const sf::FloatRect& road_network_bounds =
+      scenario_template_->road_network_bounds;
   const geometry::Vector2D view_center(
-      road_network_bounds_.left + road_network_bounds_.width / 2.0f,
-      road_network_bounds_.top + road_network_bounds_.height / 2.0f);
-  const float view_width = road_network_bounds_.width;
-  const float view_height = road_network_bounds_.height;
+      road_network_bounds.left + road_network_bounds.width / 2.0f,
+      road_network_bounds.top + road_network_bounds.height / 2.0f);
+  const float view_width = road_network_bounds.width;
+  const float view_height = road_network_bounds.height;
 
   // build the view from overloaded function
   return View(view_center, 0.0f, view_height, view_width, target_height,
@@ -703,7 +1456,7 @@ Scenario::VehiclesDestinationsDrawables(const Object* source,
                                         float radius) const {
   std::vector<std::unique_ptr<sf::CircleShape>> target_position_drawables;
   if (source == nullptr) {
-    for (const auto& obj : objects_) {
+    for (const auto& obj : objects()) {
       auto circle_shape = utils::MakeCircleShape(obj->target_position(), radius,
                                                  obj->color(), false);
       target_position_drawables.push_back(std::move(circle_shape));
@@ -733,10 +1486,10 @@ void Scenario::draw(sf::RenderTarget& target,
   horizontal_flip.scale(1, -1);
   sf::View view =
       View(target.getSize().y, target.getSize().x, /*padding=*/30.0f);
-  DrawOnTarget(target, road_lines_, view, horizontal_flip);
-  DrawOnTarget(target, objects_, view, horizontal_flip);
+  DrawOnTarget(target, scenario_template_->road_lines, view, horizontal_flip);
+  DrawOnTarget(target, objects(), view, horizontal_flip);
   DrawOnTarget(target, traffic_lights_, view, horizontal_flip);
-  DrawOnTarget(target, stop_signs_, view, horizontal_flip);
+  DrawOnTarget(target, scenario_template_->stop_signs, view, horizontal_flip);
   // DrawOnTarget(target, src.getTraces(), view, horizontal_flip);
 }
 
@@ -798,7 +1551,7 @@ NdArray<unsigned char> Scenario::Image(uint64_t img_height, uint64_t img_width,
   }
   // color all the vehicles
   else {
-    for (const auto& obj : objects_) {
+    for (const auto& obj : objects()) {
       Vehicle* src = dynamic_cast<Vehicle*>(obj.get());
     
       if (obj->Type() == ObjectType::kVehicle) {
@@ -815,13 +1568,11 @@ NdArray<unsigned char> Scenario::Image(uint64_t img_height, uint64_t img_width,
       }
     }
   }
-    
 
-  DrawOnTarget(canvas, road_lines_, view, horizontal_flip);
-  DrawOnTarget(canvas, objects_, view, horizontal_flip);
+  DrawOnTarget(canvas, scenario_template_->road_lines, view, horizontal_flip);
+  DrawOnTarget(canvas, objects(), view, horizontal_flip);
   DrawOnTarget(canvas, traffic_lights_, view, horizontal_flip);
-  DrawOnTarget(canvas, stop_signs_, view, horizontal_flip);
-
+  DrawOnTarget(canvas, scenario_template_->stop_signs, view, horizontal_flip);
 
   return canvas.AsNdArray();
 }
@@ -860,8 +1611,9 @@ NdArray<unsigned char> Scenario::EgoVehicleConeImage(
   DrawOnTarget(canvas, background_drawable, cone_view, horizontal_flip);
 
   // draw roads and objects
-  DrawOnTarget(canvas, road_lines_, scenario_view, horizontal_flip);
-  DrawOnTarget(canvas, objects_, scenario_view, horizontal_flip);
+  DrawOnTarget(canvas, scenario_template_->road_lines, scenario_view,
+               horizontal_flip);
+  DrawOnTarget(canvas, objects(), scenario_view, horizontal_flip);
 
   // draw target_positions
   if (draw_target_positions) {
@@ -870,7 +1622,7 @@ NdArray<unsigned char> Scenario::EgoVehicleConeImage(
   }
 
   // draw obstructions
-  for (const auto& obj : objects_) {
+  for (const auto& obj : objects()) {
     if (obj->id() == source.id() || !obj->can_block_sight()) continue;
     const float dist_to_source = (obj->position() - source.position()).Norm();
     if (dist_to_source > view_dist + obj->Radius()) continue;
@@ -883,7 +1635,8 @@ NdArray<unsigned char> Scenario::EgoVehicleConeImage(
 
   // draw stop signs and traffic lights (not subject to obstructions)
   DrawOnTarget(canvas, traffic_lights_, scenario_view, horizontal_flip);
-  DrawOnTarget(canvas, stop_signs_, scenario_view, horizontal_flip);
+  DrawOnTarget(canvas, scenario_template_->stop_signs, scenario_view,
+               horizontal_flip);
 
   // draw cone
   auto cone_drawables =
@@ -911,8 +1664,7 @@ NdArray<unsigned char> Scenario::EgoVehicleFeaturesImage(
       VisibleObjects(source, view_dist, view_angle, head_angle);
   std::vector<const sf::Drawable*> drawables;
 
-  for (const auto [obj, dist] : NearestKRoadPoints(
-           source, road_points, max_visible_road_points_, road_edge_first_)) {
+  for (const auto& [obj, dist] : road_points) {
     drawables.emplace_back(dynamic_cast<const RoadPoint*>(obj));
   }
   for (const auto& [objects, limit] :
@@ -937,28 +1689,25 @@ NdArray<unsigned char> Scenario::EgoVehicleFeaturesImage(
   return canvas.AsNdArray();
 }
 
-void Scenario::LoadObjects(const json& objects_json) {
+void Scenario::LoadObjects(const ScenarioData& scenario_data,
+                           ScenarioTemplate* scenario_template) const {
+  const ScenarioData& data = scenario_data;
+  const int64_t num_objects = data.num_objects();
   int64_t cur_id = 0;
-  for (const auto& obj : objects_json) {
-    const ObjectType object_type = ParseObjectType(obj["type"]);
+  for (int64_t obj_idx = 0; obj_idx < num_objects; ++obj_idx) {
+    const ObjectType object_type = data.object_types[obj_idx];
+    const int64_t offset = data.trajectory_offsets[obj_idx];
+    const int64_t trajectory_length =
+        data.trajectory_offsets[obj_idx + 1] - offset;
 
     // TODO(ev) current_time_ should be passed in rather than defined here.
-    const geometry::Vector2D position(obj["position"][current_time_]["x"],
-                                      obj["position"][current_time_]["y"]);
-    const float width = static_cast<float>(obj["width"]);
-    const float length = static_cast<float>(obj["length"]);
-    geometry::Vector2D target_position;
-    if (obj.contains("goalPosition")) {
-      target_position = geometry::Vector2D(obj["goalPosition"]["x"],
-                                           obj["goalPosition"]["y"]);
-    }
-
-    const auto& obj_position = obj["position"];
-    const auto& obj_heading = obj["heading"];
-    const auto& obj_velocity = obj["velocity"];
-    const auto& obj_valid = obj["valid"];
-    const int64_t trajectory_length = obj_position.size();
-    const bool is_av = obj["is_av"].template get<int>();
+    const geometry::Vector2D position(data.x[offset + current_time_],
+                                      data.y[offset + current_time_]);
+    const float width = data.object_widths[obj_idx];
+    const float length = data.object_lengths[obj_idx];
+    const geometry::Vector2D target_position(data.goal_x[obj_idx],
+                                             data.goal_y[obj_idx]);
+    const bool is_av = data.is_av[obj_idx];
 
     std::vector<geometry::Vector2D> cur_trajectory;
     std::vector<float> cur_headings;
@@ -974,16 +1723,14 @@ void Scenario::LoadObjects(const json& objects_json) {
     float target_heading = 0.0f;
     float target_speed = 0.0f;
     bool is_moving = false;
-    for (int64_t i = 0; i < trajectory_length; ++i) {
-      const geometry::Vector2D cur_pos(obj_position[i]["x"],
-                                       obj_position[i]["y"]);
+    for (int64_t i = offset; i < offset + trajectory_length; ++i) {
+      const geometry::Vector2D cur_pos(data.x[i], data.y[i]);
       const float cur_heading = geometry::utils::NormalizeAngle(
-          geometry::utils::Radians(static_cast<float>(obj_heading[i])));
-      const float cur_speed =
-          geometry::Vector2D(obj_velocity[i]["x"], obj_velocity[i]["y"]).Norm();
-      const bool valid = static_cast<bool>(obj_valid[i]);
-      const geometry::Vector2D cur_velocity(obj_velocity[i]["x"],
-                                            obj_velocity[i]["y"]);
+          geometry::utils::Radians(data.heading[i]));
+      const geometry::Vector2D cur_velocity(data.velocity_x[i],
+                                            data.velocity_y[i]);
+      const float cur_speed = cur_velocity.Norm();
+      const bool valid = static_cast<bool>(data.valid[i]);
 
       cur_trajectory.push_back(cur_pos);
       cur_headings.push_back(cur_heading);
@@ -1009,105 +1756,117 @@ void Scenario::LoadObjects(const json& objects_json) {
       continue;
     }
 
-    if (object_type == ObjectType::kVehicle) {
-      std::shared_ptr<Vehicle> vehicle = std::make_shared<Vehicle>(
-          cur_id, length, width, position, cur_headings[current_time_],
-          cur_speeds[current_time_], target_position, target_heading,
-          target_speed, is_av);
-      vehicles_.push_back(vehicle);
-      objects_.push_back(vehicle);
-      if (is_moving) {
-        moving_objects_.push_back(vehicle);
-      }
+    if (object_type == ObjectType::kVehicle ||
+        (allow_non_vehicles_ && (object_type == ObjectType::kPedestrian ||
+                                 object_type == ObjectType::kCyclist))) {
+      ObjectTemplate object;
+      object.type = object_type;
+      object.id = cur_id;
+      object.length = length;
+      object.width = width;
+      object.position = position;
+      object.heading = cur_headings[current_time_];
+      object.speed = cur_speeds[current_time_];
+      object.target_position = target_position;
+      object.target_heading = target_heading;
+      object.target_speed = target_speed;
+      object.is_av = is_av;
+      object.is_moving = is_moving;
+      scenario_template->objects.push_back(object);
     } else if (allow_non_vehicles_) {
-      if (object_type == ObjectType::kPedestrian) {
-        std::shared_ptr<Pedestrian> pedestrian = std::make_shared<Pedestrian>(
-            cur_id, length, width, position, cur_headings[current_time_],
-            cur_speeds[current_time_], target_position, target_heading,
-            target_speed);
-        pedestrians_.push_back(pedestrian);
-        objects_.push_back(pedestrian);
-        if (is_moving) {
-          moving_objects_.push_back(pedestrian);
-        }
-      } else if (object_type == ObjectType::kCyclist) {
-        std::shared_ptr<Cyclist> cyclist = std::make_shared<Cyclist>(
-            cur_id, length, width, position, cur_headings[current_time_],
-            cur_speeds[current_time_], target_position, target_heading,
-            target_speed);
-        cyclists_.push_back(cyclist);
-        objects_.push_back(cyclist);
-        if (is_moving) {
-          moving_objects_.push_back(cyclist);
-        }
-      } else {
-        std::cerr << "Unknown object type: " << obj["type"] << std::endl;
-      }
+      std::cerr << "Unknown object type: " << static_cast<int>(object_type)
+                << std::endl;
     }
 
-    expert_trajectories_.push_back(std::move(cur_trajectory));
-    expert_headings_.push_back(std::move(cur_headings));
-    expert_speeds_.push_back(std::move(cur_speeds));
-    expert_valid_masks_.push_back(std::move(valid_mask));
-    expert_velocities_.push_back(std::move(cur_velocities));
+    scenario_template->expert_trajectories.push_back(std::move(cur_trajectory));
+    scenario_template->expert_headings.push_back(std::move(cur_headings));
+    scenario_template->expert_speeds.push_back(std::move(cur_speeds));
+    scenario_template->expert_valid_masks.push_back(std::move(valid_mask));
+    scenario_template->expert_velocities.push_back(std::move(cur_velocities));
     ++cur_id;
   }
-
-  // Reset the road objects bvh
-  object_bvh_.Reset(objects_);
 }
 
-void Scenario::LoadRoads(const json& roads_json) {
+void Scenario::LoadRoads(const ScenarioData& scenario_data,
+                         ScenarioTemplate* scenario_template) const {
+  const ScenarioData& data = scenario_data;
   float min_x = std::numeric_limits<float>::max();
   float min_y = std::numeric_limits<float>::max();
   float max_x = std::numeric_limits<float>::lowest();
   float max_y = std::numeric_limits<float>::lowest();
 
-  for (const auto& road : roads_json) {
-    const auto& geometry_json = road["geometry"];
-    const RoadType road_type = ParseRoadType(road["type"]);
+  const int64_t num_roads = data.num_roads();
+  for (int64_t road_idx = 0; road_idx < num_roads; ++road_idx) {
+    const RoadType road_type = data.road_types[road_idx];
     const bool check_collision = (road_type == RoadType::kRoadEdge);
+    const int64_t beg = data.road_offsets[road_idx];
+    const int64_t end = data.road_offsets[road_idx + 1];
 
     // We have to handle stop signs differently from other lane types
     if (road_type == RoadType::kStopSign) {
-      const geometry::Vector2D position(geometry_json.front()["x"],
-                                        geometry_json.front()["y"]);
-      stop_signs_.push_back(std::make_shared<StopSign>(position));
+      const geometry::Vector2D position(data.road_x[beg], data.road_y[beg]);
+      scenario_template->stop_signs.push_back(
+          std::make_shared<StopSign>(position));
     } else {
-      const int64_t geometry_size = geometry_json.size();
       std::vector<geometry::Vector2D> geometry;
-      geometry.reserve(geometry_size);
+      geometry.reserve(end - beg);
 
       // Iterate over every line segment
-      for (int64_t i = 0; i < geometry_size; ++i) {
-        const geometry::Vector2D cur_pos(geometry_json[i]["x"],
-                                         geometry_json[i]["y"]);
+      for (int64_t i = beg; i < end; ++i) {
+        const geometry::Vector2D cur_pos(data.road_x[i], data.road_y[i]);
         min_x = std::min(min_x, cur_pos.x());
         min_y = std::min(min_y, cur_pos.y());
         max_x = std::max(max_x, cur_pos.x());
         max_y = std::max(max_y, cur_pos.y());
         geometry.push_back(cur_pos);
 
-        if (check_collision && i < geometry_size - 1) {
-          const geometry::Vector2D nxt_pos(geometry_json[i + 1]["x"],
-                                           geometry_json[i + 1]["y"]);
-          line_segments_.push_back(
+        if (check_collision && i < end - 1) {
+          const geometry::Vector2D nxt_pos(data.road_x[i + 1],
+                                           data.road_y[i + 1]);
+          scenario_template->line_segments.push_back(
               std::make_shared<geometry::LineSegment>(cur_pos, nxt_pos));
         }
       }
       // TODO: Try different sample rate.
       std::shared_ptr<RoadLine> road_line = std::make_shared<RoadLine>(
-          road_type, std::move(geometry), sample_every_n_, check_collision);
-      road_lines_.push_back(road_line);
+          road_type, std::move(geometry), sample_every_n_, check_collision,
+          scenario_template->road_point_table.size());
+      scenario_template->road_point_table.Append(*road_line);
+      scenario_template->road_lines.push_back(road_line);
     }
   }
 
-  road_network_bounds_ =
+  scenario_template->road_network_bounds =
       sf::FloatRect(min_x, min_y, max_x - min_x, max_y - min_y);
 
-  // Now create the BVH for the line segments
+  // Now create the index for the line segments
   // Since the line segments never move we only need to define this once
-  line_segment_bvh_.Reset(line_segments_);
+  if (road_edge_grid_) {
+    scenario_template->line_segment_grid.Reset(
+        scenario_template->line_segments);
+  } else {
+    scenario_template->line_segment_bvh.Reset(scenario_template->line_segments);
+  }
+}
+
+void Scenario::LoadTrafficLights(const ScenarioData& scenario_data,
+                                 ScenarioTemplate* scenario_template) const {
+  const ScenarioData& data = scenario_data;
+  const int64_t num_traffic_lights = data.num_traffic_lights();
+  for (int64_t tl_idx = 0; tl_idx < num_traffic_lights; ++tl_idx) {
+    const auto beg = data.traffic_light_offsets[tl_idx];
+    const auto end = data.traffic_light_offsets[tl_idx + 1];
+    std::vector<int64_t> valid_times(data.traffic_light_times.begin() + beg,
+                                     data.traffic_light_times.begin() + end);
+    std::vector<TrafficLightState> light_states(
+        data.traffic_light_states.begin() + beg,
+        data.traffic_light_states.begin() + end);
+    scenario_template->traffic_lights.push_back(
+        std::make_shared<const TrafficLight>(
+            geometry::Vector2D(data.traffic_light_x[tl_idx],
+                               data.traffic_light_y[tl_idx]),
+            valid_times, light_states, current_time_));
+  }
 }
 
 }  // namespace nocturne
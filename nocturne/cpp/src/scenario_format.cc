@@ -0,0 +1,345 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_format.h"
+
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#include <iterator>
+#include <memory>
+#include <stdexcept>
+#include <type_traits>
+#include <vector>
+
+namespace nocturne {
+
+namespace {
+
+static_assert(sizeof(ObjectType) == sizeof(int32_t));
+static_assert(sizeof(RoadType) == sizeof(int32_t));
+static_assert(sizeof(TrafficLightState) == sizeof(int32_t));
+
+class BinaryWriter {
+ public:
+  template <typename T>
+  void Write(const T& value) {
+    static_assert(std::is_trivially_copyable_v<T>);
+    buffer_.append(reinterpret_cast<const char*>(&value), sizeof(T));
+  }
+
+  template <typename T>
+  void WriteArray(const ScenarioArray<T>& values) {
+    static_assert(std::is_trivially_copyable_v<T>);
+    Align();
+    buffer_.append(reinterpret_cast<const char*>(values.data()),
+                   values.size() * sizeof(T));
+  }
+
+  void WriteString(const std::string& s) {
+    Write<int64_t>(s.size());
+    buffer_.append(s);
+  }
+
+  std::string Release() { return std::move(buffer_); }
+
+ private:
+  void Align() {
+    const int64_t padding =
+        (kBinaryScenarioAlignment - buffer_.size() % kBinaryScenarioAlignment) %
+        kBinaryScenarioAlignment;
+    buffer_.append(padding, '\0');
+  }
+
+  std::string buffer_;
+};
+
+class BinaryReader {
+ public:
+  // `data` is the start of the scenario. The arrays are aligned relative to it
+  // if `aligned`, and view it rather than being copied if `in_place`.
+  BinaryReader(const char* data, int64_t size, bool aligned, bool in_place)
+      : data_(data), size_(size), aligned_(aligned), in_place_(in_place) {}
+
+  template <typename T>
+  T Read() {
+    static_assert(std::is_trivially_copyable_v<T>);
+    CheckAvailable(sizeof(T));
+    T value;
+    std::memcpy(&value, data_ + pos_, sizeof(T));
+    pos_ += sizeof(T);
+    return value;
+  }
+
+  template <typename T>
+  void ReadArray(int64_t n, ScenarioArray<T>& values) {
+    static_assert(std::is_trivially_copyable_v<T>);
+    if (n < 0) {
+      throw std::invalid_argument("Corrupted binary scenario.");
+    }
+    if (aligned_) {
+      const int64_t padding =
+          (kBinaryScenarioAlignment - pos_ % kBinaryScenarioAlignment) %
+          kBinaryScenarioAlignment;
+      CheckAvailable(padding);
+      pos_ += padding;
+    }
+    CheckAvailable(n * sizeof(T));
+    const char* const begin = data_ + pos_;
+    if (in_place_ && reinterpret_cast<uintptr_t>(begin) % alignof(T) == 0) {
+      values = ScenarioArray<T>::View(reinterpret_cast<const T*>(begin), n);
+    } else {
+      std::vector<T> copy(n);
+      std::memcpy(copy.data(), begin, n * sizeof(T));
+      values = ScenarioArray<T>(std::move(copy));
+    }
+    pos_ += n * sizeof(T);
+  }
+
+  void Skip(int64_t n) {
+    CheckAvailable(n);
+    pos_ += n;
+  }
+
+  std::string ReadString() {
+    const int64_t n = Read<int64_t>();
+    if (n < 0) {
+      throw std::invalid_argument("Corrupted binary scenario.");
+    }
+    CheckAvailable(n);
+    std::string s(data_ + pos_, n);
+    pos_ += n;
+    return s;
+  }
+
+ private:
+  void CheckAvailable(int64_t n) const {
+    if (n > size_ - pos_) {
+      throw std::invalid_argument("Truncated binary scenario.");
+    }
+  }
+
+  const char* const data_;
+  const int64_t size_;
+  const bool aligned_;
+  const bool in_place_;
+  int64_t pos_ = 0;
+};
+
+// Reads n + 1 CSR offsets and checks that they index a packed array of size
+// `packed_size`.
+void ReadOffsets(BinaryReader& reader, int64_t n, int64_t packed_size,
+                 ScenarioArray<int64_t>& offsets) {
+  reader.ReadArray(n + 1, offsets);
+  if (offsets.front() != 0 || offsets.back() != packed_size) {
+    throw std::invalid_argument("Corrupted binary scenario.");
+  }
+  for (int64_t i = 0; i < n; ++i) {
+    if (offsets[i] > offsets[i + 1]) {
+      throw std::invalid_argument("Corrupted binary scenario.");
+    }
+  }
+}
+
+}  // namespace
+
+ScenarioData ParseJsonScenario(const nlohmann::json& j) {
+  ScenarioData data;
+  data.name = j["name"];
+
+  for (const auto& obj : j["objects"]) {
+    data.object_types.push_back(ParseObjectType(obj["type"]));
+    data.object_lengths.push_back(obj["length"].get<float>());
+    data.object_widths.push_back(obj["width"].get<float>());
+    if (obj.contains("goalPosition")) {
+      data.goal_x.push_back(obj["goalPosition"]["x"].get<float>());
+      data.goal_y.push_back(obj["goalPosition"]["y"].get<float>());
+    } else {
+      data.goal_x.push_back(0.0f);
+      data.goal_y.push_back(0.0f);
+    }
+    data.is_av.push_back(obj.value("is_av", 0) != 0);
+
+    const auto& obj_position = obj["position"];
+    const auto& obj_heading = obj["heading"];
+    const auto& obj_velocity = obj["velocity"];
+    const auto& obj_valid = obj["valid"];
+    const int64_t trajectory_length = obj_position.size();
+    for (int64_t i = 0; i < trajectory_length; ++i) {
+      data.x.push_back(obj_position[i]["x"].get<float>());
+      data.y.push_back(obj_position[i]["y"].get<float>());
+      data.heading.push_back(obj_heading[i].get<float>());
+      data.velocity_x.push_back(obj_velocity[i]["x"].get<float>());
+      data.velocity_y.push_back(obj_velocity[i]["y"].get<float>());
+      data.valid.push_back(static_cast<bool>(obj_valid[i]));
+    }
+    data.trajectory_offsets.push_back(data.x.size());
+  }
+
+  for (const auto& road : j["roads"]) {
+    data.road_types.push_back(ParseRoadType(road["type"]));
+    for (const auto& point : road["geometry"]) {
+      data.road_x.push_back(point["x"].get<float>());
+      data.road_y.push_back(point["y"].get<float>());
+    }
+    data.road_offsets.push_back(data.road_x.size());
+  }
+
+  for (const auto& tl : j["tl_states"]) {
+    // Lane positions don't move so we can just use the first element.
+    data.traffic_light_x.push_back(tl["x"][0].get<float>());
+    data.traffic_light_y.push_back(tl["y"][0].get<float>());
+    for (size_t i = 0; i < tl["state"].size(); ++i) {
+      data.traffic_light_states.push_back(
+          ParseTrafficLightState(tl["state"][i]));
+      data.traffic_light_times.push_back(int(tl["time_index"][i]));
+    }
+    data.traffic_light_offsets.push_back(data.traffic_light_states.size());
+  }
+
+  return data;
+}
+
+bool IsBinaryScenario(const char* data, int64_t size) {
+  return size >= static_cast<int64_t>(sizeof(kBinaryScenarioMagic)) &&
+         std::memcmp(data, kBinaryScenarioMagic,
+                     sizeof(kBinaryScenarioMagic)) == 0;
+}
+
+ScenarioData ParseBinaryScenario(const char* data, int64_t size,
+                                 std::shared_ptr<const void> storage) {
+  if (!IsBinaryScenario(data, size)) {
+    throw std::invalid_argument("Not a binary scenario.");
+  }
+  uint32_t version = 0;
+  if (size < static_cast<int64_t>(sizeof(kBinaryScenarioMagic) +
+                                  sizeof(version))) {
+    throw std::invalid_argument("Truncated binary scenario.");
+  }
+  std::memcpy(&version, data + sizeof(kBinaryScenarioMagic), sizeof(version));
+  if (version != 1 && version != kBinaryScenarioVersion) {
+    throw std::invalid_argument("Unsupported binary scenario version: " +
+                                std::to_string(version));
+  }
+  BinaryReader reader(data, size, /*aligned=*/version >= 2,
+                      /*in_place=*/storage != nullptr);
+  reader.Skip(sizeof(kBinaryScenarioMagic) + sizeof(version));
+
+  ScenarioData ret;
+  ret.name = reader.ReadString();
+
+  const int64_t num_objects = reader.Read<int64_t>();
+  const int64_t num_states = reader.Read<int64_t>();
+  reader.ReadArray(num_objects, ret.object_types);
+  reader.ReadArray(num_objects, ret.object_lengths);
+  reader.ReadArray(num_objects, ret.object_widths);
+  reader.ReadArray(num_objects, ret.goal_x);
+  reader.ReadArray(num_objects, ret.goal_y);
+  reader.ReadArray(num_objects, ret.is_av);
+  ReadOffsets(reader, num_objects, num_states, ret.trajectory_offsets);
+  reader.ReadArray(num_states, ret.x);
+  reader.ReadArray(num_states, ret.y);
+  reader.ReadArray(num_states, ret.heading);
+  reader.ReadArray(num_states, ret.velocity_x);
+  reader.ReadArray(num_states, ret.velocity_y);
+  reader.ReadArray(num_states, ret.valid);
+
+  const int64_t num_roads = reader.Read<int64_t>();
+  const int64_t num_road_points = reader.Read<int64_t>();
+  reader.ReadArray(num_roads, ret.road_types);
+  ReadOffsets(reader, num_roads, num_road_points, ret.road_offsets);
+  reader.ReadArray(num_road_points, ret.road_x);
+  reader.ReadArray(num_road_points, ret.road_y);
+
+  const int64_t num_traffic_lights = reader.Read<int64_t>();
+  const int64_t num_light_states = reader.Read<int64_t>();
+  reader.ReadArray(num_traffic_lights, ret.traffic_light_x);
+  reader.ReadArray(num_traffic_lights, ret.traffic_light_y);
+  ReadOffsets(reader, num_traffic_lights, num_light_states,
+              ret.traffic_light_offsets);
+  reader.ReadArray(num_light_states, ret.traffic_light_states);
+  reader.ReadArray(num_light_states, ret.traffic_light_times);
+
+  ret.storage = std::move(storage);
+  return ret;
+}
+
+std::string SerializeScenario(const ScenarioData& scenario_data) {
+  const ScenarioData& d = scenario_data;
+  BinaryWriter writer;
+  writer.Write(kBinaryScenarioMagic);
+  writer.Write(kBinaryScenarioVersion);
+  writer.WriteString(d.name);
+
+  writer.Write<int64_t>(d.num_objects());
+  writer.Write<int64_t>(d.x.size());
+  writer.WriteArray(d.object_types);
+  writer.WriteArray(d.object_lengths);
+  writer.WriteArray(d.object_widths);
+  writer.WriteArray(d.goal_x);
+  writer.WriteArray(d.goal_y);
+  writer.WriteArray(d.is_av);
+  writer.WriteArray(d.trajectory_offsets);
+  writer.WriteArray(d.x);
+  writer.WriteArray(d.y);
+  writer.WriteArray(d.heading);
+  writer.WriteArray(d.velocity_x);
+  writer.WriteArray(d.velocity_y);
+  writer.WriteArray(d.valid);
+
+  writer.Write<int64_t>(d.num_roads());
+  writer.Write<int64_t>(d.road_x.size());
+  writer.WriteArray(d.road_types);
+  writer.WriteArray(d.road_offsets);
+  writer.WriteArray(d.road_x);
+  writer.WriteArray(d.road_y);
+
+  writer.Write<int64_t>(d.num_traffic_lights());
+  writer.Write<int64_t>(d.traffic_light_states.size());
+  writer.WriteArray(d.traffic_light_x);
+  writer.WriteArray(d.traffic_light_y);
+  writer.WriteArray(d.traffic_light_offsets);
+  writer.WriteArray(d.traffic_light_states);
+  writer.WriteArray(d.traffic_light_times);
+
+  return writer.Release();
+}
+
+ScenarioData ReadScenarioFile(const std::string& scenario_path) {
+  std::ifstream data(scenario_path, std::ios::binary);
+  if (!data.is_open()) {
+    throw std::invalid_argument("Scenario file couldn't be opened: " +
+                                scenario_path);
+  }
+
+  char magic[sizeof(kBinaryScenarioMagic)];
+  data.read(magic, sizeof(magic));
+  const int64_t magic_size = data.gcount();
+  if (!IsBinaryScenario(magic, magic_size)) {
+    data.clear();
+    data.seekg(0);
+    nlohmann::json j;
+    data >> j;
+    return ParseJsonScenario(j);
+  }
+
+  // The arrays of the scenario view the buffer, which it keeps alive.
+  auto buffer = std::make_shared<std::vector<char>>(magic, magic + magic_size);
+  buffer->insert(buffer->end(), std::istreambuf_iterator<char>(data),
+                 std::istreambuf_iterator<char>());
+  return ParseBinaryScenario(buffer->data(), buffer->size(), buffer);
+}
+
+void ConvertScenarioFile(const std::string& src_path,
+                         const std::string& dst_path) {
+  const std::string buffer = SerializeScenario(ReadScenarioFile(src_path));
+  std::ofstream out(dst_path, std::ios::binary);
+  if (!out.is_open()) {
+    throw std::invalid_argument("Scenario file couldn't be opened: " +
+                                dst_path);
+  }
+  out.write(buffer.data(), buffer.size());
+}
+
+}  // namespace nocturne
@@ -0,0 +1,179 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_pack.h"
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <cstring>
+#include <fstream>
+#include <stdexcept>
+#include <unordered_set>
+
+namespace nocturne {
+
+namespace {
+
+constexpr int64_t kScenarioPackAlignment = 8;
+constexpr int64_t kScenarioPackHeaderSize =
+    sizeof(kScenarioPackMagic) + 2 * sizeof(uint32_t) + 2 * sizeof(int64_t);
+
+template <typename T>
+T ReadValue(const char* data, int64_t size, int64_t& pos) {
+  if (pos < 0 || static_cast<int64_t>(sizeof(T)) > size - pos) {
+    throw std::invalid_argument("Corrupted scenario pack.");
+  }
+  T value;
+  std::memcpy(&value, data + pos, sizeof(T));
+  pos += sizeof(T);
+  return value;
+}
+
+template <typename T>
+void WriteValue(std::ofstream& out, const T& value) {
+  out.write(reinterpret_cast<const char*>(&value), sizeof(T));
+}
+
+std::string BaseName(const std::string& path) {
+  const size_t pos = path.find_last_of('/');
+  return pos == std::string::npos ? path : path.substr(pos + 1);
+}
+
+}  // namespace
+
+ScenarioPack::ScenarioPack(const std::string& pack_path) : path_(pack_path) {
+  const int fd = open(pack_path.c_str(), O_RDONLY);
+  if (fd < 0) {
+    throw std::invalid_argument("Scenario pack couldn't be opened: " +
+                                pack_path);
+  }
+  struct stat st;
+  if (fstat(fd, &st) != 0) {
+    close(fd);
+    throw std::runtime_error("Scenario pack couldn't be read: " + pack_path);
+  }
+  size_ = st.st_size;
+  if (size_ < kScenarioPackHeaderSize) {
+    close(fd);
+    throw std::invalid_argument("Not a scenario pack: " + pack_path);
+  }
+  void* addr = mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd, 0);
+  // The mapping stays valid after the file descriptor is closed.
+  close(fd);
+  if (addr == MAP_FAILED) {
+    throw std::runtime_error("Scenario pack couldn't be mapped: " + pack_path);
+  }
+  const int64_t mapping_size = size_;
+  mapping_ = std::shared_ptr<const char>(
+      static_cast<const char*>(addr), [mapping_size](const char* p) {
+        munmap(const_cast<char*>(p), mapping_size);
+      });
+  data_ = mapping_.get();
+
+  if (std::memcmp(data_, kScenarioPackMagic, sizeof(kScenarioPackMagic)) != 0) {
+    throw std::invalid_argument("Not a scenario pack: " + pack_path);
+  }
+  int64_t pos = sizeof(kScenarioPackMagic);
+  const uint32_t version = ReadValue<uint32_t>(data_, size_, pos);
+  if (version != kScenarioPackVersion) {
+    throw std::invalid_argument("Unsupported scenario pack version: " +
+                                std::to_string(version));
+  }
+  ReadValue<uint32_t>(data_, size_, pos);
+  const int64_t num_scenes = ReadValue<int64_t>(data_, size_, pos);
+  pos = ReadValue<int64_t>(data_, size_, pos);
+
+  names_.reserve(num_scenes);
+  index_.reserve(num_scenes);
+  for (int64_t i = 0; i < num_scenes; ++i) {
+    const int64_t offset = ReadValue<int64_t>(data_, size_, pos);
+    const int64_t scene_size = ReadValue<int64_t>(data_, size_, pos);
+    const int64_t name_size = ReadValue<int64_t>(data_, size_, pos);
+    if (offset < kScenarioPackHeaderSize || scene_size < 0 ||
+        scene_size > size_ - offset || name_size < 0 ||
+        name_size > size_ - pos) {
+      throw std::invalid_argument("Corrupted scenario pack.");
+    }
+    std::string name(data_ + pos, name_size);
+    pos += name_size;
+    if (!index_.emplace(name, std::make_pair(offset, scene_size)).second) {
+      throw std::invalid_argument("Duplicated scene in scenario pack: " +
+                                  name);
+    }
+    names_.push_back(std::move(name));
+  }
+}
+
+std::string_view ScenarioPack::SceneBytes(const std::string& name) const {
+  const auto it = index_.find(name);
+  if (it == index_.end()) {
+    throw std::invalid_argument("Scene not found in scenario pack: " + name);
+  }
+  const auto [offset, scene_size] = it->second;
+  return std::string_view(data_ + offset, scene_size);
+}
+
+void WriteScenarioPack(const std::string& dst_path,
+                       const std::vector<std::string>& src_paths) {
+  std::ofstream out(dst_path, std::ios::binary);
+  if (!out.is_open()) {
+    throw std::invalid_argument("Scenario pack couldn't be opened: " +
+                                dst_path);
+  }
+
+  // The index offset is only known once all the scenes are written, so the
+  // header is written twice.
+  const auto write_header = [&out, &src_paths](int64_t index_offset) {
+    out.write(kScenarioPackMagic, sizeof(kScenarioPackMagic));
+    WriteValue(out, kScenarioPackVersion);
+    WriteValue(out, uint32_t(0));
+    WriteValue(out, static_cast<int64_t>(src_paths.size()));
+    WriteValue(out, index_offset);
+  };
+  write_header(0);
+
+  std::vector<std::string> names;
+  names.reserve(src_paths.size());
+  for (const std::string& src_path : src_paths) {
+    names.push_back(BaseName(src_path));
+  }
+  if (std::unordered_set<std::string>(names.begin(), names.end()).size() !=
+      names.size()) {
+    throw std::invalid_argument("Scenario pack scene names must be unique.");
+  }
+
+  std::vector<std::pair<int64_t, int64_t>> entries;
+  entries.reserve(src_paths.size());
+  int64_t offset = kScenarioPackHeaderSize;
+  for (const std::string& src_path : src_paths) {
+    const std::string buffer = SerializeScenario(ReadScenarioFile(src_path));
+    entries.emplace_back(offset, buffer.size());
+    out.write(buffer.data(), buffer.size());
+    offset += buffer.size();
+    const int64_t padding =
+        (kScenarioPackAlignment - offset % kScenarioPackAlignment) %
+        kScenarioPackAlignment;
+    out.write("\0\0\0\0\0\0\0", padding);
+    offset += padding;
+  }
+
+  const int64_t index_offset = offset;
+  for (size_t i = 0; i < names.size(); ++i) {
+    WriteValue(out, entries[i].first);
+    WriteValue(out, entries[i].second);
+    WriteValue(out, static_cast<int64_t>(names[i].size()));
+    out.write(names[i].data(), names[i].size());
+  }
+
+  out.seekp(0);
+  write_header(index_offset);
+  if (!out.good()) {
+    throw std::runtime_error("Failed to write scenario pack: " + dst_path);
+  }
+}
+
+}  // namespace nocturne
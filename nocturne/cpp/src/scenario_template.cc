@@ -0,0 +1,173 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_template.h"
+
+#include <cmath>
+
+namespace nocturne {
+
+namespace {
+
+template <class T>
+int64_t VectorMemoryUsage(const std::vector<T>& vec) {
+  return sizeof(vec) + vec.capacity() * sizeof(T);
+}
+
+int64_t VectorMemoryUsage(const std::vector<bool>& vec) {
+  return sizeof(vec) + vec.capacity() / 8;
+}
+
+template <class T>
+int64_t NestedVectorMemoryUsage(const std::vector<std::vector<T>>& vec) {
+  int64_t ret = sizeof(vec);
+  for (const auto& v : vec) {
+    ret += VectorMemoryUsage(v);
+  }
+  return ret;
+}
+
+}  // namespace
+
+int64_t ScenarioTemplate::MemoryUsage() const {
+  // Size of a std::shared_ptr control block allocated with std::make_shared.
+  constexpr int64_t kControlBlockSize = 16;
+
+  int64_t ret = sizeof(ScenarioTemplate) + name.capacity();
+  ret += VectorMemoryUsage(objects);
+  ret += VectorMemoryUsage(traffic_lights);
+  for (const auto& traffic_light : traffic_lights) {
+    ret += sizeof(TrafficLight) + kControlBlockSize +
+           VectorMemoryUsage(traffic_light->timestamps()) +
+           VectorMemoryUsage(traffic_light->light_states());
+  }
+  ret += VectorMemoryUsage(line_segments) +
+         line_segments.size() *
+             (sizeof(geometry::LineSegment) + kControlBlockSize);
+  ret += VectorMemoryUsage(road_lines);
+  for (const auto& road_line : road_lines) {
+    const int64_t num_points = road_line->geometry_points().size();
+    ret += sizeof(RoadLine) + kControlBlockSize +
+           VectorMemoryUsage(road_line->geometry_points()) +
+           VectorMemoryUsage(road_line->road_points()) +
+           num_points * sizeof(sf::Vertex);
+  }
+  ret += VectorMemoryUsage(road_point_table.x) +
+         VectorMemoryUsage(road_point_table.y) +
+         VectorMemoryUsage(road_point_table.neighbor_x) +
+         VectorMemoryUsage(road_point_table.neighbor_y) +
+         VectorMemoryUsage(road_point_table.neighbor_distance) +
+         VectorMemoryUsage(road_point_table.neighbor_angle) +
+         VectorMemoryUsage(road_point_table.road_type);
+  ret += VectorMemoryUsage(stop_signs) +
+         stop_signs.size() * (sizeof(StopSign) + kControlBlockSize);
+
+  // The BVH has 2N - 1 nodes.
+  if (!line_segment_bvh.Empty()) {
+    ret += std::max(2 * static_cast<int64_t>(line_segments.size()) - 1,
+                    int64_t(0)) *
+           sizeof(geometry::BVH::Node);
+  }
+  ret += line_segment_grid.MemoryUsage();
+  ret += road_point_grid.MemoryUsage();
+
+  ret += NestedVectorMemoryUsage(expert_trajectories);
+  ret += NestedVectorMemoryUsage(expert_velocities);
+  ret += NestedVectorMemoryUsage(expert_headings);
+  ret += NestedVectorMemoryUsage(expert_speeds);
+  ret += NestedVectorMemoryUsage(expert_valid_masks);
+  return ret;
+}
+
+ScenarioTemplateCache& ScenarioTemplateCache::Global() {
+  static ScenarioTemplateCache cache;
+  return cache;
+}
+
+int64_t ScenarioTemplateCache::capacity() const {
+  std::lock_guard<std::mutex> lock(mu_);
+  return capacity_;
+}
+
+void ScenarioTemplateCache::set_capacity(int64_t capacity) {
+  std::lock_guard<std::mutex> lock(mu_);
+  capacity_ = std::max(capacity, int64_t(0));
+  EvictUntil(capacity_);
+}
+
+int64_t ScenarioTemplateCache::size() const {
+  std::lock_guard<std::mutex> lock(mu_);
+  return entries_.size();
+}
+
+int64_t ScenarioTemplateCache::memory_usage() const {
+  std::lock_guard<std::mutex> lock(mu_);
+  return memory_usage_;
+}
+
+int64_t ScenarioTemplateCache::hits() const {
+  std::lock_guard<std::mutex> lock(mu_);
+  return hits_;
+}
+
+int64_t ScenarioTemplateCache::misses() const {
+  std::lock_guard<std::mutex> lock(mu_);
+  return misses_;
+}
+
+std::shared_ptr<const ScenarioTemplate> ScenarioTemplateCache::Get(
+    const std::string& key) {
+  std::lock_guard<std::mutex> lock(mu_);
+  if (capacity_ == 0) {
+    return nullptr;
+  }
+  const auto it = index_.find(key);
+  if (it == index_.end()) {
+    ++misses_;
+    return nullptr;
+  }
+  ++hits_;
+  entries_.splice(entries_.begin(), entries_, it->second);
+  return it->second->scenario_template;
+}
+
+void ScenarioTemplateCache::Put(
+    const std::string& key,
+    std::shared_ptr<const ScenarioTemplate> scenario_template) {
+  const int64_t cur_usage = scenario_template->MemoryUsage();
+  std::lock_guard<std::mutex> lock(mu_);
+  if (cur_usage > capacity_) {
+    return;
+  }
+  const auto it = index_.find(key);
+  if (it != index_.end()) {
+    memory_usage_ -= it->second->memory_usage;
+    entries_.erase(it->second);
+    index_.erase(it);
+  }
+  EvictUntil(capacity_ - cur_usage);
+  entries_.push_front({key, std::move(scenario_template), cur_usage});
+  index_[key] = entries_.begin();
+  memory_usage_ += cur_usage;
+}
+
+void ScenarioTemplateCache::Clear() {
+  std::lock_guard<std::mutex> lock(mu_);
+  entries_.clear();
+  index_.clear();
+  memory_usage_ = 0;
+  hits_ = 0;
+  misses_ = 0;
+}
+
+void ScenarioTemplateCache::EvictUntil(int64_t memory_usage) {
+  while (!entries_.empty() && memory_usage_ > memory_usage) {
+    const Entry& entry = entries_.back();
+    memory_usage_ -= entry.memory_usage;
+    index_.erase(entry.key);
+    entries_.pop_back();
+  }
+}
+
+}  // namespace nocturne
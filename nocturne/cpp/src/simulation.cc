@@ -8,6 +8,15 @@
 
 namespace nocturne {
 
+void Simulation::Reset() {
+  if (scenario_pack_ != nullptr) {
+    scenario_ =
+        std::make_unique<Scenario>(*scenario_pack_, scenario_path_, config_);
+  } else {
+    scenario_ = std::make_unique<Scenario>(scenario_path_, config_);
+  }
+}
+
 void Simulation::Render() {
   if (render_window_ == nullptr) {
     constexpr int64_t kWinWidth = 1500;
@@ -0,0 +1,116 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "utils/thread_pool.h"
+
+#include <algorithm>
+#include <stdexcept>
+#include <string>
+
+namespace nocturne {
+namespace utils {
+
+ThreadPool::ThreadPool(int64_t num_threads) : num_threads_(num_threads) {
+  if (num_threads_ < 1) {
+    throw std::invalid_argument("num_threads must be positive, got " +
+                                std::to_string(num_threads_));
+  }
+  workers_.reserve(num_threads_ - 1);
+  for (int64_t worker = 1; worker < num_threads_; ++worker) {
+    workers_.emplace_back(&ThreadPool::WorkerLoop, this, worker);
+  }
+}
+
+ThreadPool::~ThreadPool() {
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    stop_ = true;
+  }
+  work_cv_.notify_all();
+  for (std::thread& worker : workers_) {
+    worker.join();
+  }
+}
+
+int64_t ThreadPool::NumChunks(int64_t n, int64_t min_chunk_size) const {
+  min_chunk_size = std::max(min_chunk_size, int64_t(1));
+  return std::clamp((n + min_chunk_size - 1) / min_chunk_size, int64_t(0),
+                    num_threads_);
+}
+
+void ThreadPool::ParallelFor(int64_t n, const ChunkFunc& func,
+                             int64_t min_chunk_size) {
+  const int64_t num_chunks = NumChunks(n, min_chunk_size);
+  if (num_chunks == 0) {
+    return;
+  }
+  if (num_chunks == 1) {
+    func(/*chunk=*/0, /*begin=*/0, /*end=*/n);
+    return;
+  }
+  std::lock_guard<std::mutex> loop_lock(loop_mu_);
+  {
+    std::lock_guard<std::mutex> lock(mu_);
+    func_ = &func;
+    n_ = n;
+    num_chunks_ = num_chunks;
+    num_pending_ = num_chunks - 1;
+    exception_ = nullptr;
+    ++generation_;
+  }
+  work_cv_.notify_all();
+  RunChunk(/*chunk=*/0);
+
+  std::unique_lock<std::mutex> lock(mu_);
+  done_cv_.wait(lock, [this]() { return num_pending_ == 0; });
+  func_ = nullptr;
+  if (exception_ != nullptr) {
+    std::exception_ptr exception = nullptr;
+    std::swap(exception, exception_);
+    std::rethrow_exception(exception);
+  }
+}
+
+void ThreadPool::WorkerLoop(int64_t worker) {
+  int64_t generation = 0;
+  while (true) {
+    {
+      std::unique_lock<std::mutex> lock(mu_);
+      work_cv_.wait(lock, [this, generation]() {
+        return stop_ || generation_ != generation;
+      });
+      if (stop_) {
+        return;
+      }
+      generation = generation_;
+      // Workers without a chunk in this loop wait for the next one.
+      if (worker >= num_chunks_) {
+        continue;
+      }
+    }
+    RunChunk(worker);
+    {
+      std::lock_guard<std::mutex> lock(mu_);
+      --num_pending_;
+    }
+    done_cv_.notify_one();
+  }
+}
+
+void ThreadPool::RunChunk(int64_t chunk) {
+  // Chunks sizes differ by at most one iteration.
+  const int64_t begin = n_ * chunk / num_chunks_;
+  const int64_t end = n_ * (chunk + 1) / num_chunks_;
+  try {
+    (*func_)(chunk, begin, end);
+  } catch (...) {
+    std::lock_guard<std::mutex> lock(mu_);
+    if (exception_ == nullptr) {
+      exception_ = std::current_exception();
+    }
+  }
+}
+
+}  // namespace utils
+}  // namespace nocturne
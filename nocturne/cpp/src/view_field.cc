@@ -5,6 +5,7 @@
 #include "view_field.h"
 
 #include <algorithm>
+#include <array>
 #include <functional>
 #include <iterator>
 #include <limits>
@@ -30,6 +31,7 @@ using geometry::ConvexPolygon;
 using geometry::LineSegment;
 using geometry::Vector2D;
 using geometry::utils::kTwoPi;
+using geometry::utils::MaskType;
 
 // TODO: Find a better eps.
 constexpr float kRotationEps = 1e-4f;
@@ -55,6 +57,210 @@ void AppendSightCandidates(const CircleLike& vision,
   }
 }
 
+// Appends the sight endpoints of the edges of `polygon`.
+void AppendSightEndpoints(const CircleLike& vision,
+                          const ConvexPolygon& polygon,
+                          std::vector<Vector2D>& endpoints) {
+  const std::vector<Vector2D>& vertices = polygon.vertices();
+  const int64_t n = vertices.size();
+  for (int64_t i = 0; i < n; ++i) {
+    const LineSegment edge(vertices[i], vertices[i + 1 < n ? i + 1 : 0]);
+    // Check one endpoint should be enough, the othe one will be checked in
+    // the next edge.
+    const Vector2D& x = edge.Endpoint0();
+    if (vision.Contains(x)) {
+      AppendSightCandidates(vision, x, endpoints);
+    }
+    const auto [p, q] = vision.Intersection(edge);
+    if (p.has_value()) {
+      AppendSightCandidates(vision, *p, endpoints);
+    }
+    if (q.has_value()) {
+      AppendSightCandidates(vision, *q, endpoints);
+    }
+  }
+}
+
+// Scratch space of AngularVisibleObjectsImpl, kept per thread.
+struct AngularVisibilityScratch {
+  std::vector<Vector2D> sight_endpoints;
+  std::vector<float> x;
+  std::vector<float> y;
+  std::vector<float> dis;
+  std::vector<float> cur_dis;
+  std::vector<int64_t> idx;
+  std::vector<MaskType> mask;
+  std::vector<MaskType> block_mask;
+  AngularIndex index;
+  ShadowProfile profile;
+};
+
+AngularVisibilityScratch& ThreadAngularVisibilityScratch() {
+  thread_local AngularVisibilityScratch scratch;
+  return scratch;
+}
+
+// Same as VisibleObjectsImpl into scratch.mask, the sight lines being sorted
+// by angle so that each occluder is only tested against the sight lines in its
+// angular interval.
+void AngularVisibleObjectsImpl(const std::vector<const ObjectBase*>& objects,
+                               const std::vector<const Occluder*>& occluders,
+                               const Vector2D& o,
+                               AngularVisibilityScratch& scratch) {
+  const int64_t n = objects.size();
+  const std::vector<Vector2D>& points = scratch.sight_endpoints;
+  const int64_t m = points.size();
+  geometry::utils::PackCoordinates(points, scratch.x, scratch.y);
+  AngularIndex& index = scratch.index;
+  index.Reset(o, scratch.x.data(), scratch.y.data(), m);
+  float* x = index.x();
+  float* y = index.y();
+  const int64_t* perm = index.index();
+
+  std::vector<float>& dis = scratch.dis;
+  std::vector<float>& cur_dis = scratch.cur_dis;
+  std::vector<int64_t>& idx = scratch.idx;
+  dis.assign(m, 1.0f);
+  idx.assign(m, -1);
+  cur_dis.resize(m);
+  std::array<std::pair<int64_t, int64_t>, 2> ranges;
+  for (int64_t i = 0; i < n; ++i) {
+    if (!objects[i]->can_block_sight()) {
+      continue;
+    }
+    const int64_t num_ranges = index.CandidateRanges(*occluders[i], ranges);
+    for (int64_t r = 0; r < num_ranges; ++r) {
+      const auto [begin, end] = ranges[r];
+      geometry::BatchParametricIntersection(o, x + begin, y + begin,
+                                            end - begin, occluders[i]->polygon,
+                                            cur_dis.data() + begin);
+      for (int64_t j = begin; j < end; ++j) {
+        if (cur_dis[j] < dis[j]) {
+          dis[j] = cur_dis[j];
+          idx[j] = i;
+        }
+      }
+    }
+  }
+
+  std::vector<MaskType>& mask = scratch.mask;
+  mask.assign(n, 0);
+  for (int64_t j = 0; j < m; ++j) {
+    const geometry::Vector2D p = LineSegment(o, points[perm[j]]).Point(dis[j]);
+    x[j] = p.x();
+    y[j] = p.y();
+    if (idx[j] != -1) {
+      mask[idx[j]] = 1;
+    }
+  }
+  // The truncated sight lines keep their directions, hence their order.
+  std::vector<MaskType>& block_mask = scratch.block_mask;
+  block_mask.resize(m);
+  for (int64_t i = 0; i < n; ++i) {
+    if (mask[i]) {
+      continue;
+    }
+    const int64_t num_ranges = index.CandidateRanges(*occluders[i], ranges);
+    for (int64_t r = 0; r < num_ranges; ++r) {
+      const auto [begin, end] = ranges[r];
+      MaskType* cur_mask = block_mask.data() + begin;
+      geometry::BatchIntersects(occluders[i]->polygon, o, x + begin, y + begin,
+                                end - begin, cur_mask);
+      // Use bitwise operation to get better performance.
+      mask[i] |= std::accumulate(cur_mask, cur_mask + (end - begin),
+                                 MaskType(0), std::bit_or<MaskType>());
+    }
+  }
+}
+
+// Same as AngularVisibleObjectsImpl, each sight line being tested against the
+// occluders of its sector of the shadow profile.
+void SweepVisibleObjectsImpl(const std::vector<const ObjectBase*>& objects,
+                             const std::vector<const Occluder*>& occluders,
+                             const Vector2D& o,
+                             AngularVisibilityScratch& scratch) {
+  const int64_t n = objects.size();
+  const std::vector<Vector2D>& points = scratch.sight_endpoints;
+  const int64_t m = points.size();
+  geometry::utils::PackCoordinates(points, scratch.x, scratch.y);
+  ShadowProfile& profile = scratch.profile;
+  profile.Reset(o, objects, occluders);
+  profile.SortPoints(scratch.x.data(), scratch.y.data(), m);
+  float* x = profile.x();
+  float* y = profile.y();
+  const int64_t* perm = profile.index();
+  const int64_t num_sectors = profile.num_sectors();
+
+  std::vector<float>& dis = scratch.dis;
+  std::vector<float>& cur_dis = scratch.cur_dis;
+  std::vector<int64_t>& idx = scratch.idx;
+  dis.assign(m, 1.0f);
+  idx.assign(m, -1);
+  cur_dis.resize(m);
+  for (int64_t sector = 0; sector < num_sectors; ++sector) {
+    const auto [begin, end] = profile.SectorPoints(sector);
+    if (begin == end) {
+      continue;
+    }
+    for (const int64_t* it = profile.OccludersBegin(sector);
+         it != profile.OccludersEnd(sector); ++it) {
+      const int64_t i = *it;
+      geometry::BatchParametricIntersection(o, x + begin, y + begin,
+                                            end - begin, occluders[i]->polygon,
+                                            cur_dis.data() + begin);
+      for (int64_t j = begin; j < end; ++j) {
+        if (cur_dis[j] < dis[j]) {
+          dis[j] = cur_dis[j];
+          idx[j] = i;
+        }
+      }
+    }
+  }
+
+  std::vector<MaskType>& mask = scratch.mask;
+  mask.assign(n, 0);
+  for (int64_t j = 0; j < m; ++j) {
+    const geometry::Vector2D p = LineSegment(o, points[perm[j]]).Point(dis[j]);
+    x[j] = p.x();
+    y[j] = p.y();
+    if (idx[j] != -1) {
+      mask[idx[j]] = 1;
+    }
+  }
+  // The occluders left out of a sector are behind the end of its truncated
+  // sight lines, only the ones of the sector may intersect them.
+  std::vector<MaskType>& block_mask = scratch.block_mask;
+  block_mask.resize(m);
+  for (int64_t sector = 0; sector < num_sectors; ++sector) {
+    const auto [begin, end] = profile.SectorPoints(sector);
+    if (begin == end) {
+      continue;
+    }
+    for (const int64_t* it = profile.OccludersBegin(sector);
+         it != profile.OccludersEnd(sector); ++it) {
+      const int64_t i = *it;
+      if (mask[i]) {
+        continue;
+      }
+      MaskType* cur_mask = block_mask.data() + begin;
+      geometry::BatchIntersects(occluders[i]->polygon, o, x + begin, y + begin,
+                                end - begin, cur_mask);
+      mask[i] |= std::accumulate(cur_mask, cur_mask + (end - begin),
+                                 MaskType(0), std::bit_or<MaskType>());
+    }
+  }
+  // The objects which cannot block the sight are not in the profile.
+  for (int64_t i = 0; i < n; ++i) {
+    if (mask[i] || objects[i]->can_block_sight()) {
+      continue;
+    }
+    geometry::BatchIntersects(occluders[i]->polygon, o, x, y, m,
+                              block_mask.data());
+    mask[i] |= std::accumulate(block_mask.cbegin(), block_mask.cend(),
+                               MaskType(0), std::bit_or<MaskType>());
+  }
+}
+
 std::vector<geometry::utils::MaskType> VisibleObjectsImpl(
     const std::vector<const ObjectBase*>& objects, const Vector2D& o,
     const std::vector<Vector2D>& points) {
@@ -158,6 +364,84 @@ void ViewField::FilterVisibleObjects(
   objects.resize(pivot);
 }
 
+void ViewField::FilterVisibleObjects(std::vector<const ObjectBase*>& objects,
+                                     std::vector<const Occluder*>& occluders,
+                                     OcclusionAlgorithm algorithm) const {
+  AngularVisibilityScratch& scratch = ThreadAngularVisibilityScratch();
+  ComputeSightEndpoints(occluders, scratch.sight_endpoints);
+  if (algorithm == OcclusionAlgorithm::kAngularSweep) {
+    SweepVisibleObjectsImpl(objects, occluders, vision_->center(), scratch);
+  } else {
+    AngularVisibleObjectsImpl(objects, occluders, vision_->center(), scratch);
+  }
+  const int64_t pivot = utils::MaskedPartition(scratch.mask, objects);
+  utils::MaskedPartition(scratch.mask, occluders);
+  objects.resize(pivot);
+  occluders.resize(pivot);
+}
+
+void ViewField::FilterOccludedPoints(
+    const std::vector<const ObjectBase*>& objects,
+    const std::vector<const Occluder*>& occluders,
+    std::vector<const geometry::PointLike*>& points,
+    OcclusionAlgorithm algorithm) const {
+  AngularVisibilityScratch& scratch = ThreadAngularVisibilityScratch();
+  const Vector2D& o = vision_->center();
+  const int64_t n = points.size();
+  geometry::utils::PackCoordinates(points, scratch.x, scratch.y);
+  std::vector<MaskType>& mask = scratch.mask;
+  std::vector<MaskType>& block_mask = scratch.block_mask;
+  mask.assign(n, 1);
+  block_mask.resize(n);
+  // Clears the mask of the sorted points [begin, end) hidden by `occluder`.
+  const auto apply_occluder = [&o, &mask, &block_mask](
+                                  const Occluder& occluder, const float* x,
+                                  const float* y, const int64_t* perm,
+                                  int64_t begin, int64_t end) {
+    geometry::BatchIntersects(occluder.polygon, o, x + begin, y + begin,
+                              end - begin, block_mask.data() + begin);
+    for (int64_t j = begin; j < end; ++j) {
+      // Use bitwise operation to get better performance.
+      // Use (^1) for not operation.
+      mask[perm[j]] &= (block_mask[j] ^ 1);
+    }
+  };
+
+  if (algorithm == OcclusionAlgorithm::kAngularSweep) {
+    ShadowProfile& profile = scratch.profile;
+    profile.Reset(o, objects, occluders);
+    profile.SortPoints(scratch.x.data(), scratch.y.data(), n);
+    const int64_t num_sectors = profile.num_sectors();
+    for (int64_t sector = 0; sector < num_sectors; ++sector) {
+      const auto [begin, end] = profile.SectorPoints(sector);
+      for (const int64_t* it = profile.OccludersBegin(sector);
+           begin < end && it != profile.OccludersEnd(sector); ++it) {
+        apply_occluder(*occluders[*it], profile.x(), profile.y(),
+                       profile.index(), begin, end);
+      }
+    }
+  } else {
+    AngularIndex& index = scratch.index;
+    index.Reset(o, scratch.x.data(), scratch.y.data(), n);
+    std::array<std::pair<int64_t, int64_t>, 2> ranges;
+    const int64_t num_objects = objects.size();
+    for (int64_t i = 0; i < num_objects; ++i) {
+      if (!objects[i]->can_block_sight()) {
+        continue;
+      }
+      // Only the points in the angular interval of the occluder may be hidden
+      // by it.
+      const int64_t num_ranges = index.CandidateRanges(*occluders[i], ranges);
+      for (int64_t r = 0; r < num_ranges; ++r) {
+        apply_occluder(*occluders[i], index.x(), index.y(), index.index(),
+                       ranges[r].first, ranges[r].second);
+      }
+    }
+  }
+  const int64_t pivot = utils::MaskedPartition(mask, points);
+  points.resize(pivot);
+}
+
 std::vector<const ObjectBase*> ViewField::VisibleNonblockingObjects(
     const std::vector<const ObjectBase*>& objects) const {
   std::vector<const ObjectBase*> ret;
@@ -195,8 +479,14 @@ std::vector<const geometry::PointLike*> ViewField::VisiblePoints(
 
 void ViewField::FilterVisiblePoints(
     std::vector<const geometry::PointLike*>& objects) const {
-  const std::vector<geometry::utils::MaskType> mask =
-      vision_->BatchContains(objects);
+  std::vector<geometry::utils::MaskType> mask;
+  FilterVisiblePoints(objects, mask);
+}
+
+void ViewField::FilterVisiblePoints(
+    std::vector<const geometry::PointLike*>& objects,
+    std::vector<geometry::utils::MaskType>& mask) const {
+  vision_->BatchContains(objects, mask);
   const int64_t pivot = utils::MaskedPartition(mask, objects);
   objects.resize(pivot);
 }
@@ -211,22 +501,7 @@ std::vector<Vector2D> ViewField::ComputeSightEndpoints(
     ret.push_back(o + vptr->Radius1());
   }
   for (const ObjectBase* obj : objects) {
-    const auto edges = obj->BoundingPolygon().Edges();
-    for (const LineSegment& edge : edges) {
-      // Check one endpoint should be enough, the othe one will be checked in
-      // the next edge.
-      const Vector2D& x = edge.Endpoint0();
-      if (vision_->Contains(x)) {
-        AppendSightCandidates(*vision_, x, ret);
-      }
-      const auto [p, q] = vision_->Intersection(edge);
-      if (p.has_value()) {
-        AppendSightCandidates(*vision_, *p, ret);
-      }
-      if (q.has_value()) {
-        AppendSightCandidates(*vision_, *q, ret);
-      }
-    }
+    AppendSightEndpoints(*vision_, obj->BoundingPolygon(), ret);
   }
   // Remove duplicate endpoints.
   std::sort(ret.begin(), ret.end());
@@ -235,4 +510,23 @@ std::vector<Vector2D> ViewField::ComputeSightEndpoints(
   return ret;
 }
 
+void ViewField::ComputeSightEndpoints(
+    const std::vector<const Occluder*>& occluders,
+    std::vector<Vector2D>& ret) const {
+  ret.clear();
+  const Vector2D& o = vision_->center();
+  if (!panoramic_view_) {
+    const CircularSector* vptr = dynamic_cast<CircularSector*>(vision_.get());
+    ret.push_back(o + vptr->Radius0());
+    ret.push_back(o + vptr->Radius1());
+  }
+  for (const Occluder* occluder : occluders) {
+    AppendSightEndpoints(*vision_, occluder->polygon, ret);
+  }
+  // Remove duplicate endpoints.
+  std::sort(ret.begin(), ret.end());
+  auto it = std::unique(ret.begin(), ret.end());
+  ret.resize(std::distance(ret.begin(), it));
+}
+
 }  // namespace nocturne
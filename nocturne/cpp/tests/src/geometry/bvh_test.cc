@@ -22,6 +22,7 @@ namespace {
 
 using testing::ElementsAreArray;
 using testing::UnorderedElementsAre;
+using testing::UnorderedElementsAreArray;
 
 class MockObject : public AABBInterface {
  public:
@@ -30,6 +31,8 @@ class MockObject : public AABBInterface {
 
   int64_t id() const { return id_; }
 
+  void set_center(const Vector2D& center) { center_ = center; }
+
   AABB GetAABB() const override {
     return AABB(center_ - radius_, center_ + radius_);
   }
@@ -160,6 +163,86 @@ TEST(BVHTest, LineSegmentIntersectionCandidatesTest) {
   EXPECT_THAT(candidates, UnorderedElementsAre(&obj3));
 }
 
+TEST(BVHTest, RefitTest) {
+  MockObject obj1(1, Vector2D(0.0f, 0.0f), 1.0f);
+  MockObject obj2(2, Vector2D(0.5f, 0.5f), 1.0f);
+  MockObject obj3(3, Vector2D(10.0f, 0.0f), 1.0f);
+  MockObject obj4(4, Vector2D(10.0f, 1.5f), 1.0f);
+  MockObject obj5(5, Vector2D(-10.0f, -10.0f), 1.0f);
+
+  std::vector<const MockObject*> objects = {&obj1, &obj2, &obj3, &obj4, &obj5};
+  TestBVH bvh(objects);
+  EXPECT_FLOAT_EQ(bvh.Refit(), 1.0f);
+
+  obj2.set_center(Vector2D(10.5f, 0.5f));
+  obj5.set_center(Vector2D(-10.0f, -9.0f));
+  EXPECT_GT(bvh.Refit(), 1.0f);
+  std::vector<const MockObject*> candidates =
+      bvh.IntersectionCandidates<MockObject>(obj1);
+  EXPECT_THAT(candidates, UnorderedElementsAre(&obj1));
+  candidates = bvh.IntersectionCandidates<MockObject>(obj3);
+  EXPECT_THAT(candidates, UnorderedElementsAre(&obj2, &obj3, &obj4));
+  candidates = bvh.IntersectionCandidates<MockObject>(
+      LineSegment(Vector2D(-11.0f, -8.5f), Vector2D(-9.0f, -8.5f)));
+  EXPECT_THAT(candidates, UnorderedElementsAre(&obj5));
+}
+
+TEST(BVHTest, RemoveTest) {
+  const int64_t n = 100;
+  const std::vector<MockObject> objects = MakeRandomObjects(n);
+  TestBVH bvh(objects);
+  for (int64_t i = 0; i < n; i += 2) {
+    EXPECT_TRUE(bvh.Remove(&objects[i]));
+  }
+  EXPECT_FALSE(bvh.Remove(&objects[0]));
+
+  std::vector<const AABBInterface*> expected_leaves;
+  for (int64_t i = 1; i < n; i += 2) {
+    expected_leaves.push_back(&objects[i]);
+  }
+  EXPECT_THAT(bvh.Leaves(), UnorderedElementsAreArray(expected_leaves));
+  for (int64_t i = 0; i < n; ++i) {
+    const std::vector<const MockObject*> candidates =
+        bvh.IntersectionCandidates<MockObject>(objects[i]);
+    EXPECT_EQ(std::count(candidates.cbegin(), candidates.cend(), &objects[i]),
+              i % 2);
+  }
+
+  for (int64_t i = 1; i < n; i += 2) {
+    EXPECT_TRUE(bvh.Remove(&objects[i]));
+  }
+  EXPECT_TRUE(bvh.Empty());
+  EXPECT_TRUE(bvh.IntersectionCandidates<MockObject>(objects[1]).empty());
+}
+
+TEST(BVHTest, RemoveAtTest) {
+  const int64_t n = 100;
+  const std::vector<MockObject> objects = MakeRandomObjects(n);
+  TestBVH bvh(objects);
+  for (int64_t i = 0; i < n; i += 2) {
+    EXPECT_TRUE(bvh.RemoveAt(i));
+  }
+  EXPECT_FALSE(bvh.RemoveAt(0));
+  EXPECT_FALSE(bvh.Remove(&objects[0]));
+
+  std::vector<const AABBInterface*> expected_leaves;
+  for (int64_t i = 1; i < n; i += 2) {
+    expected_leaves.push_back(&objects[i]);
+  }
+  EXPECT_THAT(bvh.Leaves(), UnorderedElementsAreArray(expected_leaves));
+  for (int64_t i = 0; i < n; ++i) {
+    const std::vector<const MockObject*> candidates =
+        bvh.IntersectionCandidates<MockObject>(objects[i]);
+    EXPECT_EQ(std::count(candidates.cbegin(), candidates.cend(), &objects[i]),
+              i % 2);
+  }
+
+  for (int64_t i = 1; i < n; i += 2) {
+    EXPECT_TRUE(bvh.RemoveAt(i));
+  }
+  EXPECT_TRUE(bvh.Empty());
+}
+
 }  // namespace
 }  // namespace geometry
 }  // namespace nocturne
@@ -0,0 +1,99 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "geometry/point_grid.h"
+
+#include <gmock/gmock-matchers.h>
+#include <gtest/gtest.h>
+
+#include <algorithm>
+#include <cmath>
+#include <random>
+#include <vector>
+
+#include "geometry/point_like.h"
+#include "geometry/vector_2d.h"
+
+namespace nocturne {
+namespace geometry {
+namespace {
+
+using testing::UnorderedElementsAreArray;
+
+class MockPoint : public PointLike {
+ public:
+  MockPoint(const Vector2D& point) : point_(point) {}
+
+  Vector2D Coordinate() const override { return point_; }
+
+ protected:
+  Vector2D point_;
+};
+
+TEST(PointGridTest, RingPointsTest) {
+  std::mt19937 gen(0);
+  std::uniform_real_distribution<float> pos_dis(-100.0f, 100.0f);
+  std::vector<MockPoint> points;
+  for (int64_t i = 0; i < 1000; ++i) {
+    points.emplace_back(Vector2D(pos_dis(gen), pos_dis(gen)));
+  }
+  // Duplicate points all go to the same cell.
+  points.emplace_back(points[0].Coordinate());
+  std::vector<const MockPoint*> ptrs;
+  for (const MockPoint& p : points) {
+    ptrs.push_back(&p);
+  }
+  const PointGrid grid(ptrs, /*cell_size=*/10.0f);
+  EXPECT_EQ(grid.Size(), points.size());
+  EXPECT_GT(grid.num_cells(), 1);
+
+  std::uniform_real_distribution<float> query_dis(-150.0f, 150.0f);
+  for (int64_t i = 0; i < 100; ++i) {
+    const Vector2D o(query_dis(gen), query_dis(gen));
+    const int64_t num_rings = grid.NumRings(o);
+    std::vector<const MockPoint*> visited;
+    float bound = 0.0f;
+    for (int64_t ring = 0; ring < num_rings; ++ring) {
+      const int64_t num_visited = visited.size();
+      const float prev_bound = bound;
+      bound = grid.RingPoints(o, ring, visited);
+      EXPECT_GE(bound, prev_bound);
+      // The points of the next rings are further than the bound.
+      for (const MockPoint* p : ptrs) {
+        if (std::find(visited.cbegin(), visited.cend(), p) == visited.cend()) {
+          EXPECT_GE(Distance(o, p->Coordinate()), bound);
+        }
+      }
+      // The points of this ring are further than the previous bound.
+      for (int64_t j = num_visited; j < static_cast<int64_t>(visited.size());
+           ++j) {
+        EXPECT_GE(Distance(o, visited[j]->Coordinate()), prev_bound);
+      }
+    }
+    EXPECT_TRUE(std::isinf(bound));
+    EXPECT_THAT(visited, UnorderedElementsAreArray(ptrs));
+  }
+}
+
+TEST(PointGridTest, EmptyTest) {
+  PointGrid grid;
+  EXPECT_TRUE(grid.Empty());
+  EXPECT_EQ(grid.NumRings(Vector2D(0.0f, 0.0f)), 0);
+  std::vector<const PointLike*> visited;
+  EXPECT_TRUE(std::isinf(grid.RingPoints(Vector2D(0.0f, 0.0f), 0, visited)));
+  EXPECT_TRUE(visited.empty());
+
+  // A single point.
+  const MockPoint point(Vector2D(1.0f, 2.0f));
+  grid.Reset(std::vector<const MockPoint*>{&point}, /*cell_size=*/1.0f);
+  EXPECT_EQ(grid.Size(), 1);
+  EXPECT_EQ(grid.NumRings(Vector2D(-5.0f, 7.0f)), 1);
+  EXPECT_TRUE(std::isinf(grid.RingPoints(Vector2D(-5.0f, 7.0f), 0, visited)));
+  ASSERT_EQ(visited.size(), 1);
+  EXPECT_EQ(visited[0], &point);
+}
+
+}  // namespace
+}  // namespace geometry
+}  // namespace nocturne
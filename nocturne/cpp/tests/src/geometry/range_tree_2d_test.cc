@@ -74,6 +74,11 @@ TEST(RangeTree2dTest, RangeSearchTest) {
   for (size_t i = 0; i < ret.size(); ++i) {
     EXPECT_EQ(ret[i], ans[i]);
   }
+
+  // Searching into a non-empty vector replaces its content.
+  const AABB aabb2(0.0, -5.0, 15.0, 5.0);
+  tree.RangeSearch<MockPoint>(aabb2, ret);
+  EXPECT_EQ(ret, tree.RangeSearch<MockPoint>(aabb2));
 }
 
 }  // namespace
@@ -0,0 +1,98 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "geometry/uniform_grid.h"
+
+#include <gmock/gmock-matchers.h>
+#include <gtest/gtest.h>
+
+#include <memory>
+#include <random>
+#include <vector>
+
+#include "geometry/aabb.h"
+#include "geometry/bvh.h"
+#include "geometry/line_segment.h"
+#include "geometry/vector_2d.h"
+
+namespace nocturne {
+namespace geometry {
+namespace {
+
+using testing::UnorderedElementsAre;
+using testing::UnorderedElementsAreArray;
+
+TEST(UniformGridTest, IntersectionCandidatesTest) {
+  const std::vector<std::shared_ptr<LineSegment>> segments = {
+      std::make_shared<LineSegment>(Vector2D(0.0f, 0.0f), Vector2D(1.0f, 1.0f)),
+      std::make_shared<LineSegment>(Vector2D(0.5f, 2.0f),
+                                    Vector2D(10.0f, 0.5f)),
+      std::make_shared<LineSegment>(Vector2D(9.0f, 9.0f),
+                                    Vector2D(10.0f, 10.0f)),
+      std::make_shared<LineSegment>(Vector2D(-5.0f, 10.0f),
+                                    Vector2D(-4.0f, -3.0f)),
+  };
+  const UniformGrid grid(segments, /*cell_size=*/1.0f);
+  EXPECT_EQ(grid.Size(), 4);
+  EXPECT_GT(grid.num_cells(), 1);
+
+  // Segments overlapping several cells of the query are reported once.
+  std::vector<const LineSegment*> candidates =
+      grid.IntersectionCandidates<LineSegment>(AABB(-1.0f, -1.0f, 3.0f, 3.0f));
+  EXPECT_THAT(candidates,
+              UnorderedElementsAre(segments[0].get(), segments[1].get()));
+  candidates =
+      grid.IntersectionCandidates<LineSegment>(AABB(8.5f, 8.5f, 9.5f, 9.5f));
+  EXPECT_THAT(candidates, UnorderedElementsAre(segments[2].get()));
+  candidates = grid.IntersectionCandidates<LineSegment>(
+      AABB(-6.0f, -6.0f, 12.0f, 12.0f));
+  EXPECT_EQ(candidates.size(), segments.size());
+  candidates = grid.IntersectionCandidates<LineSegment>(
+      AABB(20.0f, 20.0f, 21.0f, 21.0f));
+  EXPECT_TRUE(candidates.empty());
+}
+
+TEST(UniformGridTest, BVHCandidatesTest) {
+  std::mt19937 gen(0);
+  std::uniform_real_distribution<float> pos_dis(-100.0f, 100.0f);
+  std::uniform_real_distribution<float> len_dis(-1.0f, 1.0f);
+  std::vector<std::shared_ptr<LineSegment>> segments;
+  for (int64_t i = 0; i < 1000; ++i) {
+    const Vector2D p(pos_dis(gen), pos_dis(gen));
+    segments.push_back(std::make_shared<LineSegment>(
+        p, p + Vector2D(len_dis(gen), len_dis(gen))));
+  }
+  const BVH bvh(segments);
+  const UniformGrid grid(segments);
+  EXPECT_GT(grid.cell_size(), 0.0f);
+  for (int64_t i = 0; i < 100; ++i) {
+    const Vector2D p(pos_dis(gen), pos_dis(gen));
+    const LineSegment query(p, p + Vector2D(5.0f, 3.0f));
+    EXPECT_THAT(
+        grid.IntersectionCandidates<LineSegment>(query),
+        UnorderedElementsAreArray(bvh.IntersectionCandidates<LineSegment>(
+            static_cast<const AABBInterface&>(query))));
+  }
+}
+
+TEST(UniformGridTest, EmptyTest) {
+  UniformGrid grid;
+  EXPECT_TRUE(grid.Empty());
+  EXPECT_TRUE(
+      grid.IntersectionCandidates<LineSegment>(AABB(0.0f, 0.0f, 1.0f, 1.0f))
+          .empty());
+
+  const std::vector<std::shared_ptr<LineSegment>> segments = {
+      std::make_shared<LineSegment>(Vector2D(1.0f, 1.0f), Vector2D(1.0f, 1.0f)),
+  };
+  grid.Reset(segments);
+  EXPECT_FALSE(grid.Empty());
+  EXPECT_EQ(grid.num_cells(), 1);
+  grid.Clear();
+  EXPECT_TRUE(grid.Empty());
+}
+
+}  // namespace
+}  // namespace geometry
+}  // namespace nocturne
@@ -0,0 +1,101 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "object_state_store.h"
+
+#include <gtest/gtest.h>
+
+#include <memory>
+#include <vector>
+
+#include "geometry/geometry_utils.h"
+#include "geometry/vector_2d.h"
+#include "object.h"
+
+namespace nocturne {
+namespace {
+
+using geometry::utils::kQuarterPi;
+
+TEST(ObjectStateStoreTest, KinematicBicycleStepTest) {
+  const float dt = 0.1f;
+  const int num_objects = 10;
+  const int num_steps = 20;
+
+  // Standalone objects own their state, the others are views into the store.
+  std::vector<std::unique_ptr<Object>> standalone_objects;
+  std::vector<std::unique_ptr<Object>> objects;
+  auto store = std::make_shared<ObjectStateStore>();
+  for (int i = 0; i < num_objects; ++i) {
+    for (auto* vec : {&standalone_objects, &objects}) {
+      auto obj = std::make_unique<Object>(
+          /*id=*/i, /*length=*/2.0f, /*width=*/1.0f, /*max_speed=*/5.0f,
+          geometry::Vector2D(i, -i), /*heading=*/kQuarterPi * i,
+          /*speed=*/0.5f * i, geometry::Vector2D(0.0f, 0.0f),
+          /*target_heading=*/0.0f, /*target_speed=*/0.0f,
+          /*can_block_sight=*/true, /*can_be_collided=*/true,
+          /*check_collision=*/true, vec == &objects ? store : nullptr);
+      obj->set_acceleration(0.3f * i - 1.0f);
+      obj->set_steering(0.05f * i - 0.2f);
+      vec->push_back(std::move(obj));
+    }
+  }
+  ASSERT_EQ(store->size(), num_objects);
+
+  for (int t = 0; t < num_steps; ++t) {
+    for (auto& obj : standalone_objects) {
+      obj->Step(dt);
+    }
+    store->KinematicBicycleStep(dt);
+  }
+  for (int i = 0; i < num_objects; ++i) {
+    EXPECT_EQ(objects[i]->state_index(), i);
+    EXPECT_EQ(objects[i]->position(), standalone_objects[i]->position());
+    EXPECT_EQ(objects[i]->heading(), standalone_objects[i]->heading());
+    EXPECT_EQ(objects[i]->speed(), standalone_objects[i]->speed());
+    EXPECT_LE(objects[i]->speed(), objects[i]->max_speed());
+  }
+}
+
+TEST(ObjectStateStoreTest, ExpertStepTest) {
+  const std::vector<std::vector<geometry::Vector2D>> expert_trajectories = {
+      {geometry::Vector2D(0.0f, 0.0f), geometry::Vector2D(1.0f, 2.0f)},
+      {geometry::Vector2D(5.0f, 5.0f), geometry::Vector2D(6.0f, 7.0f)},
+      {geometry::Vector2D(9.0f, 9.0f), geometry::Vector2D(3.0f, 3.0f)}};
+  const std::vector<std::vector<float>> expert_headings = {
+      {0.0f, 0.5f}, {1.0f, 1.5f}, {2.0f, 2.5f}};
+  const std::vector<std::vector<float>> expert_speeds = {
+      {1.0f, 2.0f}, {3.0f, 4.0f}, {5.0f, 6.0f}};
+
+  ObjectStateStore store;
+  for (int64_t id = 0; id < 3; ++id) {
+    store.Add(id, expert_trajectories[id][0], expert_headings[id][0],
+              expert_speeds[id][0], /*object_max_speed=*/10.0f);
+    store.acceleration[id] = 1.0f;
+  }
+  store.flags[0] = ObjectStateStore::kExpertControl;
+  store.flags[2] =
+      ObjectStateStore::kExpertControl | ObjectStateStore::kRemoved;
+
+  store.KinematicBicycleStep(/*dt=*/0.1f);
+  store.ExpertStep(/*time=*/1, expert_trajectories, expert_headings,
+                   expert_speeds);
+
+  // Expert controlled object.
+  EXPECT_FLOAT_EQ(store.x[0], 1.0f);
+  EXPECT_FLOAT_EQ(store.y[0], 2.0f);
+  EXPECT_FLOAT_EQ(store.heading[0], 0.5f);
+  EXPECT_FLOAT_EQ(store.speed[0], 2.0f);
+  // Free object.
+  EXPECT_NE(store.x[1], 6.0f);
+  EXPECT_FLOAT_EQ(store.speed[1], 3.1f);
+  // Removed object.
+  EXPECT_FLOAT_EQ(store.x[2], 9.0f);
+  EXPECT_FLOAT_EQ(store.y[2], 9.0f);
+  EXPECT_FLOAT_EQ(store.heading[2], 2.0f);
+  EXPECT_FLOAT_EQ(store.speed[2], 5.0f);
+}
+
+}  // namespace
+}  // namespace nocturne
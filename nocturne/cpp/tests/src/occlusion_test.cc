@@ -0,0 +1,193 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "occlusion.h"
+
+#include <gtest/gtest.h>
+
+#include <algorithm>
+#include <array>
+#include <random>
+#include <utility>
+#include <vector>
+
+#include "geometry/geometry_utils.h"
+#include "geometry/intersection.h"
+#include "geometry/polygon.h"
+#include "geometry/vector_2d.h"
+#include "object_base.h"
+
+namespace nocturne {
+namespace {
+
+using geometry::ConvexPolygon;
+using geometry::Vector2D;
+using geometry::utils::kPi;
+
+Occluder MakeOccluder(const Vector2D& center, float length, float width,
+                      float heading) {
+  Occluder occluder;
+  occluder.polygon = ConvexPolygon(
+      {Vector2D(length * 0.5f, width * 0.5f).Rotate(heading) + center,
+       Vector2D(-length * 0.5f, width * 0.5f).Rotate(heading) + center,
+       Vector2D(-length * 0.5f, -width * 0.5f).Rotate(heading) + center,
+       Vector2D(length * 0.5f, -width * 0.5f).Rotate(heading) + center});
+  occluder.aabb = occluder.polygon.GetAABB();
+  return occluder;
+}
+
+TEST(AngularIndexTest, CandidateRangesTest) {
+  std::mt19937 gen(0);
+  std::uniform_real_distribution<float> pos_dis(-50.0f, 50.0f);
+  std::uniform_real_distribution<float> heading_dis(-kPi, kPi);
+  std::uniform_real_distribution<float> size_dis(0.5f, 8.0f);
+  constexpr int64_t kNumPoints = 2000;
+  constexpr int64_t kNumOccluders = 200;
+
+  const Vector2D o(pos_dis(gen) * 0.1f, pos_dis(gen) * 0.1f);
+  std::vector<float> x(kNumPoints);
+  std::vector<float> y(kNumPoints);
+  for (int64_t i = 0; i < kNumPoints; ++i) {
+    x[i] = pos_dis(gen);
+    y[i] = pos_dis(gen);
+  }
+  AngularIndex index;
+  index.Reset(o, x.data(), y.data(), kNumPoints);
+  ASSERT_EQ(index.size(), kNumPoints);
+  std::vector<int64_t> count(kNumPoints, 0);
+  for (int64_t i = 0; i < kNumPoints; ++i) {
+    const int64_t j = index.index()[i];
+    EXPECT_EQ(index.x()[i], x[j]);
+    EXPECT_EQ(index.y()[i], y[j]);
+    ++count[j];
+  }
+  EXPECT_EQ(std::count(count.cbegin(), count.cend(), 1), kNumPoints);
+
+  std::array<std::pair<int64_t, int64_t>, 2> ranges;
+  std::vector<geometry::utils::MaskType> mask(kNumPoints);
+  int64_t num_candidates = 0;
+  for (int64_t k = 0; k < kNumOccluders; ++k) {
+    const Occluder occluder =
+        MakeOccluder(Vector2D(pos_dis(gen), pos_dis(gen)), size_dis(gen),
+                     size_dis(gen), heading_dis(gen));
+    geometry::BatchIntersects(occluder.polygon, o, index.x(), index.y(),
+                              kNumPoints, mask.data());
+    std::vector<bool> is_candidate(kNumPoints, false);
+    const int64_t num_ranges = index.CandidateRanges(occluder, ranges);
+    ASSERT_GE(num_ranges, 1);
+    ASSERT_LE(num_ranges, 2);
+    for (int64_t r = 0; r < num_ranges; ++r) {
+      ASSERT_LE(0, ranges[r].first);
+      ASSERT_LE(ranges[r].first, ranges[r].second);
+      ASSERT_LE(ranges[r].second, kNumPoints);
+      for (int64_t i = ranges[r].first; i < ranges[r].second; ++i) {
+        is_candidate[i] = true;
+        ++num_candidates;
+      }
+    }
+    for (int64_t i = 0; i < kNumPoints; ++i) {
+      if (mask[i]) {
+        EXPECT_TRUE(is_candidate[i]);
+      }
+    }
+  }
+  // Most of the points are pruned for most of the occluders.
+  EXPECT_LT(num_candidates, kNumPoints * kNumOccluders / 4);
+}
+
+// Objects only used for their can_block_sight flag.
+class MockObject : public ObjectBase {
+ public:
+  explicit MockObject(bool can_block_sight)
+      : ObjectBase(Vector2D(0.0f, 0.0f), can_block_sight,
+                   /*can_be_collided=*/true, /*check_collision=*/true) {}
+
+  float Radius() const override { return 0.0f; }
+  ConvexPolygon BoundingPolygon() const override { return ConvexPolygon(); }
+
+ protected:
+  void draw(sf::RenderTarget& /*target*/,
+            sf::RenderStates /*states*/) const override {}
+};
+
+TEST(ShadowProfileTest, SectorsTest) {
+  std::mt19937 gen(0);
+  std::uniform_real_distribution<float> pos_dis(-50.0f, 50.0f);
+  std::uniform_real_distribution<float> heading_dis(-kPi, kPi);
+  std::uniform_real_distribution<float> size_dis(0.5f, 8.0f);
+  std::bernoulli_distribution block_dis(0.9);
+  constexpr int64_t kNumPoints = 2000;
+  constexpr int64_t kNumOccluders = 64;
+
+  const Vector2D o(pos_dis(gen) * 0.1f, pos_dis(gen) * 0.1f);
+  std::vector<MockObject> objects;
+  std::vector<Occluder> occluders;
+  objects.reserve(kNumOccluders);
+  occluders.reserve(kNumOccluders);
+  std::vector<const ObjectBase*> object_ptrs;
+  std::vector<const Occluder*> occluder_ptrs;
+  for (int64_t i = 0; i < kNumOccluders; ++i) {
+    objects.emplace_back(block_dis(gen));
+    occluders.push_back(MakeOccluder(Vector2D(pos_dis(gen), pos_dis(gen)),
+                                     size_dis(gen), size_dis(gen),
+                                     heading_dis(gen)));
+    object_ptrs.push_back(&objects.back());
+    occluder_ptrs.push_back(&occluders.back());
+  }
+  // An occluder containing the observer.
+  occluders.back() = MakeOccluder(o, 4.0f, 2.0f, 0.0f);
+  std::vector<float> x(kNumPoints);
+  std::vector<float> y(kNumPoints);
+  for (int64_t i = 0; i < kNumPoints; ++i) {
+    x[i] = pos_dis(gen);
+    y[i] = pos_dis(gen);
+  }
+
+  ShadowProfile profile;
+  profile.Reset(o, object_ptrs, occluder_ptrs);
+  profile.SortPoints(x.data(), y.data(), kNumPoints);
+  std::vector<int64_t> count(kNumPoints, 0);
+  int64_t num_candidates = 0;
+  for (int64_t sector = 0; sector < profile.num_sectors(); ++sector) {
+    const auto [begin, end] = profile.SectorPoints(sector);
+    EXPECT_TRUE(std::is_sorted(profile.OccludersBegin(sector),
+                               profile.OccludersEnd(sector)));
+    for (int64_t j = begin; j < end; ++j) {
+      const int64_t i = profile.index()[j];
+      EXPECT_EQ(profile.x()[j], x[i]);
+      EXPECT_EQ(profile.y()[j], y[i]);
+      ++count[i];
+
+      // The point is hidden by an occluder of its sector iff it is hidden by
+      // any of the occluders.
+      bool expected = false;
+      for (int64_t k = 0; k < kNumOccluders; ++k) {
+        if (!objects[k].can_block_sight()) {
+          continue;
+        }
+        geometry::utils::MaskType mask = 0;
+        geometry::BatchIntersects(occluders[k].polygon, o, &x[i], &y[i], 1,
+                                  &mask);
+        expected |= static_cast<bool>(mask);
+      }
+      bool actual = false;
+      for (const int64_t* it = profile.OccludersBegin(sector);
+           it != profile.OccludersEnd(sector); ++it) {
+        EXPECT_TRUE(objects[*it].can_block_sight());
+        geometry::utils::MaskType mask = 0;
+        geometry::BatchIntersects(occluders[*it].polygon, o, &x[i], &y[i], 1,
+                                  &mask);
+        actual |= static_cast<bool>(mask);
+        ++num_candidates;
+      }
+      EXPECT_EQ(actual, expected);
+    }
+  }
+  EXPECT_EQ(std::count(count.cbegin(), count.cend(), 1), kNumPoints);
+  // Most of the occluders are pruned for most of the points.
+  EXPECT_LT(num_candidates, kNumPoints * kNumOccluders / 8);
+}
+
+}  // namespace
+}  // namespace nocturne
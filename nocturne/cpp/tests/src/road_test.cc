@@ -52,5 +52,48 @@ TEST(RoadLineTest, SampleRoadPointTest) {
   }
 }
 
+TEST(RoadPointTableTest, AppendTest) {
+  const RoadLine lane(
+      RoadType::kLane,
+      {geometry::Vector2D(0.0f, 0.0f), geometry::Vector2D(3.0f, 4.0f),
+       geometry::Vector2D(3.0f, 6.0f)},
+      /*sample_every_n=*/1, /*check_collision=*/false,
+      /*first_point_index=*/0);
+  const RoadLine road_edge(
+      RoadType::kRoadEdge,
+      {geometry::Vector2D(-1.0f, 0.0f), geometry::Vector2D(-1.0f, -2.0f)},
+      /*sample_every_n=*/1, /*check_collision=*/true,
+      /*first_point_index=*/3);
+  RoadPointTable table;
+  table.Append(lane);
+  table.Append(road_edge);
+  ASSERT_EQ(table.size(), 5);
+  for (const RoadLine* road_line : {&lane, &road_edge}) {
+    for (const RoadPoint& point : road_line->road_points()) {
+      const int64_t i = point.index();
+      ASSERT_GE(i, 0);
+      ASSERT_LT(i, table.size());
+      const geometry::Vector2D d = point.neighbor_position() - point.position();
+      EXPECT_EQ(table.x[i], point.position().x());
+      EXPECT_EQ(table.y[i], point.position().y());
+      EXPECT_EQ(table.neighbor_x[i], d.x());
+      EXPECT_EQ(table.neighbor_y[i], d.y());
+      EXPECT_EQ(table.neighbor_distance[i], d.Norm());
+      EXPECT_EQ(table.neighbor_angle[i], d.Angle());
+      EXPECT_EQ(table.road_type[i], road_line->road_type());
+    }
+  }
+  EXPECT_FLOAT_EQ(table.neighbor_distance[0], 5.0f);
+  EXPECT_FLOAT_EQ(table.neighbor_angle[3], -geometry::utils::kHalfPi);
+  // The last point of a road line is its own neighbor.
+  EXPECT_EQ(table.neighbor_distance[2], 0.0f);
+
+  const RoadLine unindexed(RoadType::kLane, {geometry::Vector2D(0.0f, 0.0f),
+                                             geometry::Vector2D(1.0f, 0.0f)});
+  for (const RoadPoint& point : unindexed.road_points()) {
+    EXPECT_EQ(point.index(), -1);
+  }
+}
+
 }  // namespace
 }  // namespace nocturne
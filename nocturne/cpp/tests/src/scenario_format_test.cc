@@ -0,0 +1,140 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_format.h"
+
+#include <gtest/gtest.h>
+
+#include <memory>
+#include <nlohmann/json.hpp>
+#include <stdexcept>
+#include <string>
+
+namespace nocturne {
+namespace {
+
+nlohmann::json MakeScenarioJson() {
+  return nlohmann::json::parse(R"({
+    "name": "test_scenario",
+    "objects": [
+      {
+        "type": "vehicle",
+        "length": 4.5,
+        "width": 2.0,
+        "position": [{"x": 1.0, "y": 2.0}, {"x": 1.5, "y": 2.5}],
+        "heading": [90.0, 45.0],
+        "velocity": [{"x": 0.0, "y": 1.0}, {"x": 3.0, "y": 4.0}],
+        "valid": [true, false],
+        "goalPosition": {"x": 10.0, "y": 20.0},
+        "is_av": 1
+      },
+      {
+        "type": "pedestrian",
+        "length": 1.0,
+        "width": 1.0,
+        "position": [{"x": -1.0, "y": -2.0}],
+        "heading": [0.0],
+        "velocity": [{"x": 0.0, "y": 0.0}],
+        "valid": [true]
+      }
+    ],
+    "roads": [
+      {"type": "road_edge",
+       "geometry": [{"x": 0.0, "y": 0.0}, {"x": 1.0, "y": 0.0},
+                    {"x": 2.0, "y": 1.0}]},
+      {"type": "stop_sign", "geometry": [{"x": 5.0, "y": 5.0}]}
+    ],
+    "tl_states": {
+      "7": {"x": [3.0], "y": [4.0], "state": ["stop", "go"],
+            "time_index": [0, 1]}
+    }
+  })");
+}
+
+void ExpectScenarioDataEq(const ScenarioData& lhs, const ScenarioData& rhs) {
+  EXPECT_EQ(lhs.name, rhs.name);
+  EXPECT_EQ(lhs.object_types, rhs.object_types);
+  EXPECT_EQ(lhs.object_lengths, rhs.object_lengths);
+  EXPECT_EQ(lhs.object_widths, rhs.object_widths);
+  EXPECT_EQ(lhs.goal_x, rhs.goal_x);
+  EXPECT_EQ(lhs.goal_y, rhs.goal_y);
+  EXPECT_EQ(lhs.is_av, rhs.is_av);
+  EXPECT_EQ(lhs.trajectory_offsets, rhs.trajectory_offsets);
+  EXPECT_EQ(lhs.x, rhs.x);
+  EXPECT_EQ(lhs.y, rhs.y);
+  EXPECT_EQ(lhs.heading, rhs.heading);
+  EXPECT_EQ(lhs.velocity_x, rhs.velocity_x);
+  EXPECT_EQ(lhs.velocity_y, rhs.velocity_y);
+  EXPECT_EQ(lhs.valid, rhs.valid);
+  EXPECT_EQ(lhs.road_types, rhs.road_types);
+  EXPECT_EQ(lhs.road_offsets, rhs.road_offsets);
+  EXPECT_EQ(lhs.road_x, rhs.road_x);
+  EXPECT_EQ(lhs.road_y, rhs.road_y);
+  EXPECT_EQ(lhs.traffic_light_x, rhs.traffic_light_x);
+  EXPECT_EQ(lhs.traffic_light_y, rhs.traffic_light_y);
+  EXPECT_EQ(lhs.traffic_light_offsets, rhs.traffic_light_offsets);
+  EXPECT_EQ(lhs.traffic_light_states, rhs.traffic_light_states);
+  EXPECT_EQ(lhs.traffic_light_times, rhs.traffic_light_times);
+}
+
+TEST(ScenarioFormatTest, ParseJsonTest) {
+  const ScenarioData data = ParseJsonScenario(MakeScenarioJson());
+  EXPECT_EQ(data.name, "test_scenario");
+  ASSERT_EQ(data.num_objects(), 2);
+  EXPECT_EQ(data.object_types[0], ObjectType::kVehicle);
+  EXPECT_EQ(data.object_types[1], ObjectType::kPedestrian);
+  EXPECT_EQ(data.is_av, (std::vector<uint8_t>{1, 0}));
+  EXPECT_EQ(data.goal_x, (std::vector<float>{10.0f, 0.0f}));
+  EXPECT_EQ(data.trajectory_offsets, (std::vector<int64_t>{0, 2, 3}));
+  EXPECT_EQ(data.x, (std::vector<float>{1.0f, 1.5f, -1.0f}));
+  EXPECT_EQ(data.heading, (std::vector<float>{90.0f, 45.0f, 0.0f}));
+  EXPECT_EQ(data.valid, (std::vector<uint8_t>{1, 0, 1}));
+  ASSERT_EQ(data.num_roads(), 2);
+  EXPECT_EQ(data.road_types[0], RoadType::kRoadEdge);
+  EXPECT_EQ(data.road_types[1], RoadType::kStopSign);
+  EXPECT_EQ(data.road_offsets, (std::vector<int64_t>{0, 3, 4}));
+  ASSERT_EQ(data.num_traffic_lights(), 1);
+  EXPECT_EQ(data.traffic_light_states,
+            (std::vector<TrafficLightState>{TrafficLightState::kStop,
+                                            TrafficLightState::kGo}));
+  EXPECT_EQ(data.traffic_light_times, (std::vector<int64_t>{0, 1}));
+}
+
+TEST(ScenarioFormatTest, BinaryRoundTripTest) {
+  const ScenarioData data = ParseJsonScenario(MakeScenarioJson());
+  const std::string buffer = SerializeScenario(data);
+  ASSERT_TRUE(IsBinaryScenario(buffer.data(), buffer.size()));
+  ExpectScenarioDataEq(ParseBinaryScenario(buffer.data(), buffer.size()), data);
+}
+
+TEST(ScenarioFormatTest, BinaryInPlaceTest) {
+  const ScenarioData data = ParseJsonScenario(MakeScenarioJson());
+  const auto buffer = std::make_shared<std::string>(SerializeScenario(data));
+  const ScenarioData copied =
+      ParseBinaryScenario(buffer->data(), buffer->size());
+  EXPECT_FALSE(copied.x.is_view());
+  EXPECT_EQ(copied.storage, nullptr);
+
+  const ScenarioData in_place =
+      ParseBinaryScenario(buffer->data(), buffer->size(), buffer);
+  ExpectScenarioDataEq(in_place, data);
+  EXPECT_TRUE(in_place.x.is_view());
+  EXPECT_TRUE(in_place.trajectory_offsets.is_view());
+  EXPECT_EQ(in_place.storage, buffer);
+}
+
+TEST(ScenarioFormatTest, InvalidBinaryTest) {
+  const std::string json_buffer = MakeScenarioJson().dump();
+  EXPECT_FALSE(IsBinaryScenario(json_buffer.data(), json_buffer.size()));
+  EXPECT_THROW(ParseBinaryScenario(json_buffer.data(), json_buffer.size()),
+               std::invalid_argument);
+
+  const std::string buffer =
+      SerializeScenario(ParseJsonScenario(MakeScenarioJson()));
+  EXPECT_THROW(ParseBinaryScenario(buffer.data(), buffer.size() - 1),
+               std::invalid_argument);
+}
+
+}  // namespace
+}  // namespace nocturne
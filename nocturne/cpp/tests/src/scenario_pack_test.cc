@@ -0,0 +1,101 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_pack.h"
+
+#include <gtest/gtest.h>
+
+#include <filesystem>
+#include <fstream>
+#include <stdexcept>
+#include <string>
+#include <string_view>
+#include <vector>
+
+namespace nocturne {
+namespace {
+
+std::string MakeScenarioJson(const std::string& name, float x) {
+  return R"({"name": ")" + name + R"(",
+    "objects": [{
+      "type": "vehicle", "length": 4.5, "width": 2.0,
+      "position": [{"x": )" +
+         std::to_string(x) + R"(, "y": 2.0}],
+      "heading": [90.0], "velocity": [{"x": 0.0, "y": 1.0}], "valid": [true],
+      "goalPosition": {"x": 10.0, "y": 20.0}, "is_av": 0}],
+    "roads": [{"type": "lane",
+               "geometry": [{"x": 0.0, "y": 0.0}, {"x": 1.0, "y": 0.0}]}],
+    "tl_states": {}})";
+}
+
+TEST(ScenarioPackTest, WriteAndLoadTest) {
+  const std::filesystem::path dir =
+      std::filesystem::temp_directory_path() / "nocturne_scenario_pack_test";
+  std::filesystem::create_directories(dir);
+  std::vector<std::string> src_paths;
+  for (int i = 0; i < 3; ++i) {
+    const std::string file = (dir / ("scene_" + std::to_string(i) + ".json"));
+    std::ofstream(file) << MakeScenarioJson("scene_" + std::to_string(i), i);
+    src_paths.push_back(file);
+  }
+  // Mix in a scene already converted to the binary format.
+  ConvertScenarioFile(src_paths.back(), (dir / "scene_3.bin").string());
+  src_paths.push_back(dir / "scene_3.bin");
+
+  const std::string pack_path = dir / "scenes.pack";
+  WriteScenarioPack(pack_path, src_paths);
+
+  const ScenarioPack pack(pack_path);
+  EXPECT_EQ(pack.size(), 4);
+  EXPECT_EQ(pack.names(),
+            (std::vector<std::string>{"scene_0.json", "scene_1.json",
+                                      "scene_2.json", "scene_3.bin"}));
+  EXPECT_TRUE(pack.Contains("scene_1.json"));
+  EXPECT_FALSE(pack.Contains("scene_4.json"));
+  for (int i = 0; i < 3; ++i) {
+    const ScenarioData data =
+        pack.LoadScene("scene_" + std::to_string(i) + ".json");
+    EXPECT_EQ(data.name, "scene_" + std::to_string(i));
+    EXPECT_EQ(data.x, std::vector<float>{static_cast<float>(i)});
+    EXPECT_EQ(data.road_offsets, (std::vector<int64_t>{0, 2}));
+  }
+  EXPECT_EQ(pack.LoadScene("scene_3.bin").name, "scene_2");
+  EXPECT_EQ(
+      reinterpret_cast<uintptr_t>(pack.SceneBytes("scene_1.json").data()) % 8,
+      0);
+  EXPECT_THROW(pack.LoadScene("scene_4.json"), std::invalid_argument);
+  EXPECT_THROW(ScenarioPack(src_paths.front()), std::invalid_argument);
+
+  std::filesystem::remove_all(dir);
+}
+
+TEST(ScenarioPackTest, InPlaceLoadTest) {
+  const std::filesystem::path dir =
+      std::filesystem::temp_directory_path() / "nocturne_scenario_pack_test";
+  std::filesystem::create_directories(dir);
+  const std::string src_path = dir / "scene.json";
+  std::ofstream(src_path) << MakeScenarioJson("scene", 3.0f);
+  const std::string pack_path = dir / "scenes.pack";
+  WriteScenarioPack(pack_path, {src_path});
+
+  ScenarioData data;
+  {
+    const ScenarioPack pack(pack_path);
+    data = pack.LoadScene("scene.json");
+    // The arrays point into the mapped scene bytes.
+    const std::string_view bytes = pack.SceneBytes("scene.json");
+    const char* x = reinterpret_cast<const char*>(data.x.data());
+    EXPECT_TRUE(data.x.is_view());
+    EXPECT_TRUE(data.road_offsets.is_view());
+    EXPECT_GE(x, bytes.data());
+    EXPECT_LT(x, bytes.data() + bytes.size());
+  }
+  // The scene keeps the mapping alive after the pack is destroyed.
+  std::filesystem::remove_all(dir);
+  EXPECT_EQ(data.x, std::vector<float>{3.0f});
+  EXPECT_EQ(data.road_offsets, (std::vector<int64_t>{0, 2}));
+}
+
+}  // namespace
+}  // namespace nocturne
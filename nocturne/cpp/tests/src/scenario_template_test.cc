@@ -0,0 +1,115 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_template.h"
+
+#include <gtest/gtest.h>
+
+#include <filesystem>
+#include <fstream>
+#include <memory>
+#include <string>
+
+#include "scenario.h"
+
+namespace nocturne {
+namespace {
+
+std::shared_ptr<const ScenarioTemplate> MakeTemplate(const std::string& name,
+                                                     int64_t num_objects) {
+  std::shared_ptr<ScenarioTemplate> scenario_template =
+      std::make_shared<ScenarioTemplate>();
+  scenario_template->name = name;
+  scenario_template->objects.resize(num_objects);
+  return scenario_template;
+}
+
+TEST(ScenarioTemplateCacheTest, LRUTest) {
+  const auto tpl_a = MakeTemplate("a", 10);
+  const auto tpl_b = MakeTemplate("b", 10);
+  const auto tpl_c = MakeTemplate("c", 10);
+  const int64_t template_size = tpl_a->MemoryUsage();
+  ASSERT_EQ(tpl_b->MemoryUsage(), template_size);
+
+  ScenarioTemplateCache cache;
+  // The cache is disabled by default.
+  cache.Put("a", tpl_a);
+  EXPECT_EQ(cache.Get("a"), nullptr);
+  EXPECT_EQ(cache.size(), 0);
+  EXPECT_EQ(cache.misses(), 0);
+
+  cache.set_capacity(2 * template_size);
+  cache.Put("a", tpl_a);
+  cache.Put("b", tpl_b);
+  EXPECT_EQ(cache.size(), 2);
+  EXPECT_EQ(cache.memory_usage(), 2 * template_size);
+  EXPECT_EQ(cache.Get("a"), tpl_a);
+  // "b" is now the least recently used template.
+  cache.Put("c", tpl_c);
+  EXPECT_EQ(cache.size(), 2);
+  EXPECT_EQ(cache.Get("b"), nullptr);
+  EXPECT_EQ(cache.Get("a"), tpl_a);
+  EXPECT_EQ(cache.Get("c"), tpl_c);
+  EXPECT_EQ(cache.hits(), 3);
+  EXPECT_EQ(cache.misses(), 1);
+
+  // Templates larger than the capacity are not cached.
+  cache.Put("d", MakeTemplate("d", 1000));
+  EXPECT_EQ(cache.Get("d"), nullptr);
+  EXPECT_EQ(cache.size(), 2);
+
+  cache.set_capacity(template_size);
+  EXPECT_EQ(cache.size(), 1);
+  EXPECT_EQ(cache.Get("c"), tpl_c);
+
+  cache.Clear();
+  EXPECT_EQ(cache.size(), 0);
+  EXPECT_EQ(cache.memory_usage(), 0);
+  EXPECT_EQ(cache.hits(), 0);
+}
+
+TEST(ScenarioTemplateCacheTest, SharedScenarioTest) {
+  const std::filesystem::path dir =
+      std::filesystem::temp_directory_path() / "nocturne_scenario_cache_test";
+  std::filesystem::create_directories(dir);
+  const std::string path = dir / "scene.json";
+  std::ofstream(path) << R"({"name": "scene",
+    "objects": [{
+      "type": "vehicle", "length": 4.5, "width": 2.0,
+      "position": [{"x": 1.0, "y": 2.0}, {"x": 1.0, "y": 3.0}],
+      "heading": [90.0, 90.0],
+      "velocity": [{"x": 0.0, "y": 10.0}, {"x": 0.0, "y": 10.0}],
+      "valid": [true, true],
+      "goalPosition": {"x": 1.0, "y": 3.0}, "is_av": 0}],
+    "roads": [{"type": "road_edge",
+               "geometry": [{"x": -5.0, "y": 0.0}, {"x": -5.0, "y": 10.0}]}],
+    "tl_states": {}})";
+
+  ScenarioTemplateCache& cache = ScenarioTemplateCache::Global();
+  const int64_t capacity = cache.capacity();
+  cache.Clear();
+  cache.set_capacity(int64_t(1) << 20);
+
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}};
+  Scenario scenario_a(path, config);
+  scenario_a.Step(0.1f);
+  Scenario scenario_b(path, config);
+  EXPECT_EQ(cache.misses(), 1);
+  EXPECT_EQ(cache.hits(), 1);
+  EXPECT_EQ(scenario_b.name(), "scene");
+  EXPECT_EQ(&scenario_a.road_lines(), &scenario_b.road_lines());
+  // Objects are not shared between the scenarios.
+  ASSERT_EQ(scenario_b.objects().size(), 1);
+  EXPECT_NE(scenario_a.objects()[0], scenario_b.objects()[0]);
+  EXPECT_NEAR(scenario_a.objects()[0]->position().y(), 3.0f, 1e-4);
+  EXPECT_NEAR(scenario_b.objects()[0]->position().y(), 2.0f, 1e-4);
+
+  cache.Clear();
+  cache.set_capacity(capacity);
+  std::filesystem::remove_all(dir);
+}
+
+}  // namespace
+}  // namespace nocturne
@@ -0,0 +1,916 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario.h"
+
+#include <gtest/gtest.h>
+
+#include <algorithm>
+#include <cmath>
+#include <filesystem>
+#include <fstream>
+#include <limits>
+#include <memory>
+#include <random>
+#include <string>
+#include <tuple>
+#include <unordered_map>
+#include <utility>
+#include <variant>
+#include <vector>
+
+#include "view_field.h"
+
+namespace nocturne {
+namespace {
+
+class ScenarioTest : public ::testing::Test {
+ protected:
+  // A vehicle driving at 50m/s through a road edge and its goal during the
+  // first step of 0.1s.
+  void SetUp() override {
+    dir_ = std::filesystem::temp_directory_path() / "nocturne_scenario_test";
+    std::filesystem::create_directories(dir_);
+    path_ = dir_ / "scene.json";
+    std::ofstream(path_) << R"({"name": "scene",
+      "objects": [{
+        "type": "vehicle", "length": 4.5, "width": 2.0,
+        "position": [{"x": -6.0, "y": 10.0}, {"x": -1.0, "y": 10.0},
+                     {"x": 4.0, "y": 10.0}],
+        "heading": [0.0, 0.0, 0.0],
+        "velocity": [{"x": 50.0, "y": 0.0}, {"x": 50.0, "y": 0.0},
+                     {"x": 50.0, "y": 0.0}],
+        "valid": [true, true, true],
+        "goalPosition": {"x": -1.0, "y": 10.0}, "is_av": 0}],
+      "roads": [{"type": "road_edge",
+                 "geometry": [{"x": -1.5, "y": 8.0}, {"x": -1.5, "y": 12.0}]}],
+      "tl_states": {}})";
+  }
+
+  void TearDown() override { std::filesystem::remove_all(dir_); }
+
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config_ = {{"start_time", int64_t(0)}};
+  std::filesystem::path dir_;
+  std::string path_;
+};
+
+TEST_F(ScenarioTest, StepNTest) {
+  Scenario scenario(path_, config_);
+  const Object& vehicle = *scenario.objects()[0];
+  scenario.Step(0.1f);
+  EXPECT_TRUE(vehicle.collided());
+  scenario.Step(0.1f);
+  EXPECT_FALSE(vehicle.collided());
+
+  Scenario scenario_n(path_, config_);
+  const Object& vehicle_n = *scenario_n.objects()[0];
+  GoalTolerance goal_tolerance;
+  goal_tolerance.position = 0.5f;
+  const std::vector<int64_t> goal_ids =
+      scenario_n.StepN(2, 0.1f, goal_tolerance);
+  EXPECT_EQ(scenario_n.current_time(), scenario.current_time());
+  EXPECT_FLOAT_EQ(vehicle_n.position().x(), vehicle.position().x());
+  EXPECT_FLOAT_EQ(vehicle_n.position().y(), vehicle.position().y());
+  // The collision and the goal of the first step are reported.
+  EXPECT_TRUE(vehicle_n.collided());
+  EXPECT_EQ(vehicle_n.collision_type(),
+            CollisionType::kVehicleRoadEdgeCollision);
+  EXPECT_EQ(goal_ids, std::vector<int64_t>{vehicle_n.id()});
+
+  EXPECT_TRUE(scenario_n.StepN(1, 0.1f).empty());
+  EXPECT_THROW(scenario_n.StepN(0, 0.1f), std::invalid_argument);
+}
+
+TEST_F(ScenarioTest, RemoveObjectsTest) {
+  Scenario scenario(path_, config_);
+  const std::shared_ptr<Object> vehicle = scenario.objects()[0];
+  EXPECT_EQ(scenario.FindObject(vehicle->id()), vehicle.get());
+
+  const std::vector<int64_t> ids = {-1, vehicle->id(), 42, vehicle->id()};
+  EXPECT_EQ(scenario.RemoveObjects(ids.size(), ids.data()), 1);
+  EXPECT_EQ(scenario.FindObject(vehicle->id()), nullptr);
+  EXPECT_TRUE(scenario.objects().empty());
+  EXPECT_TRUE(scenario.vehicles().empty());
+  EXPECT_TRUE(scenario.moving_objects().empty());
+  EXPECT_FALSE(scenario.RemoveObject(*vehicle));
+
+  // Removed objects are no longer stepped.
+  const float x = vehicle->position().x();
+  scenario.Step(0.1f);
+  EXPECT_FLOAT_EQ(vehicle->position().x(), x);
+}
+
+TEST_F(ScenarioTest, CollisionSubsetTest) {
+  Scenario scenario(path_, config_);
+  Object& vehicle = *scenario.objects()[0];
+  scenario.SetCollisionSubset(0, nullptr);
+  scenario.Step(0.1f);
+  EXPECT_FALSE(vehicle.collided());
+
+  // The road edge collision is found again once the vehicle is checked, also
+  // when it stopped on the road edge.
+  scenario.ClearCollisionSubset();
+  vehicle.set_speed(0.0f);
+  vehicle.set_position(-1.0f, 10.0f);
+  scenario.RefreshObjects();
+  EXPECT_TRUE(vehicle.collided());
+  scenario.Step(0.1f);
+  EXPECT_TRUE(vehicle.collided());
+  EXPECT_EQ(vehicle.collision_type(), CollisionType::kVehicleRoadEdgeCollision);
+
+  // Two pairs of overlapping vehicles, only the first vehicle is checked.
+  std::string objects;
+  for (const auto& [x, y] :
+       std::vector<std::pair<int, int>>{{0, 0}, {4, 0}, {0, 20}, {4, 20}}) {
+    objects += std::string(objects.empty() ? "" : ",") +
+               R"({"type": "vehicle", "length": 4.5, "width": 2.0,
+                   "position": [{"x": )" +
+               std::to_string(x) + R"(, "y": )" + std::to_string(y) + R"(}],
+                   "heading": [0.0], "velocity": [{"x": 0.0, "y": 0.0}],
+                   "valid": [true], "goalPosition": {"x": 50.0, "y": 0.0},
+                   "is_av": 0})";
+  }
+  const std::string pairs_path = dir_ / "pairs.json";
+  std::ofstream(pairs_path)
+      << R"({"name": "pairs", "objects": [)" << objects << R"(],
+      "roads": [{"type": "road_edge",
+                 "geometry": [{"x": -50.0, "y": -50.0},
+                              {"x": 50.0, "y": -50.0}]}],
+      "tl_states": {}})";
+  Scenario pairs_scenario(pairs_path, config_);
+  ASSERT_EQ(pairs_scenario.objects().size(), 4);
+  const int64_t controlled_id = pairs_scenario.objects()[0]->id();
+  pairs_scenario.SetCollisionSubset(1, &controlled_id);
+  pairs_scenario.Step(0.1f);
+  // Both sides of a collision with a checked vehicle are flagged.
+  for (int64_t i : {0, 1}) {
+    const Object& obj = *pairs_scenario.objects()[i];
+    EXPECT_TRUE(obj.collided());
+    EXPECT_EQ(obj.collision_type(), CollisionType::kVehicleVehicleCollision);
+  }
+  // Pairs of unchecked vehicles are not tested.
+  for (int64_t i : {2, 3}) {
+    EXPECT_FALSE(pairs_scenario.objects()[i]->collided());
+  }
+
+  pairs_scenario.ClearCollisionSubset();
+  pairs_scenario.Step(0.1f);
+  for (const auto& obj : pairs_scenario.objects()) {
+    EXPECT_TRUE(obj->collided());
+    EXPECT_EQ(obj->collision_type(), CollisionType::kVehicleVehicleCollision);
+  }
+}
+
+// Rows of vehicles 4m apart driving into each other and into road edges
+// around the rows.
+ScenarioData MakeGridScenarioData(int64_t num_rows, int64_t num_cols) {
+  ScenarioData data;
+  data.name = "parallel";
+  for (int64_t row = 0; row < num_rows; ++row) {
+    for (int64_t col = 0; col < num_cols; ++col) {
+      const float x = 4.0f * col;
+      const float y = 3.0f * row;
+      data.object_types.push_back(ObjectType::kVehicle);
+      data.object_lengths.push_back(4.5f);
+      data.object_widths.push_back(2.0f);
+      data.goal_x.push_back(x + 10.0f);
+      data.goal_y.push_back(y);
+      data.is_av.push_back(0);
+      data.x.push_back(x);
+      data.y.push_back(y);
+      data.heading.push_back(0.0f);
+      data.velocity_x.push_back(1.0f);
+      data.velocity_y.push_back(0.0f);
+      data.valid.push_back(1);
+      data.trajectory_offsets.push_back(data.x.size());
+    }
+    data.road_types.push_back(RoadType::kRoadEdge);
+    data.road_x.push_back(-5.0f);
+    data.road_y.push_back(3.0f * row + 1.4f);
+    data.road_x.push_back(4.0f * num_cols);
+    data.road_y.push_back(3.0f * row);
+    data.road_offsets.push_back(data.road_x.size());
+  }
+  return data;
+}
+
+TEST(ParallelScenarioTest, StepTest) {
+  constexpr int64_t kNumRows = 40;
+  constexpr int64_t kNumCols = 20;
+  const ScenarioData data = MakeGridScenarioData(kNumRows, kNumCols);
+
+  std::unordered_map<std::string, std::variant<bool, int64_t, float>> config = {
+      {"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  config["num_threads"] = int64_t(4);
+  Scenario parallel_scenario(data, config);
+  EXPECT_EQ(scenario.num_threads(), 1);
+  EXPECT_EQ(parallel_scenario.num_threads(), 4);
+
+  std::mt19937 rng(0);
+  std::normal_distribution<float> acceleration_dist(0.0f, 2.0f);
+  std::normal_distribution<float> steering_dist(0.0f, 0.3f);
+  const int64_t num_objects = scenario.objects().size();
+  ASSERT_EQ(num_objects, kNumRows * kNumCols);
+  int64_t num_collisions = 0;
+  for (int64_t step = 0; step < 10; ++step) {
+    for (int64_t i = 0; i < num_objects; ++i) {
+      const float acceleration = acceleration_dist(rng);
+      const float steering = steering_dist(rng);
+      for (Scenario* cur : {&scenario, &parallel_scenario}) {
+        cur->objects()[i]->set_acceleration(acceleration);
+        cur->objects()[i]->set_steering(steering);
+      }
+    }
+    scenario.Step(0.1f);
+    parallel_scenario.Step(0.1f);
+    for (int64_t i = 0; i < num_objects; ++i) {
+      const Object& obj = *scenario.objects()[i];
+      const Object& parallel_obj = *parallel_scenario.objects()[i];
+      EXPECT_EQ(parallel_obj.position().x(), obj.position().x());
+      EXPECT_EQ(parallel_obj.position().y(), obj.position().y());
+      EXPECT_EQ(parallel_obj.heading(), obj.heading());
+      EXPECT_EQ(parallel_obj.speed(), obj.speed());
+      EXPECT_EQ(parallel_obj.collided(), obj.collided());
+      EXPECT_EQ(parallel_obj.collision_type(), obj.collision_type());
+      num_collisions += obj.collided();
+    }
+  }
+  EXPECT_GT(num_collisions, 0);
+
+  config["num_threads"] = int64_t(0);
+  EXPECT_THROW(Scenario(data, config), std::invalid_argument);
+}
+
+// Kinematics, goals and collisions of the objects of a scenario, in the order
+// of its objects.
+std::vector<std::tuple<int64_t, float, float, float, float, float, float, bool,
+                       bool, CollisionType>>
+ObjectStates(const Scenario& scenario) {
+  std::vector<std::tuple<int64_t, float, float, float, float, float, float,
+                         bool, bool, CollisionType>>
+      states;
+  for (const auto& obj : scenario.objects()) {
+    states.emplace_back(obj->id(), obj->position().x(), obj->position().y(),
+                        obj->heading(), obj->speed(), obj->head_angle(),
+                        obj->target_position().x(), obj->expert_control(),
+                        obj->collided(), obj->collision_type());
+  }
+  return states;
+}
+
+// Sets random actions to the objects of several scenarios of the same scene.
+void SetRandomActions(std::mt19937& rng,
+                      const std::vector<Scenario*>& scenarios) {
+  std::normal_distribution<float> acceleration_dist(0.0f, 2.0f);
+  std::normal_distribution<float> steering_dist(0.0f, 0.3f);
+  const int64_t num_objects = scenarios[0]->objects().size();
+  for (int64_t i = 0; i < num_objects; ++i) {
+    const float acceleration = acceleration_dist(rng);
+    const float steering = steering_dist(rng);
+    for (Scenario* scenario : scenarios) {
+      scenario->objects()[i]->set_acceleration(acceleration);
+      scenario->objects()[i]->set_steering(steering);
+    }
+  }
+}
+
+TEST(SnapshotScenarioTest, RestoreTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  std::mt19937 rng(0);
+  for (int64_t step = 0; step < 3; ++step) {
+    SetRandomActions(rng, {&scenario});
+    scenario.Step(0.1f);
+  }
+  const ScenarioSnapshot snapshot = scenario.Snapshot();
+  const auto states = ObjectStates(scenario);
+  const int64_t current_time = scenario.current_time();
+
+  // The steps after the snapshot are the same after it is restored.
+  std::mt19937 actions_rng(1);
+  std::vector<decltype(ObjectStates(scenario))> next_states;
+  for (int64_t step = 0; step < 5; ++step) {
+    SetRandomActions(actions_rng, {&scenario});
+    scenario.Step(0.1f);
+    next_states.push_back(ObjectStates(scenario));
+  }
+  EXPECT_NE(next_states.back(), states);
+  scenario.objects()[1]->set_expert_control(true);
+
+  scenario.Restore(snapshot);
+  EXPECT_EQ(scenario.current_time(), current_time);
+  EXPECT_EQ(ObjectStates(scenario), states);
+  actions_rng.seed(1);
+  for (int64_t step = 0; step < 5; ++step) {
+    SetRandomActions(actions_rng, {&scenario});
+    scenario.Step(0.1f);
+    EXPECT_EQ(ObjectStates(scenario), next_states[step]);
+  }
+  // Snapshots are reusable.
+  scenario.Restore(snapshot);
+  EXPECT_EQ(ObjectStates(scenario), states);
+}
+
+TEST(SnapshotScenarioTest, RestoreRemovedObjectsTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  scenario.Step(0.1f);
+  const ScenarioSnapshot snapshot = scenario.Snapshot();
+  const auto states = ObjectStates(scenario);
+  const int64_t num_vehicles = scenario.vehicles().size();
+  const int64_t num_moving_objects = scenario.moving_objects().size();
+
+  const std::vector<std::shared_ptr<Object>> objects = scenario.objects();
+  const std::vector<int64_t> ids = {objects[0]->id(), objects[5]->id()};
+  ASSERT_EQ(scenario.RemoveObjects(ids.size(), ids.data()), 2);
+  scenario.Step(0.1f);
+  ASSERT_EQ(scenario.FindObject(ids[0]), nullptr);
+
+  scenario.Restore(snapshot);
+  EXPECT_EQ(ObjectStates(scenario), states);
+  EXPECT_EQ(scenario.vehicles().size(), num_vehicles);
+  EXPECT_EQ(scenario.moving_objects().size(), num_moving_objects);
+  // The handles of the removed objects are valid again.
+  EXPECT_EQ(scenario.FindObject(ids[0]), objects[0].get());
+  EXPECT_EQ(scenario.FindObject(ids[1]), objects[5].get());
+
+  // Objects removed before the snapshot stay removed.
+  ASSERT_EQ(scenario.RemoveObjects(1, ids.data()), 1);
+  const ScenarioSnapshot removed_snapshot = scenario.Snapshot();
+  scenario.Restore(snapshot);
+  scenario.Restore(removed_snapshot);
+  EXPECT_EQ(scenario.FindObject(ids[0]), nullptr);
+  EXPECT_EQ(scenario.objects().size(), objects.size() - 1);
+}
+
+TEST(SnapshotScenarioTest, CloneTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  std::mt19937 rng(0);
+  for (int64_t step = 0; step < 3; ++step) {
+    SetRandomActions(rng, {&scenario});
+    scenario.Step(0.1f);
+  }
+  const std::unique_ptr<Scenario> clone = scenario.Clone();
+  EXPECT_EQ(clone->current_time(), scenario.current_time());
+  EXPECT_EQ(ObjectStates(*clone), ObjectStates(scenario));
+  for (int64_t i = 0; i < static_cast<int64_t>(scenario.objects().size());
+       ++i) {
+    EXPECT_NE(clone->objects()[i].get(), scenario.objects()[i].get());
+  }
+
+  // Stepping the clone leaves the source as is.
+  const auto states = ObjectStates(scenario);
+  const int64_t current_time = scenario.current_time();
+  SetRandomActions(rng, {clone.get()});
+  clone->Step(0.1f);
+  const int64_t id = clone->objects()[0]->id();
+  ASSERT_EQ(clone->RemoveObjects(1, &id), 1);
+  EXPECT_EQ(ObjectStates(scenario), states);
+  EXPECT_EQ(scenario.current_time(), current_time);
+  EXPECT_NE(scenario.FindObject(id), nullptr);
+
+  // And the other way around, the same actions give the same states.
+  const std::unique_ptr<Scenario> other_clone = scenario.Clone();
+  for (int64_t step = 0; step < 3; ++step) {
+    SetRandomActions(rng, {&scenario, other_clone.get()});
+    scenario.Step(0.1f);
+    other_clone->Step(0.1f);
+    EXPECT_EQ(ObjectStates(*other_clone), ObjectStates(scenario));
+  }
+  scenario.Step(0.1f);
+  EXPECT_NE(other_clone->current_time(), scenario.current_time());
+}
+
+TEST(SnapshotScenarioTest, CloneCollisionSubsetTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  const int64_t id = scenario.objects()[0]->id();
+  scenario.SetCollisionSubset(1, &id);
+  const std::unique_ptr<Scenario> clone = scenario.Clone();
+  for (int64_t step = 0; step < 3; ++step) {
+    scenario.Step(0.1f);
+    clone->Step(0.1f);
+    EXPECT_EQ(ObjectStates(*clone), ObjectStates(scenario));
+  }
+}
+
+TEST(SnapshotScenarioTest, TemplateMismatchTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  const std::unique_ptr<Scenario> clone = scenario.Clone();
+  clone->Step(0.1f);
+  EXPECT_NO_THROW(scenario.Restore(clone->Snapshot()));
+  EXPECT_EQ(ObjectStates(scenario), ObjectStates(*clone));
+
+  // Scenarios built from the same data don't share their template.
+  Scenario other_scenario(data, config);
+  EXPECT_THROW(other_scenario.Restore(scenario.Snapshot()),
+               std::invalid_argument);
+  Scenario smaller_scenario(MakeGridScenarioData(2, 3), config);
+  EXPECT_THROW(smaller_scenario.Restore(scenario.Snapshot()),
+               std::invalid_argument);
+}
+
+TEST(ActionsScenarioTest, ApplyActionsTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  Scenario batched_scenario(data, config);
+  const int64_t removed_id = batched_scenario.objects()[2]->id();
+  ASSERT_EQ(batched_scenario.RemoveObjects(1, &removed_id), 1);
+  ASSERT_EQ(scenario.RemoveObjects(1, &removed_id), 1);
+
+  // The batched actions are the same as setting the controls of each vehicle.
+  std::mt19937 rng(0);
+  std::normal_distribution<float> dist(0.0f, 1.0f);
+  std::vector<int64_t> ids;
+  std::vector<float> acceleration;
+  std::vector<float> steering;
+  std::vector<float> head_angle;
+  for (const auto& obj : scenario.objects()) {
+    ids.push_back(obj->id());
+    acceleration.push_back(dist(rng));
+    steering.push_back(dist(rng));
+    head_angle.push_back(dist(rng));
+    obj->set_acceleration(acceleration.back());
+    obj->set_steering(steering.back());
+    obj->set_head_angle(head_angle.back());
+  }
+  // Removed objects are ignored.
+  ids.push_back(removed_id);
+  acceleration.push_back(1.0f);
+  steering.push_back(1.0f);
+  head_angle.push_back(1.0f);
+  batched_scenario.ApplyActions(ids.size(), ids.data(), acceleration.data(),
+                                steering.data(), head_angle.data());
+  for (int64_t i = 0; i < static_cast<int64_t>(scenario.objects().size());
+       ++i) {
+    const Object& obj = *scenario.objects()[i];
+    const Object& batched_obj = *batched_scenario.objects()[i];
+    EXPECT_EQ(batched_obj.acceleration(), obj.acceleration());
+    EXPECT_EQ(batched_obj.steering(), obj.steering());
+    EXPECT_EQ(batched_obj.head_angle(), obj.head_angle());
+  }
+  scenario.Step(0.1f);
+  batched_scenario.Step(0.1f);
+  EXPECT_EQ(ObjectStates(batched_scenario), ObjectStates(scenario));
+
+  // NaN leaves the control unchanged, and so does a null head angle.
+  const Object& obj = *batched_scenario.objects()[0];
+  const float nan = std::numeric_limits<float>::quiet_NaN();
+  const float new_steering = 0.25f;
+  batched_scenario.ApplyActions(1, &ids[0], &nan, &new_steering);
+  EXPECT_EQ(obj.acceleration(), acceleration[0]);
+  EXPECT_EQ(obj.steering(), new_steering);
+  EXPECT_EQ(obj.head_angle(), head_angle[0]);
+}
+
+TEST(ActionsScenarioTest, ApplyDiscreteActionsTest) {
+  const ScenarioData data = MakeGridScenarioData(4, 3);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)}, {"moving_threshold", 0.0f}};
+  Scenario scenario(data, config);
+  const std::vector<float> acceleration_grid = {-2.0f, 0.0f, 1.0f, 3.0f};
+  const std::vector<float> steering_grid = {-0.5f, 0.0f, 0.5f};
+  const int64_t num_grid_actions =
+      acceleration_grid.size() * steering_grid.size();
+
+  std::vector<int64_t> ids;
+  std::vector<int64_t> actions;
+  for (const auto& obj : scenario.objects()) {
+    ids.push_back(obj->id());
+    actions.push_back((actions.size() * 5) % num_grid_actions);
+  }
+  scenario.ApplyDiscreteActions(ids.size(), ids.data(), actions.data(),
+                                acceleration_grid, steering_grid);
+  for (int64_t i = 0; i < static_cast<int64_t>(ids.size()); ++i) {
+    const Object& obj = *scenario.objects()[i];
+    EXPECT_EQ(obj.acceleration(), acceleration_grid[actions[i] / 3]);
+    EXPECT_EQ(obj.steering(), steering_grid[actions[i] % 3]);
+  }
+
+  // An invalid action doesn't apply any of the actions.
+  std::vector<int64_t> new_actions(ids.size(), 0);
+  for (int64_t invalid_action : {int64_t(-1), num_grid_actions}) {
+    new_actions.back() = invalid_action;
+    EXPECT_THROW(scenario.ApplyDiscreteActions(
+                     ids.size(), ids.data(), new_actions.data(),
+                     acceleration_grid, steering_grid),
+                 std::out_of_range);
+    for (int64_t i = 0; i < static_cast<int64_t>(ids.size()); ++i) {
+      const Object& obj = *scenario.objects()[i];
+      EXPECT_EQ(obj.acceleration(), acceleration_grid[actions[i] / 3]);
+      EXPECT_EQ(obj.steering(), steering_grid[actions[i] % 3]);
+    }
+  }
+}
+
+TEST(ParallelScenarioTest, ObservationsTest) {
+  constexpr float kViewDist = 20.0f;
+  constexpr float kViewAngle = 2.0f;
+  const ScenarioData data = MakeGridScenarioData(10, 10);
+  std::unordered_map<std::string, std::variant<bool, int64_t, float>> config = {
+      {"start_time", int64_t(0)}, {"max_visible_road_points", int64_t(20)}};
+  Scenario scenario(data, config);
+  config["num_threads"] = int64_t(3);
+  Scenario parallel_scenario(data, config);
+  scenario.Step(0.1f);
+  parallel_scenario.Step(0.1f);
+
+  std::vector<const Object*> objects;
+  std::vector<const Object*> parallel_objects;
+  for (const auto& obj : scenario.objects()) {
+    objects.push_back(obj.get());
+  }
+  for (const auto& obj : parallel_scenario.objects()) {
+    parallel_objects.push_back(obj.get());
+  }
+  objects.push_back(nullptr);
+  parallel_objects.push_back(nullptr);
+  const int64_t n = objects.size();
+  const int64_t observation_size = scenario.ObservationSize();
+  ASSERT_EQ(observation_size,
+            kEgoFeatureSize + scenario.FlattenedVisibleStateSize());
+
+  const NdArray<float> observations =
+      scenario.Observations(objects, kViewDist, kViewAngle);
+  const NdArray<float> parallel_observations =
+      parallel_scenario.Observations(parallel_objects, kViewDist, kViewAngle);
+  ASSERT_EQ(observations.shape(), std::vector<int64_t>({n, observation_size}));
+  ASSERT_EQ(parallel_observations.shape(), observations.shape());
+  for (int64_t i = 0; i + 1 < n; ++i) {
+    const float* row = observations.DataPtr() + i * observation_size;
+    const NdArray<float> ego_state = scenario.EgoState(*objects[i]);
+    const NdArray<float> visible_state =
+        scenario.FlattenedVisibleState(*objects[i], kViewDist, kViewAngle);
+    EXPECT_TRUE(
+        std::equal(ego_state.data().cbegin(), ego_state.data().cend(), row));
+    EXPECT_TRUE(std::equal(visible_state.data().cbegin(),
+                           visible_state.data().cend(), row + kEgoFeatureSize));
+  }
+  const float* last_row = observations.DataPtr() + (n - 1) * observation_size;
+  EXPECT_TRUE(std::all_of(last_row, last_row + observation_size,
+                          [](float x) { return std::isnan(x); }));
+  for (int64_t i = 0; i < (n - 1) * observation_size; ++i) {
+    EXPECT_EQ(parallel_observations.data()[i], observations.data()[i]);
+  }
+
+  const NdArray<float> visible_states = scenario.Observations(
+      objects, kViewDist, kViewAngle, /*head_angle=*/0.0f, /*ego_state=*/false);
+  ASSERT_EQ(visible_states.shape(),
+            std::vector<int64_t>({n, scenario.FlattenedVisibleStateSize()}));
+  for (int64_t i = 0; i + 1 < n; ++i) {
+    EXPECT_TRUE(std::equal(
+        visible_states.DataPtr() + i * scenario.FlattenedVisibleStateSize(),
+        visible_states.DataPtr() +
+            (i + 1) * scenario.FlattenedVisibleStateSize(),
+        observations.DataPtr() + i * observation_size + kEgoFeatureSize));
+  }
+}
+
+TEST(ParallelScenarioTest, NormalizeStateTest) {
+  constexpr float kViewDist = 20.0f;
+  constexpr float kViewAngle = 2.0f;
+  const ScenarioData data = MakeGridScenarioData(10, 10);
+  std::unordered_map<std::string, std::variant<bool, int64_t, float>> config = {
+      {"start_time", int64_t(0)}, {"max_visible_road_points", int64_t(20)}};
+  const Scenario scenario(data, config);
+  config["normalize_state"] = true;
+  for (int64_t i = 0; i < kEgoFeatureSize; ++i) {
+    config[std::string("ego_state_max_") + kEgoFeatureNames[i]] =
+        static_cast<float>(i + 2);
+  }
+  const std::vector<std::string> keys = {"objects", "road_points",
+                                         "traffic_lights", "stop_signs"};
+  const std::vector<float> visible_scales = {10.0f, 20.0f, 30.0f, 40.0f};
+  for (int64_t i = 0; i < 4; ++i) {
+    config["visible_state_max_" + keys[i]] = visible_scales[i];
+  }
+  const Scenario normalized_scenario(data, config);
+
+  std::vector<const Object*> objects;
+  std::vector<const Object*> normalized_objects;
+  for (const auto& obj : scenario.objects()) {
+    objects.push_back(obj.get());
+  }
+  for (const auto& obj : normalized_scenario.objects()) {
+    normalized_objects.push_back(obj.get());
+  }
+  const RaggedObservationBatch batch =
+      scenario.RaggedObservations(objects, kViewDist, kViewAngle);
+  const RaggedObservationBatch normalized_batch =
+      normalized_scenario.RaggedObservations(normalized_objects, kViewDist,
+                                             kViewAngle);
+  for (int64_t i = 0; i < batch.ego_state.size(); ++i) {
+    EXPECT_EQ(normalized_batch.ego_state.data()[i],
+              batch.ego_state.data()[i] /
+                  static_cast<float>(i % kEgoFeatureSize + 2));
+  }
+  int64_t num_visible = 0;
+  for (int64_t i = 0; i < 4; ++i) {
+    const NdArray<float>& features = batch.features.at(keys[i]);
+    const NdArray<float>& normalized_features =
+        normalized_batch.features.at(keys[i]);
+    ASSERT_EQ(normalized_features.shape(), features.shape()) << keys[i];
+    for (int64_t j = 0; j < features.size(); ++j) {
+      EXPECT_EQ(normalized_features.data()[j],
+                features.data()[j] / visible_scales[i]);
+    }
+    num_visible += features.size();
+  }
+  EXPECT_GT(num_visible, 0);
+
+  // The padded observations hold the same features.
+  const NdArray<float> observations = normalized_scenario.Observations(
+      normalized_objects, kViewDist, kViewAngle);
+  const int64_t observation_size = normalized_scenario.ObservationSize();
+  for (int64_t i = 0; i < static_cast<int64_t>(objects.size()); ++i) {
+    const float* row = observations.DataPtr() + i * observation_size;
+    EXPECT_TRUE(std::equal(
+        normalized_batch.ego_state.DataPtr() + i * kEgoFeatureSize,
+        normalized_batch.ego_state.DataPtr() + (i + 1) * kEgoFeatureSize, row));
+    const auto visible_state = normalized_scenario.VisibleState(
+        *normalized_objects[i], kViewDist, kViewAngle, /*head_angle=*/0.0f,
+        /*padding=*/true);
+    row += kEgoFeatureSize;
+    for (const std::string& key : keys) {
+      const NdArray<float>& features = visible_state.at(key);
+      EXPECT_TRUE(
+          std::equal(features.data().cbegin(), features.data().cend(), row))
+          << key;
+      row += features.size();
+    }
+  }
+}
+
+TEST(ParallelScenarioTest, RaggedObservationsTest) {
+  constexpr float kViewDist = 20.0f;
+  constexpr float kViewAngle = 2.0f;
+  const ScenarioData data = MakeGridScenarioData(10, 10);
+  const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+      config = {{"start_time", int64_t(0)},
+                {"max_visible_road_points", int64_t(20)},
+                {"num_threads", int64_t(3)}};
+  Scenario scenario(data, config);
+  scenario.Step(0.1f);
+
+  std::vector<const Object*> objects;
+  for (const auto& obj : scenario.objects()) {
+    objects.push_back(obj.get());
+  }
+  objects.insert(objects.begin() + 5, nullptr);
+  const int64_t n = objects.size();
+  const int64_t observation_size = scenario.ObservationSize();
+  const NdArray<float> observations =
+      scenario.Observations(objects, kViewDist, kViewAngle);
+  const RaggedObservationBatch batch =
+      scenario.RaggedObservations(objects, kViewDist, kViewAngle);
+
+  ASSERT_EQ(batch.ego_state.shape(),
+            std::vector<int64_t>({n, kEgoFeatureSize}));
+  const std::vector<std::string> keys = {"objects", "road_points",
+                                         "traffic_lights", "stop_signs"};
+  const std::vector<int64_t> feature_sizes = {
+      kObjectFeatureSize, kRoadPointFeatureSize, kTrafficLightFeatureSize,
+      kStopSignsFeatureSize};
+  const std::vector<int64_t> max_visible = {
+      scenario.getMaxNumVisibleObjects(), scenario.getMaxNumVisibleRoadPoints(),
+      scenario.getMaxNumVisibleTrafficLights(),
+      scenario.getMaxNumVisibleStopSigns()};
+  ASSERT_EQ(batch.features.size(), keys.size());
+  ASSERT_EQ(batch.offsets.size(), keys.size());
+
+  int64_t num_visible = 0;
+  for (int64_t i = 0; i < n; ++i) {
+    const float* row = observations.DataPtr() + i * observation_size;
+    const float* ego_state = batch.ego_state.DataPtr() + i * kEgoFeatureSize;
+    if (objects[i] == nullptr) {
+      EXPECT_TRUE(std::all_of(ego_state, ego_state + kEgoFeatureSize,
+                              [](float x) { return std::isnan(x); }));
+    } else {
+      EXPECT_TRUE(std::equal(ego_state, ego_state + kEgoFeatureSize, row));
+    }
+    // The ragged features are the non-padding rows of each category of the
+    // flattened visible state, which is 0 after them.
+    const float* category = row + kEgoFeatureSize;
+    for (size_t c = 0; c < keys.size(); ++c) {
+      const NdArray<float>& features = batch.features.at(keys[c]);
+      const NdArray<int64_t>& offsets = batch.offsets.at(keys[c]);
+      ASSERT_EQ(offsets.shape(), std::vector<int64_t>({n + 1}));
+      const int64_t begin = offsets.data()[i];
+      const int64_t end = offsets.data()[i + 1];
+      ASSERT_LE(begin, end);
+      ASSERT_LE(end - begin, max_visible[c]);
+      const int64_t size = (end - begin) * feature_sizes[c];
+      if (objects[i] == nullptr) {
+        EXPECT_EQ(size, 0);
+      } else {
+        EXPECT_TRUE(std::equal(features.DataPtr() + begin * feature_sizes[c],
+                               features.DataPtr() + end * feature_sizes[c],
+                               category));
+        EXPECT_TRUE(std::all_of(category + size,
+                                category + max_visible[c] * feature_sizes[c],
+                                [](float x) { return x == 0.0f; }));
+      }
+      category += max_visible[c] * feature_sizes[c];
+      num_visible += end - begin;
+    }
+  }
+  EXPECT_GT(num_visible, 0);
+  for (size_t c = 0; c < keys.size(); ++c) {
+    EXPECT_EQ(batch.features.at(keys[c]).shape(),
+              std::vector<int64_t>(
+                  {batch.offsets.at(keys[c]).data()[n], feature_sizes[c]}));
+  }
+
+  const RaggedObservationBatch visible_states = scenario.RaggedObservations(
+      objects, kViewDist, kViewAngle, /*head_angle=*/0.0f,
+      /*ego_state=*/false);
+  EXPECT_EQ(visible_states.ego_state.size(), 0);
+  for (const std::string& key : keys) {
+    EXPECT_EQ(visible_states.features.at(key).data(),
+              batch.features.at(key).data());
+    EXPECT_EQ(visible_states.offsets.at(key).data(),
+              batch.offsets.at(key).data());
+  }
+}
+
+// Vehicles and road polylines at random positions around the origin.
+ScenarioData MakeRandomScenarioData(int64_t num_objects, int64_t num_roads,
+                                    int64_t road_length) {
+  std::mt19937 rng(0);
+  std::uniform_real_distribution<float> pos_dist(-40.0f, 40.0f);
+  std::uniform_real_distribution<float> heading_dist(-3.0f, 3.0f);
+  ScenarioData data;
+  data.name = "random";
+  for (int64_t i = 0; i < num_objects; ++i) {
+    const float x = pos_dist(rng);
+    const float y = pos_dist(rng);
+    data.object_types.push_back(ObjectType::kVehicle);
+    data.object_lengths.push_back(4.5f);
+    data.object_widths.push_back(2.0f);
+    data.goal_x.push_back(x + 10.0f);
+    data.goal_y.push_back(y);
+    data.is_av.push_back(0);
+    data.x.push_back(x);
+    data.y.push_back(y);
+    data.heading.push_back(heading_dist(rng));
+    data.velocity_x.push_back(1.0f);
+    data.velocity_y.push_back(0.0f);
+    data.valid.push_back(1);
+    data.trajectory_offsets.push_back(data.x.size());
+  }
+  for (int64_t i = 0; i < num_roads; ++i) {
+    data.road_types.push_back(i % 2 == 0 ? RoadType::kRoadEdge
+                                         : RoadType::kLane);
+    float x = pos_dist(rng);
+    float y = pos_dist(rng);
+    float heading = heading_dist(rng);
+    for (int64_t j = 0; j < road_length; ++j) {
+      data.road_x.push_back(x);
+      data.road_y.push_back(y);
+      heading += 0.1f * heading_dist(rng);
+      x += 2.0f * std::cos(heading);
+      y += 2.0f * std::sin(heading);
+    }
+    data.road_offsets.push_back(data.road_x.size());
+  }
+  return data;
+}
+
+TEST(VisibilityScenarioTest, AngularSweepTest) {
+  constexpr float kViewDist = 80.0f;
+  const ScenarioData data = MakeRandomScenarioData(48, 12, 50);
+  std::unordered_map<std::string, std::variant<bool, int64_t, float>> config = {
+      {"start_time", int64_t(0)},
+      {"moving_threshold", 0.0f},
+      {"max_visible_objects", int64_t(64)},
+      {"max_visible_road_points", int64_t(500)}};
+  Scenario scenario(data, config);
+  config["angular_sweep_visibility"] = true;
+  Scenario sweep_scenario(data, config);
+
+  const int64_t num_objects = scenario.objects().size();
+  ASSERT_EQ(num_objects, 48);
+  std::vector<const Object*> objects;
+  std::vector<const Object*> sweep_objects;
+  for (int64_t i = 0; i < num_objects; ++i) {
+    objects.push_back(scenario.objects()[i].get());
+    sweep_objects.push_back(sweep_scenario.objects()[i].get());
+  }
+  int64_t num_visible_road_points = 0;
+  for (const float view_angle : {1.5f, 6.3f}) {
+    for (int64_t i = 0; i < num_objects; ++i) {
+      const auto expected =
+          scenario.VisibleState(*objects[i], kViewDist, view_angle);
+      const auto actual =
+          sweep_scenario.VisibleState(*sweep_objects[i], kViewDist, view_angle);
+      ASSERT_EQ(actual.size(), expected.size());
+      for (const auto& [key, value] : expected) {
+        EXPECT_EQ(actual.at(key).shape(), value.shape()) << key;
+        EXPECT_EQ(actual.at(key).data(), value.data()) << key;
+      }
+      num_visible_road_points += expected.at("road_points").shape()[0];
+    }
+    const NdArray<float> expected =
+        scenario.Observations(objects, kViewDist, view_angle);
+    const NdArray<float> actual =
+        sweep_scenario.Observations(sweep_objects, kViewDist, view_angle);
+    EXPECT_EQ(actual.data(), expected.data());
+  }
+  EXPECT_GT(num_visible_road_points, 0);
+}
+
+TEST(VisibilityScenarioTest, NearestVisibleRoadPointsTest) {
+  constexpr float kViewDist = 40.0f;
+  constexpr int64_t kMaxVisibleRoadPoints = 50;
+  const ScenarioData data = MakeRandomScenarioData(48, 12, 50);
+  for (const bool road_edge_first : {false, true}) {
+    const std::unordered_map<std::string, std::variant<bool, int64_t, float>>
+        config = {{"start_time", int64_t(0)},
+                  {"moving_threshold", 0.0f},
+                  {"max_visible_road_points", kMaxVisibleRoadPoints},
+                  {"road_edge_first", road_edge_first}};
+    const Scenario scenario(data, config);
+    std::vector<const RoadPoint*> road_points;
+    for (const auto& road_line : scenario.road_lines()) {
+      for (const RoadPoint& p : road_line->road_points()) {
+        road_points.push_back(&p);
+      }
+    }
+
+    for (const float view_angle : {1.5f, 6.3f}) {
+      for (const auto& src : scenario.objects()) {
+        // Test all the road points of the scene against all the objects.
+        const ViewField vf(src->position(), kViewDist, src->heading(),
+                           view_angle);
+        std::vector<const ObjectBase*> objects;
+        std::vector<Occluder> occluder_storage;
+        for (const auto& obj : scenario.objects()) {
+          if (obj != src) {
+            objects.push_back(obj.get());
+            occluder_storage.emplace_back(*obj);
+          }
+        }
+        std::vector<const Occluder*> occluders;
+        for (const Occluder& occluder : occluder_storage) {
+          occluders.push_back(&occluder);
+        }
+        vf.FilterVisibleObjects(objects, occluders);
+        std::vector<const geometry::PointLike*> points(road_points.begin(),
+                                                       road_points.end());
+        vf.FilterVisiblePoints(points);
+        vf.FilterOccludedPoints(objects, occluders, points);
+        // Sorted by distance then by index, the road edges first if
+        // road_edge_first.
+        std::vector<std::tuple<bool, float, int64_t, const RoadPoint*>>
+            expected;
+        for (const geometry::PointLike* p : points) {
+          const RoadPoint* road_point = dynamic_cast<const RoadPoint*>(p);
+          expected.emplace_back(
+              road_edge_first && road_point->road_type() != RoadType::kRoadEdge,
+              geometry::Distance(src->position(), road_point->position()),
+              road_point->index(), road_point);
+        }
+        std::sort(expected.begin(), expected.end());
+        expected.resize(std::min(static_cast<int64_t>(expected.size()),
+                                 kMaxVisibleRoadPoints));
+
+        const NdArray<float> actual =
+            scenario
+                .VisibleState(*src, kViewDist, view_angle,
+                              /*head_angle=*/0.0f, /*padding=*/false)
+                .at("road_points");
+        ASSERT_EQ(actual.shape()[0], expected.size());
+        const float* row = actual.DataPtr();
+        for (const auto& [not_edge, dist, index, road_point] : expected) {
+          EXPECT_EQ(row[1], dist);
+          EXPECT_EQ(row[3],
+                    (road_point->neighbor_position() - road_point->position())
+                        .Norm());
+          EXPECT_EQ(row[5 + static_cast<int64_t>(road_point->road_type())],
+                    1.0f);
+          row += kRoadPointFeatureSize;
+        }
+      }
+    }
+  }
+}
+
+}  // namespace
+}  // namespace nocturne
@@ -0,0 +1,71 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "utils/thread_pool.h"
+
+#include <gtest/gtest.h>
+
+#include <numeric>
+#include <stdexcept>
+#include <utility>
+#include <vector>
+
+namespace nocturne {
+namespace utils {
+namespace {
+
+TEST(ThreadPoolTest, ParallelForTest) {
+  ThreadPool thread_pool(4);
+  EXPECT_EQ(thread_pool.num_threads(), 4);
+  EXPECT_EQ(thread_pool.NumChunks(0), 0);
+  EXPECT_EQ(thread_pool.NumChunks(3), 3);
+  EXPECT_EQ(thread_pool.NumChunks(100), 4);
+  EXPECT_EQ(thread_pool.NumChunks(100, /*min_chunk_size=*/40), 3);
+
+  for (int64_t repeat = 0; repeat < 100; ++repeat) {
+    const int64_t n = 1000 + repeat;
+    std::vector<int64_t> counts(n, 0);
+    std::vector<std::pair<int64_t, int64_t>> chunks(thread_pool.NumChunks(n));
+    thread_pool.ParallelFor(
+        n, [&counts, &chunks](int64_t chunk, int64_t begin, int64_t end) {
+          chunks[chunk] = std::make_pair(begin, end);
+          for (int64_t i = begin; i < end; ++i) {
+            ++counts[i];
+          }
+        });
+    EXPECT_EQ(counts, std::vector<int64_t>(n, 1));
+    // Chunks are contiguous and in order.
+    EXPECT_EQ(chunks.front().first, 0);
+    EXPECT_EQ(chunks.back().second, n);
+    for (int64_t i = 1; i < static_cast<int64_t>(chunks.size()); ++i) {
+      EXPECT_EQ(chunks[i].first, chunks[i - 1].second);
+    }
+  }
+}
+
+TEST(ThreadPoolTest, ExceptionTest) {
+  ThreadPool thread_pool(4);
+  EXPECT_THROW(thread_pool.ParallelFor(
+                   100,
+                   [](int64_t chunk, int64_t /*begin*/, int64_t /*end*/) {
+                     if (chunk == 2) {
+                       throw std::runtime_error("chunk 2");
+                     }
+                   }),
+               std::runtime_error);
+  // The pool can still be used after an exception.
+  std::vector<int64_t> sums(thread_pool.NumChunks(10), 0);
+  thread_pool.ParallelFor(10,
+                          [&sums](int64_t chunk, int64_t begin, int64_t end) {
+                            for (int64_t i = begin; i < end; ++i) {
+                              sums[chunk] += i;
+                            }
+                          });
+  EXPECT_EQ(std::accumulate(sums.cbegin(), sums.cend(), int64_t(0)), 45);
+  EXPECT_THROW(ThreadPool(0), std::invalid_argument);
+}
+
+}  // namespace
+}  // namespace utils
+}  // namespace nocturne
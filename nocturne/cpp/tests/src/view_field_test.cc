@@ -7,13 +7,18 @@
 #include <gmock/gmock-matchers.h>
 #include <gtest/gtest.h>
 
+#include <algorithm>
 #include <cmath>
+#include <random>
 #include <string>
 #include <vector>
 
 #include "geometry/geometry_utils.h"
+#include "geometry/intersection.h"
+#include "geometry/point_like.h"
 #include "geometry/vector_2d.h"
 #include "object_base.h"
+#include "occlusion.h"
 
 namespace nocturne {
 namespace {
@@ -75,6 +80,16 @@ class MockObject : public ObjectBase {
   const float heading_ = 0.0f;
 };
 
+class MockPoint : public geometry::PointLike {
+ public:
+  explicit MockPoint(const Vector2D& p) : p_(p) {}
+
+  Vector2D Coordinate() const override { return p_; }
+
+ private:
+  const Vector2D p_;
+};
+
 TEST(ViewFieldTest, VisibleObjectsTest) {
   const ViewField vf(Vector2D(1.0f, 1.0f), 10.0f, kHalfPi,
                      geometry::utils::Radians(120.0f));
@@ -267,5 +282,85 @@ TEST(ViewFieldTest, NumericTest) {
   EXPECT_EQ(visible_objects2.size(), 14);
 }
 
+TEST(ViewFieldTest, OccludersTest) {
+  std::mt19937 gen(0);
+  std::uniform_real_distribution<float> pos_dis(-40.0f, 40.0f);
+  std::uniform_real_distribution<float> heading_dis(-kPi, kPi);
+  std::uniform_real_distribution<float> size_dis(0.5f, 6.0f);
+  std::bernoulli_distribution block_dis(0.8);
+  constexpr int64_t kNumObjects = 64;
+  constexpr int64_t kNumPoints = 500;
+  constexpr int64_t kNumTrials = 20;
+  for (int64_t trial = 0; trial < kNumTrials; ++trial) {
+    std::vector<MockObject> objects;
+    objects.reserve(kNumObjects);
+    for (int64_t i = 0; i < kNumObjects; ++i) {
+      objects.emplace_back(size_dis(gen), size_dis(gen),
+                           Vector2D(pos_dis(gen), pos_dis(gen)),
+                           heading_dis(gen), block_dis(gen));
+    }
+    std::vector<const ObjectBase*> object_ptrs;
+    std::vector<Occluder> occluders;
+    std::vector<const Occluder*> occluder_ptrs;
+    occluders.reserve(kNumObjects);
+    for (const MockObject& obj : objects) {
+      object_ptrs.push_back(&obj);
+      occluders.emplace_back(obj);
+      occluder_ptrs.push_back(&occluders.back());
+    }
+    std::vector<const ObjectBase*> expected = object_ptrs;
+    const float view_angle =
+        trial % 2 == 0 ? kTwoPi : geometry::utils::Radians(120.0f);
+    const Vector2D center(pos_dis(gen), pos_dis(gen));
+    const ViewField vf(center, 60.0f, heading_dis(gen), view_angle);
+    vf.FilterVisibleObjects(expected);
+    for (const OcclusionAlgorithm algorithm :
+         {OcclusionAlgorithm::kAngularBuckets,
+          OcclusionAlgorithm::kAngularSweep}) {
+      std::vector<const ObjectBase*> actual = object_ptrs;
+      std::vector<const Occluder*> actual_occluders = occluder_ptrs;
+      vf.FilterVisibleObjects(actual, actual_occluders, algorithm);
+      EXPECT_EQ(actual, expected);
+      ASSERT_EQ(actual_occluders.size(), actual.size());
+      for (size_t i = 0; i < actual.size(); ++i) {
+        EXPECT_EQ(actual_occluders[i],
+                  &occluders[static_cast<const MockObject*>(actual[i]) -
+                             objects.data()]);
+      }
+    }
+
+    // Occluded points, against all the blocking objects.
+    std::vector<MockPoint> points;
+    points.reserve(kNumPoints);
+    std::vector<const geometry::PointLike*> expected_points;
+    for (int64_t i = 0; i < kNumPoints; ++i) {
+      points.emplace_back(Vector2D(pos_dis(gen), pos_dis(gen)));
+      const std::vector<Vector2D> p = {points.back().Coordinate()};
+      geometry::utils::MaskType occluded = 0;
+      for (const MockObject& obj : objects) {
+        if (obj.can_block_sight()) {
+          occluded |=
+              geometry::BatchIntersects(obj.BoundingPolygon(), center, p)[0];
+        }
+      }
+      if (!occluded) {
+        expected_points.push_back(&points.back());
+      }
+    }
+    for (const OcclusionAlgorithm algorithm :
+         {OcclusionAlgorithm::kAngularBuckets,
+          OcclusionAlgorithm::kAngularSweep}) {
+      std::vector<const geometry::PointLike*> actual_points;
+      for (const MockPoint& p : points) {
+        actual_points.push_back(&p);
+      }
+      vf.FilterOccludedPoints(object_ptrs, occluder_ptrs, actual_points,
+                              algorithm);
+      std::sort(actual_points.begin(), actual_points.end());
+      EXPECT_EQ(actual_points, expected_points);
+    }
+  }
+}
+
 }  // namespace
 }  // namespace nocturne
@@ -7,12 +7,11 @@ import json
 import logging
 import random
 import glob
-import os
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
 from enum import Enum
-from itertools import islice, product
+from itertools import product
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, TypeVar, Union
+from typing import Any, Dict, List, Optional, Tuple, TypeVar, Union
 
 import numpy as np
 import torch
@@ -20,8 +19,18 @@ from box import Box as ConfigBox
 from gym import Env
 from gym.spaces import Box, Discrete
 
-from nocturne import Action, Simulation, Vector2D, Vehicle
+from nocturne import (
+    Action,
+    ScenarioPack,
+    Simulation,
+    Vector2D,
+    Vehicle,
+    scenario_cache_info,
+    set_scenario_cache_capacity,
+)
+from nocturne.envs.scene_prefetcher import ScenePrefetcher
 from utils.config import load_config
+from nocturne.utils import MANIFEST_FILE, VALID_FILES, scene_files
 np.set_printoptions(suppress=True)
 
 _MAX_NUM_TRIES_TO_FIND_VALID_VEHICLE = 100
@@ -30,6 +39,22 @@ ActType = TypeVar("ActType")  # pylint: disable=invalid-name
 ObsType = TypeVar("ObsType")  # pylint: disable=invalid-name
 RenderType = TypeVar("RenderType")  # pylint: disable=invalid-name
 
+# Categories of visible objects of the ragged observations, see `BaseEnv.get_ragged_observations`
+VISIBLE_CATEGORIES = ("objects", "road_points", "traffic_lights", "stop_signs")
+# Features of the ego state, in the order of the observations and of `ego_state_feat_max`
+EGO_STATE_FEATURES = (
+    "veh_len",
+    "veh_width",
+    "speed",
+    "target_dist",
+    "target_azimuth",
+    "target_heading",
+    "rel_target_speed_dist",
+    "curr_accel",
+    "curr_steering",
+    "curr_head_angle",
+)
+
 class CollisionType(Enum):
     """Enum for collision types."""
 
@@ -79,25 +104,95 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         self.count_invalid = 0
         self.count_total = 0
 
-        # Load valid vehicles dict 
-        with open(self.config.data_path / "valid_files.json", encoding="utf-8") as file:
-            self.valid_veh_dict = json.load(file)
-      
-        # Load files
-        file_paths = self.config.data_path.glob('*.json')
+        # The simulator normalizes the observations while it writes them, the scales are passed to it
+        # with the scenario config, see `_make_simulation`
+        self._ego_state_scales = np.array([float(val) for val in self.config.ego_state_feat_max.values()])
+        self._normalization_config = {"normalize_state": bool(self.config.normalize_state)}
+        if self.config.normalize_state:
+            self._normalization_config.update(
+                (f"ego_state_max_{name}", float(scale))
+                for name, scale in zip(EGO_STATE_FEATURES, self._ego_state_scales)
+            )
+            self._normalization_config.update(
+                (f"visible_state_max_{category}", float(self.config.vis_obs_max)) for category in VISIBLE_CATEGORIES
+            )
+
+        # Keep the parsed scenes in memory so that resets don't parse them again. The cache is process-wide,
+        # so an env only raises its budget and never shrinks or clears the cache of the other envs. Call
+        # `set_scenario_cache_capacity` to shrink it
+        scenario_cache_capacity = int(self.config.get("scenario_cache_mb", 0) * 2**20)
+        if scenario_cache_capacity > scenario_cache_info()["capacity"]:
+            set_scenario_cache_capacity(scenario_cache_capacity)
+
+        # Scenes are either stored as files in the data folder or packed in a
+        # single scenario pack file, with valid_files.json stored next to it
+        self.scenario_pack = None
+        data_dir = self.config.data_path
+        if self.config.data_path.is_file():
+            self.scenario_pack = ScenarioPack(str(self.config.data_path))
+            data_dir = self.config.data_path.parent
+
+        # The dataset manifest (see utils/data_generation/make_manifest.py) stores the metadata of every
+        # scene, which lets us skip the scenes without controllable vehicles without loading them
+        self.scene_metadata = None
+        manifest_path = Path(self.config.get("manifest_path") or data_dir / MANIFEST_FILE)
+        if manifest_path.exists():
+            with open(manifest_path, encoding="utf-8") as file:
+                manifest = json.load(file)
+            for key, value in manifest["scenario"].items():
+                if self.config.scenario.get(key) != value:
+                    logging.warning(
+                        f"The manifest was built with {key} = {value} but the scenario config has "
+                        f"{key} = {self.config.scenario.get(key)}, rebuild it."
+                    )
+            self.scene_metadata = manifest["scenes"]
+            self.valid_veh_dict = {file: meta["expert_ids"] for file, meta in self.scene_metadata.items()}
+            files = [file for file, meta in self.scene_metadata.items() if self._is_scene_usable(meta)]
+        else:
+            # Load valid vehicles dict
+            with open(data_dir / VALID_FILES, encoding="utf-8") as file:
+                self.valid_veh_dict = json.load(file)
+
+            # Load files, scenes can be stored as JSON or in the binary format
+            if self.scenario_pack is not None:
+                files = self.scenario_pack.names()
+            else:
+                files = scene_files(data_dir)
 
         if self.config.fix_file_order:
-            files = sorted([os.path.basename(file) for file in file_paths])
+            files = sorted(files)
         else:
-            files = [os.path.basename(file) for file in file_paths]
             random.shuffle(files)
 
         # Select subset of files to sample from
         if self.config.num_files != -1:
             self.files = files[: self.config.num_files]
+        else:
+            self.files = files
         if len(self.files) == 0:
             raise ValueError("Data path does not contain scenes.")
 
+        # Load the next scenes in the background while the current episode runs. The sampled but not yet
+        # used scenes are kept in `_upcoming_files`, together with the probabilities they were sampled with.
+        # Scenes sampled ahead of time are drawn from their own generator, so that they don't change the
+        # order of the draws of the global one, e.g. of the vehicle permutations of reset
+        self.prefetcher = None
+        self._upcoming_files = deque()
+        self._upcoming_probs = None
+        self._file_rng = np.random
+        if self.config.get("prefetch_depth", 0) > 0:
+            self.prefetcher = ScenePrefetcher(
+                self._make_simulation,
+                depth=self.config.prefetch_depth,
+                num_workers=self.config.get("prefetch_workers", 1),
+            )
+            self._file_rng = np.random.default_rng(self.config.seed)
+
+        # Observations without the padding of the visible state, see `get_ragged_observations`
+        self.ragged_obs = self.config.subscriber.get("ragged_observations", False)
+        if self.ragged_obs and self.config.subscriber.n_frames_stacked > 1:
+            raise ValueError("Frame stacking is not supported with ragged observations.")
+
         # Set observation space
         obs_dim = self._get_obs_space_dim()
         self.observation_space = Box(
@@ -112,6 +207,20 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         else:
             self._set_continuous_action_space()
 
+        # State of the scenes after the warm-up of reset, see `_run_warmup`
+        self._warmup_cache = OrderedDict()
+
+        # Buffers the observations are written to when no output array is given, see `get_observations`
+        # and `_stack_frames`. They are reused across steps, so their rows are overwritten by the next step
+        self._raw_obs_buffer = np.empty((0, 0), dtype=np.float32)
+        self._obs_buffer = np.empty((0, 0), dtype=np.float32)
+        self._stacked_obs_buffer = np.empty((0, 0), dtype=np.float32)
+
+        # Last observations of the controlled vehicles for frame stacking, see `_reset_context`
+        self._context = np.empty((0, 0, 0), dtype=np.float32)
+        self._context_rows = {}
+        self._context_head = 0
+
         # Count total and invalid samples
         self.invalid_samples = 0
         self.total_samples = 0
@@ -119,10 +228,25 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
     def apply_actions(self, action_dict: Dict[int, ActType]) -> None:
         """Apply a dict of actions to the vehicle objects.
 
+        Discrete action indices and numpy actions are applied to all the vehicles in a single call to the
+        simulator.
+
         Args:
         ----
             action_dict (Dict[int, ActType]): Dictionary of actions to apply to the vehicles.
         """
+        if len(action_dict) == 0:
+            return
+        ids = np.fromiter(action_dict.keys(), dtype=np.int64, count=len(action_dict))
+        actions = list(action_dict.values())
+        if self.idx_to_actions is not None and all(isinstance(action, (int, np.integer)) for action in actions):
+            self.scenario.apply_discrete_actions(ids, np.array(actions), self.accel_grid, self.steering_grid)
+            return
+        if all(isinstance(action, np.ndarray) and action.size == 3 for action in actions):
+            actions = np.stack(actions)
+            self.scenario.apply_actions(ids, actions[:, 0], actions[:, 1], actions[:, 2])
+            return
+
         for veh_obj in self.scenario.getObjectsThatMoved():
             action = action_dict.get(veh_obj.id, None)
             if action is None:
@@ -130,13 +254,18 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             _apply_action_to_vehicle(veh_obj, action, idx_to_actions=self.idx_to_actions)
 
     def step(  # pylint: disable=arguments-renamed,too-many-locals,too-many-branches,too-many-statements
-        self, action_dict: Dict[int, ActType]
+        self, action_dict: Dict[int, ActType], out: Optional[np.ndarray] = None
     ) -> Tuple[Dict[int, ObsType], Dict[int, float], Dict[int, bool], Dict[int, Dict[str, Union[bool, str]]]]:
         """Run one timestep of the environment's dynamics.
 
+        The observations are views into buffers reused by the next step, copy them to keep them.
+
         Args:
         ----
             action_dict (Dict[int, ActType]): Dictionary of actions to apply to the vehicles.
+            out (Optional[np.ndarray]): If given, C-contiguous float32 array with at least one row per
+                controlled vehicle the observations are written to, see `_write_observations`. Not
+                supported with ragged observations.
 
         Raises:
         ------
@@ -169,47 +298,62 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         for obj in objects_to_teleport:
             obj.expert_control = True
             
-        # Step the simulator
-        self.simulation.step(self.config.dt)
-        self.t += self.config.dt
-        self.step_num += 1
+        # Step the simulator, holding the actions for `sims_per_step` steps. The last step of the
+        # episode is shorter when sims_per_step does not divide the number of steps left, as the
+        # expert trajectories end at episode_length.
+        sims_per_step = min(self.config.get("sims_per_step", 1), max(self.config.episode_length - self.step_num, 1))
+        if sims_per_step > 1:
+            goal_ids = self.simulation.step_n(sims_per_step, self.config.dt, **self._goal_tolerances())
+        else:
+            self.simulation.step(self.config.dt)
+            goal_ids = np.empty(0, dtype=np.int64)
+        self.t += self.config.dt * sims_per_step
+        self.step_num += sims_per_step
 
         logging.debug(f'stepping {[obj.id for obj in objects_to_teleport]} ({len(objects_to_teleport)} / {len(objects_to_teleport)+len(self.controlled_vehicles)}) vehs in expert-control mode.\n')
         logging.debug(f'controlling vehicle(s): {[veh.id for veh in self.controlled_vehicles]}, is_av? {[veh.is_av for veh in self.controlled_vehicles]}, expert-control = {[veh.expert_control for veh in self.controlled_vehicles]}.')
         
+        # Read the states of the active vehicles at once
+        active_vehicles = [veh_obj for veh_obj in self.controlled_vehicles if veh_obj.getID() not in self.done_ids]
+        states = self.scenario.object_states(np.array([veh_obj.getID() for veh_obj in active_vehicles], dtype=np.int64))
+        goal_dists = np.linalg.norm(states["target_position"] - states["position"], axis=1)
+        speed_diffs = np.abs(states["speed"].astype(np.float64) - states["target_speed"])
+        heading_diffs = np.abs(_angle_sub(states["heading"].astype(np.float64), states["target_heading"]))
+        # Vehicles that reached their goal during the intermediate steps of an action repeat
+        goals_reached = np.isin(states["id"], goal_ids)
+
+        # Vehicles to remove from the scene once all the observations are computed
+        removed_ids = []
+
+        # Row of each active vehicle in `observations`
+        obs_rows = range(len(active_vehicles))
+        if self.ragged_obs:
+            observations = self.get_ragged_observations(active_vehicles)
+        elif out is None:
+            observations = self._stack_frames(active_vehicles, self.get_observations(active_vehicles))
+        else:
+            observations = self._write_observations(active_vehicles, out)
+            obs_rows = [self._context_rows[veh_obj.getID()] for veh_obj in active_vehicles]
+
         # Take actions for the controlled vehicles
-        for veh_obj in self.controlled_vehicles:
+        for idx, veh_obj in enumerate(active_vehicles):
             veh_id = veh_obj.getID()
-            if veh_id in self.done_ids:
-                continue
-      
-            if veh_obj.position.x == self.config.scenario.invalid_position:
-                logging.debug(f"(IN STEP) at t = {self.step_num} in {self.file}, vehicle {veh_obj.id} is invalid (pos = {veh_obj.position.x}). Removing it.")
+
+            if states["position"][idx, 0] == self.config.scenario.invalid_position:
+                logging.debug(f"(IN STEP) at t = {self.step_num} in {self.file}, vehicle {veh_id} is invalid (pos = {states['position'][idx, 0]}). Removing it.")
                 self.invalid_samples += 1
 
             # Get vehicle observation
-            self.context_dict[veh_id].append(self.get_observation(veh_obj))
-            if self.config.subscriber.n_frames_stacked > 1:
-                veh_deque = self.context_dict[veh_id]
-                context_list = list(
-                    islice(
-                        veh_deque,
-                        len(veh_deque) - self.config.subscriber.n_frames_stacked,
-                        len(veh_deque),
-                    )
-                )
-                obs_dict[veh_id] = np.concatenate(context_list)
+            if self.ragged_obs:
+                obs_dict[veh_id] = ragged_row(observations, idx)
             else:
-                obs_dict[veh_id] = self.context_dict[veh_id][-1]
+                obs_dict[veh_id] = observations[obs_rows[idx]]
             rew_dict[veh_id] = 0
             done_dict[veh_id] = False
             info_dict[veh_id]["goal_achieved"] = False
             info_dict[veh_id]["collided"] = False
             info_dict[veh_id]["veh_veh_collision"] = False
             info_dict[veh_id]["veh_edge_collision"] = False
-       
-            obj_pos = veh_obj.position
-            goal_pos = veh_obj.target_position
 
             ############################################
             #   Compute rewards
@@ -218,14 +362,12 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             speed_target_achieved = True
             heading_target_achieved = True
             if rew_cfg.position_target:
-                position_target_achieved = (goal_pos - obj_pos).norm() < rew_cfg.position_target_tolerance
+                position_target_achieved = goal_dists[idx] < rew_cfg.position_target_tolerance
             if rew_cfg.speed_target:
-                speed_target_achieved = np.abs(veh_obj.speed - veh_obj.target_speed) < rew_cfg.speed_target_tolerance
+                speed_target_achieved = speed_diffs[idx] < rew_cfg.speed_target_tolerance
             if rew_cfg.heading_target:
-                heading_target_achieved = (
-                    np.abs(_angle_sub(veh_obj.heading, veh_obj.target_heading)) < rew_cfg.heading_target_tolerance
-                )
-            if position_target_achieved and speed_target_achieved and heading_target_achieved:
+                heading_target_achieved = heading_diffs[idx] < rew_cfg.heading_target_tolerance
+            if (position_target_achieved and speed_target_achieved and heading_target_achieved) or goals_reached[idx]:
                 info_dict[veh_id]["goal_achieved"] = True
                 rew_dict[veh_id] += rew_cfg.goal_achieved_bonus / rew_cfg.reward_scaling
         
@@ -236,7 +378,7 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                 if rew_cfg.goal_distance_penalty:
                     rew_dict[veh_id] -= (
                         rew_cfg.shaped_goal_distance_scaling
-                        * ((goal_pos - obj_pos).norm() / self.goal_dist_normalizers[veh_id] + 1e4)
+                        * (goal_dists[idx] / self.goal_dist_normalizers[veh_id] + 1e4)
                         / rew_cfg.reward_scaling
                     )
                 else:
@@ -246,7 +388,7 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                     # time-step is always less than just acquiring the goal reward once
                     rew_dict[veh_id] += (
                         rew_cfg.shaped_goal_distance_scaling
-                        * (1 - (goal_pos - obj_pos).norm() / (self.goal_dist_normalizers[veh_id] + 1e4))
+                        * (1 - goal_dists[idx] / (self.goal_dist_normalizers[veh_id] + 1e4))
                         / rew_cfg.reward_scaling
                     )
                 # repeat the same thing for speed and heading
@@ -254,26 +396,26 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                     if rew_cfg.goal_distance_penalty:
                         rew_dict[veh_id] -= (
                             rew_cfg.shaped_goal_distance_scaling
-                            * (np.abs(veh_obj.speed - veh_obj.target_speed) / rew_cfg.goal_speed_scaling)
+                            * (speed_diffs[idx] / rew_cfg.goal_speed_scaling)
                             / rew_cfg.reward_scaling
                         )
                     else:
                         rew_dict[veh_id] += (
                             rew_cfg.shaped_goal_distance_scaling
-                            * (1 - np.abs(veh_obj.speed - veh_obj.target_speed) / rew_cfg.goal_speed_scaling)
+                            * (1 - speed_diffs[idx] / rew_cfg.goal_speed_scaling)
                             / rew_cfg.reward_scaling
                         )
                 if rew_cfg.shaped_goal_distance and rew_cfg.heading_target:
                     if rew_cfg.goal_distance_penalty:
                         rew_dict[veh_id] -= (
                             rew_cfg.shaped_goal_distance_scaling
-                            * (np.abs(_angle_sub(veh_obj.heading, veh_obj.target_heading)) / (2 * np.pi))
+                            * (heading_diffs[idx] / (2 * np.pi))
                             / rew_cfg.reward_scaling
                         )
                     else:
                         rew_dict[veh_id] += (
                             rew_cfg.shaped_goal_distance_scaling
-                            * (1 - np.abs(_angle_sub(veh_obj.heading, veh_obj.target_heading)) / (2 * np.pi))
+                            * (1 - heading_diffs[idx] / (2 * np.pi))
                             / rew_cfg.reward_scaling
                         )
             ############################################
@@ -282,14 +424,15 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             # achieved our goal
             if info_dict[veh_id]["goal_achieved"] and self.config.get("remove_at_goal", True):
                 done_dict[veh_id] = True
-            if veh_obj.getCollided():
+            if states["collided"][idx]:
                 info_dict[veh_id]["collided"] = True
-                if int(veh_obj.collision_type) == CollisionType.VEHICLE_VEHICLE.value:
+                collision_type = states["collision_type"][idx]
+                if collision_type == CollisionType.VEHICLE_VEHICLE.value:
                     info_dict[veh_id]["veh_veh_collision"] = True
-                elif int(veh_obj.collision_type) == CollisionType.VEHICLE_EDGE.value:
+                elif collision_type == CollisionType.VEHICLE_EDGE.value:
                     info_dict[veh_id]["veh_edge_collision"] = True
-                elif int(veh_obj.collision_type) != CollisionType.NONE.value:
-                    raise ValueError(f"Unknown collision type: {veh_obj.collision_type}.")
+                elif collision_type != CollisionType.NONE.value:
+                    raise ValueError(f"Unknown collision type: {collision_type}.")
                 rew_dict[veh_id] -= np.abs(rew_cfg.collision_penalty) / rew_cfg.reward_scaling
                 if self.config.get("remove_at_collide", True):
                     done_dict[veh_id] = True
@@ -300,7 +443,9 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                 if (info_dict[veh_id]["goal_achieved"] and self.config.get("remove_at_goal", True)) or (
                     info_dict[veh_id]["collided"] and self.config.get("remove_at_collide", True)
                 ):
-                    self.scenario.removeVehicle(veh_obj)
+                    removed_ids.append(veh_id)
+        if removed_ids:
+            self.scenario.remove_objects(np.array(removed_ids, dtype=np.int64))
 
         if self.config.rew_cfg.shared_reward:
             total_reward = np.sum(rew_dict.values())
@@ -315,17 +460,30 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
 
         return obs_dict, rew_dict, done_dict, info_dict
 
+    def _goal_tolerances(self) -> Dict[str, Optional[float]]:
+        """Return the goal tolerances of the reward config, None for the targets that are not used."""
+        rew_cfg = self.config.rew_cfg
+        return {
+            "position_tolerance": rew_cfg.position_target_tolerance if rew_cfg.position_target else None,
+            "speed_tolerance": rew_cfg.speed_target_tolerance if rew_cfg.speed_target else None,
+            "heading_tolerance": rew_cfg.heading_target_tolerance if rew_cfg.heading_target else None,
+        }
+
     def reset(  # pylint: disable=arguments-differ,too-many-locals,too-many-branches,too-many-statements
         self,
         filename=None,
         psr_dict=None,
+        out=None,
     ) -> Dict[int, ObsType]:
         """Reset the environment.
 
+        The observations are views into buffers reused by the next step, copy them to keep them.
+
         Args:
         ----
         filename: If provided, reset env to this traffic scene.
         psr_dict: If provided, reset env to a scene sampled with given probabilities.
+        out: If provided, array the observations are written to, see `step`.
 
         Returns:
         -------
@@ -342,18 +500,15 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             if filename is not None:
                 # Reset to a specific scene name
                 self.file = filename
-            elif self.config.sample_file_method == "no_replacement":
-                # Random uniformly without replacement
-                self.file = self.files.pop()
-            elif psr_dict is not None:
-                # Prioritized scene replay: sample according to probabilities
-                probs = [item["prob"] for item in psr_dict.values()]
-                self.file = np.random.choice(self.files, p=probs)
-            else:  # Random uniformly with replacement (default)
-                self.file = np.random.choice(self.files)
-
-            self.simulation = Simulation(str(self.config.data_path / self.file), config=self.config.scenario)
-            
+            else:
+                self.file = self._sample_file(psr_dict)
+
+            if self.prefetcher is not None:
+                self.simulation = self.prefetcher.get(self.file)
+                self.prefetcher.prefetch(self._predict_next_files(filename))
+            else:
+                self.simulation = self._make_simulation(self.file)
+
             self.scenario = self.simulation.getScenario()
 
             # Get controlled vehicles
@@ -372,40 +527,36 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                     raise ValueError(f"Scene {self.file!s} has no AV vehicles in. Skip")
 
             #####################################################################
-            #   Construct context dictionary of observations that can be used to
-            #   warm up policies by stepping all vehicles as experts.
+            #   Step all the vehicles forward as experts and record their
+            #   observations as context that can be used to warm up policies.
             #####################################################################
-            dead_feat = -np.ones(
-                self.get_observation(self.scenario.getVehicles()[0]).shape[0] * self.config.subscriber.n_frames_stacked
-            )
-            # Step all the vehicles forward by one second and record their observations
-            # as context
             self.config.scenario.context_length = max(
                 self.config.scenario.context_length, self.config.subscriber.n_frames_stacked
             )  # Note: Consider raising an error if context_length < n_frames_stacked.
-            self.context_dict = {
-                veh.getID(): deque(
-                    [dead_feat for _ in range(self.config.scenario.context_length)],
-                    maxlen=self.config.scenario.context_length,
-                )
-                for veh in self.scenario.getVehicles()
-            }
-            for veh in self.scenario.getObjectsThatMoved():
-                veh.expert_control = True
-            for _ in range(self.config.scenario.context_length):
-                for veh in self.scenario.getObjectsThatMoved():
-                    obs = self.get_observation(veh)
-                    self.context_dict[veh.getID()].append(obs)
-                # Step simulator
-                self.simulation.step(self.config.dt)
-                # Make sure to increment counter
-                self.step_num += 1
-            # now hand back control to our actual controllers
-            for veh in self.scenario.getObjectsThatMoved():
-                veh.expert_control = False
+            # Repeated resets to the same scene restore the state after the warm-up from the cache instead
+            # of simulating it again. The observation config doesn't change over the life of the env, so
+            # it is not part of the key
+            warmup_key = (
+                self.file,
+                self.config.scenario.start_time,
+                self.config.scenario.context_length,
+                self.config.dt,
+            )
+            warmup = self._warmup_cache.get(warmup_key)
+            if warmup is not None:
+                self._warmup_cache.move_to_end(warmup_key)
+                self._restore_warmup(warmup)
+            else:
+                warmup = self._run_warmup()
+                if self.config.get("warmup_cache_size", 0) > 0:
+                    self._warmup_cache[warmup_key] = warmup
+                    if len(self._warmup_cache) > self.config.warmup_cache_size:
+                        self._warmup_cache.popitem(last=False)
+            self.step_num += self.config.scenario.context_length
 
             # remove all the objects that are in collision or are already in goal dist
             # additionally set the objects that have infeasible goals to be experts
+            removed_ids = []
             for veh_obj in self.simulation.getScenario().getObjectsThatMoved():
                 obj_pos = _position_as_array(veh_obj.getPosition())
                 goal_pos = _position_as_array(veh_obj.getGoalPosition())
@@ -415,12 +566,13 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                 ############################################
                 norm = np.linalg.norm(goal_pos - obj_pos)
                 if norm < self.config.rew_cfg.goal_tolerance or veh_obj.getCollided():
-                    self.scenario.removeVehicle(veh_obj)
+                    removed_ids.append(veh_obj.getID())
                 ############################################
                 #    Set all vehicles with unachievable goals to be experts
                 ############################################
                 if self.file in self.valid_veh_dict and veh_obj.getID() in self.valid_veh_dict[self.file]:
                     veh_obj.expert_control = True
+            self.scenario.remove_objects(np.array(removed_ids, dtype=np.int64))
             ############################################
             #    Pick out the vehicles that we are controlling
             ############################################
@@ -429,6 +581,7 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                 temp_vehicles = np.random.permutation(self.scenario.getObjectsThatMoved())
                 curr_index = 0
                 self.controlled_vehicles = []
+                removed_ids = []
 
                 for vehicle in temp_vehicles:
                     # Remove vehicles that have invalid positions
@@ -443,7 +596,7 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                     ) or np.isclose(vehicle.getGoalPosition().y, self.config.scenario.invalid_position)
 
                     if veh_at_invalid_pos or veh_has_invalid_goal_pos:
-                        self.scenario.removeVehicle(vehicle)
+                        removed_ids.append(vehicle.getID())
 
                     # Otherwise the vehicle is valid and we add it to the list of controlled vehicles
                     if (
@@ -456,6 +609,7 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                         curr_index += 1
                     else:
                         vehicle.expert_control = True
+                self.scenario.remove_objects(np.array(removed_ids, dtype=np.int64))
 
             self.all_vehicle_ids = {veh.getID(): veh for veh in self.controlled_vehicles}
 
@@ -466,6 +620,12 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         else:  # No break in for-loop, i.e., no valid vehicle found in any of the files.
             raise ValueError(f"No controllable vehicles in any of the {len(self.files)} scenes.")
 
+        # Only the collisions of the controlled vehicles are used by the environment
+        if self.config.get("check_controlled_collisions_only", False):
+            self.scenario.set_collision_subset(
+                np.array([veh_obj.getID() for veh_obj in self.controlled_vehicles], dtype=np.int64)
+            )
+
         # Set goal positions for controlled vehicles
         self._set_goal_positions()
 
@@ -473,7 +633,16 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         obs_dict = {}
         self.goal_dist_normalizers = {}
         max_goal_dist = -np.inf
-        for veh_obj in self.controlled_vehicles:
+        if self.ragged_obs:
+            observations = self.get_ragged_observations(self.controlled_vehicles)
+        elif out is None:
+            observations = self.get_observations(self.controlled_vehicles)
+            self._reset_context(warmup["context"], observations.shape[1], observations.dtype)
+            observations = self._stack_frames(self.controlled_vehicles, observations)
+        else:
+            self._reset_context(warmup["context"], out.shape[1] // self.config.subscriber.n_frames_stacked, out.dtype)
+            observations = self._write_observations(self.controlled_vehicles, out)
+        for idx, veh_obj in enumerate(self.controlled_vehicles):
             veh_id = veh_obj.getID()
             # store normalizers for each vehicle
             obj_pos = _position_as_array(veh_obj.getPosition())
@@ -481,20 +650,10 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             dist = np.linalg.norm(obj_pos - goal_pos)
             self.goal_dist_normalizers[veh_id] = dist
             # compute the obs
-            obs = self.get_observation(veh_obj)
-            self.context_dict[veh_id].append(obs)
-            if self.config.subscriber.n_frames_stacked > 1:
-                veh_deque = self.context_dict[veh_id]
-                context_list = list(
-                    islice(
-                        veh_deque,
-                        len(veh_deque) - self.config.subscriber.n_frames_stacked,
-                        len(veh_deque),
-                    )
-                )
-                obs_dict[veh_id] = np.concatenate(context_list)
+            if self.ragged_obs:
+                obs_dict[veh_id] = ragged_row(observations, idx)
             else:
-                obs_dict[veh_id] = self.context_dict[veh_id][-1]
+                obs_dict[veh_id] = observations[idx]
             # pick the vehicle that has to travel the furthest distance and use it for
             # rendering
             if dist > max_goal_dist:
@@ -510,13 +669,270 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
             veh_obj = self.all_vehicle_ids[veh_id]
             if np.isclose(veh_obj.position.x, self.config.scenario.invalid_position):
                 logging.debug(f"obs_dict contains invalid vehicle! veh_id: {veh_id} at t = {self.step_num}")
-                logging.debug(f"obs_max: {obs_dict[veh_id].max()}")
+                if not self.ragged_obs:
+                    logging.debug(f"obs_max: {obs_dict[veh_id].max()}")
                 self.invalid_samples += 1
 
         self.total_samples += len(obs_dict.keys())
 
         return obs_dict
 
+    def _run_warmup(self) -> Dict[str, Any]:
+        """Step all the moving vehicles as experts for `context_length` steps.
+
+        Returns:
+        -------
+            Dict[str, Any]: the current time, the kinematic state and control mode of every object after the
+                warm-up, and the warm-up observations of the moving vehicles.
+        """
+        # Only the last `n_frames_stacked - 1` warm-up observations end up in a stacked observation, the
+        # older ones are pushed out of the context before they are used
+        context_length = self.config.scenario.context_length
+        first_obs_step = context_length - (self.config.subscriber.n_frames_stacked - 1)
+        context = defaultdict(list)
+        for veh in self.scenario.getObjectsThatMoved():
+            veh.expert_control = True
+        for step in range(context_length):
+            if step >= first_obs_step:
+                moved = self.scenario.getObjectsThatMoved()
+                # The observations are copied out of the buffer reused by the next call
+                for veh, obs in zip(moved, self.get_observations(moved).copy()):
+                    context[veh.getID()].append(obs)
+            self.simulation.step(self.config.dt)
+        # now hand back control to our actual controllers
+        for veh in self.scenario.getObjectsThatMoved():
+            veh.expert_control = False
+
+        objects = self.scenario.getObjects()
+        states = np.array(
+            [
+                [obj.position.x, obj.position.y, obj.heading, obj.speed, obj.acceleration, obj.steering, obj.head_angle]
+                for obj in objects
+            ]
+        )
+        expert_control = [obj.expert_control for obj in objects]
+        return {
+            "current_time": self.scenario.current_time,
+            "states": states,
+            "expert_control": expert_control,
+            "context": dict(context),
+        }
+
+    def _reset_context(self, warmup_context: Dict[int, List[np.ndarray]], obs_dim: int, dtype: np.dtype) -> None:
+        """Reset the frame stacking context of the controlled vehicles to their warm-up observations.
+
+        The context is a ring buffer of shape `(num_vehicles, n_frames_stacked, obs_dim)` with the last
+        observations of every controlled vehicle, the newest one being in slot `_context_head`. The
+        observations of all the vehicles are pushed at the same steps, so they share the head. The
+        frames before the first observation of a vehicle are filled with -1.
+
+        Args:
+        ----
+            warmup_context (Dict[int, List[np.ndarray]]): the warm-up observations of the moving vehicles,
+                see `_run_warmup`.
+            obs_dim (int): size of an observation.
+            dtype (np.dtype): data type of the observations.
+        """
+        n_frames_stacked = self.config.subscriber.n_frames_stacked
+        self._context_rows = {veh_obj.getID(): row for row, veh_obj in enumerate(self.controlled_vehicles)}
+        self._context = np.full((len(self.controlled_vehicles), n_frames_stacked, obs_dim), -1, dtype=dtype)
+        # The warm-up observations fill the slots up to the head, the next observation goes to the last one
+        self._context_head = (n_frames_stacked - 2) % n_frames_stacked
+        for veh_id, row in self._context_rows.items():
+            frames = warmup_context.get(veh_id, [])
+            frames = frames[max(len(frames) - (n_frames_stacked - 1), 0) :]
+            if len(frames) > 0:
+                self._context[row, n_frames_stacked - 1 - len(frames) : n_frames_stacked - 1] = frames
+
+    def _stack_frames(self, veh_objs: List[Vehicle], observations: np.ndarray) -> np.ndarray:
+        """Push the observations of the vehicles to their context and return their stacked observations.
+
+        Args:
+        ----
+            veh_objs (List[Vehicle]): controlled vehicles the observations are of.
+            observations (np.ndarray): one observation per vehicle, see `get_observations`.
+
+        Returns:
+        -------
+            np.ndarray: array of shape `(len(veh_objs), n_frames_stacked * obs_dim)` with the last
+                `n_frames_stacked` observations of each vehicle, from the oldest to the newest. It is a
+                buffer of the env that is reused by the next call.
+        """
+        if self.config.subscriber.n_frames_stacked == 1:
+            return observations
+        self._push_frames(veh_objs, observations)
+        self._stacked_obs_buffer = _fit_buffer(self._stacked_obs_buffer, len(veh_objs), self._context[0].size)
+        return self._gather_frames(veh_objs, self._stacked_obs_buffer[: len(veh_objs)])
+
+    def _push_frames(self, veh_objs: List[Vehicle], observations: np.ndarray) -> None:
+        """Push the observations of the vehicles to their context.
+
+        Args:
+        ----
+            veh_objs (List[Vehicle]): controlled vehicles the observations are of.
+            observations (np.ndarray): one observation per vehicle, see `get_observations`.
+        """
+        rows = np.array([self._context_rows[veh_obj.getID()] for veh_obj in veh_objs], dtype=np.int64)
+        self._context_head = (self._context_head + 1) % self.config.subscriber.n_frames_stacked
+        self._context[rows, self._context_head] = observations
+
+    def _gather_frames(self, veh_objs: List[Vehicle], out: np.ndarray) -> np.ndarray:
+        """Write the last `n_frames_stacked` observations of the vehicles to `out`, from the oldest to the newest.
+
+        Args:
+        ----
+            veh_objs (List[Vehicle]): controlled vehicles to get the stacked observations of.
+            out (np.ndarray): C-contiguous array of shape `(len(veh_objs), n_frames_stacked * obs_dim)`.
+
+        Returns:
+        -------
+            np.ndarray: `out`.
+        """
+        n_frames_stacked = self.config.subscriber.n_frames_stacked
+        rows = np.array([self._context_rows[veh_obj.getID()] for veh_obj in veh_objs], dtype=np.int64)
+        frames = (self._context_head + 1 + np.arange(n_frames_stacked)) % n_frames_stacked
+        # The frames of all the vehicles are gathered at once from the context, seen as one frame per row.
+        # The indices are in range, and unlike the default mode "clip" doesn't buffer the output
+        obs_dim = self._context.shape[2]
+        np.take(
+            self._context.reshape(-1, obs_dim),
+            rows[:, None] * n_frames_stacked + frames,
+            axis=0,
+            out=out.reshape(len(rows), n_frames_stacked, obs_dim),
+            mode="clip",
+        )
+        return out
+
+    def _write_observations(self, active_vehicles: List[Vehicle], out: np.ndarray) -> np.ndarray:
+        """Write the stacked observations of the controlled vehicles to the rows of `out`.
+
+        Row i of `out` is the observation of the i-th controlled vehicle. The rows of the controlled vehicles
+        that are not active and the rows after the last controlled vehicle are NaN. Without frame stacking
+        nor current positions, the simulator writes the observations straight to `out`.
+
+        Args:
+        ----
+            active_vehicles (List[Vehicle]): controlled vehicles that are not done.
+            out (np.ndarray): C-contiguous float32 array of shape `(num_rows, observation dim)`, with at
+                least one row per controlled vehicle.
+
+        Returns:
+        -------
+            np.ndarray: the rows of `out` of the controlled vehicles.
+        """
+        num_controlled = len(self.controlled_vehicles)
+        out[num_controlled:] = np.nan
+        observations = out[:num_controlled]
+        active_ids = {veh_obj.getID() for veh_obj in active_vehicles}
+        if self.config.subscriber.n_frames_stacked == 1 and not self.config.subscriber.use_current_position:
+            # The rows of the ids that are not in the scenario are NaN
+            ids = [veh_obj.getID() if veh_obj.getID() in active_ids else -1 for veh_obj in self.controlled_vehicles]
+            return self.scenario.observations(
+                np.array(ids, dtype=np.int64),
+                self.config.subscriber.view_dist,
+                self.config.subscriber.view_angle,
+                ego_state=self.config.subscriber.use_ego_state,
+                visible_state=self.config.subscriber.use_observations,
+                out=observations,
+            )
+        self._push_frames(active_vehicles, self.get_observations(active_vehicles))
+        self._gather_frames(self.controlled_vehicles, observations)
+        for row, veh_obj in enumerate(self.controlled_vehicles):
+            if veh_obj.getID() not in active_ids:
+                observations[row] = np.nan
+        return observations
+
+    def _restore_warmup(self, warmup: Dict[str, Any]) -> None:
+        """Restore the state of the scenario after the warm-up.
+
+        Args:
+        ----
+            warmup (Dict[str, Any]): the output of `_run_warmup` for the current scene.
+        """
+        for obj, (pos_x, pos_y, heading, speed, accel, steering, head_angle), expert_control in zip(
+            self.scenario.getObjects(), warmup["states"], warmup["expert_control"]
+        ):
+            obj.expert_control = expert_control
+            obj.set_position(pos_x, pos_y)
+            obj.heading = heading
+            obj.speed = speed
+            obj.acceleration = accel
+            obj.steering = steering
+            obj.head_angle = head_angle
+        self.scenario.current_time = warmup["current_time"]
+        self.scenario.refresh_objects()
+
+    def _is_scene_usable(self, meta: Dict[str, Any]) -> bool:
+        """Return whether a scene of the manifest has vehicles that reset can pick to control.
+
+        Args:
+        ----
+            meta (Dict[str, Any]): metadata of the scene in the manifest.
+        """
+        if self.use_av_only:
+            return len(meta["av_ids"]) > 0
+        return meta["num_controllable"] > 0
+
+    def _make_simulation(self, file: str) -> Simulation:
+        """Create the simulation of a traffic scene.
+
+        Args:
+        ----
+            file (str): file name of the scene in the data folder or in the scenario pack.
+        """
+        config = {**self.config.scenario, **self._normalization_config}
+        if self.scenario_pack is not None:
+            return Simulation(self.scenario_pack, file, config=config)
+        return Simulation(str(self.config.data_path / file), config=config)
+
+    def _sample_file(self, psr_dict=None) -> str:
+        """Sample the next traffic scene according to `sample_file_method`.
+
+        Args:
+        ----
+            psr_dict: If provided, sample the scene with the given probabilities.
+        """
+        if self.config.sample_file_method == "no_replacement":
+            # Random uniformly without replacement
+            return self.files.pop()
+        # Prioritized scene replay samples according to probabilities, the default is random uniformly with
+        # replacement. Scenes sampled ahead of time with other probabilities are discarded
+        probs = [item["prob"] for item in psr_dict.values()] if psr_dict is not None else None
+        if probs != self._upcoming_probs:
+            self._upcoming_files.clear()
+            self._upcoming_probs = probs
+        if len(self._upcoming_files) == 0:
+            self._upcoming_files.append(self._file_rng.choice(self.files, p=probs))
+        return self._upcoming_files.popleft()
+
+    def _predict_next_files(self, filename=None):
+        """Return the scenes the next resets are going to use, sampling them ahead of time if needed.
+
+        Args:
+        ----
+            filename: If provided, the env is reset to this traffic scene every time.
+        """
+        depth = self.prefetcher.depth
+        if filename is not None:
+            return [filename] * depth
+        if self.config.sample_file_method == "no_replacement":
+            return self.files[: -depth - 1 : -1]
+        while len(self._upcoming_files) < depth:
+            self._upcoming_files.append(self._file_rng.choice(self.files, p=self._upcoming_probs))
+        return list(self._upcoming_files)
+
+    def prefetch_stats(self) -> Dict[str, int]:
+        """Return the number of scene prefetch hits, misses and of scenes being prefetched."""
+        if self.prefetcher is None:
+            return {"hits": 0, "misses": 0, "pending": 0}
+        return self.prefetcher.stats()
+
+    def close(self) -> None:
+        """Stop the background scene loading."""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+
     def get_observation(self, veh_obj: Vehicle) -> np.ndarray:
         """Return the observation for a particular vehicle.
 
@@ -528,36 +944,95 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         -------
             np.ndarray: Observation for the vehicle.
         """
-        cur_position = []
-        if self.config.subscriber.use_current_position:
-            cur_position = _position_as_array(veh_obj.getPosition())
-            speed = np.array([veh_obj.getSpeed()])
-            steer = np.array([veh_obj.steering])
-            if self.config.normalize_state:
-                cur_position = cur_position / np.linalg.norm(cur_position)
+        return self.get_observations([veh_obj])[0].copy()
 
-            cur_position = np.concatenate([cur_position, speed, steer])
+    def get_observations(self, veh_objs: List[Vehicle], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the observations of several vehicles, computed in a single call to the simulator.
 
-        ego_state = []
-        if self.config.subscriber.use_ego_state:
-            ego_state = self.scenario.ego_state(veh_obj)
+        Args:
+        ----
+            veh_objs (List[Vehicle]): Vehicle objects to get the observations for.
+            out (Optional[np.ndarray]): If given, C-contiguous float32 array of shape (len(veh_objs),
+                observation dim) the observations are written to. Otherwise they are written to a buffer
+                of the env that is reused by the next call.
 
-            if self.config.normalize_state:
-                ego_state_norm = self.normalize_ego_state_by_cat(ego_state)
-            
-        visible_state = []
-        if self.config.subscriber.use_observations:
-            visible_state = self.scenario.flattened_visible_state(
-                veh_obj, self.config.subscriber.view_dist, self.config.subscriber.view_angle
+        Returns:
+        -------
+            np.ndarray: Observations of the vehicles, one row per vehicle.
+        """
+        use_ego_state = self.config.subscriber.use_ego_state
+        use_observations = self.config.subscriber.use_observations
+        use_current_position = self.config.subscriber.use_current_position
+        num_vehicles = len(veh_objs)
+        obs_size = self.scenario.observation_size(ego_state=use_ego_state, visible_state=use_observations)
+        if out is None:
+            self._obs_buffer = _fit_buffer(self._obs_buffer, num_vehicles, obs_size + 4 * use_current_position)
+            out = self._obs_buffer[:num_vehicles]
+        # The observations are normalized by the simulator (see `_make_simulation`)
+        if not use_current_position:
+            return self.scenario.observations(
+                veh_objs,
+                self.config.subscriber.view_dist,
+                self.config.subscriber.view_angle,
+                ego_state=use_ego_state,
+                visible_state=use_observations,
+                out=out,
             )
-            if self.config.normalize_state:
-                visible_state = self.normalize_obs_by_cat(visible_state)
 
-        # Concatenate
-        obs = np.concatenate((ego_state_norm, visible_state, cur_position))
-        
+        # The simulator only writes whole rows, so its observations go to a buffer before being
+        # concatenated with the current positions
+        self._raw_obs_buffer = _fit_buffer(self._raw_obs_buffer, num_vehicles, obs_size)
+        obs = self.scenario.observations(
+            veh_objs,
+            self.config.subscriber.view_dist,
+            self.config.subscriber.view_angle,
+            ego_state=use_ego_state,
+            visible_state=use_observations,
+            out=self._raw_obs_buffer[:num_vehicles],
+        )
+        return np.concatenate((obs, self._get_current_positions(veh_objs)), axis=1, out=out)
+
+    def get_ragged_observations(self, veh_objs: List[Vehicle]) -> Dict[str, np.ndarray]:
+        """Return the observations of several vehicles without the padding of the visible state.
+
+        The features of the visible objects of all the vehicles are stored contiguously, so that the
+        memory of the observations scales with the number of visible objects instead of their maximum.
+
+        Args:
+        ----
+            veh_objs (List[Vehicle]): Vehicle objects to get the observations for.
+
+        Returns:
+        -------
+            Dict[str, np.ndarray]: One row per vehicle of "ego_state" (if `use_ego_state`) and
+                "current_position" (if `use_current_position`). If `use_observations`, the features of
+                each category of `VISIBLE_CATEGORIES` and their offsets under the category followed by
+                "_offsets": the features of vehicle i are rows `offsets[i]:offsets[i + 1]`. These are the
+                rows of `get_observations` without the padding.
+        """
+        use_ego_state = self.config.subscriber.use_ego_state
+        use_observations = self.config.subscriber.use_observations
+        obs = self.scenario.ragged_observations(
+            veh_objs,
+            self.config.subscriber.view_dist,
+            self.config.subscriber.view_angle,
+            ego_state=use_ego_state,
+            visible_state=use_observations,
+        )
+        if self.config.subscriber.use_current_position:
+            obs["current_position"] = self._get_current_positions(veh_objs)
         return obs
 
+    def _get_current_positions(self, veh_objs: List[Vehicle]) -> np.ndarray:
+        """Return the positions, speeds and steering of the vehicles, one row per vehicle."""
+        cur_position = np.array([_position_as_array(veh_obj.getPosition()) for veh_obj in veh_objs]).reshape(-1, 2)
+        speed = np.array([[veh_obj.getSpeed()] for veh_obj in veh_objs]).reshape(-1, 1)
+        steer = np.array([[veh_obj.steering] for veh_obj in veh_objs]).reshape(-1, 1)
+        if self.config.normalize_state:
+            cur_position = cur_position / np.linalg.norm(cur_position, axis=1, keepdims=True)
+
+        return np.concatenate([cur_position, speed, steer], axis=1)
+
     def _get_obs_space_dim(self, base=0):
         """Calculate observation dimension based on the configs."""
         # Set dimensions (fixed values)
@@ -584,6 +1059,17 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
 
             obs_space_dim += base + self.ro_dim + self.rg_dim + self.tl_dim + self.ss_dim
 
+        # Feature dimension of each entry of the ragged observations
+        self.ragged_feature_dims = {}
+        if self.config.subscriber.use_ego_state:
+            self.ragged_feature_dims["ego_state"] = self.ego_state_feat
+        if self.config.subscriber.use_current_position:
+            self.ragged_feature_dims["current_position"] = 4
+        if self.config.subscriber.use_observations:
+            self.ragged_feature_dims.update(
+                zip(VISIBLE_CATEGORIES, (self.road_obj_feat, self.road_graph_feat, self.tl_feat, self.stop_sign_feat))
+            )
+
         # Multiply by memory to get the final dimension
         obs_space_dim = obs_space_dim * self.config.subscriber.n_frames_stacked
 
@@ -617,11 +1103,17 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
                 veh_obj.setGoalPosition(veh_obj.target_position)
 
     def normalize_ego_state_by_cat(self, state):
-        """Divide every feature in the ego state by the maximum value of that feature."""
-        return state / (np.array([float(val) for val in self.config.ego_state_feat_max.values()]))
+        """Divide every feature in the ego state by the maximum value of that feature.
+
+        The observations of the env are normalized by the simulator, this divides raw ego states the same way.
+        """
+        return state / self._ego_state_scales
 
     def normalize_obs_by_cat(self, state):
-        """Divide all visible state elements by the maximum value across the visible state."""
+        """Divide all visible state elements by the maximum value across the visible state.
+
+        The observations of the env are normalized by the simulator, this divides raw visible states the same way.
+        """
         return state / self.config.vis_obs_max
 
     def render(self) -> Optional[RenderType]:  # pylint: disable=unused-argument
@@ -751,26 +1243,69 @@ class BaseEnv(Env):  # pylint: disable=too-many-instance-attributes
         return road_objects, road_points, traffic_lights, stop_signs
 
 
-def _angle_sub(current_angle: float, target_angle: float) -> float:
+def ragged_row(obs: Dict[str, np.ndarray], idx: int) -> Dict[str, np.ndarray]:
+    """Return the observation of row `idx` of ragged observations, as views into their arrays.
+
+    Args:
+    ----
+        obs (Dict[str, np.ndarray]): Ragged observations, see `BaseEnv.get_ragged_observations`.
+        idx (int): Row of the observation.
+
+    Returns:
+    -------
+        Dict[str, np.ndarray]: The row of each per-vehicle entry, and the features of the visible
+            objects of each category.
+    """
+    row = {}
+    for key, value in obs.items():
+        if key.endswith("_offsets"):
+            continue
+        if key in VISIBLE_CATEGORIES:
+            offsets = obs[f"{key}_offsets"]
+            row[key] = value[offsets[idx] : offsets[idx + 1]]
+        else:
+            row[key] = value[idx]
+    return row
+
+
+def _fit_buffer(buffer: np.ndarray, num_rows: int, num_cols: int) -> np.ndarray:
+    """Return `buffer` if it has `num_cols` columns and at least `num_rows` rows, otherwise a new one that has.
+
+    Args:
+    ----
+        buffer (np.ndarray): 2D float32 buffer to reuse.
+        num_rows (int): minimum number of rows.
+        num_cols (int): number of columns.
+
+    Returns:
+    -------
+        np.ndarray: a float32 buffer of at least `num_rows` rows and `num_cols` columns.
+    """
+    if buffer.shape[0] < num_rows or buffer.shape[1] != num_cols:
+        buffer = np.empty((num_rows, num_cols), dtype=np.float32)
+    return buffer
+
+
+def _angle_sub(
+    current_angle: Union[float, np.ndarray], target_angle: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
     """Subtract two angles to find the minimum angle between them.
 
     Args:
     ----
-        current_angle (float): Current angle.
-        target_angle (float): Target angle.
+        current_angle (Union[float, np.ndarray]): Current angle(s).
+        target_angle (Union[float, np.ndarray]): Target angle(s).
 
     Returns:
     -------
-        float: Minimum angle between the two angles.
+        Union[float, np.ndarray]: Minimum angle(s) between the two angles.
     """
     # Subtract the angles, constraining the value to [0, 2 * np.pi)
     diff = (target_angle - current_angle) % (2 * np.pi)
 
     # If we are more than np.pi we're taking the long way around.
     # Let's instead go in the shorter, negative direction
-    if diff > np.pi:
-        diff = -(2 * np.pi - diff)
-    return diff
+    return np.where(diff > np.pi, -(2 * np.pi - diff), diff)
 
 
 def _apply_action_to_vehicle(
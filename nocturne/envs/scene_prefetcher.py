@@ -0,0 +1,91 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Background loading of the next traffic scenes of an environment."""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Tuple
+
+from nocturne import Simulation
+
+
+class ScenePrefetcher:
+    """Load the scenes an environment is about to reset to on background threads.
+
+    The simulator releases the GIL while it parses a scene, so a thread pool is enough to take scene
+    loading off the critical path of `reset`. A process pool is not an option since simulations can't be
+    pickled.
+    """
+
+    def __init__(self, load_fn: Callable[[str], Simulation], depth: int, num_workers: int = 1) -> None:
+        """Initialize the prefetcher.
+
+        Args:
+        ----
+            load_fn (Callable[[str], Simulation]): creates the simulation of a scene given its file name.
+            depth (int): maximum number of scenes loaded ahead of time.
+            num_workers (int): number of background loading threads.
+        """
+        self.load_fn = load_fn
+        self.depth = depth
+        self.hits = 0
+        self.misses = 0
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="scene_prefetcher")
+        self._pending: Deque[Tuple[str, Future]] = deque()
+
+    def prefetch(self, files: Iterable[str]) -> None:
+        """Schedule the loading of the next scenes, in the order they are going to be used.
+
+        Scenes already being loaded are kept, other pending scenes are discarded.
+
+        Args:
+        ----
+            files (Iterable[str]): predicted next scenes, only the first `depth` ones are loaded.
+        """
+        pending = self._pending
+        self._pending = deque()
+        for file in files:
+            if len(self._pending) >= self.depth:
+                break
+            index = next((i for i, (pending_file, _) in enumerate(pending) if pending_file == file), None)
+            if index is None:
+                future = self._executor.submit(self.load_fn, file)
+            else:
+                _, future = pending[index]
+                del pending[index]
+            self._pending.append((file, future))
+        for _, future in pending:
+            future.cancel()
+
+    def get(self, file: str) -> Simulation:
+        """Return the simulation of a scene, waiting for it if it is still being loaded.
+
+        Scenes that were not prefetched are loaded synchronously.
+
+        Args:
+        ----
+            file (str): file name of the scene.
+
+        Returns:
+        -------
+            Simulation: a freshly loaded simulation of the scene.
+        """
+        for i, (pending_file, future) in enumerate(self._pending):
+            if pending_file == file:
+                del self._pending[i]
+                self.hits += 1
+                return future.result()
+        self.misses += 1
+        return self.load_fn(file)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of prefetch hits, misses and of pending scenes."""
+        return {"hits": self.hits, "misses": self.misses, "pending": len(self._pending)}
+
+    def close(self) -> None:
+        """Discard the pending scenes and stop the loading threads."""
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
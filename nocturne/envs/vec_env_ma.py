@@ -2,7 +2,7 @@
 import logging
 import time
 from copy import deepcopy
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import gymnasium as gym
 import numpy as np
@@ -12,7 +12,7 @@ from stable_baselines3.common.vec_env.base_vec_env import (
     VecEnvStepReturn,
 )
 
-from nocturne.envs.base_env import BaseEnv
+from nocturne.envs.base_env import VISIBLE_CATEGORIES, BaseEnv, ragged_row
 from utils.config import load_config
 
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +32,13 @@ class MultiAgentAsVecEnv(VecEnv):
 
         # Make action and observation spaces compatible with SB3 (requires gymnasium)
         self.action_space = gym.spaces.Discrete(self.env.action_space.n)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf, self.env.observation_space.shape, np.float32)
+        # With ragged observations, the observations of the agents are packed into a dict of ragged
+        # arrays instead of `buf_obs`, see `_pack_ragged_obs`
+        self.ragged_obs = self.env.ragged_obs
+        if self.ragged_obs:
+            self.observation_space = self._ragged_observation_space()
+        else:
+            self.observation_space = gym.spaces.Box(-np.inf, np.inf, self.env.observation_space.shape, np.float32)
         self.num_envs = num_envs  # The maximum number of agents allowed in the environmen
         self.psr = psr  # Whether to use PSR or not
 
@@ -50,6 +56,14 @@ class MultiAgentAsVecEnv(VecEnv):
         self.agents_in_scene = []
         self.filename = None  # If provided, always use the same file
 
+        # Step buffers, refilled in place by reset and step. The env writes the observations of its
+        # controlled vehicles straight to the rows of `buf_obs`
+        self.buf_obs = np.full(
+            fill_value=np.nan, shape=(self.num_envs, self.env.observation_space.shape[0]), dtype=np.float32
+        )
+        self.buf_dones = np.full(fill_value=np.nan, shape=(self.num_envs,))
+        self.buf_rews = np.full_like(self.buf_dones, fill_value=np.nan)
+
     def _reset_seeds(self) -> None:
         """Reset all environments' seeds."""
         self._seeds = None
@@ -57,7 +71,7 @@ class MultiAgentAsVecEnv(VecEnv):
     def reset(self, seed=None):
         """Reset environment and return initial observations."""
         # Reset Nocturne env
-        obs_dict = self.env.reset(self.filename, self.psr_dict)
+        obs_dict = self.env.reset(self.filename, self.psr_dict, out=None if self.ragged_obs else self.buf_obs)
 
         # Reset storage
         self.agent_ids = []
@@ -67,10 +81,12 @@ class MultiAgentAsVecEnv(VecEnv):
         self.ep_off_road = 0    
         self.ep_goal_achieved = 0
 
-        obs_all = np.full(fill_value=np.nan, shape=(self.num_envs, self.env.observation_space.shape[0]))
-        for idx, agent_id in enumerate(obs_dict.keys()):
-            self.agent_ids.append(agent_id)
-            obs_all[idx, :] = obs_dict[agent_id]
+        # The rows of `buf_obs` follow the order of the agents in `obs_dict`
+        self.agent_ids.extend(obs_dict.keys())
+        if self.ragged_obs:
+            obs_all = self._pack_ragged_obs([obs_dict[agent_id] for agent_id in self.agent_ids])
+        else:
+            obs_all = self.buf_obs
 
         # Save obs in buffer
         self._save_obs(obs_all)
@@ -90,7 +106,9 @@ class MultiAgentAsVecEnv(VecEnv):
         }
 
         # Take a step to obtain dicts
-        next_obses_dict, rew_dict, done_dict, info_dict = self.env.step(agent_actions)
+        next_obses_dict, rew_dict, done_dict, info_dict = self.env.step(
+            agent_actions, out=None if self.ragged_obs else self.buf_obs
+        )
 
         # Update dead agents based on most recent done_dict
         for agent_id, is_done in done_dict.items():
@@ -100,9 +118,12 @@ class MultiAgentAsVecEnv(VecEnv):
                 self.last_info_dicts[agent_id] = info_dict[agent_id].copy()
 
         # Storage
-        obs = np.full(fill_value=np.nan, shape=(self.num_envs, self.observation_space.shape[0]))
-        self.buf_dones = np.full(fill_value=np.nan, shape=(self.num_envs,))
-        self.buf_rews = np.full_like(self.buf_dones, fill_value=np.nan)
+        if self.ragged_obs:
+            obs_rows = [None] * self.num_envs
+        else:
+            obs = self.buf_obs
+        self.buf_dones.fill(np.nan)
+        self.buf_rews.fill(np.nan)
         self.buf_infos = [{} for _ in range(self.num_envs)]
 
         # Override NaN placeholder for each agent that is alive
@@ -111,7 +132,10 @@ class MultiAgentAsVecEnv(VecEnv):
                 self.buf_rews[idx] = rew_dict[key]
                 self.buf_dones[idx] = done_dict[key] * 1
                 self.buf_infos[idx] = info_dict[key]
-                obs[idx, :] = next_obses_dict[key]
+                if self.ragged_obs:
+                    obs_rows[idx] = next_obses_dict[key]
+        if self.ragged_obs:
+            obs = self._pack_ragged_obs(obs_rows)
 
         # Save step reward obtained across all agents
         self.rewards.append(sum(rew_dict.values()))
@@ -133,9 +157,14 @@ class MultiAgentAsVecEnv(VecEnv):
             self.num_agents_goal_achieved += self.ep_goal_achieved
             self.total_agents_in_rollout += len(self.agent_ids)
 
-            # Save final observation where user can get it, then reset
+            # Save final observation where user can get it, then reset. The observation buffer is
+            # refilled by reset, so the final observations are copied out of it
             for idx in range(len(self.agent_ids)):
-                self.buf_infos[idx]["terminal_observation"] = obs[idx]
+                if self.ragged_obs:
+                    # The ragged batch is not reused, its views don't need to be copied
+                    self.buf_infos[idx]["terminal_observation"] = ragged_row(obs, idx)
+                else:
+                    self.buf_infos[idx]["terminal_observation"] = obs[idx].copy()
 
             # Log episode stats
             ep_len = self.step_num
@@ -227,8 +256,57 @@ class MultiAgentAsVecEnv(VecEnv):
 
     def _obs_from_buf(self) -> VecEnvObs:
         """Get observation from buffer."""
+        if self.ragged_obs:
+            # A new ragged batch is packed at every step
+            return self.buf_obs
         return np.copy(self.buf_obs)
 
+    def _ragged_observation_space(self) -> gym.spaces.Dict:
+        """Return the space of the ragged observation of an agent.
+
+        Returns:
+        -------
+            gym.spaces.Dict: A vector per entry of `BaseEnv.ragged_feature_dims`, except for the categories of
+                `VISIBLE_CATEGORIES` that have a sequence of vectors, one per visible object. The batches of
+                `_pack_ragged_obs` concatenate these sequences and store their offsets.
+        """
+        spaces = {}
+        for key, dim in self.env.ragged_feature_dims.items():
+            feature_space = gym.spaces.Box(-np.inf, np.inf, (dim,), np.float32)
+            spaces[key] = gym.spaces.Sequence(feature_space, stack=True) if key in VISIBLE_CATEGORIES else feature_space
+        return gym.spaces.Dict(spaces)
+
+    def _pack_ragged_obs(self, obs_rows: List[Optional[Dict[str, np.ndarray]]]) -> Dict[str, np.ndarray]:
+        """Pack the ragged observations of the agents into a ragged batch of `num_envs` rows.
+
+        Args:
+        ----
+            obs_rows (List[Optional[Dict[str, np.ndarray]]]): Ragged observation of each agent (see
+                `BaseEnv.get_ragged_observations`), None for the agents that are done.
+
+        Returns:
+        -------
+            Dict[str, np.ndarray]: Ragged observations in the layout of `BaseEnv.get_ragged_observations`,
+                with `num_envs` rows. The rows of the agents that are done or missing are NaN and have no
+                visible object.
+        """
+        obs_rows = list(obs_rows) + [None] * (self.num_envs - len(obs_rows))
+        batch = {}
+        for key, dim in self.env.ragged_feature_dims.items():
+            if key in VISIBLE_CATEGORIES:
+                features = [row[key] for row in obs_rows if row is not None]
+                counts = [0 if row is None else len(row[key]) for row in obs_rows]
+                offsets = np.zeros(self.num_envs + 1, dtype=np.int64)
+                np.cumsum(counts, out=offsets[1:])
+                batch[key] = np.concatenate(features) if features else np.empty((0, dim), dtype=np.float32)
+                batch[f"{key}_offsets"] = offsets
+            else:
+                batch[key] = np.full((self.num_envs, dim), np.nan, dtype=np.float32)
+                for idx, row in enumerate(obs_rows):
+                    if row is not None:
+                        batch[key][idx] = row[key]
+        return batch
+
     def get_attr(self, attr_name, indices=None):
         raise NotImplementedError()
 
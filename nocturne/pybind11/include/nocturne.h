@@ -14,6 +14,7 @@ void DefineAction(py::module& m);
 void DefineObject(py::module& m);
 void DefineRoadLine(py::module& m);
 void DefineScenario(py::module& m);
+void DefineScenarioPack(py::module& m);
 void DefineSimulation(py::module& m);
 void DefineVector2D(py::module& m);
 void DefineVehicle(py::module& m);
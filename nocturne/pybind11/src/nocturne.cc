@@ -18,6 +18,7 @@ PYBIND11_MODULE(nocturne_cpp, m) {
   DefineObject(m);
   DefineRoadLine(m);
   DefineScenario(m);
+  DefineScenarioPack(m);
   DefineSimulation(m);
   DefineVector2D(m);
   DefineVehicle(m);
@@ -7,13 +7,19 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <limits>
 #include <memory>
+#include <optional>
+#include <stdexcept>
 #include <string>
 #include <variant>
+#include <vector>
 
 #include "geometry/geometry_utils.h"
 #include "numpy_utils.h"
 #include "object.h"
+#include "scenario_format.h"
+#include "scenario_template.h"
 
 namespace py = pybind11;
 
@@ -21,7 +27,229 @@ namespace nocturne {
 
 using geometry::utils::kHalfPi;
 
+namespace {
+
+template <typename T>
+using ContiguousArray =
+    py::array_t<T, py::array::c_style | py::array::forcecast>;
+
+void ApplyActions(Scenario& scenario, const ContiguousArray<int64_t>& ids,
+                  const ContiguousArray<float>& acceleration,
+                  const ContiguousArray<float>& steering,
+                  const std::optional<ContiguousArray<float>>& head_angle) {
+  const int64_t n = ids.size();
+  if (acceleration.size() != n || steering.size() != n ||
+      (head_angle.has_value() && head_angle->size() != n)) {
+    throw std::invalid_argument(
+        "ids and actions must have the same number of elements.");
+  }
+  scenario.ApplyActions(n, ids.data(), acceleration.data(), steering.data(),
+                        head_angle.has_value() ? head_angle->data() : nullptr);
+}
+
+void ApplyDiscreteActions(Scenario& scenario,
+                          const ContiguousArray<int64_t>& ids,
+                          const ContiguousArray<int64_t>& actions,
+                          const ContiguousArray<float>& acceleration_grid,
+                          const ContiguousArray<float>& steering_grid) {
+  const int64_t n = ids.size();
+  if (actions.size() != n) {
+    throw std::invalid_argument(
+        "ids and actions must have the same number of elements.");
+  }
+  scenario.ApplyDiscreteActions(
+      n, ids.data(), actions.data(),
+      std::vector<float>(acceleration_grid.data(),
+                         acceleration_grid.data() + acceleration_grid.size()),
+      std::vector<float>(steering_grid.data(),
+                         steering_grid.data() + steering_grid.size()));
+}
+
+// Computes the observations of `objects` without holding the GIL, into `out`
+// if given, otherwise into a new (N, observation size) numpy array.
+py::array_t<float> Observations(const Scenario& scenario,
+                                const std::vector<const Object*>& objects,
+                                float view_dist, float view_angle,
+                                float head_angle, bool ego_state,
+                                bool visible_state,
+                                const std::optional<py::array>& out) {
+  const int64_t n = objects.size();
+  const int64_t observation_size =
+      scenario.ObservationSize(ego_state, visible_state);
+  py::array_t<float> observations;
+  if (out.has_value()) {
+    if (!out->dtype().is(py::dtype::of<float>()) || out->ndim() != 2 ||
+        out->shape(0) != n || out->shape(1) != observation_size ||
+        !(out->flags() & py::array::c_style) || !out->writeable()) {
+      throw std::invalid_argument(
+          "out must be a writable C-contiguous float32 array of shape (" +
+          std::to_string(n) + ", " + std::to_string(observation_size) + ")");
+    }
+    observations = py::reinterpret_borrow<py::array_t<float>>(*out);
+  } else {
+    observations = py::array_t<float>({n, observation_size});
+  }
+  float* observations_data = observations.mutable_data();
+  {
+    py::gil_scoped_release release;
+    scenario.Observations(objects, view_dist, view_angle, head_angle, ego_state,
+                          visible_state, observations_data);
+  }
+  return observations;
+}
+
+py::array_t<float> ObservationsByIds(const Scenario& scenario,
+                                     const ContiguousArray<int64_t>& ids,
+                                     float view_dist, float view_angle,
+                                     float head_angle, bool ego_state,
+                                     bool visible_state,
+                                     const std::optional<py::array>& out) {
+  std::vector<const Object*> objects;
+  objects.reserve(ids.size());
+  for (int64_t i = 0; i < ids.size(); ++i) {
+    objects.push_back(scenario.FindObject(ids.data()[i]));
+  }
+  return Observations(scenario, objects, view_dist, view_angle, head_angle,
+                      ego_state, visible_state, out);
+}
+
+// Computes the ragged observations of `objects` without holding the GIL. The
+// features of each category are stored under its name, and its offsets under
+// its name followed by "_offsets".
+py::dict RaggedObservations(const Scenario& scenario,
+                            const std::vector<const Object*>& objects,
+                            float view_dist, float view_angle, float head_angle,
+                            bool ego_state, bool visible_state) {
+  RaggedObservationBatch batch;
+  {
+    py::gil_scoped_release release;
+    batch = scenario.RaggedObservations(objects, view_dist, view_angle,
+                                        head_angle, ego_state, visible_state);
+  }
+  py::dict ret;
+  if (ego_state) {
+    ret["ego_state"] = utils::AsNumpyArray(std::move(batch.ego_state));
+  }
+  for (auto& [key, features] : batch.features) {
+    ret[py::str(key)] = utils::AsNumpyArray(std::move(features));
+  }
+  for (auto& [key, offsets] : batch.offsets) {
+    ret[py::str(key + "_offsets")] = utils::AsNumpyArray(std::move(offsets));
+  }
+  return ret;
+}
+
+py::dict RaggedObservationsByIds(const Scenario& scenario,
+                                 const ContiguousArray<int64_t>& ids,
+                                 float view_dist, float view_angle,
+                                 float head_angle, bool ego_state,
+                                 bool visible_state) {
+  std::vector<const Object*> objects;
+  objects.reserve(ids.size());
+  for (int64_t i = 0; i < ids.size(); ++i) {
+    objects.push_back(scenario.FindObject(ids.data()[i]));
+  }
+  return RaggedObservations(scenario, objects, view_dist, view_angle,
+                            head_angle, ego_state, visible_state);
+}
+
+// Packs the states of the objects with the given ids, or of all the objects of
+// the scenario, into one numpy array per attribute. The rows of ids that are
+// not in the scenario, e.g. removed objects, are NaN, false and 0.
+py::dict ObjectStates(const Scenario& scenario,
+                      const std::optional<ContiguousArray<int64_t>>& ids) {
+  const std::vector<std::shared_ptr<Object>>& objects = scenario.objects();
+  std::vector<const Object*> rows;
+  if (ids.has_value()) {
+    const int64_t* id_data = ids->data();
+    rows.reserve(ids->size());
+    for (int64_t i = 0; i < ids->size(); ++i) {
+      rows.push_back(scenario.FindObject(id_data[i]));
+    }
+  } else {
+    rows.reserve(objects.size());
+    for (const auto& obj : objects) {
+      rows.push_back(obj.get());
+    }
+  }
+
+  const int64_t n = rows.size();
+  py::array_t<int64_t> id(n);
+  py::array_t<float> position({n, int64_t(2)});
+  py::array_t<float> heading(n);
+  py::array_t<float> speed(n);
+  py::array_t<float> target_position({n, int64_t(2)});
+  py::array_t<float> target_heading(n);
+  py::array_t<float> target_speed(n);
+  py::array_t<bool> collided(n);
+  py::array_t<int64_t> collision_type(n);
+  py::array_t<bool> expert_control(n);
+
+  int64_t* id_data = id.mutable_data();
+  float* position_data = position.mutable_data();
+  float* heading_data = heading.mutable_data();
+  float* speed_data = speed.mutable_data();
+  float* target_position_data = target_position.mutable_data();
+  float* target_heading_data = target_heading.mutable_data();
+  float* target_speed_data = target_speed.mutable_data();
+  bool* collided_data = collided.mutable_data();
+  int64_t* collision_type_data = collision_type.mutable_data();
+  bool* expert_control_data = expert_control.mutable_data();
+  constexpr float kNaN = std::numeric_limits<float>::quiet_NaN();
+  for (int64_t i = 0; i < n; ++i) {
+    const Object* obj = rows[i];
+    if (obj == nullptr) {
+      id_data[i] = ids->data()[i];
+      position_data[2 * i] = position_data[2 * i + 1] = kNaN;
+      heading_data[i] = speed_data[i] = kNaN;
+      target_position_data[2 * i] = target_position_data[2 * i + 1] = kNaN;
+      target_heading_data[i] = target_speed_data[i] = kNaN;
+      collided_data[i] = false;
+      collision_type_data[i] = 0;
+      expert_control_data[i] = false;
+      continue;
+    }
+    const geometry::Vector2D pos = obj->position();
+    const geometry::Vector2D& target_pos = obj->target_position();
+    id_data[i] = obj->id();
+    position_data[2 * i] = pos.x();
+    position_data[2 * i + 1] = pos.y();
+    heading_data[i] = obj->heading();
+    speed_data[i] = obj->speed();
+    target_position_data[2 * i] = target_pos.x();
+    target_position_data[2 * i + 1] = target_pos.y();
+    target_heading_data[i] = obj->target_heading();
+    target_speed_data[i] = obj->target_speed();
+    collided_data[i] = obj->collided();
+    collision_type_data[i] = static_cast<int64_t>(obj->collision_type());
+    expert_control_data[i] = obj->expert_control();
+  }
+
+  py::dict states;
+  states["id"] = id;
+  states["position"] = position;
+  states["heading"] = heading;
+  states["speed"] = speed;
+  states["target_position"] = target_position;
+  states["target_heading"] = target_heading;
+  states["target_speed"] = target_speed;
+  states["collided"] = collided;
+  states["collision_type"] = collision_type;
+  states["expert_control"] = expert_control;
+  return states;
+}
+
+}  // namespace
+
 void DefineScenario(py::module& m) {
+  py::class_<ScenarioSnapshot, std::shared_ptr<ScenarioSnapshot>>(
+      m, "ScenarioSnapshot")
+      .def_property_readonly("name",
+                             [](const ScenarioSnapshot& snapshot) {
+                               return snapshot.scenario_template->name;
+                             })
+      .def_readonly("current_time", &ScenarioSnapshot::current_time);
+
   py::class_<Scenario, std::shared_ptr<Scenario>>(m, "Scenario")
       .def(py::init<const std::string&,
                     const std::unordered_map<
@@ -31,6 +259,9 @@ void DefineScenario(py::module& m) {
 
       // Properties
       .def_property_readonly("name", &Scenario::name)
+      .def_property_readonly("num_threads", &Scenario::num_threads)
+      .def_property("current_time", &Scenario::current_time,
+                    &Scenario::set_current_time)
 
       // Methods
       .def("vehicles", &Scenario::vehicles, py::return_value_policy::reference)
@@ -41,6 +272,62 @@ void DefineScenario(py::module& m) {
       .def("moving_objects", &Scenario::moving_objects,
            py::return_value_policy::reference)
       .def("remove_object", &Scenario::RemoveObject)
+      .def(
+          "remove_objects",
+          [](Scenario& scenario, const ContiguousArray<int64_t>& ids) {
+            return scenario.RemoveObjects(ids.size(), ids.data());
+          },
+          "Remove the objects with the given ids at once, ignoring the ids of "
+          "objects that are not in the scenario. Returns the number of "
+          "removed objects",
+          py::arg("ids"))
+      .def("refresh_objects", &Scenario::RefreshObjects)
+      .def(
+          "set_collision_subset",
+          [](Scenario& scenario,
+             const std::optional<ContiguousArray<int64_t>>& ids) {
+            if (ids.has_value()) {
+              scenario.SetCollisionSubset(ids->size(), ids->data());
+            } else {
+              scenario.ClearCollisionSubset();
+            }
+          },
+          "Restrict the collision checks to the objects with the given ids, "
+          "or check all the objects again if ids is None",
+          py::arg("ids") = py::none())
+      .def("step", &Scenario::Step, py::arg("dt"),
+           py::call_guard<py::gil_scoped_release>())
+      .def("snapshot", &Scenario::Snapshot,
+           "Capture the object kinematics, goals and collisions, the removed "
+           "objects and the current time of the scenario")
+      .def("restore", &Scenario::Restore,
+           "Restore a snapshot taken on this scenario or on a scenario of the "
+           "same scene, e.g. a clone",
+           py::arg("snapshot"))
+      .def(
+          "clone",
+          [](const Scenario& scenario) {
+            return std::shared_ptr<Scenario>(scenario.Clone());
+          },
+          "Return a scenario in the same state sharing the road map, spatial "
+          "indices and expert data of this one")
+      .def("apply_actions", &ApplyActions,
+           "Set the acceleration, steering and optionally head angle of the "
+           "objects with the given ids",
+           py::arg("ids"), py::arg("acceleration"), py::arg("steering"),
+           py::arg("head_angle") = std::nullopt)
+      .def("apply_discrete_actions", &ApplyDiscreteActions,
+           "Set the acceleration and steering of the objects with the given "
+           "ids from action indices into the product of the acceleration and "
+           "steering grids",
+           py::arg("ids"), py::arg("actions"), py::arg("acceleration_grid"),
+           py::arg("steering_grid"))
+      .def("object_states", &ObjectStates,
+           "Return a dict of numpy arrays with the ids, positions, headings, "
+           "speeds, target positions, target headings, target speeds, "
+           "collision flags, collision types and expert control flags of the "
+           "objects with the given ids (all the objects by default)",
+           py::arg("ids") = std::nullopt)
       .def("road_lines", &Scenario::road_lines)
 
       .def("ego_state",
@@ -55,7 +342,8 @@ void DefineScenario(py::module& m) {
                 scenario.VisibleState(src, view_dist, view_angle, head_angle, padding));
           },
           py::arg("object"), py::arg("view_dist") = 60,
-          py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0, py::arg("padding") = false)
+          py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0,
+          py::arg("padding") = false)
       .def(
           "flattened_visible_state",
           [](const Scenario& scenario, const Object& src, float view_dist,
@@ -65,6 +353,43 @@ void DefineScenario(py::module& m) {
           },
           py::arg("object"), py::arg("view_dist") = 60,
           py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0)
+      .def("observations", &Observations,
+           "Return the observations of the given objects as a (N, "
+           "observation_size) float32 array, each row being the ego state "
+           "followed by the flattened visible state of an object. Rows are "
+           "computed in parallel with num_threads threads. If given, `out` "
+           "must be a writable C-contiguous float32 array of that shape, "
+           "which is filled in place and returned",
+           py::arg("objects"), py::arg("view_dist") = 60,
+           py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0,
+           py::arg("ego_state") = true, py::arg("visible_state") = true,
+           py::arg("out") = py::none())
+      .def("observations", &ObservationsByIds,
+           "Same as above for the objects with the given ids, the rows of ids "
+           "that are not in the scenario are NaN",
+           py::arg("ids"), py::arg("view_dist") = 60,
+           py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0,
+           py::arg("ego_state") = true, py::arg("visible_state") = true,
+           py::arg("out") = py::none())
+      .def("ragged_observations", &RaggedObservations,
+           "Same as observations without the padding of the visible states. "
+           "Return a dict with the (N, ego feature size) ego states under "
+           "'ego_state', NaN for the objects that are not in the scenario, "
+           "and for each category of visible objects ('objects', "
+           "'road_points', 'traffic_lights' and 'stop_signs') the features "
+           "of the visible objects of all the rows under its name and the "
+           "(N + 1) offsets of the rows into them under its name followed by "
+           "'_offsets'",
+           py::arg("objects"), py::arg("view_dist") = 60,
+           py::arg("view_angle") = kHalfPi, py::arg("head_angle") = 0.0,
+           py::arg("ego_state") = true, py::arg("visible_state") = true)
+      .def("ragged_observations", &RaggedObservationsByIds,
+           "Same as above for the objects with the given ids", py::arg("ids"),
+           py::arg("view_dist") = 60, py::arg("view_angle") = kHalfPi,
+           py::arg("head_angle") = 0.0, py::arg("ego_state") = true,
+           py::arg("visible_state") = true)
+      .def("observation_size", &Scenario::ObservationSize,
+           py::arg("ego_state") = true, py::arg("visible_state") = true)
       .def("expert_heading", &Scenario::ExpertHeading)
       .def("expert_speed", &Scenario::ExpertSpeed)
       .def("expert_velocity", &Scenario::ExpertVelocity)
@@ -87,9 +412,9 @@ void DefineScenario(py::module& m) {
       .def(
           "getImage",
           [](Scenario& scenario, uint64_t img_height, uint64_t img_width,
-             bool draw_target_positions, float padding, const std::vector<Object*>& sources,
-             uint64_t view_height, uint64_t view_width,
-             bool rotate_with_source,
+             bool draw_target_positions, float padding,
+             const std::vector<Object*>& sources, uint64_t view_height,
+             uint64_t view_width, bool rotate_with_source,
              bool move_with_source) {
             return utils::AsNumpyArray<unsigned char>(scenario.Image(
                 img_height, img_width, draw_target_positions, padding, sources,
@@ -99,8 +424,9 @@ void DefineScenario(py::module& m) {
           "representing an image of the scene.",
           py::arg("img_height") = 1000, py::arg("img_width") = 1000,
           py::arg("draw_target_positions") = true, py::arg("padding") = 50.0f,
-          py::arg("sources") = std::vector<Object*>(), py::arg("view_height") = 200,
-          py::arg("view_width") = 200, py::arg("rotate_with_source") = true,
+          py::arg("sources") = std::vector<Object*>(),
+          py::arg("view_height") = 200, py::arg("view_width") = 200,
+          py::arg("rotate_with_source") = true,
           py::arg("move_with_source") = true)
       .def(
           "getFeaturesImage",
@@ -149,6 +475,36 @@ void DefineScenario(py::module& m) {
       .def("getTrafficLightFeatureSize", &Scenario::getTrafficLightFeatureSize)
       .def("getStopSignsFeatureSize", &Scenario::getStopSignsFeatureSize)
       .def("getEgoFeatureSize", &Scenario::getEgoFeatureSize);
+
+  m.def("convert_scenario", &ConvertScenarioFile,
+        "Convert a scenario file to the binary scenario format",
+        py::arg("src_path"), py::arg("dst_path"));
+
+  m.def(
+      "set_scenario_cache_capacity",
+      [](int64_t capacity) {
+        ScenarioTemplateCache::Global().set_capacity(capacity);
+      },
+      "Set the memory budget in bytes of the parsed scenario cache, 0 "
+      "disables the cache",
+      py::arg("capacity"));
+  m.def(
+      "scenario_cache_info",
+      []() {
+        const ScenarioTemplateCache& cache = ScenarioTemplateCache::Global();
+        py::dict info;
+        info["capacity"] = cache.capacity();
+        info["size"] = cache.size();
+        info["memory_usage"] = cache.memory_usage();
+        info["hits"] = cache.hits();
+        info["misses"] = cache.misses();
+        return info;
+      },
+      "Return the capacity, size, memory usage, hits and misses of the "
+      "parsed scenario cache");
+  m.def(
+      "clear_scenario_cache", []() { ScenarioTemplateCache::Global().Clear(); },
+      "Remove all the parsed scenarios from the cache");
 }
 
 }  // namespace nocturne
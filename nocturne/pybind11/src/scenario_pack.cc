@@ -0,0 +1,34 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+
+#include "scenario_pack.h"
+
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+#include <memory>
+#include <string>
+#include <vector>
+
+#include "nocturne.h"
+
+namespace py = pybind11;
+
+namespace nocturne {
+
+void DefineScenarioPack(py::module& m) {
+  py::class_<ScenarioPack, std::shared_ptr<ScenarioPack>>(m, "ScenarioPack")
+      .def(py::init<const std::string&>(), "Memory-map a scenario pack",
+           py::arg("pack_path"))
+      .def_property_readonly("path", &ScenarioPack::path)
+      .def("names", &ScenarioPack::names)
+      .def("__len__", &ScenarioPack::size)
+      .def("__contains__", &ScenarioPack::Contains);
+
+  m.def("write_scenario_pack", &WriteScenarioPack,
+        "Write scenario files into a single scenario pack", py::arg("dst_path"),
+        py::arg("src_paths"));
+}
+
+}  // namespace nocturne
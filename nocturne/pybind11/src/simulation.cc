@@ -4,10 +4,14 @@
 
 #include "simulation.h"
 
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <algorithm>
+#include <limits>
 #include <memory>
+#include <optional>
 #include <string>
 #include <unordered_map>
 #include <variant>
@@ -16,6 +20,32 @@ namespace py = pybind11;
 
 namespace nocturne {
 
+namespace {
+
+py::array_t<int64_t> StepN(Simulation& simulation, int64_t num_steps, float dt,
+                           std::optional<float> position_tolerance,
+                           std::optional<float> speed_tolerance,
+                           std::optional<float> heading_tolerance) {
+  std::optional<GoalTolerance> goal_tolerance;
+  if (position_tolerance.has_value() || speed_tolerance.has_value() ||
+      heading_tolerance.has_value()) {
+    constexpr float kInf = std::numeric_limits<float>::infinity();
+    goal_tolerance = GoalTolerance{position_tolerance.value_or(kInf),
+                                   speed_tolerance.value_or(kInf),
+                                   heading_tolerance.value_or(kInf)};
+  }
+  std::vector<int64_t> goal_ids;
+  {
+    py::gil_scoped_release release;
+    goal_ids = simulation.StepN(num_steps, dt, goal_tolerance);
+  }
+  py::array_t<int64_t> ret(goal_ids.size());
+  std::copy(goal_ids.cbegin(), goal_ids.cend(), ret.mutable_data());
+  return ret;
+}
+
+}  // namespace
+
 void DefineSimulation(py::module& m) {
   py::class_<Simulation, std::shared_ptr<Simulation>>(m, "Simulation")
       .def(py::init<const std::string&,
@@ -24,9 +54,29 @@ void DefineSimulation(py::module& m) {
            "Constructor for Simulation", py::arg("scenario_path") = "",
            py::arg("config") =
                std::unordered_map<std::string,
-                                  std::variant<bool, int64_t, float>>())
-      .def("reset", &Simulation::Reset)
-      .def("step", &Simulation::Step)
+                                  std::variant<bool, int64_t, float>>(),
+           py::call_guard<py::gil_scoped_release>())
+      .def(py::init<std::shared_ptr<const ScenarioPack>, const std::string&,
+                    const std::unordered_map<
+                        std::string, std::variant<bool, int64_t, float>>&>(),
+           "Constructor for Simulation of a scene in a scenario pack",
+           py::arg("scenario_pack"), py::arg("scenario_name"),
+           py::arg("config") =
+               std::unordered_map<std::string,
+                                  std::variant<bool, int64_t, float>>(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("reset", &Simulation::Reset,
+           py::call_guard<py::gil_scoped_release>())
+      .def("step", &Simulation::Step, py::call_guard<py::gil_scoped_release>())
+      .def("step_n", &StepN,
+           "Run num_steps steps with the same actions, accumulating the "
+           "collisions. Returns the ids of the objects that reached their goal "
+           "during the steps within the given tolerances, empty if no "
+           "tolerance is given",
+           py::arg("num_steps"), py::arg("dt"),
+           py::arg("position_tolerance") = py::none(),
+           py::arg("speed_tolerance") = py::none(),
+           py::arg("heading_tolerance") = py::none())
       .def("render", &Simulation::Render)
       .def("scenario", &Simulation::GetScenario,
            py::return_value_policy::reference)
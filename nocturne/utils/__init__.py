@@ -0,0 +1,9 @@
+"""Nocturne utilities."""
+from nocturne.utils.scene_files import BINARY_SUFFIX, MANIFEST_FILE, VALID_FILES, scene_files
+
+__all__ = [
+    "BINARY_SUFFIX",
+    "MANIFEST_FILE",
+    "VALID_FILES",
+    "scene_files",
+]
@@ -0,0 +1,28 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Listing of the scenes of a data folder."""
+BINARY_SUFFIX = ".bin"
+MANIFEST_FILE = "manifest.json"
+VALID_FILES = "valid_files.json"
+
+
+def scene_files(data_dir, binary=True):
+    """Return the sorted file names of the scenes of a data folder.
+
+    A scene stored both as JSON and in the binary format, e.g. in a folder converted in place, is only
+    listed once, by its binary file.
+
+    Args:
+    ----
+        data_dir (Path): folder containing the JSON or binary scenarios.
+        binary (bool): if false, only list the JSON scenarios.
+    """
+    patterns = ("*.json", "*" + BINARY_SUFFIX) if binary else ("*.json",)
+    files = {}
+    for pattern in patterns:
+        for file in data_dir.glob(pattern):
+            if file.name not in (VALID_FILES, MANIFEST_FILE):
+                files[file.stem] = file.name
+    return sorted(files.values())
@@ -30,8 +30,9 @@ class NocturneToSB3(gymnasium.Env):
             action_dict={self.controlled_vehicle: action}
         )
 
+        # The env reuses its observation buffers across steps, gym expects a new array
         return (
-            next_obs_dict[self.controlled_vehicle],
+            next_obs_dict[self.controlled_vehicle].copy(),
             rewards_dict[self.controlled_vehicle],
             dones_dict[self.controlled_vehicle],
             False,
@@ -44,7 +45,7 @@ class NocturneToSB3(gymnasium.Env):
         assert len(self.env.controlled_vehicles) == 1, "This wrapper does not support multi-agent control."
 
         self.controlled_vehicle = self.env.controlled_vehicles[0].id
-        return obs_dict[self.controlled_vehicle], {}
+        return obs_dict[self.controlled_vehicle].copy(), {}
 
     @property
     def action_space(self):
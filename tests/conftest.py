@@ -0,0 +1,66 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Fixtures shared by the environment tests."""
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+from nocturne.envs.base_env import BaseEnv
+
+TESTS_PATH = Path(__file__).resolve().parent
+PROJECT_PATH = TESTS_PATH.parent
+SCENE_FILE = "large_file_tfrecord.json"
+
+
+def _merge(config, overrides):
+    """Recursively update `config` with `overrides`."""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            _merge(config[key], value)
+        else:
+            config[key] = value
+    return config
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Return a data folder with the test scene and its valid_files.json."""
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    shutil.copy(TESTS_PATH / SCENE_FILE, data_path / SCENE_FILE)
+    (data_path / "valid_files.json").write_text(json.dumps({SCENE_FILE: []}))
+    return data_path
+
+
+@pytest.fixture
+def make_config(data_dir):
+    """Return a factory of env configs on the test data, the default config updated by its arguments."""
+
+    def _make_config(**overrides):
+        with (PROJECT_PATH / "configs" / "env_config.yaml").open(encoding="utf-8") as file:
+            config = yaml.safe_load(file)
+        config["data_path"] = str(data_dir)
+        config["num_files"] = -1
+        return _merge(config, overrides)
+
+    return _make_config
+
+
+@pytest.fixture
+def make_env(make_config):
+    """Return a factory of environments on the test data, with the default config updated by its arguments."""
+    envs = []
+
+    def _make_env(**overrides):
+        env = BaseEnv(make_config(**overrides))
+        envs.append(env)
+        return env
+
+    yield _make_env
+    for env in envs:
+        env.close()
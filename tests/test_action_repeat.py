@@ -0,0 +1,22 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the action repeat of the environment when sims_per_step does not divide the episode."""
+import pytest
+from conftest import SCENE_FILE
+
+
+@pytest.mark.parametrize("sims_per_step", [3, 7])
+def test_action_repeat(make_env, sims_per_step):
+    """Check that the episode ends at episode_length, with a shorter last step."""
+    env = make_env(sims_per_step=sims_per_step, remove_at_goal=False, remove_at_collide=False)
+    episode_length = env.config.episode_length
+    env.reset(SCENE_FILE)
+    num_steps = episode_length - env.step_num
+    assert num_steps % sims_per_step != 0
+    done = {"__all__": False}
+    while not done["__all__"]:
+        _, _, done, _ = env.step({})
+    assert env.step_num == episode_length
+    assert env.scenario.current_time == episode_length
@@ -0,0 +1,67 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test that the batched actions match the actions applied one vehicle at a time."""
+import numpy as np
+import pytest
+
+from nocturne import Action
+from nocturne.envs.base_env import _apply_action_to_vehicle
+
+
+def _controls(vehicles):
+    return [(veh.acceleration, veh.steering, veh.head_angle) for veh in vehicles]
+
+
+def test_discrete_actions(make_env):
+    """Check that action `a` is `accel_grid[a // num_steer]` and `steering_grid[a % num_steer]` (`idx_to_actions`)."""
+    env = make_env(discretize_actions=True)
+    env.reset()
+    vehicles = env.controlled_vehicles
+    num_actions = len(env.idx_to_actions)
+    num_steer = len(env.steering_grid)
+    assert num_actions == len(env.accel_grid) * num_steer
+    for start in range(0, num_actions, len(vehicles)):
+        actions = {veh.id: (start + i) % num_actions for i, veh in enumerate(vehicles)}
+        env.apply_actions(actions)
+        batched = _controls(vehicles)
+        for veh in vehicles:
+            action = actions[veh.id]
+            assert veh.acceleration == np.float32(env.accel_grid[action // num_steer])
+            assert veh.steering == np.float32(env.steering_grid[action % num_steer])
+            _apply_action_to_vehicle(veh, action, idx_to_actions=env.idx_to_actions)
+        assert _controls(vehicles) == batched
+
+
+def test_invalid_discrete_action(make_env):
+    """Check that an invalid action index doesn't apply any of the actions."""
+    env = make_env(discretize_actions=True)
+    env.reset()
+    vehicles = env.controlled_vehicles
+    env.apply_actions({veh.id: 0 for veh in vehicles})
+    controls = _controls(vehicles)
+    actions = {veh.id: 1 for veh in vehicles}
+    actions[vehicles[-1].id] = len(env.idx_to_actions)
+    with pytest.raises(IndexError):
+        env.apply_actions(actions)
+    assert _controls(vehicles) == controls
+
+
+def test_numpy_actions(make_env):
+    """Check that numpy actions of all the vehicles are the same as applying them one at a time."""
+    env = make_env(discretize_actions=False)
+    env.reset()
+    vehicles = env.controlled_vehicles
+    rng = np.random.default_rng(0)
+    actions = {veh.id: rng.normal(size=3).astype(np.float32) for veh in vehicles}
+    env.apply_actions(actions)
+    batched = _controls(vehicles)
+    for veh in vehicles:
+        veh.apply_action(Action.from_numpy(actions[veh.id]))
+    assert _controls(vehicles) == batched
+    # Actions of removed vehicles are ignored
+    env.scenario.remove_objects(np.array([vehicles[0].id], dtype=np.int64))
+    env.apply_actions({veh.id: np.zeros(3, dtype=np.float32) for veh in vehicles})
+    assert _controls(vehicles[:1]) == batched[:1]
+    assert all(control == (0.0, 0.0, 0.0) for control in _controls(vehicles[1:]))
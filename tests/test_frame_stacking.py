@@ -0,0 +1,53 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the stacked observations against the concatenation of the last observations of every vehicle."""
+import numpy as np
+import pytest
+from conftest import SCENE_FILE
+
+NUM_RESETS = 3
+NUM_STEPS = 8
+
+
+@pytest.mark.parametrize("n_frames_stacked", [2, 4])
+def test_frame_stacking(make_env, n_frames_stacked):
+    """Check the stacked observations over several steps, after vehicles are done and after resets.
+
+    The frames are the observations of an env without frame stacking stepped with the same actions, after
+    the warm-up observations of the stacked env. The frames before the first observation are filled with -1.
+    """
+    overrides = {"discretize_actions": True, "warmup_cache_size": 0}
+    env = make_env(subscriber={"n_frames_stacked": n_frames_stacked}, **overrides)
+    frame_env = make_env(subscriber={"n_frames_stacked": 1}, **overrides)
+    run_warmup = env._run_warmup  # pylint: disable=protected-access
+    warmups = []
+
+    def record_warmup():
+        warmups.append(run_warmup())
+        return warmups[-1]
+
+    env._run_warmup = record_warmup  # pylint: disable=protected-access
+    rng = np.random.default_rng(0)
+    num_done_steps = 0
+    for _ in range(NUM_RESETS):
+        obs = env.reset(SCENE_FILE)
+        frames = frame_env.reset(SCENE_FILE)
+        obs_dim = len(next(iter(frames.values())))
+        history = {
+            veh_id: [np.full(obs_dim, -1, dtype=np.float32)] * n_frames_stacked + warmups[-1]["context"][veh_id]
+            for veh_id in frames
+        }
+        for step in range(NUM_STEPS + 1):
+            if step > 0:
+                actions = {veh_id: rng.integers(len(env.idx_to_actions)) for veh_id in obs}
+                obs, _, done, _ = env.step(actions)
+                frames, _, _, _ = frame_env.step(actions)
+                num_done_steps += len(env.done_ids) > 0 and not done["__all__"]
+            assert obs.keys() == frames.keys()
+            for veh_id, frame in frames.items():
+                history[veh_id].append(frame.copy())
+                np.testing.assert_array_equal(obs[veh_id], np.concatenate(history[veh_id][-n_frames_stacked:]))
+    # Some of the steps are after the first vehicles are done
+    assert num_done_steps > 0
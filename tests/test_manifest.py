@@ -0,0 +1,90 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the scene selection of the environment with a dataset manifest."""
+import json
+import logging
+from pathlib import Path
+
+import pytest
+import yaml
+
+from nocturne.utils import scene_files
+from utils.data_generation.make_manifest import MANIFEST_FILE, MANIFEST_VERSION, VALID_FILES, scene_metadata
+
+# Moving vehicles of the test scene
+EXPERT_IDS = [10, 44]
+CONTROLLABLE_IDS = [49, 56]
+
+
+@pytest.fixture
+def scenario_config():
+    """Return the scenario config of the default env config."""
+    with (Path(__file__).resolve().parents[1] / "configs" / "env_config.yaml").open(encoding="utf-8") as file:
+        return yaml.safe_load(file)["scenario"]
+
+
+@pytest.fixture
+def manifest_dir(data_dir, scenario_config):
+    """Return a data folder with a usable scene and a scene whose moving vehicles all have to be experts.
+
+    The usable scene takes its experts from the manifest while valid_files.json lists other ones, and the
+    unusable scene is overwritten after the manifest is built so that loading it fails.
+    """
+    (scene,) = scene_files(data_dir)
+    (data_dir / scene).rename(data_dir / "usable.json")
+    (data_dir / "unusable.json").write_bytes((data_dir / "usable.json").read_bytes())
+    invalid_position = scenario_config["invalid_position"]
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "scenario": {
+            key: scenario_config[key]
+            for key in ("start_time", "allow_non_vehicles", "moving_threshold", "speed_threshold")
+            if key in scenario_config
+        },
+        "scenes": {
+            "usable.json": scene_metadata("usable.json", data_dir, scenario_config, invalid_position, EXPERT_IDS),
+            "unusable.json": scene_metadata(
+                "unusable.json", data_dir, scenario_config, invalid_position, EXPERT_IDS + CONTROLLABLE_IDS
+            ),
+        },
+    }
+    assert manifest["scenes"]["usable.json"]["num_controllable"] == len(CONTROLLABLE_IDS)
+    assert manifest["scenes"]["unusable.json"]["num_controllable"] == 0
+    (data_dir / MANIFEST_FILE).write_text(json.dumps(manifest))
+    (data_dir / VALID_FILES).write_text(json.dumps({"usable.json": CONTROLLABLE_IDS[:1], "unusable.json": []}))
+    (data_dir / "unusable.json").write_text("not a scene")
+    return data_dir
+
+
+@pytest.mark.usefixtures("manifest_dir")
+def test_manifest_scenes(make_env):
+    """Check that the env never loads the unusable scenes and takes the experts from the manifest."""
+    env = make_env()
+    assert env.files == ["usable.json"]
+    assert env.valid_veh_dict == {"usable.json": EXPERT_IDS, "unusable.json": EXPERT_IDS + CONTROLLABLE_IDS}
+    for _ in range(3):
+        env.reset()
+        assert env.file == "usable.json"
+        assert sorted(env.all_vehicle_ids) == CONTROLLABLE_IDS
+        for veh_obj in env.scenario.getObjectsThatMoved():
+            assert veh_obj.expert_control == (veh_obj.getID() in EXPERT_IDS)
+
+
+@pytest.mark.usefixtures("manifest_dir")
+def test_manifest_av_only(make_env):
+    """Check that the scenes without AVs are skipped when only the AVs are controlled."""
+    with pytest.raises(ValueError, match="does not contain scenes"):
+        make_env(use_av_only=True)
+
+
+def test_manifest_config_mismatch(manifest_dir, scenario_config, make_env, caplog):
+    """Check that the env warns when the manifest was built with another scenario config."""
+    manifest = json.loads((manifest_dir / MANIFEST_FILE).read_text())
+    manifest["scenario"]["start_time"] = scenario_config["start_time"] + 1
+    (manifest_dir / MANIFEST_FILE).write_text(json.dumps(manifest))
+    with caplog.at_level(logging.WARNING):
+        env = make_env()
+    assert "start_time" in caplog.text
+    assert env.files == ["usable.json"]
@@ -0,0 +1,47 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the observations normalized by the simulator against the division of the raw observations."""
+import numpy as np
+from conftest import SCENE_FILE
+
+from nocturne.envs.base_env import VISIBLE_CATEGORIES
+
+
+def _reset(env, raw_env):
+    """Reset the envs to the test scene and return the vehicles of the raw env in the order of the other."""
+    env.reset(SCENE_FILE)
+    raw_env.reset(SCENE_FILE)
+    assert env.all_vehicle_ids.keys() == raw_env.all_vehicle_ids.keys()
+    return [raw_env.all_vehicle_ids[veh.id] for veh in env.controlled_vehicles]
+
+
+def test_normalized_observations(make_env):
+    """Check that the observations are the raw ones divided by `ego_state_feat_max` and `vis_obs_max`."""
+    env = make_env(normalize_state=True)
+    raw_env = make_env(normalize_state=False)
+    raw_vehicles = _reset(env, raw_env)
+    obs = env.get_observations(env.controlled_vehicles)
+    raw_obs = raw_env.get_observations(raw_vehicles)
+    assert not np.allclose(obs, raw_obs)
+    ego_dim = env.ego_state_feat
+    expected = np.concatenate(
+        (env.normalize_ego_state_by_cat(raw_obs[:, :ego_dim]), env.normalize_obs_by_cat(raw_obs[:, ego_dim:])),
+        axis=1,
+    )
+    np.testing.assert_allclose(obs, expected, rtol=1e-6)
+
+
+def test_normalized_ragged_observations(make_env):
+    """Check that the ragged observations are normalized the same way."""
+    env = make_env(normalize_state=True, subscriber={"ragged_observations": True})
+    raw_env = make_env(normalize_state=False, subscriber={"ragged_observations": True})
+    raw_vehicles = _reset(env, raw_env)
+    obs = env.get_ragged_observations(env.controlled_vehicles)
+    raw_obs = raw_env.get_ragged_observations(raw_vehicles)
+    assert obs.keys() == raw_obs.keys()
+    np.testing.assert_allclose(obs["ego_state"], env.normalize_ego_state_by_cat(raw_obs["ego_state"]), rtol=1e-6)
+    for key in VISIBLE_CATEGORIES:
+        np.testing.assert_allclose(obs[key], env.normalize_obs_by_cat(raw_obs[key]), rtol=1e-6)
+        np.testing.assert_array_equal(obs[f"{key}_offsets"], raw_obs[f"{key}_offsets"])
@@ -0,0 +1,56 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test that the observations are written to reused buffers, or to the array given to reset and step."""
+import numpy as np
+import pytest
+from conftest import SCENE_FILE
+
+NUM_STEPS = 8
+NUM_EXTRA_ROWS = 2
+
+
+def test_reused_buffer(make_env):
+    """Check that the observations of two steps are in the same buffer."""
+    env = make_env(discretize_actions=True, warmup_cache_size=0)
+    obs = env.reset(SCENE_FILE)
+    veh_id = next(iter(obs))
+    first, _, _, _ = env.step({})
+    second, _, _, _ = env.step({})
+    assert first[veh_id].base is second[veh_id].base
+    assert first[veh_id].base is obs[veh_id].base
+
+
+@pytest.mark.parametrize("n_frames_stacked", [1, 2])
+def test_out(make_env, n_frames_stacked):
+    """Check the observations written to an output array against the ones of an env stepped with the same actions.
+
+    The rows of the vehicles that are done and the rows after the last controlled vehicle are NaN.
+    """
+    overrides = {"discretize_actions": True, "warmup_cache_size": 0}
+    env = make_env(subscriber={"n_frames_stacked": n_frames_stacked}, **overrides)
+    expected_env = make_env(subscriber={"n_frames_stacked": n_frames_stacked}, **overrides)
+    expected = expected_env.reset(SCENE_FILE)
+    obs_dim = len(next(iter(expected.values())))
+    out = np.empty((len(expected_env.controlled_vehicles) + NUM_EXTRA_ROWS, obs_dim), dtype=np.float32)
+    obs = env.reset(SCENE_FILE, out=out)
+    rng = np.random.default_rng(0)
+    num_done_steps = 0
+    for step in range(NUM_STEPS + 1):
+        if step > 0:
+            actions = {veh_id: rng.integers(len(env.idx_to_actions)) for veh_id in obs}
+            obs, _, done, _ = env.step(actions, out=out)
+            expected, _, _, _ = expected_env.step(actions)
+            num_done_steps += len(env.done_ids) > 0 and not done["__all__"]
+        assert obs.keys() == expected.keys()
+        for row, veh_obj in enumerate(env.controlled_vehicles):
+            veh_id = veh_obj.getID()
+            if veh_id in obs:
+                assert obs[veh_id].base is out
+                np.testing.assert_array_equal(out[row], expected[veh_id])
+            else:
+                assert np.isnan(out[row]).all()
+        assert np.isnan(out[len(env.controlled_vehicles) :]).all()
+    # Some of the steps are after the first vehicles are done
+    assert num_done_steps > 0
@@ -0,0 +1,33 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the budget the environments give to the process-wide cache of parsed scenes."""
+import pytest
+from conftest import SCENE_FILE
+
+from nocturne import scenario_cache_info, set_scenario_cache_capacity
+
+
+@pytest.fixture
+def scenario_cache():
+    """Disable the scene cache before and after the test."""
+    set_scenario_cache_capacity(0)
+    yield
+    set_scenario_cache_capacity(0)
+
+
+@pytest.mark.usefixtures("scenario_cache")
+def test_envs_only_raise_capacity(make_env):
+    """Check that an env with a smaller budget neither shrinks nor clears the cache of another env."""
+    env = make_env(scenario_cache_mb=8)
+    env.reset(SCENE_FILE)
+    info = scenario_cache_info()
+    assert info["capacity"] == 8 * 2**20
+    assert info["size"] == 1
+    make_env(scenario_cache_mb=0)
+    make_env(scenario_cache_mb=4)
+    assert scenario_cache_info()["capacity"] == 8 * 2**20
+    assert scenario_cache_info()["size"] == 1
+    make_env(scenario_cache_mb=16)
+    assert scenario_cache_info()["capacity"] == 16 * 2**20
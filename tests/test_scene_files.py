@@ -0,0 +1,28 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the listing of the scenes of a data folder."""
+import shutil
+
+from nocturne import convert_scenario
+from nocturne.utils import scene_files
+
+
+def test_scene_files(data_dir):
+    """Check that a scene stored both as JSON and in the binary format is listed once, by its binary file."""
+    (scene,) = scene_files(data_dir)
+    convert_scenario(str(data_dir / scene), str(data_dir / "converted.bin"))
+    shutil.copy(data_dir / scene, data_dir / "converted.json")
+    convert_scenario(str(data_dir / scene), str(data_dir / "binary_only.bin"))
+    assert scene_files(data_dir) == ["binary_only.bin", "converted.bin", scene]
+
+
+def test_env_files(data_dir, make_env):
+    """Check that the environment samples each scene of a partially converted folder once."""
+    (scene,) = scene_files(data_dir)
+    convert_scenario(str(data_dir / scene), str(data_dir / "converted.bin"))
+    shutil.copy(data_dir / scene, data_dir / "converted.json")
+    env = make_env(fix_file_order=True)
+    assert env.files == ["converted.bin", scene]
+    env.reset("converted.bin")
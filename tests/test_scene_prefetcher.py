@@ -0,0 +1,117 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the background loading of the next scenes of the environment."""
+import json
+import threading
+
+import pytest
+
+from nocturne.utils import scene_files
+
+NUM_SCENES = 4
+
+
+@pytest.fixture
+def scenes_dir(data_dir):
+    """Return a data folder with distinct scenes, scene i being the test scene without its first 3 * i objects."""
+    (scene,) = scene_files(data_dir)
+    with (data_dir / scene).open(encoding="utf-8") as file:
+        data = json.load(file)
+    (data_dir / scene).unlink()
+    objects = data["objects"]
+    for i in range(NUM_SCENES):
+        data["objects"] = objects[3 * i :]
+        with (data_dir / f"scene_{i}.json").open("w", encoding="utf-8") as file:
+            json.dump(data, file)
+    return data_dir
+
+
+def _scene_state(simulation):
+    """Return the ids and kinematics of the objects of a simulation."""
+    return [
+        (obj.id, obj.position.x, obj.position.y, obj.heading, obj.speed)
+        for obj in simulation.getScenario().getObjects()
+    ]
+
+
+@pytest.mark.usefixtures("scenes_dir")
+@pytest.mark.parametrize("sample_file_method", ["random", "no_replacement"])
+def test_prefetched_scenes(make_env, sample_file_method):
+    """Check that the prefetched scenes are the sampled ones, loaded like without prefetching."""
+    env = make_env(
+        prefetch_depth=2, sample_file_method=sample_file_method, fix_file_order=True, scenario={"context_length": 1}
+    )
+    assert len(env.files) == NUM_SCENES
+    prefetcher_get = env.prefetcher.get
+    loaded = []
+
+    def get(file):
+        simulation = prefetcher_get(file)
+        loaded.append((file, _scene_state(simulation)))
+        return simulation
+
+    env.prefetcher.get = get
+    files = []
+    predicted = None
+    for _ in range(NUM_SCENES):
+        env.reset()
+        # The scene is the first one predicted at the previous reset
+        if predicted is not None:
+            assert env.file == predicted[0]
+        predicted = env._predict_next_files()  # pylint: disable=protected-access
+        files.append(env.file)
+
+    assert [file for file, _ in loaded] == files
+    for file, state in loaded:
+        assert state == _scene_state(env._make_simulation(file))  # pylint: disable=protected-access
+    if sample_file_method == "no_replacement":
+        assert files == [f"scene_{i}.json" for i in reversed(range(NUM_SCENES))]
+    stats = env.prefetch_stats()
+    assert stats["hits"] == NUM_SCENES - 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.usefixtures("scenes_dir")
+def test_reset_to_file(make_env):
+    """Check that resets to a given scene use the prefetched copies of that scene."""
+    env = make_env(prefetch_depth=2, scenario={"context_length": 1})
+    for _ in range(3):
+        env.reset("scene_1.json")
+        assert env.file == "scene_1.json"
+    assert env.prefetch_stats() == {"hits": 2, "misses": 1, "pending": 2}
+    plain_env = make_env(scenario={"context_length": 1})
+    plain_env.reset("scene_1.json")
+    assert _scene_state(env.simulation) == _scene_state(plain_env.simulation)
+
+
+@pytest.mark.usefixtures("scenes_dir")
+def test_global_random_state(make_env):
+    """Check that sampling the next scenes ahead of time doesn't change the draws of the global random state."""
+    env = make_env(prefetch_depth=2, scenario={"context_length": 1})
+    plain_env = make_env(scenario={"context_length": 1})
+    for seed in range(3):
+        env.seed(seed)
+        env.reset()
+        plain_env.seed(seed)
+        plain_env.reset(env.file)
+        assert [veh.id for veh in env.controlled_vehicles] == [veh.id for veh in plain_env.controlled_vehicles]
+
+
+@pytest.mark.usefixtures("scenes_dir")
+def test_close(make_env):
+    """Check that `close` stops the loading threads and that the environment still resets afterwards."""
+    env = make_env(prefetch_depth=2, prefetch_workers=2, scenario={"context_length": 1})
+    env.reset()
+    prefetcher = env.prefetcher
+    assert any(thread.name.startswith("scene_prefetcher") for thread in threading.enumerate())
+    env.close()
+    assert env.prefetcher is None
+    assert not any(thread.name.startswith("scene_prefetcher") for thread in threading.enumerate())
+    with pytest.raises(RuntimeError):
+        prefetcher.prefetch(["scene_0.json"])
+    assert env.prefetch_stats() == {"hits": 0, "misses": 0, "pending": 0}
+    env.reset()
+    # Closing again is a no-op
+    env.close()
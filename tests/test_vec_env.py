@@ -0,0 +1,52 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test the observations of the multi-agent vectorized environment against its observation space."""
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from nocturne.envs.base_env import ragged_row
+from nocturne.envs.vec_env_ma import MultiAgentAsVecEnv
+
+NUM_ENVS = 8
+NUM_STEPS = 5
+
+
+@pytest.fixture
+def make_vec_env(make_config):
+    """Return a factory of vectorized environments on the test data."""
+    vec_envs = []
+
+    def _make_vec_env(**overrides):
+        vec_env = MultiAgentAsVecEnv(make_config(**overrides), num_envs=NUM_ENVS)
+        vec_envs.append(vec_env)
+        return vec_env
+
+    yield _make_vec_env
+    for vec_env in vec_envs:
+        vec_env.close()
+
+
+def test_ragged_observation_space(make_vec_env):
+    """Check that the ragged observations of the agents that are not done are in the observation space."""
+    vec_env = make_vec_env(subscriber={"ragged_observations": True})
+    assert isinstance(vec_env.observation_space, gym.spaces.Dict)
+    obs = vec_env.reset()
+    rng = np.random.default_rng(0)
+    for _ in range(NUM_STEPS):
+        rows = [idx for idx, agent_id in enumerate(vec_env.agent_ids) if agent_id not in vec_env.dead_agent_ids]
+        assert len(rows) > 0
+        for idx in rows:
+            assert vec_env.observation_space.contains(ragged_row(obs, idx))
+        obs, _, dones, _ = vec_env.step(rng.integers(vec_env.action_space.n, size=NUM_ENVS))
+        if dones.all():
+            break
+
+
+def test_observation_space(make_vec_env):
+    """Check that the flat observations have the shape of the observation space."""
+    vec_env = make_vec_env()
+    assert isinstance(vec_env.observation_space, gym.spaces.Box)
+    assert vec_env.reset().shape == (NUM_ENVS, *vec_env.observation_space.shape)
@@ -0,0 +1,97 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Test that resets restoring the warm-up from the cache are the same as resets simulating it."""
+import json
+
+import numpy as np
+import pytest
+from conftest import SCENE_FILE
+
+NUM_RESETS = 3
+NUM_STEPS = 5
+# Index in the test scene of a vehicle that moves during the whole episode
+AV_INDEX = 19
+
+
+def _vehicle_states(env):
+    """Return the kinematic state and control mode of every object, and the controlled vehicles."""
+    states = [
+        (
+            obj.id,
+            obj.position.x,
+            obj.position.y,
+            obj.heading,
+            obj.speed,
+            obj.acceleration,
+            obj.steering,
+            obj.head_angle,
+            obj.expert_control,
+        )
+        for obj in env.scenario.getObjects()
+    ]
+    return states, [veh.id for veh in env.controlled_vehicles], env.scenario.current_time
+
+
+def _assert_same_obs(obs, expected):
+    assert obs.keys() == expected.keys()
+    for veh_id, veh_obs in obs.items():
+        np.testing.assert_array_equal(veh_obs, expected[veh_id])
+
+
+def _copy_obs(obs):
+    """Return a copy of the observations of the vehicles."""
+    return {veh_id: veh_obs.copy() for veh_id, veh_obs in obs.items()}
+
+
+def _rollout(env, seed):
+    """Reset the env to the test scene several times and step it with random actions.
+
+    Returns the observations and vehicle states after every reset and step. The observations are copied
+    since the env reuses their buffers.
+    """
+    rng = np.random.default_rng(seed)
+    trajectory = []
+    for _ in range(NUM_RESETS):
+        obs = env.reset(SCENE_FILE)
+        trajectory.append((_copy_obs(obs), _vehicle_states(env)))
+        for _ in range(NUM_STEPS):
+            actions = {veh_id: rng.integers(len(env.idx_to_actions)) for veh_id in obs}
+            obs, _, done, _ = env.step(actions)
+            trajectory.append((_copy_obs(obs), _vehicle_states(env)))
+            if done["__all__"]:
+                break
+    return trajectory
+
+
+@pytest.mark.parametrize("use_av_only", [False, True])
+@pytest.mark.parametrize("n_frames_stacked", [1, 3])
+def test_warmup_cache(data_dir, make_env, n_frames_stacked, use_av_only):
+    """Check that the cached resets give the same observations and vehicle states as the uncached ones."""
+    if use_av_only:
+        # The test scene has no AV, make one of its moving vehicles the AV
+        scene = json.loads((data_dir / SCENE_FILE).read_text())
+        scene["objects"][AV_INDEX]["is_av"] = 1
+        (data_dir / SCENE_FILE).write_text(json.dumps(scene))
+    overrides = {
+        "discretize_actions": True,
+        "use_av_only": use_av_only,
+        "subscriber": {"n_frames_stacked": n_frames_stacked},
+    }
+    env = make_env(warmup_cache_size=4, **overrides)
+    run_warmup = env._run_warmup  # pylint: disable=protected-access
+    num_warmups = []
+
+    def count_warmups():
+        num_warmups.append(1)
+        return run_warmup()
+
+    env._run_warmup = count_warmups  # pylint: disable=protected-access
+    trajectory = _rollout(env, 0)
+    assert len(num_warmups) == 1
+    expected = _rollout(make_env(warmup_cache_size=0, **overrides), 0)
+
+    for (obs, states), (expected_obs, expected_states) in zip(trajectory, expected, strict=True):
+        _assert_same_obs(obs, expected_obs)
+        assert states == expected_states
@@ -0,0 +1,85 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Convert Nocturne JSON scenarios into the binary scenario format.
+
+The binary files are loaded by `Simulation(path, config)` exactly like the JSON
+files (the format is detected from the file header) but skip JSON parsing
+entirely, which makes `BaseEnv.reset` considerably faster.
+"""
+import argparse
+import json
+import multiprocessing
+from pathlib import Path
+
+from nocturne import convert_scenario
+from nocturne.utils import BINARY_SUFFIX, MANIFEST_FILE, VALID_FILES, scene_files
+
+
+def convert_files(files, output_dir):
+    """Convert the list of JSON scenario files to binary.
+
+    Args:
+    ----
+        files ([Path]): list of JSON scenario files to convert.
+        output_dir (Path): directory in which to store the binary files.
+    """
+    for file in files:
+        convert_scenario(str(file), str(output_dir / (file.stem + BINARY_SUFFIX)))
+
+
+def main():
+    """Convert a folder of JSON scenarios."""
+    parser = argparse.ArgumentParser(description="Convert Nocturne JSON scenarios to the binary format.")
+    parser.add_argument("input_dir", type=str, help="folder containing the JSON scenarios")
+    parser.add_argument("output_dir", type=str, help="folder in which to store the binary scenarios")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="If true, split the conversion up over multiple processes",
+    )
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = [input_dir / file for file in scene_files(input_dir, binary=False)]
+
+    if args.parallel:
+        # leave some cpus free but have at least one and don't use more than 40
+        num_cpus = min(max(multiprocessing.cpu_count() - 2, 1), 40)
+        num_files = len(files)
+        process_list = []
+        for i in range(num_cpus):
+            p = multiprocessing.Process(
+                target=convert_files,
+                args=[files[i * num_files // num_cpus : (i + 1) * num_files // num_cpus], output_dir],
+            )
+            p.start()
+            process_list.append(p)
+
+        for process in process_list:
+            process.join()
+    else:
+        convert_files(files, output_dir)
+
+    # Carry over the valid vehicles of each scene, keyed by the new file names
+    if (input_dir / VALID_FILES).exists():
+        with (input_dir / VALID_FILES).open(encoding="utf-8") as file:
+            valid_veh_dict = json.load(file)
+        valid_veh_dict = {Path(key).stem + BINARY_SUFFIX: value for key, value in valid_veh_dict.items()}
+        with (output_dir / VALID_FILES).open("w", encoding="utf-8") as file:
+            json.dump(valid_veh_dict, file)
+
+    # Same for the scenes of the manifest
+    if (input_dir / MANIFEST_FILE).exists():
+        with (input_dir / MANIFEST_FILE).open(encoding="utf-8") as file:
+            manifest = json.load(file)
+        manifest["scenes"] = {Path(key).stem + BINARY_SUFFIX: value for key, value in manifest["scenes"].items()}
+        with (output_dir / MANIFEST_FILE).open("w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+
+
+if __name__ == "__main__":
+    main()
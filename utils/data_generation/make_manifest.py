@@ -0,0 +1,157 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Build the manifest of a Nocturne dataset.
+
+The manifest stores metadata about every scene of a data folder or of a scenario pack: the number of
+objects that moved, the AVs, the vehicles with an invalid start or goal position, the vehicles that have to
+be experts (from `valid_files.json`), the number of road points and the number of intersecting expert paths.
+`BaseEnv` reads `manifest.json` from the data folder (or the folder of the pack) when it exists, and only
+samples scenes that have controllable vehicles. Scenes that can't be used are then never loaded.
+
+The metadata depends on the scenario config, so the manifest must be rebuilt when `start_time`,
+`allow_non_vehicles`, `moving_threshold` or `speed_threshold` change.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from nocturne import ScenarioPack, Simulation
+from nocturne.utils import MANIFEST_FILE, VALID_FILES, scene_files
+from utils.config import load_config
+from utils.count_intersecting_paths import process_vehicle_combinations
+
+MANIFEST_VERSION = 1
+
+
+def scene_metadata(file, data_path, scenario_config, invalid_position, expert_ids, *, allowed_time_window=50):
+    """Compute the metadata of a traffic scene.
+
+    Args:
+    ----
+        file (str): file name of the scene in the data folder or in the scenario pack.
+        data_path (Path): data folder or scenario pack.
+        scenario_config (dict): scenario config used to load the scene.
+        invalid_position (float): coordinate of invalid positions.
+        expert_ids ([int]): vehicles that have to be experts in this scene.
+        allowed_time_window (int): maximum number of steps between two vehicles passing through the
+            intersection of their paths for the paths to count as intersecting.
+
+    Returns:
+    -------
+        dict: the metadata of the scene.
+    """
+    if data_path.is_file():
+        sim = Simulation(ScenarioPack(str(data_path)), file, config=scenario_config)
+    else:
+        sim = Simulation(str(data_path / file), config=scenario_config)
+    scenario = sim.getScenario()
+    moving_objects = scenario.getObjectsThatMoved()
+
+    invalid_start_ids = [obj.id for obj in moving_objects if np.isclose(obj.position.x, invalid_position)]
+    invalid_goal_ids = [
+        obj.id
+        for obj in moving_objects
+        if np.isclose(obj.target_position.x, invalid_position) or np.isclose(obj.target_position.y, invalid_position)
+    ]
+    unusable_ids = set(invalid_start_ids) | set(invalid_goal_ids) | set(expert_ids)
+    moving_vehicle_ids = {veh.id for veh in scenario.getVehicles()} & {obj.id for obj in moving_objects}
+
+    # Expert trajectories of the moving vehicles, with NaNs where they are invalid
+    moving_vehicles = [obj for obj in moving_objects if obj.id in moving_vehicle_ids]
+    trajectories = []
+    for veh in moving_vehicles:
+        trajectory = []
+        while True:
+            try:
+                pos = scenario.expert_position(veh, len(trajectory))
+            except IndexError:
+                break
+            trajectory.append([np.nan, np.nan] if np.isclose(pos.x, invalid_position) else [pos.x, pos.y])
+        trajectories.append(trajectory)
+    vehicle_id_dict = {veh.id: idx for idx, veh in enumerate(moving_vehicles)}
+    intersecting_paths = {}
+    if len(moving_vehicles) > 1:
+        expert_trajectories = np.full((len(trajectories), max(map(len, trajectories)), 2), np.nan)
+        for idx, trajectory in enumerate(trajectories):
+            expert_trajectories[idx, : len(trajectory)] = trajectory
+        intersecting_paths, _ = process_vehicle_combinations(expert_trajectories, vehicle_id_dict, allowed_time_window)
+
+    return {
+        "num_objects": len(scenario.getObjects()),
+        "num_vehicles": len(scenario.getVehicles()),
+        "num_moving_objects": len(moving_objects),
+        "num_controllable": len([obj for obj in moving_objects if obj.id not in unusable_ids]),
+        "av_ids": [veh.id for veh in scenario.getVehicles() if veh.is_av],
+        "invalid_start_ids": invalid_start_ids,
+        "invalid_goal_ids": invalid_goal_ids,
+        "expert_ids": list(expert_ids),
+        "num_road_points": sum(len(road_line.geometry_points()) for road_line in scenario.getRoadLines()),
+        # Each intersection is counted for both vehicles
+        "num_intersecting_paths": int(sum(intersecting_paths.values())) // 2,
+        "max_intersecting_paths": int(max(intersecting_paths.values(), default=0)),
+    }
+
+
+def main():
+    """Write the manifest of a data folder or of a scenario pack."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the manifest of a Nocturne dataset.")
+    parser.add_argument("data_path", type=str, help="folder containing the scenarios, or scenario pack")
+    parser.add_argument("--config", type=str, default="env_config", help="env config providing the scenario config")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="If true, split the computation up over multiple processes",
+    )
+    args = parser.parse_args()
+
+    env_config = load_config(args.config)
+    scenario_config = env_config.scenario.to_dict()
+    data_path = Path(args.data_path)
+    if data_path.is_file():
+        data_dir = data_path.parent
+        files = ScenarioPack(str(data_path)).names()
+    else:
+        data_dir = data_path
+        files = scene_files(data_dir)
+
+    valid_veh_dict = {}
+    if (data_dir / VALID_FILES).exists():
+        with (data_dir / VALID_FILES).open(encoding="utf-8") as file:
+            valid_veh_dict = json.load(file)
+
+    invalid_position = scenario_config["invalid_position"]
+    tasks = [(file, data_path, scenario_config, invalid_position, valid_veh_dict.get(file, [])) for file in files]
+    if args.parallel:
+        # leave some cpus free but have at least one and don't use more than 40
+        num_cpus = min(max(multiprocessing.cpu_count() - 2, 1), 40)
+        with multiprocessing.Pool(num_cpus) as pool:
+            metadata = pool.starmap(scene_metadata, tasks)
+    else:
+        metadata = [scene_metadata(*task) for task in tasks]
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "scenario": {
+            key: scenario_config[key]
+            for key in ("start_time", "allow_non_vehicles", "moving_threshold", "speed_threshold")
+            if key in scenario_config
+        },
+        "scenes": dict(zip(files, metadata, strict=True)),
+    }
+    with (data_dir / MANIFEST_FILE).open("w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    num_usable = sum(meta["num_controllable"] > 0 for meta in metadata)
+    logging.info(
+        "Wrote the manifest of %d scenes (%d with controllable vehicles) to %s", len(files), num_usable, data_dir
+    )
+
+
+if __name__ == "__main__":
+    main()
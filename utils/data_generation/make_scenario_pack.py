@@ -0,0 +1,42 @@
+# Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Pack a folder of Nocturne scenarios into a single memory-mapped dataset file.
+
+Set `data_path` in the env config to the resulting pack file to train on it.
+The valid vehicles file and the manifest of the folder are copied next to the
+pack, where `BaseEnv` looks for them.
+"""
+import argparse
+import logging
+import shutil
+from pathlib import Path
+
+from nocturne import write_scenario_pack
+from nocturne.utils import MANIFEST_FILE, VALID_FILES, scene_files
+
+
+def main():
+    """Write the scenario pack."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Pack Nocturne scenarios into a single file.")
+    parser.add_argument("input_dir", type=str, help="folder containing the JSON or binary scenarios")
+    parser.add_argument("output_path", type=str, help="path of the scenario pack to write")
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    output_path = Path(args.output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    files = [str(input_dir / file) for file in scene_files(input_dir)]
+    write_scenario_pack(str(output_path), files)
+    logging.info("Wrote %d scenes to %s", len(files), output_path)
+
+    if input_dir.resolve() != output_path.parent.resolve():
+        for name in (VALID_FILES, MANIFEST_FILE):
+            if (input_dir / name).exists():
+                shutil.copy(input_dir / name, output_path.parent / name)
+
+
+if __name__ == "__main__":
+    main()
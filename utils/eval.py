@@ -185,6 +185,9 @@ class EvaluatePolicy:
         for timestep in range(num_steps):
             logging.debug(f"-- t = {timestep} --")
 
+            # Positions and speeds of all the agents
+            states = self.env.scenario.object_states(agent_ids)
+
             # Get actions
             if mode == "expert":
                 for veh_obj in self.env.controlled_vehicles:
@@ -199,8 +202,8 @@ class EvaluatePolicy:
                             veh_idx = agent_id_to_idx_dict[veh_obj.id]
 
                             # Store action index, position, and speed
-                            agent_positions[veh_idx, timestep] = np.array([veh_obj.position.x, veh_obj.position.y])
-                            agent_speed[veh_idx, timestep] = veh_obj.speed
+                            agent_positions[veh_idx, timestep] = states["position"][veh_idx]
+                            agent_speed[veh_idx, timestep] = states["speed"][veh_idx]
                             action_indices[veh_idx, timestep] = action_idx
                         else:
                             # Skip None actions (these are invalid)
@@ -222,11 +225,12 @@ class EvaluatePolicy:
                 # self.policy.get_distribution(observations).distribution.probs
                 action_dict = dict(zip(obs_dict.keys(), actions))
 
+                alive = ~np.isin(agent_ids, dead_agent_ids)
+                agent_positions[alive, timestep] = states["position"][alive]
+                agent_speed[alive, timestep] = states["speed"][alive]
                 for veh_obj in self.env.controlled_vehicles:
                     if veh_obj.id not in dead_agent_ids:
                         veh_idx = agent_id_to_idx_dict[veh_obj.id]
-                        agent_positions[veh_idx, timestep] = np.array([veh_obj.position.x, veh_obj.position.y])
-                        agent_speed[veh_idx, timestep] = veh_obj.speed
                         action_indices[veh_idx, timestep] = action_dict[veh_obj.id]
 
             elif mode == "random":